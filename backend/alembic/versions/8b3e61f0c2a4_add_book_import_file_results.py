@@ -0,0 +1,121 @@
+"""add book import file results
+
+Revision ID: 8b3e61f0c2a4
+Revises: 5d7c9d5d4c61
+Create Date: 2026-10-19 10:00:00.000000
+"""
+
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '8b3e61f0c2a4'
+down_revision = '5d7c9d5d4c61'
+branch_labels = None
+depends_on = None
+
+
+def _load_json_list(value) -> list:
+    if isinstance(value, list):
+        return value
+    if not value:
+        return []
+    try:
+        parsed = json.loads(value)
+    except (TypeError, ValueError):
+        return []
+    return parsed if isinstance(parsed, list) else []
+
+
+def upgrade() -> None:
+    file_results = op.create_table('book_import_file_results',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('task_id', sa.String(length=64), nullable=False),
+    sa.Column('account_id', sa.Integer(), nullable=False),
+    sa.Column('source_name', sa.String(length=500), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('chunk_count', sa.Integer(), nullable=True),
+    sa.Column('ocr_used', sa.Boolean(), nullable=True),
+    sa.Column('ocr_pages', sa.Integer(), nullable=True),
+    sa.Column('error_message', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['account_id'], ['accounts.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('book_import_file_results', schema=None) as batch_op:
+        batch_op.create_index('ix_book_import_file_results_task_id', ['task_id', 'id'], unique=False)
+        batch_op.create_index('ix_book_import_file_results_account_task', ['account_id', 'task_id'], unique=False)
+
+    conn = op.get_bind()
+    tasks = sa.table(
+        'book_import_tasks',
+        sa.column('id', sa.Integer()),
+        sa.column('task_id', sa.String()),
+        sa.column('account_id', sa.Integer()),
+        sa.column('file_results', sa.JSON()),
+        sa.column('updated_at', sa.DateTime()),
+    )
+    rows = conn.execute(
+        sa.select(tasks.c.task_id, tasks.c.account_id, tasks.c.file_results, tasks.c.updated_at).order_by(tasks.c.id.asc())
+    ).fetchall()
+    payload = []
+    for task_id, account_id, raw_results, updated_at in rows:
+        for item in _load_json_list(raw_results):
+            if not isinstance(item, dict):
+                continue
+            payload.append(
+                {
+                    'task_id': task_id,
+                    'account_id': int(account_id or 1),
+                    'source_name': str(item.get('source_name', '') or '')[:500],
+                    'status': str(item.get('status', 'pending') or 'pending')[:20],
+                    'chunk_count': int(item.get('chunk_count', 0) or 0),
+                    'ocr_used': bool(item.get('ocr_used', False)),
+                    'ocr_pages': int(item.get('ocr_pages', 0) or 0),
+                    'error_message': str(item.get('error_message', '') or ''),
+                    'created_at': updated_at,
+                }
+            )
+    if payload:
+        op.bulk_insert(file_results, payload)
+
+    with op.batch_alter_table('book_import_tasks', schema=None) as batch_op:
+        batch_op.drop_column('file_results')
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('book_import_tasks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('file_results', sa.JSON(), nullable=True))
+
+    conn = op.get_bind()
+    rows = conn.execute(
+        sa.text(
+            'SELECT task_id, source_name, status, chunk_count, ocr_used, ocr_pages, error_message '
+            'FROM book_import_file_results ORDER BY task_id ASC, id ASC'
+        )
+    ).fetchall()
+    grouped: dict[str, list[dict]] = {}
+    for task_id, source_name, status, chunk_count, ocr_used, ocr_pages, error_message in rows:
+        grouped.setdefault(task_id, []).append(
+            {
+                'source_name': source_name,
+                'status': status,
+                'chunk_count': int(chunk_count or 0),
+                'ocr_used': bool(ocr_used),
+                'ocr_pages': int(ocr_pages or 0),
+                'error_message': error_message or '',
+            }
+        )
+    for task_id, items in grouped.items():
+        conn.execute(
+            sa.text('UPDATE book_import_tasks SET file_results = :file_results WHERE task_id = :task_id'),
+            {'file_results': json.dumps(items, ensure_ascii=False), 'task_id': task_id},
+        )
+
+    with op.batch_alter_table('book_import_file_results', schema=None) as batch_op:
+        batch_op.drop_index('ix_book_import_file_results_account_task')
+        batch_op.drop_index('ix_book_import_file_results_task_id')
+
+    op.drop_table('book_import_file_results')
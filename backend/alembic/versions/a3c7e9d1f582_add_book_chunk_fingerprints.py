@@ -0,0 +1,37 @@
+"""add book chunk fingerprints
+
+Revision ID: a3c7e9d1f582
+Revises: f1b9d3e6a4c7
+Create Date: 2026-10-19 23:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'a3c7e9d1f582'
+down_revision = 'f1b9d3e6a4c7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('book_chunk_fingerprints',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('account_id', sa.Integer(), nullable=False),
+    sa.Column('source_hash', sa.String(length=64), nullable=False),
+    sa.Column('doc_type', sa.String(length=50), nullable=False, server_default=''),
+    sa.Column('fingerprint', sa.BigInteger(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['account_id'], ['accounts.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('book_chunk_fingerprints', schema=None) as batch_op:
+        batch_op.create_index('ix_book_chunk_fingerprints_source', ['account_id', 'source_hash'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('book_chunk_fingerprints', schema=None) as batch_op:
+        batch_op.drop_index('ix_book_chunk_fingerprints_source')
+
+    op.drop_table('book_chunk_fingerprints')
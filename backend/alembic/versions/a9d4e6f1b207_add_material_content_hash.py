@@ -0,0 +1,27 @@
+"""add material content hash
+
+Revision ID: a9d4e6f1b207
+Revises: f5c81d2e7a94
+Create Date: 2026-10-19 14:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'a9d4e6f1b207'
+down_revision = 'f5c81d2e7a94'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('materials', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+        batch_op.create_index('ix_materials_hash_account', ['content_hash', 'account_id'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('materials', schema=None) as batch_op:
+        batch_op.drop_index('ix_materials_hash_account')
+        batch_op.drop_column('content_hash')
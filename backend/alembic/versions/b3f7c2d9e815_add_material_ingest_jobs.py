@@ -0,0 +1,55 @@
+"""add material ingest jobs
+
+Revision ID: b3f7c2d9e815
+Revises: a9d4e6f1b207
+Create Date: 2026-10-19 15:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'b3f7c2d9e815'
+down_revision = 'a9d4e6f1b207'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('material_ingest_jobs',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('task_id', sa.String(length=64), nullable=False),
+    sa.Column('account_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('filename', sa.String(length=500), nullable=False),
+    sa.Column('file_path', sa.String(length=1000), nullable=False),
+    sa.Column('file_size', sa.Integer(), nullable=True),
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('allow_duplicate', sa.Boolean(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=True),
+    sa.Column('worker_id', sa.String(length=100), nullable=True),
+    sa.Column('material_id', sa.Integer(), nullable=True),
+    sa.Column('duplicate', sa.Boolean(), nullable=True),
+    sa.Column('message', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['account_id'], ['accounts.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('material_ingest_jobs', schema=None) as batch_op:
+        batch_op.create_index('uq_material_ingest_jobs_task_id', ['task_id'], unique=True)
+        batch_op.create_index('ix_material_ingest_jobs_status_id', ['status', 'id'], unique=False)
+        batch_op.create_index('ix_material_ingest_jobs_account_user', ['account_id', 'user_id'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('material_ingest_jobs', schema=None) as batch_op:
+        batch_op.drop_index('ix_material_ingest_jobs_account_user')
+        batch_op.drop_index('ix_material_ingest_jobs_status_id')
+        batch_op.drop_index('uq_material_ingest_jobs_task_id')
+
+    op.drop_table('material_ingest_jobs')
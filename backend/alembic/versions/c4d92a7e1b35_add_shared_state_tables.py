@@ -0,0 +1,57 @@
+"""add shared state tables
+
+Revision ID: c4d92a7e1b35
+Revises: 8b3e61f0c2a4
+Create Date: 2026-10-19 11:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'c4d92a7e1b35'
+down_revision = '8b3e61f0c2a4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('shared_counters',
+    sa.Column('key', sa.String(length=255), nullable=False),
+    sa.Column('value', sa.BigInteger(), nullable=False),
+    sa.Column('expires_at', sa.Float(), nullable=True),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_table('shared_leases',
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('owner', sa.String(length=255), nullable=False),
+    sa.Column('expires_at', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.create_table('shared_values',
+    sa.Column('key', sa.String(length=255), nullable=False),
+    sa.Column('value', sa.JSON(), nullable=True),
+    sa.Column('expires_at', sa.Float(), nullable=True),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_table('shared_messages',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('channel', sa.String(length=255), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('shared_messages', schema=None) as batch_op:
+        batch_op.create_index('ix_shared_messages_channel_id', ['channel', 'id'], unique=False)
+        batch_op.create_index('ix_shared_messages_created_at', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('shared_messages', schema=None) as batch_op:
+        batch_op.drop_index('ix_shared_messages_created_at')
+        batch_op.drop_index('ix_shared_messages_channel_id')
+
+    op.drop_table('shared_messages')
+    op.drop_table('shared_values')
+    op.drop_table('shared_leases')
+    op.drop_table('shared_counters')
@@ -0,0 +1,27 @@
+"""add material ingest batch id
+
+Revision ID: d6a1f8c3b592
+Revises: b3f7c2d9e815
+Create Date: 2026-10-19 16:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'd6a1f8c3b592'
+down_revision = 'b3f7c2d9e815'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('material_ingest_jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('batch_id', sa.String(length=64), nullable=True))
+        batch_op.create_index('ix_material_ingest_jobs_batch_id', ['batch_id'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('material_ingest_jobs', schema=None) as batch_op:
+        batch_op.drop_index('ix_material_ingest_jobs_batch_id')
+        batch_op.drop_column('batch_id')
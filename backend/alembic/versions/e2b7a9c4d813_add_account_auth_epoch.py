@@ -0,0 +1,25 @@
+"""add account auth epoch
+
+Revision ID: e2b7a9c4d813
+Revises: c4d92a7e1b35
+Create Date: 2026-10-19 12:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'e2b7a9c4d813'
+down_revision = 'c4d92a7e1b35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('accounts', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('auth_epoch', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('accounts', schema=None) as batch_op:
+        batch_op.drop_column('auth_epoch')
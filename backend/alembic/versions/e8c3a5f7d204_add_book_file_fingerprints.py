@@ -0,0 +1,31 @@
+"""add book file fingerprints
+
+Revision ID: e8c3a5f7d204
+Revises: d6a1f8c3b592
+Create Date: 2026-10-19 18:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'e8c3a5f7d204'
+down_revision = 'd6a1f8c3b592'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('book_file_fingerprints',
+    sa.Column('relative_path', sa.String(length=1000), nullable=False),
+    sa.Column('file_size', sa.BigInteger(), nullable=False),
+    sa.Column('mtime_ns', sa.BigInteger(), nullable=False),
+    sa.Column('inode', sa.BigInteger(), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('hashed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('relative_path')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('book_file_fingerprints')
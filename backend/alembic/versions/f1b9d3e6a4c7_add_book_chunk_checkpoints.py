@@ -0,0 +1,47 @@
+"""add book chunk checkpoints
+
+Revision ID: f1b9d3e6a4c7
+Revises: e8c3a5f7d204
+Create Date: 2026-10-19 21:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'f1b9d3e6a4c7'
+down_revision = 'e8c3a5f7d204'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('book_chunk_checkpoints',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('account_id', sa.Integer(), nullable=False),
+    sa.Column('source_hash', sa.String(length=64), nullable=False),
+    sa.Column('chunk_hash', sa.String(length=64), nullable=False),
+    sa.Column('namespace', sa.String(length=500), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['account_id'], ['accounts.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('book_chunk_checkpoints', schema=None) as batch_op:
+        batch_op.create_index(
+            'uq_book_chunk_checkpoints_chunk',
+            ['account_id', 'source_hash', 'chunk_hash', 'namespace'],
+            unique=True,
+        )
+
+    with op.batch_alter_table('book_import_tasks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('rebuild_cleared', sa.Boolean(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('book_import_tasks', schema=None) as batch_op:
+        batch_op.drop_column('rebuild_cleared')
+
+    with op.batch_alter_table('book_chunk_checkpoints', schema=None) as batch_op:
+        batch_op.drop_index('uq_book_chunk_checkpoints_chunk')
+
+    op.drop_table('book_chunk_checkpoints')
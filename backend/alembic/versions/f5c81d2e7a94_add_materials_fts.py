@@ -0,0 +1,45 @@
+"""add materials fts index
+
+Revision ID: f5c81d2e7a94
+Revises: e2b7a9c4d813
+Create Date: 2026-10-19 13:00:00.000000
+"""
+
+from alembic import op
+from sqlalchemy.exc import OperationalError
+
+
+revision = 'f5c81d2e7a94'
+down_revision = 'e2b7a9c4d813'
+branch_labels = None
+depends_on = None
+
+# Words are separated by ZERO WIDTH SPACE; must match FTS5_TOKENIZE in app/services/material_search_index.py.
+FTS5_TOKENIZE = "unicode61 separators '\u200b'"
+
+
+def upgrade() -> None:
+    # SQLite only; server databases keep the LIKE fallback in MaterialService.
+    conn = op.get_bind()
+    if conn.dialect.name != 'sqlite':
+        return
+    try:
+        conn.exec_driver_sql(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS materials_fts '
+            f'USING fts5(title, keywords, content, terms, tokenize="{FTS5_TOKENIZE}")'
+        )
+    except OperationalError:
+        # SQLite built without FTS5.
+        return
+    # Backfilled unsegmented, with terms left NULL; run_database_migrations segments these rows with jieba.
+    conn.exec_driver_sql('DELETE FROM materials_fts')
+    conn.exec_driver_sql(
+        'INSERT INTO materials_fts (rowid, title, keywords, content, terms) '
+        'SELECT id, title, keywords, content_text, NULL FROM materials'
+    )
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    if conn.dialect.name == 'sqlite':
+        conn.exec_driver_sql('DROP TABLE IF EXISTS materials_fts')
@@ -42,6 +42,7 @@ from app.serializers import (
     serialize_user_role_update_response,
 )
 from app.services.account_membership_service import AccountMembershipService
+from app.services.auth_context_cache import auth_context_cache
 from app.services.rbac_service import RBACError, RBACService, user_has_role
 
 router = APIRouter()
@@ -253,6 +254,7 @@ def update_account_status(
     if not row:
         raise HTTPException(404, "账户不存在")
     row.status = req.status
+    auth_context_cache.invalidate_on_commit(db)
     db.commit()
     db.refresh(row)
     return serialize_account(row)
@@ -4,7 +4,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, field_validator
 from sqlalchemy.orm import Session
 
-from app.auth import create_access_token, get_current_user, hash_password, verify_password
+from app.auth import create_user_access_token, get_current_user, hash_password, verify_password
 from app.database import get_db
 from app.models.account import Account
 from app.models.user import User
@@ -84,7 +84,7 @@ def register(req: RegisterRequest, db: Session = Depends(get_db)):
         department=req.department,
         invite_code=req.invite_code,
     )
-    token = create_access_token(user.id)
+    token = create_user_access_token(db, user)
     return serialize_auth_token_response(db, user, token)
 
 
@@ -100,7 +100,7 @@ def login(req: LoginRequest, db: Session = Depends(get_db)):
     if not account:
         raise HTTPException(403, "账户已禁用")
 
-    token = create_access_token(user.id)
+    token = create_user_access_token(db, user)
     return serialize_auth_token_response(db, user, token)
 
 
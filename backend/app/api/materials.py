@@ -1,9 +1,11 @@
 from __future__ import annotations
 
 import asyncio
+import uuid
 from pathlib import Path
 
 from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 
@@ -14,10 +16,12 @@ from app.config import get_settings
 from app.database import get_db
 from app.errors import AppError, FileValidationError, logger
 from app.models.book_source import BookSource
+from app.models.material_ingest_job import MaterialIngestJob
 from app.models.user import User
 from app.prompts.validators import ensure_canonical_doc_type
 from app.schemas.common import MessageResponse
 from app.schemas.materials import (
+    BookImportFileResultListResponse,
     BookImportStartResponse,
     BookImportTaskResponse,
     BookScanResponse,
@@ -26,10 +30,11 @@ from app.schemas.materials import (
     MaterialListResponse,
     MaterialResponse,
     MaterialSearchResponse,
-    MaterialUploadResponse,
+    MaterialUploadBatchResponse,
     UploadTaskResponse,
 )
 from app.serializers import (
+    serialize_book_import_file_result,
     serialize_book_import_start_response,
     serialize_book_import_task,
     serialize_book_scan_item,
@@ -37,17 +42,23 @@ from app.serializers import (
     serialize_book_upload_response,
     serialize_collection_response,
     serialize_material_detail,
+    serialize_material_ingest_job,
     serialize_material_list_item,
     serialize_material_search_hit,
-    serialize_material_upload_result,
+    serialize_material_upload_batch,
     serialize_message_response,
     serialize_upload_task,
 )
-from app.services.book_import_service import BookImportConflictError, BookImportService
+from app.services.book_import_service import BookImportService
 from app.services.book_import_task_service import book_import_task_tracker
 from app.services.context_bridge import ContextBridge
-from app.services.material_ingestion_service import MaterialIngestionService
+from app.services.material_ingest_dispatcher import material_ingest_dispatcher
 from app.services.material_service import MaterialService
+from app.services.progress_stream_service import (
+    BOOK_IMPORT_TERMINAL_STATUSES,
+    UPLOAD_TERMINAL_STATUSES,
+    ProgressStreamService,
+)
 from app.side_effects import new_error_id
 from app.services.upload_progress_service import upload_progress_tracker
 
@@ -55,6 +66,37 @@ router = APIRouter()
 ctx_bridge = ContextBridge()
 settings = get_settings()
 
+UPLOAD_TASK_STREAM_RESPONSE = {
+    200: {
+        "description": "SSE stream of an upload task snapshot followed by progress deltas.",
+        "content": {
+            "text/event-stream": {
+                "schema": {
+                    "type": "string",
+                    "example": 'data: {"event":"snapshot","task":{"task_id":"t1","status":"parsing","stage":"解析中","message":"","parse_progress":40,"updated_at":0}}\n\ndata: {"event":"delta","task_id":"t1","changes":{"parse_progress":60}}\n\ndata: [DONE]\n\n',
+                },
+            },
+        },
+    },
+}
+
+BOOK_IMPORT_TASK_STREAM_RESPONSE = {
+    200: {
+        "description": "SSE stream of a book import task snapshot followed by progress deltas.",
+        "content": {
+            "text/event-stream": {
+                "schema": {
+                    "type": "string",
+                    "example": 'data: {"event":"snapshot","task":{"task_id":"t1","status":"running"}}\n\ndata: {"event":"delta","task_id":"t1","changes":{"completed_chunks":5}}\n\ndata: [DONE]\n\n',
+                },
+            },
+        },
+    },
+}
+
+
+MATERIAL_UPLOAD_EXTENSIONS = {".doc", ".docx", ".pdf", ".txt"}
+
 
 def _safe_books_dir() -> str:
     # avoid leaking absolute server path
@@ -66,73 +108,189 @@ def _safe_books_dir() -> str:
     return "data/book"
 
 
-@router.post("/upload", response_model=MaterialUploadResponse)
+def _check_material_extension(filename: str) -> None:
+    ext = "." + filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    if ext not in MATERIAL_UPLOAD_EXTENSIONS:
+        raise HTTPException(400, f"不支持的文件格式，仅支持: {', '.join(sorted(MATERIAL_UPLOAD_EXTENSIONS))}")
+
+
+@router.post("/upload", response_model=UploadTaskResponse, status_code=202)
 async def upload_material(
     file: UploadFile = File(...),
     task_id: str | None = Form(None),
+    allow_duplicate: bool = Form(False),
     db: Session = Depends(get_db),
     current_user: User = Depends(require_permission("materials:write")),
 ):
-    """Upload a material file and extract title/doc_type/summary/keywords."""
-    allowed_ext = {".doc", ".docx", ".pdf", ".txt"}
-    ext = "." + file.filename.rsplit(".", 1)[-1].lower() if "." in file.filename else ""
-    if ext not in allowed_ext:
-        raise HTTPException(400, f"不支持的文件格式，仅支持: {', '.join(sorted(allowed_ext))}")
-
-    def update_progress(progress: int, stage: str, status: str = "parsing", message: str = ""):
-        if task_id:
-            upload_progress_tracker.update(
-                task_id,
-                account_id=current_user.account_id,
-                parse_progress=progress,
-                stage=stage,
-                status=status,
-                message=message,
-            )
-
+    """Store a material file and queue its extraction of title/doc_type/summary/keywords.
+
+    Responds ``202`` with the upload task as soon as the file is on disk; progress
+    and the outcome are reported on ``/upload-tasks/{task_id}``. A file whose
+    content the user already uploaded completes with the message ``素材已存在``;
+    ``allow_duplicate`` creates a separate entry that reuses the earlier
+    extraction and analysis instead.
+    """
+    _check_material_extension(file.filename)
+
+    task_id = task_id or uuid.uuid4().hex
+    upload_progress_tracker.update(
+        task_id,
+        account_id=current_user.account_id,
+        parse_progress=3,
+        status="parsing",
+        stage="正在保存文件",
+    )
     try:
-        file_bytes = await file.read()
-        result = await MaterialIngestionService(
+        stored = await asyncio.to_thread(MaterialService(db).save_upload, file.file, file.filename, current_user.id)
+        material_ingest_dispatcher.enqueue(
             db,
+            task_id=task_id,
             account_id=current_user.account_id,
             user_id=current_user.id,
-        ).ingest_upload(
-            file_bytes=file_bytes,
             filename=file.filename,
-            context_bridge=ctx_bridge,
-            progress_callback=update_progress,
+            stored=stored,
+            allow_duplicate=allow_duplicate,
         )
     except AppError as e:
         db.rollback()
-        if task_id:
-            upload_progress_tracker.fail(task_id, message=e.message)
+        upload_progress_tracker.fail(task_id, message=e.message)
         raise
     except Exception as e:
         db.rollback()
         error_id = new_error_id()
         logger.exception("upload material failed. error_id=%s user_id=%s err=%s", error_id, current_user.id, e)
-        if task_id:
-            upload_progress_tracker.fail(task_id, message=f"处理失败，请重试（错误ID: {error_id}）")
+        upload_progress_tracker.fail(task_id, message=f"处理失败，请重试（错误ID: {error_id}）")
+        raise AppError(
+            "上传处理失败，请稍后重试",
+            detail=str(e),
+            error_id=error_id,
+        ) from e
+
+    return serialize_upload_task(upload_progress_tracker.get(task_id) or {"task_id": task_id, "status": "queued"})
+
+
+@router.post("/upload-batch", response_model=MaterialUploadBatchResponse, status_code=202)
+async def upload_material_batch(
+    files: list[UploadFile] = File(...),
+    task_id: str | None = Form(None),
+    allow_duplicate: bool = Form(False),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_permission("materials:write")),
+):
+    """Store many material files and queue them as one batch with a single progress task.
+
+    Files are extracted in parallel worker processes and analysed with bounded LLM
+    concurrency; ``/upload-batches/{task_id}`` reports the status of every file.
+    """
+    if len(files) > settings.material_batch_max_files:
+        raise HTTPException(400, f"单次最多上传 {settings.material_batch_max_files} 个文件")
+    for file in files:
+        _check_material_extension(file.filename)
+
+    task_id = task_id or uuid.uuid4().hex
+    upload_progress_tracker.update(
+        task_id,
+        account_id=current_user.account_id,
+        parse_progress=3,
+        status="parsing",
+        stage="正在保存文件",
+    )
+    service = MaterialService(db)
+    stored_files = []
+    try:
+        for file in files:
+            stored = await asyncio.to_thread(service.save_upload, file.file, file.filename, current_user.id)
+            stored_files.append((file.filename, stored))
+        jobs = material_ingest_dispatcher.enqueue_batch(
+            db,
+            batch_id=task_id,
+            account_id=current_user.account_id,
+            user_id=current_user.id,
+            files=stored_files,
+            allow_duplicate=allow_duplicate,
+        )
+    except AppError as e:
+        db.rollback()
+        for _, stored in stored_files:
+            service.cleanup_material_file(stored.path)
+        upload_progress_tracker.fail(task_id, message=e.message)
+        raise
+    except Exception as e:
+        db.rollback()
+        for _, stored in stored_files:
+            service.cleanup_material_file(stored.path)
+        error_id = new_error_id()
+        logger.exception("batch upload failed. error_id=%s user_id=%s err=%s", error_id, current_user.id, e)
+        upload_progress_tracker.fail(task_id, message=f"处理失败，请重试（错误ID: {error_id}）")
         raise AppError(
             "上传处理失败，请稍后重试",
             detail=str(e),
             error_id=error_id,
         ) from e
 
-    return serialize_material_upload_result(result.material, warnings=result.warnings)
+    return serialize_material_upload_batch(upload_progress_tracker.get(task_id), jobs)
+
+
+@router.get("/upload-batches/{task_id}", response_model=MaterialUploadBatchResponse)
+def get_upload_batch(
+    task_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_permission("materials:read")),
+):
+    jobs = (
+        db.query(MaterialIngestJob)
+        .filter(MaterialIngestJob.batch_id == task_id, MaterialIngestJob.account_id == current_user.account_id)
+        .order_by(MaterialIngestJob.id.asc())
+        .all()
+    )
+    if not jobs:
+        raise HTTPException(404, "上传任务不存在")
+    task = upload_progress_tracker.get(task_id)
+    if task and int(task.get("account_id", 1)) != int(current_user.account_id):
+        task = None
+    return serialize_material_upload_batch(task, jobs)
 
 
 @router.get("/upload-tasks/{task_id}", response_model=UploadTaskResponse)
 def get_upload_task(
     task_id: str,
+    db: Session = Depends(get_db),
     current_user: User = Depends(require_permission("materials:read")),
 ):
     task = upload_progress_tracker.get(task_id)
-    if not task:
+    if task:
+        if int(task.get("account_id", 1)) != int(current_user.account_id):
+            raise HTTPException(404, "上传任务不存在")
+        return serialize_upload_task(task)
+    job = (
+        db.query(MaterialIngestJob)
+        .filter(MaterialIngestJob.task_id == task_id, MaterialIngestJob.account_id == current_user.account_id)
+        .first()
+    )
+    if job is None:
         raise HTTPException(404, "上传任务不存在")
-    if int(task.get("account_id", 1)) != int(current_user.account_id):
+    return serialize_material_ingest_job(job)
+
+
+@router.get("/upload-tasks/{task_id}/stream", response_class=StreamingResponse, responses=UPLOAD_TASK_STREAM_RESPONSE)
+async def stream_upload_task(
+    task_id: str,
+    current_user: User = Depends(require_permission("materials:read")),
+):
+    # The upload request may still be on its way, so a missing task is awaited briefly by the stream.
+    task = await asyncio.to_thread(upload_progress_tracker.get, task_id)
+    if task and int(task.get("account_id", 1)) != int(current_user.account_id):
         raise HTTPException(404, "上传任务不存在")
-    return serialize_upload_task(task)
+    stream_service = ProgressStreamService(
+        upload_progress_tracker,
+        serialize_task=serialize_upload_task,
+        terminal_statuses=UPLOAD_TERMINAL_STATUSES,
+    )
+    return StreamingResponse(
+        stream_service.stream(task_id, account_id=current_user.account_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("", response_model=MaterialListResponse)
@@ -157,7 +315,7 @@ def list_materials(
         doc_type=doc_type,
         keyword=keyword,
     )
-    materials = svc.get_materials(
+    hits = svc.get_material_hits(
         user_id=current_user.id,
         account_id=current_user.account_id,
         doc_type=doc_type,
@@ -165,13 +323,7 @@ def list_materials(
         skip=skip,
         limit=limit,
     )
-    changed = svc.normalize_materials_char_count(materials)
-    if changed:
-        db.commit()
-    items = [
-        serialize_material_list_item(material, char_count=svc.calculate_char_count(material.content_text or ""))
-        for material in materials
-    ]
+    items = [serialize_material_list_item(material, snippet=snippet) for material, snippet in hits]
     return serialize_collection_response(items, total=total)
 
 
@@ -211,12 +363,7 @@ def get_material(
     if material.user_id != current_user.id:
         raise HTTPException(403, "无权访问该素材")
 
-    old_char_count = material.char_count
-    char_count = svc.normalize_material_char_count(material)
-    if old_char_count != char_count:
-        db.commit()
-
-    return serialize_material_detail(material, char_count=char_count)
+    return serialize_material_detail(material)
 
 
 @router.delete("/{material_id}", response_model=MessageResponse)
@@ -271,8 +418,7 @@ async def upload_books(
     for file in files:
         source_name = Path(file.filename or '').name or '未命名文件'
         try:
-            file_bytes = await file.read()
-            item = await asyncio.to_thread(svc.save_book_upload, file_bytes, source_name)
+            item = await asyncio.to_thread(svc.save_book_upload, file.file, source_name)
             uploaded_items.append(item)
         except FileValidationError as exc:
             errors.append({
@@ -322,15 +468,11 @@ def import_books(
         raise HTTPException(403, "仅管理员可执行重建导入")
 
     svc = BookImportService(db, account_id=current_user.account_id)
-    try:
-        task_id, total_files = svc.start_import_task(
-            rebuild=bool(req.rebuild),
-            selected_files=req.selected_files,
-        )
-    except BookImportConflictError as e:
-        raise HTTPException(409, f"已有导入任务在运行，请稍后重试（task_id: {e.active_task_id}）")
-
-    return serialize_book_import_start_response(task_id, total_files=total_files)
+    task_id, total_files = svc.start_import_task(
+        rebuild=bool(req.rebuild),
+        selected_files=req.selected_files,
+    )
+    return serialize_book_import_start_response(task_id, total_files=total_files, status="queued")
 
 
 @router.get("/books/tasks/{task_id}", response_model=BookImportTaskResponse)
@@ -346,6 +488,60 @@ def get_book_import_task(
     return serialize_book_import_task(task)
 
 
+@router.post("/books/tasks/{task_id}/cancel", response_model=BookImportTaskResponse)
+def cancel_book_import_task(
+    task_id: str,
+    current_user: User = Depends(require_permission("books:write")),
+):
+    task = book_import_task_tracker.get(task_id)
+    if not task or int(task.get("account_id", 1)) != int(current_user.account_id):
+        raise HTTPException(404, "书籍学习任务不存在")
+    if task["status"] in BOOK_IMPORT_TERMINAL_STATUSES:
+        raise HTTPException(409, "任务已结束，无法取消")
+    return serialize_book_import_task(book_import_task_tracker.cancel(task_id) or task)
+
+
+@router.get("/books/tasks/{task_id}/stream", response_class=StreamingResponse, responses=BOOK_IMPORT_TASK_STREAM_RESPONSE)
+async def stream_book_import_task(
+    task_id: str,
+    current_user: User = Depends(require_permission("books:read")),
+):
+    task = await asyncio.to_thread(book_import_task_tracker.get, task_id)
+    if not task:
+        raise HTTPException(404, "书籍学习任务不存在")
+    if int(task.get("account_id", 1)) != int(current_user.account_id):
+        raise HTTPException(404, "书籍学习任务不存在")
+    stream_service = ProgressStreamService(
+        book_import_task_tracker,
+        serialize_task=serialize_book_import_task,
+        terminal_statuses=BOOK_IMPORT_TERMINAL_STATUSES,
+    )
+    return StreamingResponse(
+        stream_service.stream(task_id, account_id=current_user.account_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/books/tasks/{task_id}/files", response_model=BookImportFileResultListResponse)
+def list_book_import_task_files(
+    task_id: str,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(require_permission("books:read")),
+):
+    task = book_import_task_tracker.get(task_id)
+    if not task:
+        raise HTTPException(404, "书籍学习任务不存在")
+    if int(task.get("account_id", 1)) != int(current_user.account_id):
+        raise HTTPException(404, "书籍学习任务不存在")
+    items, total = book_import_task_tracker.list_file_results(task_id, skip=skip, limit=limit)
+    return serialize_collection_response(
+        [serialize_book_import_file_result(item) for item in items],
+        total=total,
+    )
+
+
 @router.get("/books/sources", response_model=BookSourceListResponse)
 def list_book_sources(
     skip: int = Query(0, ge=0),
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from datetime import datetime, timedelta, timezone
-from typing import Callable
+from typing import Any, Callable
 
 import bcrypt
 from fastapi import Depends, HTTPException, status
@@ -14,6 +14,7 @@ from app.database import get_db
 from app.models.account import Account
 from app.models.user import User
 from app.rbac import ROLE_ADMIN, ROLE_WRITER
+from app.services.auth_context_cache import auth_context_cache, restore_user, snapshot_user
 from app.services.rbac_service import RBACService, user_has_role
 
 settings = get_settings()
@@ -31,12 +32,46 @@ def verify_password(plain: str, hashed: str) -> bool:
     return bcrypt.checkpw(plain.encode("utf-8"), hashed.encode("utf-8"))
 
 
-def create_access_token(user_id: int) -> str:
+def create_access_token(user_id: int, claims: dict[str, Any] | None = None) -> str:
     expire = datetime.now(timezone.utc) + timedelta(minutes=settings.access_token_expire_minutes)
-    payload = {"sub": str(user_id), "exp": expire}
+    payload: dict[str, Any] = {"sub": str(user_id), "exp": expire}
+    if claims:
+        payload["ctx"] = claims
     return jwt.encode(payload, settings.secret_key, algorithm=ALGORITHM)
 
 
+def create_user_access_token(db: Session, user: User) -> str:
+    """Token for ``user``; with ``AUTH_TOKEN_CLAIMS`` it also carries the access context.
+
+    The claims are trusted only while the account's ``auth_epoch`` is unchanged, so
+    role, permission, membership and status changes revoke them.
+    """
+    if not settings.auth_token_claims:
+        return create_access_token(user.id)
+    account = db.query(Account).filter(Account.id == user.account_id).first()
+    if account is None or account.status != "active":
+        return create_access_token(user.id)
+    context = RBACService(db).build_user_access_context(user)
+    claims = {
+        "acc": context["account_id"],
+        "ep": int(account.auth_epoch or 0),
+        "role": user.role,
+        "roles": context["role_codes"],
+        "perms": context["permission_codes"],
+        "pr": context["primary_role"],
+    }
+    return create_access_token(user.id, claims)
+
+
+def decode_access_token_user_id(token: str) -> int | None:
+    """User id carried by a valid token, without touching the database."""
+    try:
+        payload = jwt.decode(token, settings.secret_key, algorithms=[ALGORITHM])
+        return int(payload.get("sub", 0)) or None
+    except (JWTError, ValueError):
+        return None
+
+
 def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db),
@@ -54,14 +89,55 @@ def get_current_user(
     except (JWTError, ValueError):
         raise credentials_exception
 
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise credentials_exception
-    account = db.query(Account).filter(Account.id == user.account_id).first()
-    if not account or account.status != "active":
+    claims = payload.get("ctx")
+    if settings.auth_token_claims and isinstance(claims, dict):
+        user = _user_from_claims(db, user_id, claims)
+        if user is not None:
+            return user
+
+    context = auth_context_cache.get(user_id)
+    if context is not None:
+        user = restore_user(db, context["user"])
+    else:
+        version = auth_context_cache.version()
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user:
+            raise credentials_exception
+        account = db.query(Account).filter(Account.id == user.account_id).first()
+        context = {"account_status": account.status if account else None}
+        if context["account_status"] == "active":
+            context.update(RBACService(db).build_user_access_context(user))
+        context["user"] = snapshot_user(user)
+        auth_context_cache.put(user.id, context, version=version)
+    if context["account_status"] != "active":
         raise HTTPException(status_code=403, detail="账户已禁用")
 
-    return RBACService(db).attach_user_access_context(user)
+    return RBACService(db).attach_user_access_context(user, context)
+
+
+def _user_from_claims(db: Session, user_id: int, claims: dict[str, Any]) -> User | None:
+    """User built from token claims, or None when they were revoked or are malformed."""
+    try:
+        account_id = int(claims["acc"])
+        epoch = int(claims["ep"])
+        context = {
+            "role_codes": [str(code) for code in claims["roles"]],
+            "permission_codes": [str(code) for code in claims["perms"]],
+            "primary_role": str(claims["pr"]),
+        }
+    except (KeyError, TypeError, ValueError):
+        return None
+    current_epoch = auth_context_cache.get_epoch(account_id)
+    if current_epoch is None:
+        version = auth_context_cache.version()
+        current_epoch = db.query(Account.auth_epoch).filter(Account.id == account_id).scalar()
+        if current_epoch is None:
+            return None
+        auth_context_cache.put_epoch(account_id, current_epoch, version=version)
+    if current_epoch != epoch:
+        return None
+    user = restore_user(db, {"id": user_id, "account_id": account_id, "role": claims.get("role")})
+    return RBACService(db).attach_user_access_context(user, context)
 
 
 def user_has_permission(user: User, permission: str) -> bool:
@@ -39,24 +39,91 @@ class Settings(BaseSettings):
     book_augmentation_enabled: bool = True
     book_chunk_size: int = 800
     book_chunk_overlap: int = 120
+    # Drop chunks whose SimHash is within this many bits of a chunk already kept from any of the account's books
+    book_chunk_dedupe_enabled: bool = True
+    book_chunk_simhash_distance: int = 3
     book_retrieval_top_k: int = 4
     book_style_top_k: int = 6
+    book_import_flush_interval_ms: int = 1000
+    book_import_flush_max_updates: int = 50
+    # Threads hashing new or changed book files during a scan; unchanged files reuse stored hashes
+    book_scan_hash_workers: int = 4
+    # Import pipeline: books parsed at once (runs in the extraction pool, so keep EXTRACTION_WORKERS >= this),
+    # concurrent analysis LLM calls, chunk uploads in flight and finished files per DB commit
+    book_import_parse_concurrency: int = 2
+    book_import_llm_concurrency: int = 4
+    book_import_chunk_concurrency: int = 8
+    book_import_write_batch_size: int = 20
+    # Imports running at once across all accounts; each account runs one at a time, the rest queue
+    book_import_max_concurrent: int = 2
+
+    # Material uploads are extracted and analysed by a background worker pool
+    material_ingest_workers: int = 2
+    # A running ingest job whose heartbeat is older than this is requeued
+    material_ingest_stale_seconds: int = 300
+    # Batch uploads: files per request and concurrent LLM analyses
+    material_batch_max_files: int = 200
+    material_batch_llm_concurrency: int = 4
+
+    # Extraction process pool (material text, EPUB, PDF/OCR). Limits apply per job;
+    # book files get the longer book timeout, used as their CPU budget as well.
+    extraction_workers: int = 2
+    extraction_max_tasks_per_worker: int = 50
+    extraction_memory_mb: int = 2048
+    extraction_cpu_seconds: int = 120
+    extraction_timeout_seconds: int = 300
+    extraction_book_timeout_seconds: int = 3600
+    # Extraction results cached on disk by file hash; least recently used entries go past the size cap
+    extraction_cache_enabled: bool = True
+    extraction_cache_dir: str = str(PROJECT_ROOT / "data" / "extraction_cache")
+    extraction_cache_max_mb: int = 1024
+    # Per-page OCR text under EXTRACTION_CACHE_DIR/ocr-pages, reused when a PDF is parsed again
+    ocr_page_cache_max_mb: int = 512
+
+    # State shared across worker processes: local (single worker), sqlite (application database), redis
+    state_backend: str = "local"
+    state_redis_url: str = "redis://localhost:6379/0"
+    state_message_retention_seconds: int = 300
+    book_import_lease_seconds: int = 60
+
+    # Progress streams (SSE)
+    progress_stream_queue_size: int = 32
+    progress_stream_keepalive_seconds: int = 15
+    # How long a stream waits for a task id that does not exist yet (uploads open the stream first).
+    progress_stream_pending_seconds: int = 30
 
     # PDF OCR
     pdf_ocr_enabled: bool = True
     pdf_ocr_lang: str = "chi_sim+eng"
     pdf_ocr_dpi: int = 300
+    # Adaptive OCR: pages are first read at PDF_OCR_FAST_DPI and re-read at PDF_OCR_DPI only when the
+    # mean word confidence (0-100) is below PDF_OCR_MIN_CONFIDENCE; the re-read drops the second
+    # language when the first pass found no Latin words. Disabled: one pass at PDF_OCR_DPI.
+    pdf_ocr_adaptive: bool = True
+    pdf_ocr_fast_dpi: int = 200
+    pdf_ocr_min_confidence: float = 70.0
     pdf_ocr_max_pages: int = 500
+    # OCR worker processes per PDF (0 = all CPU cores); also pdftoppm's rasterization thread count
+    pdf_ocr_workers: int = 0
 
     # CORS
     cors_origins: str = "http://localhost:5173,http://127.0.0.1:5173,http://localhost:9000,http://127.0.0.1:9000"
 
-    # Rate limiting
+    # Rate limiting (GCRA token bucket; LLM routes cost more than one token)
     rate_limit_per_minute: int = 60
+    rate_limit_burst: int = 60
+    rate_limit_max_keys: int = 10000
+    # Count against STATE_BACKEND so all workers share one bucket per client.
+    rate_limit_shared: bool = False
 
     # Auth
     secret_key: str = "change-this-to-a-random-secret-key"
     access_token_expire_minutes: int = 1440  # 24 hours
+    auth_context_cache_ttl_seconds: int = 30
+    auth_context_cache_max_entries: int = 10000
+    auth_context_version_check_seconds: float = 1.0
+    # Embed account, roles and permissions in access tokens (revoked via accounts.auth_epoch).
+    auth_token_claims: bool = False
 
     # Initial admin bootstrap
     initial_admin_username: str = ""
@@ -76,6 +143,7 @@ class Settings(BaseSettings):
         self.upload_dir = _resolve_project_path(self.upload_dir)
         self.export_dir = _resolve_project_path(self.export_dir)
         self.books_dir = _resolve_project_path(self.books_dir)
+        self.extraction_cache_dir = _resolve_project_path(self.extraction_cache_dir)
 
         insecure_secret = self.secret_key.strip() in {"", "change-this-to-a-random-secret-key"}
         insecure_ov_key = self.openviking_root_api_key.strip() in {"", "ov-writer-secret-key-change-me"}
@@ -1,36 +1,46 @@
 from __future__ import annotations
 
-import time
-from collections import defaultdict
+import math
 from contextlib import asynccontextmanager
 from uuid import uuid4
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 
 from app.api import accounts, auth, chat, documents, materials, preferences
 from app.bootstrap import ensure_runtime_ready
 from app.config import get_settings
 from app.errors import AppError, logger, setup_logging
+from app.schemas import RateLimitMetricsResponse
+from app.serializers import serialize_rate_limit_metrics
 from app.services.background_executor import shutdown_background_executors
 from app.services.book_import_dispatcher import book_import_dispatcher
+from app.services.book_import_task_service import book_import_task_tracker
+from app.services.extraction_pool import extraction_pool
+from app.services.material_ingest_dispatcher import material_ingest_dispatcher
+from app.services.rate_limiter import rate_limiter
+from app.services.state_backend import check_worker_support
 
 setup_logging()
 settings = get_settings()
 cors_origins = [o.strip() for o in settings.cors_origins.split(',') if o.strip()]
-_rate_buckets: dict[str, list[float]] = defaultdict(list)
-_rate_limit = settings.rate_limit_per_minute
 
 
 @asynccontextmanager
 async def lifespan(_app: FastAPI):
+    check_worker_support()
     ensure_runtime_ready()
-    book_import_dispatcher.resume_recoverable_tasks()
+    book_import_dispatcher.schedule()
+    material_ingest_dispatcher.resume_pending_jobs()
     try:
         yield
     finally:
         book_import_dispatcher.shutdown(wait=False, cancel_futures=True)
+        material_ingest_dispatcher.shutdown(wait=False, cancel_futures=True)
+        extraction_pool.shutdown(wait=False, cancel_futures=True)
+        book_import_task_tracker.flush()
         shutdown_background_executors(wait=False, cancel_futures=True)
         await chat.ctx_bridge.close()
         await materials.ctx_bridge.close()
@@ -49,24 +59,36 @@ def create_app() -> FastAPI:
 
     @app.middleware('http')
     async def rate_limit_middleware(request: Request, call_next):
-        if request.url.path in ('/api/health',):
+        if request.url.path.startswith('/api/health'):
             return await call_next(request)
 
-        client_ip = request.client.host if request.client else 'unknown'
-        now = time.time()
-        bucket = _rate_buckets[client_ip]
-
-        _rate_buckets[client_ip] = [t for t in bucket if now - t < 60]
-        bucket = _rate_buckets[client_ip]
+        try:
+            decision = await run_in_threadpool(
+                rate_limiter.check,
+                method=request.method,
+                path=request.url.path,
+                authorization=request.headers.get('Authorization'),
+                client_ip=request.client.host if request.client else 'unknown',
+            )
+        except Exception as exc:
+            logger.warning('Rate limit state unavailable: %s', exc)
+            return await call_next(request)
 
-        if len(bucket) >= _rate_limit:
+        headers = {
+            'X-RateLimit-Limit': str(rate_limiter.burst),
+            'X-RateLimit-Remaining': str(decision.remaining),
+        }
+        if not decision.allowed:
+            headers['Retry-After'] = str(max(1, math.ceil(decision.retry_after)))
             return JSONResponse(
                 status_code=429,
                 content={'error': '请求过于频繁，请稍后再试'},
+                headers=headers,
             )
 
-        bucket.append(now)
-        return await call_next(request)
+        response = await call_next(request)
+        response.headers.update(headers)
+        return response
 
     @app.exception_handler(AppError)
     async def app_error_handler(request: Request, exc: AppError):
@@ -104,6 +126,10 @@ def create_app() -> FastAPI:
     def health_check():
         return {'status': 'ok', 'service': '公文写作系统'}
 
+    @app.get('/api/health/rate-limit', response_model=RateLimitMetricsResponse)
+    def rate_limit_metrics():
+        return serialize_rate_limit_metrics(rate_limiter.metrics())
+
     return app
 
 
@@ -12,6 +12,8 @@ import app.models  # noqa: F401
 from app.database import Base, engine
 from app.errors import logger
 from app.schema_patch import apply_account_schema_patch
+from app.services.material_search_index import ensure_index as ensure_material_search_index
+from app.services.material_search_index import segment_backfilled as segment_backfilled_material_search_index
 
 APP_TABLE_NAMES = tuple(Base.metadata.tables.keys())
 
@@ -33,6 +35,13 @@ def _has_existing_app_tables(target_engine: Engine) -> bool:
     return bool(existing.intersection(APP_TABLE_NAMES))
 
 
+def _segment_backfilled_search_index(target_engine: Engine) -> None:
+    with target_engine.begin() as conn:
+        segmented = segment_backfilled_material_search_index(conn)
+    if segmented:
+        logger.info('Segmented %s materials backfilled into the search index', segmented)
+
+
 def run_database_migrations(
     target_engine: Engine | None = None,
     *,
@@ -44,15 +53,19 @@ def run_database_migrations(
 
     if _has_alembic_version_table(target_engine):
         command.upgrade(config, 'head')
+        _segment_backfilled_search_index(target_engine)
         logger.info('Database migrated to Alembic head')
         return
 
     if allow_legacy_bootstrap and _has_existing_app_tables(target_engine):
         Base.metadata.create_all(bind=target_engine)
         apply_account_schema_patch(target_engine)
+        with target_engine.begin() as conn:
+            ensure_material_search_index(conn)
         command.stamp(config, 'head')
         logger.info('Legacy schema normalized and stamped to Alembic head')
         return
 
     command.upgrade(config, 'head')
+    _segment_backfilled_search_index(target_engine)
     logger.info('Database migrated to Alembic head')
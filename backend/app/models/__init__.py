@@ -1,22 +1,30 @@
 from app.models.account import Account
 from app.models.user import User
 from app.models.material import Material
+from app.models.material_ingest_job import MaterialIngestJob
 from app.models.chat import ChatSession, ChatMessage, SessionDraft
 from app.models.document import GeneratedDocument
 from app.models.preference import UserPreference
 from app.models.style import WritingHabit, StyleProfile
 from app.models.book_source import BookSource
+from app.models.book_file_fingerprint import BookFileFingerprint
 from app.models.book_style_rule import BookStyleRule
 from app.models.book_import_task import BookImportTask
+from app.models.book_import_file_result import BookImportFileResult
+from app.models.book_chunk_checkpoint import BookChunkCheckpoint
+from app.models.book_chunk_fingerprint import BookChunkFingerprint
 from app.models.invite_code import InviteCode
+from app.models.shared_state import SharedCounter, SharedLease, SharedMessage, SharedValue
 from app.models.permission import Permission
 from app.models.role import Role
 from app.models.role_permission import RolePermission
 from app.models.user_role import UserRole
 
 __all__ = [
-    "Account", "User", "Material", "ChatSession", "ChatMessage", "SessionDraft",
+    "Account", "User", "Material", "MaterialIngestJob", "ChatSession", "ChatMessage", "SessionDraft",
     "GeneratedDocument", "UserPreference", "WritingHabit", "StyleProfile",
-    "BookSource", "BookStyleRule", "BookImportTask", "InviteCode",
+    "BookSource", "BookFileFingerprint", "BookStyleRule", "BookImportTask", "BookImportFileResult",
+    "BookChunkCheckpoint", "BookChunkFingerprint", "InviteCode",
     "Permission", "Role", "RolePermission", "UserRole",
+    "SharedCounter", "SharedLease", "SharedMessage", "SharedValue",
 ]
\ No newline at end of file
@@ -16,5 +16,8 @@ class Account(Base):
     code = Column(String(64), unique=True, nullable=False)
     name = Column(String(120), nullable=False)
     status = Column(String(20), default="active", nullable=False)
+    # Bumped whenever roles, permissions, membership or status change; tokens carrying
+    # permission claims from an older epoch are no longer trusted.
+    auth_epoch = Column(Integer, default=0, server_default="0", nullable=False)
     created_at = Column(DateTime, default=_utcnow)
     updated_at = Column(DateTime, default=_utcnow, onupdate=_utcnow)
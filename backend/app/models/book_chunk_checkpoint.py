@@ -0,0 +1,32 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String
+
+from app.database import Base
+
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+
+class BookChunkCheckpoint(Base):
+    """A book chunk already written to one OpenViking namespace; resumed imports skip it."""
+
+    __tablename__ = "book_chunk_checkpoints"
+    __table_args__ = (
+        Index(
+            "uq_book_chunk_checkpoints_chunk",
+            "account_id",
+            "source_hash",
+            "chunk_hash",
+            "namespace",
+            unique=True,
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    account_id = Column(Integer, ForeignKey("accounts.id"), nullable=False, default=1)
+    source_hash = Column(String(64), nullable=False)
+    chunk_hash = Column(String(64), nullable=False)
+    namespace = Column(String(500), nullable=False)
+    created_at = Column(DateTime, default=_utcnow)
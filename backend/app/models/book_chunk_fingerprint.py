@@ -0,0 +1,25 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Index, Integer, String
+
+from app.database import Base
+
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+
+class BookChunkFingerprint(Base):
+    """SimHash of a chunk an imported book kept; later books drop their near-duplicates of it."""
+
+    __tablename__ = "book_chunk_fingerprints"
+    __table_args__ = (Index("ix_book_chunk_fingerprints_source", "account_id", "source_hash"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    account_id = Column(Integer, ForeignKey("accounts.id"), nullable=False, default=1)
+    source_hash = Column(String(64), nullable=False)
+    # Books of another doc_type live in another namespace, so their chunks are not duplicates there.
+    doc_type = Column(String(50), nullable=False, default="")
+    # The unsigned 64-bit fingerprint stored as a signed BIGINT.
+    fingerprint = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime, default=_utcnow)
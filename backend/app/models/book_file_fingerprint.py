@@ -0,0 +1,22 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import BigInteger, Column, DateTime, String
+
+from app.database import Base
+
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+
+class BookFileFingerprint(Base):
+    """Content hash of a file under ``books_dir``, valid while its size, mtime and inode are unchanged."""
+
+    __tablename__ = "book_file_fingerprints"
+
+    relative_path = Column(String(1000), primary_key=True)
+    file_size = Column(BigInteger, nullable=False)
+    mtime_ns = Column(BigInteger, nullable=False)
+    inode = Column(BigInteger, nullable=False)
+    sha256 = Column(String(64), nullable=False)
+    hashed_at = Column(DateTime, default=_utcnow)
@@ -0,0 +1,28 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, String, Text
+
+from app.database import Base
+
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+
+class BookImportFileResult(Base):
+    __tablename__ = "book_import_file_results"
+    __table_args__ = (
+        Index("ix_book_import_file_results_task_id", "task_id", "id"),
+        Index("ix_book_import_file_results_account_task", "account_id", "task_id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    task_id = Column(String(64), nullable=False)
+    account_id = Column(Integer, ForeignKey("accounts.id"), nullable=False, default=1)
+    source_name = Column(String(500), nullable=False, default="")
+    status = Column(String(20), nullable=False, default="pending")
+    chunk_count = Column(Integer, default=0)
+    ocr_used = Column(Boolean, default=False)
+    ocr_pages = Column(Integer, default=0)
+    error_message = Column(Text, default="")
+    created_at = Column(DateTime, default=_utcnow)
@@ -24,6 +24,8 @@ class BookImportTask(Base):
     stage = Column(String(200), default="")
     message = Column(Text, default="")
     rebuild = Column(Boolean, default=False)
+    # Set once a rebuild task has cleared the account's books, so a resumed run does not clear them again.
+    rebuild_cleared = Column(Boolean, default=False)
     total_files = Column(Integer, default=0)
     completed_files = Column(Integer, default=0)
     failed_files = Column(Integer, default=0)
@@ -34,7 +36,6 @@ class BookImportTask(Base):
     completed_chunks = Column(Integer, default=0)
     ocr_used_files = Column(Integer, default=0)
     ocr_pages = Column(Integer, default=0)
-    file_results = Column(JSON, default=list)
     selected_files = Column(JSON, default=list)
     started_at = Column(DateTime, default=_utcnow)
     updated_at = Column(DateTime, default=_utcnow, onupdate=_utcnow)
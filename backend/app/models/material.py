@@ -13,6 +13,7 @@ class Material(Base):
         Index("ix_materials_account_created", "account_id", "created_at"),
         Index("ix_materials_user_doctype", "user_id", "doc_type"),
         Index("ix_materials_user_created", "user_id", "created_at"),
+        Index("ix_materials_hash_account", "content_hash", "account_id"),
     )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -21,6 +22,8 @@ class Material(Base):
     title = Column(String(500), nullable=False)
     original_filename = Column(String(500))
     file_path = Column(String(1000))
+    # SHA-256 of the uploaded file; NULL for rows created before uploads were hashed.
+    content_hash = Column(String(64))
     content_text = Column(Text)
     doc_type = Column(String(50), index=True)
     summary = Column(Text)
@@ -0,0 +1,44 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, String, Text
+
+from app.database import Base
+
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+
+class MaterialIngestJob(Base):
+    """A stored material upload waiting for (or going through) extraction and analysis."""
+
+    __tablename__ = "material_ingest_jobs"
+    __table_args__ = (
+        Index("uq_material_ingest_jobs_task_id", "task_id", unique=True),
+        Index("ix_material_ingest_jobs_status_id", "status", "id"),
+        Index("ix_material_ingest_jobs_account_user", "account_id", "user_id"),
+        Index("ix_material_ingest_jobs_batch_id", "batch_id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    task_id = Column(String(64), nullable=False)
+    # Set for files of one /upload-batch request; the batch id is also its progress task id.
+    batch_id = Column(String(64), nullable=True)
+    account_id = Column(Integer, ForeignKey("accounts.id"), nullable=False, default=1)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    filename = Column(String(500), nullable=False)
+    file_path = Column(String(1000), nullable=False)
+    file_size = Column(Integer, default=0)
+    content_hash = Column(String(64), nullable=False)
+    allow_duplicate = Column(Boolean, default=False)
+    # queued -> running -> completed | failed
+    status = Column(String(20), default="queued", nullable=False)
+    attempts = Column(Integer, default=0)
+    worker_id = Column(String(100), default="")
+    material_id = Column(Integer, nullable=True)
+    duplicate = Column(Boolean, default=False)
+    message = Column(Text, default="")
+    created_at = Column(DateTime, default=_utcnow)
+    heartbeat_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=_utcnow, onupdate=_utcnow)
+    finished_at = Column(DateTime, nullable=True)
@@ -0,0 +1,40 @@
+from sqlalchemy import JSON, BigInteger, Column, Float, Index, Integer, String
+
+from app.database import Base
+
+
+class SharedCounter(Base):
+    __tablename__ = "shared_counters"
+
+    key = Column(String(255), primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
+    expires_at = Column(Float, nullable=True)
+
+
+class SharedLease(Base):
+    __tablename__ = "shared_leases"
+
+    name = Column(String(255), primary_key=True)
+    owner = Column(String(255), nullable=False)
+    expires_at = Column(Float, nullable=False)
+
+
+class SharedValue(Base):
+    __tablename__ = "shared_values"
+
+    key = Column(String(255), primary_key=True)
+    value = Column(JSON, nullable=True)
+    expires_at = Column(Float, nullable=True)
+
+
+class SharedMessage(Base):
+    __tablename__ = "shared_messages"
+    __table_args__ = (
+        Index("ix_shared_messages_channel_id", "channel", "id"),
+        Index("ix_shared_messages_created_at", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    channel = Column(String(255), nullable=False)
+    payload = Column(JSON, nullable=True)
+    created_at = Column(Float, nullable=False)
@@ -60,6 +60,23 @@ def bootstrap_rbac() -> None:
         db.close()
 
 
+def _live_book_import_task_ids(account_ids: set[int]) -> set[str]:
+    """Tasks still running in another worker process, as seen through their accounts' leases."""
+    from app.services.book_import_task_service import book_import_account_lease, book_import_task_id_from_lease_owner
+    from app.services.state_backend import INSTANCE_ID, get_state_backend
+
+    live: set[str] = set()
+    try:
+        backend = get_state_backend()
+        for account_id in account_ids:
+            owner = backend.lease_owner(book_import_account_lease(account_id))
+            if owner and not owner.startswith(f'{INSTANCE_ID}:'):
+                live.add(book_import_task_id_from_lease_owner(owner))
+    except Exception as exc:
+        logger.warning('Book import lease lookup failed: %s', exc)
+    return live
+
+
 def mark_interrupted_book_tasks() -> None:
     db = SessionLocal()
     try:
@@ -68,6 +85,8 @@ def mark_interrupted_book_tasks() -> None:
             .filter(BookImportTask.status.in_(['pending', 'running']))
             .all()
         )
+        live_task_ids = _live_book_import_task_ids({int(row.account_id or 1) for row in rows})
+        rows = [row for row in rows if row.task_id not in live_task_ids]
         if not rows:
             return
         now = datetime.now(timezone.utc)
@@ -29,22 +29,36 @@ from app.schemas.chat import (
     ChatWorkflowSseEventResponse,
     SessionDraftResponse,
 )
-from app.schemas.common import ListResponse, MessageResponse, WarningMixin
+from app.schemas.common import (
+    ListResponse,
+    MessageResponse,
+    RateLimitMetricsResponse,
+    RateLimitRouteMetricsResponse,
+    WarningMixin,
+)
 from app.schemas.documents import GeneratedDocumentHistoryItemResponse, GeneratedDocumentHistoryListResponse
 from app.schemas.materials import (
+    BookImportFileResultListResponse,
     BookImportFileResultResponse,
     BookImportStartResponse,
     BookImportTaskResponse,
+    BookImportTaskSnapshotSseEventResponse,
+    BookImportTaskStreamEventResponse,
     BookScanItemResponse,
     BookScanResponse,
     BookSourceListResponse,
     BookSourceResponse,
     BookUploadErrorResponse,
     BookUploadResponse,
+    MaterialListItemResponse,
     MaterialListResponse,
     MaterialResponse,
-    MaterialUploadResponse,
+    TaskProgressDeltaSseEventResponse,
     UploadTaskResponse,
+    MaterialUploadBatchFileResponse,
+    MaterialUploadBatchResponse,
+    UploadTaskSnapshotSseEventResponse,
+    UploadTaskStreamEventResponse,
 )
 from app.schemas.preferences import PreferencesResponse
 
@@ -56,9 +70,12 @@ __all__ = [
     "AccountUsersResponse",
     "AuthTokenResponse",
     "AuthUserResponse",
+    "BookImportFileResultListResponse",
     "BookImportFileResultResponse",
     "BookImportStartResponse",
     "BookImportTaskResponse",
+    "BookImportTaskSnapshotSseEventResponse",
+    "BookImportTaskStreamEventResponse",
     "BookScanItemResponse",
     "BookScanResponse",
     "BookSourceListResponse",
@@ -80,21 +97,28 @@ __all__ = [
     "InviteStatusResponse",
     "GeneratedDocumentHistoryListResponse",
     "ListResponse",
+    "MaterialListItemResponse",
     "MaterialListResponse",
     "MaterialResponse",
-    "MaterialUploadResponse",
     "MessageResponse",
     "PermissionCodesResponse",
     "PermissionInfoResponse",
     "PermissionListResponse",
     "PreferencesResponse",
     "ProfileUpdateResponse",
+    "RateLimitMetricsResponse",
+    "RateLimitRouteMetricsResponse",
     "RebindUserResponse",
     "SessionDraftResponse",
     "RoleDeleteResponse",
     "RoleInfoResponse",
     "RoleListResponse",
+    "TaskProgressDeltaSseEventResponse",
     "UploadTaskResponse",
+    "MaterialUploadBatchFileResponse",
+    "MaterialUploadBatchResponse",
+    "UploadTaskSnapshotSseEventResponse",
+    "UploadTaskStreamEventResponse",
     "UserRoleSummaryResponse",
     "UserRoleUpdateResponse",
     "WarningMixin",
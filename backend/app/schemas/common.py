@@ -22,3 +22,16 @@ class MessageResponse(ApiModel):
 class ListResponse(ApiModel, Generic[T]):
     items: list[T] = Field(default_factory=list)
     total: int
+
+
+class RateLimitRouteMetricsResponse(ApiModel):
+    route_group: str
+    cost: int
+    allowed: int
+    limited: int
+
+
+class RateLimitMetricsResponse(ApiModel):
+    rate_per_minute: int
+    burst: int
+    routes: list[RateLimitRouteMetricsResponse] = Field(default_factory=list)
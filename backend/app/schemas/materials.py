@@ -1,10 +1,10 @@
 from __future__ import annotations
 
-from typing import Any
+from typing import Annotated, Any, Literal
 
 from pydantic import Field
 
-from app.schemas.common import ApiModel, ListResponse, WarningMixin
+from app.schemas.common import ApiModel, ListResponse
 
 
 class MaterialResponse(ApiModel):
@@ -19,11 +19,12 @@ class MaterialResponse(ApiModel):
     created_at: str | None = None
 
 
-class MaterialUploadResponse(MaterialResponse, WarningMixin):
-    pass
+class MaterialListItemResponse(MaterialResponse):
+    # Keyword matches only: HTML-escaped excerpt with the matched words in <mark>.
+    snippet: str | None = None
 
 
-class MaterialListResponse(ListResponse[MaterialResponse]):
+class MaterialListResponse(ListResponse[MaterialListItemResponse]):
     pass
 
 
@@ -51,6 +52,19 @@ class UploadTaskResponse(ApiModel):
     updated_at: int
 
 
+class MaterialUploadBatchFileResponse(ApiModel):
+    task_id: str
+    filename: str
+    status: str
+    material_id: int | None = None
+    duplicate: bool = False
+    message: str = ""
+
+
+class MaterialUploadBatchResponse(UploadTaskResponse):
+    files: list[MaterialUploadBatchFileResponse] = Field(default_factory=list)
+
+
 class BookScanItemResponse(ApiModel):
     source_name: str
     relative_path: str
@@ -83,6 +97,10 @@ class BookImportFileResultResponse(ApiModel):
     error_message: str = ""
 
 
+class BookImportFileResultListResponse(ListResponse[BookImportFileResultResponse]):
+    pass
+
+
 class BookImportTaskResponse(ApiModel):
     task_id: str
     status: str
@@ -105,8 +123,9 @@ class BookImportTaskResponse(ApiModel):
     overall_progress: int
     ocr_used_files: int
     ocr_pages: int
-    file_results: list[BookImportFileResultResponse] = Field(default_factory=list)
     selected_files: list[str] = Field(default_factory=list)
+    # Place among waiting tasks (1 starts next); null once the task has started
+    queue_position: int | None = None
 
 
 class BookUploadErrorResponse(ApiModel):
@@ -140,3 +159,31 @@ class BookSourceResponse(ApiModel):
 
 class BookSourceListResponse(ListResponse[BookSourceResponse]):
     pass
+
+
+class TaskProgressDeltaSseEventResponse(ApiModel):
+    event: Literal['delta']
+    task_id: str
+    changes: dict[str, Any] = Field(default_factory=dict)
+
+
+class UploadTaskSnapshotSseEventResponse(ApiModel):
+    event: Literal['snapshot']
+    task: UploadTaskResponse
+
+
+class BookImportTaskSnapshotSseEventResponse(ApiModel):
+    event: Literal['snapshot']
+    task: BookImportTaskResponse
+
+
+UploadTaskStreamEventResponse = Annotated[
+    UploadTaskSnapshotSseEventResponse | TaskProgressDeltaSseEventResponse,
+    Field(discriminator='event'),
+]
+
+
+BookImportTaskStreamEventResponse = Annotated[
+    BookImportTaskSnapshotSseEventResponse | TaskProgressDeltaSseEventResponse,
+    Field(discriminator='event'),
+]
@@ -3,7 +3,7 @@ from __future__ import annotations
 import json
 
 from collections import defaultdict
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Any
 
 from sqlalchemy.orm import Session
@@ -14,6 +14,7 @@ from app.models.chat import ChatMessage, ChatSession
 from app.models.document import GeneratedDocument
 from app.models.invite_code import InviteCode
 from app.models.material import Material
+from app.models.material_ingest_job import MaterialIngestJob
 from app.models.permission import Permission
 from app.models.role import Role
 from app.models.user import User
@@ -153,6 +154,31 @@ def serialize_chat_done_sse() -> str:
     return "data: [DONE]\n\n"
 
 
+def serialize_task_snapshot_sse(task: dict[str, Any]) -> str:
+    return _serialize_sse_payload({"event": "snapshot", "task": task})
+
+
+def serialize_task_delta_sse(previous: dict[str, Any], current: dict[str, Any]) -> str | None:
+    changes = {key: value for key, value in current.items() if previous.get(key) != value}
+    if not changes:
+        return None
+    return _serialize_sse_payload(
+        {
+            "event": "delta",
+            "task_id": str(current.get("task_id", "")),
+            "changes": changes,
+        }
+    )
+
+
+def serialize_sse_keepalive() -> str:
+    return ": keepalive\n\n"
+
+
+def serialize_task_stream_done_sse() -> str:
+    return "data: [DONE]\n\n"
+
+
 def serialize_collection_response(items: list[Any], *, total: int, **extra: Any) -> dict[str, Any]:
     payload: dict[str, Any] = {
         "items": items,
@@ -162,6 +188,22 @@ def serialize_collection_response(items: list[Any], *, total: int, **extra: Any)
     return payload
 
 
+def serialize_rate_limit_metrics(metrics: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "rate_per_minute": int(metrics.get("rate_per_minute", 0)),
+        "burst": int(metrics.get("burst", 0)),
+        "routes": [
+            {
+                "route_group": str(item.get("route_group") or ""),
+                "cost": int(item.get("cost", 0)),
+                "allowed": int(item.get("allowed", 0)),
+                "limited": int(item.get("limited", 0)),
+            }
+            for item in metrics.get("routes", [])
+        ],
+    }
+
+
 def serialize_account(account: Account, *, user_count: int | None = None) -> dict[str, Any]:
     payload: dict[str, Any] = {
         "id": account.id,
@@ -353,29 +395,26 @@ def serialize_draft_response(
     return payload
 
 
-def _material_base(material: Material, *, char_count: int | None = None) -> dict[str, Any]:
+def _material_base(material: Material) -> dict[str, Any]:
     return {
         "id": material.id,
         "title": material.title,
         "doc_type": material.doc_type,
         "summary": material.summary,
         "keywords": material.keywords or [],
-        "char_count": int(char_count if char_count is not None else (material.char_count or 0)),
+        "char_count": int(material.char_count or 0),
     }
 
 
-def serialize_material_upload_result(material: Material, warnings: list[str] | None = None) -> dict[str, Any]:
-    return _attach_warnings(_material_base(material), warnings)
-
-
-def serialize_material_list_item(material: Material, *, char_count: int | None = None) -> dict[str, Any]:
-    payload = _material_base(material, char_count=char_count)
+def serialize_material_list_item(material: Material, *, snippet: str | None = None) -> dict[str, Any]:
+    payload = _material_base(material)
     payload["created_at"] = to_shanghai_iso(material.created_at)
+    payload["snippet"] = snippet
     return payload
 
 
-def serialize_material_detail(material: Material, *, char_count: int | None = None) -> dict[str, Any]:
-    payload = _material_base(material, char_count=char_count)
+def serialize_material_detail(material: Material) -> dict[str, Any]:
+    payload = _material_base(material)
     payload["content_text"] = material.content_text
     payload["original_filename"] = material.original_filename
     payload["created_at"] = to_shanghai_iso(material.created_at)
@@ -434,6 +473,65 @@ def serialize_upload_task(task: dict[str, Any]) -> dict[str, Any]:
     }
 
 
+_INGEST_JOB_TASK_STATES = {
+    "queued": ("queued", "已进入处理队列", 10),
+    "running": ("parsing", "解析中", 12),
+    "completed": ("completed", "解析完成", 100),
+    "failed": ("failed", "解析失败", 0),
+}
+
+
+def serialize_material_ingest_job(job: MaterialIngestJob) -> dict[str, Any]:
+    """Upload task view of a persisted ingest job, used once the in-memory progress entry expired."""
+    status, stage, progress = _INGEST_JOB_TASK_STATES.get(str(job.status), ("queued", "已进入处理队列", 10))
+    updated = job.updated_at or job.created_at
+    if updated is not None and updated.tzinfo is None:
+        updated = updated.replace(tzinfo=timezone.utc)
+    return serialize_upload_task(
+        {
+            "task_id": job.task_id,
+            "status": status,
+            "stage": stage,
+            "message": "素材已存在" if job.duplicate else (job.message or ""),
+            "parse_progress": progress,
+            "updated_at": int(updated.timestamp() * 1000) if updated is not None else 0,
+        }
+    )
+
+
+def serialize_material_upload_batch(task: dict[str, Any] | None, jobs: list[MaterialIngestJob]) -> dict[str, Any]:
+    """Batch progress plus one entry per file; derived from the job rows when ``task`` expired."""
+    if task is None:
+        statuses = {str(job.status) for job in jobs}
+        if statuses & {"queued", "running"}:
+            status = "queued" if statuses == {"queued"} else "parsing"
+        else:
+            status = "completed" if "completed" in statuses else "failed"
+        done = sum(1 for job in jobs if job.status in {"completed", "failed"})
+        latest = max((serialize_material_ingest_job(job)["updated_at"] for job in jobs), default=0)
+        task = {
+            "task_id": jobs[0].batch_id if jobs else "",
+            "status": status,
+            "stage": f"已处理 {done}/{len(jobs)}",
+            "message": "",
+            "parse_progress": 100 * done // len(jobs) if jobs else 0,
+            "updated_at": latest,
+        }
+    payload = serialize_upload_task(task)
+    payload["files"] = [
+        {
+            "task_id": job.task_id,
+            "filename": job.filename,
+            "status": str(job.status),
+            "material_id": job.material_id,
+            "duplicate": bool(job.duplicate),
+            "message": job.message or "",
+        }
+        for job in jobs
+    ]
+    return payload
+
+
 def serialize_book_import_file_result(item: dict[str, Any]) -> dict[str, Any]:
     return {
         "source_name": str(item.get("source_name", "")),
@@ -468,8 +566,8 @@ def serialize_book_import_task(task: dict[str, Any]) -> dict[str, Any]:
         "overall_progress": int(task.get("overall_progress", 0) or 0),
         "ocr_used_files": int(task.get("ocr_used_files", 0) or 0),
         "ocr_pages": int(task.get("ocr_pages", 0) or 0),
-        "file_results": [serialize_book_import_file_result(item) for item in list(task.get("file_results", []))],
         "selected_files": [str(item) for item in list(task.get("selected_files", []))],
+        "queue_position": int(task["queue_position"]) if task.get("queue_position") else None,
     }
 
 
@@ -13,6 +13,7 @@ from app.models.style import WritingHabit
 from app.models.user import User
 from app.rbac import ROLE_WRITER
 from app.services.account_resource_sync_service import AccountResourceSyncService
+from app.services.auth_context_cache import auth_context_cache
 from app.services.rbac_service import RBACService
 from app.side_effects import collect_side_effect_warning
 
@@ -46,6 +47,7 @@ class AccountMembershipService:
         existing_role_codes = rbac.get_user_role_codes(user)
 
         try:
+            auth_context_cache.invalidate_on_commit(self.db)
             user.account_id = int(target_account_id)
             if migrate_data:
                 self._migrate_user_records(user.id, int(target_account_id), counts)
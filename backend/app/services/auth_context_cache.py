@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterable
+
+from sqlalchemy import event, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session, attributes, make_transient_to_detached, object_session
+
+from app.config import get_settings
+from app.errors import logger
+from app.models.account import Account
+from app.models.user import User
+from app.services.state_backend import StateBackend, get_state_backend
+
+settings = get_settings()
+
+AUTH_CONTEXT_VERSION_KEY = "auth-context:version"
+
+# Column values kept for the cached user; ``password_hash`` stays out of memory and
+# is lazy-loaded by the few endpoints that need it.
+CACHED_USER_COLUMNS = ("id", "account_id", "username", "display_name", "department", "role", "created_at", "updated_at")
+
+
+def snapshot_user(user: User) -> dict[str, Any]:
+    return {column: getattr(user, column) for column in CACHED_USER_COLUMNS}
+
+
+def restore_user(db: Session, columns: dict[str, Any]) -> User:
+    """Attach a cached user to ``db`` as a persistent instance without a SELECT.
+
+    Columns missing from ``columns`` are loaded on first access.
+    """
+    user = User(**columns)
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
+
+
+class AuthContextCache:
+    """In-process TTL cache of ``user_id`` → user columns, account status, roles and permissions.
+
+    Entries are tagged with the version counter current when they were loaded;
+    any role, permission, account status, membership or user row change bumps
+    the counter, which discards every entry. With a shared state backend the
+    counter is also bumped there, and other processes pick it up within
+    ``version_check_seconds``.
+
+    It also keeps each account's ``auth_epoch`` so tokens carrying permission
+    claims can be checked without a query; the same invalidations drop it.
+    """
+
+    def __init__(
+        self,
+        *,
+        ttl_seconds: float | None = None,
+        max_entries: int | None = None,
+        version_check_seconds: float | None = None,
+        state_backend: StateBackend | None = None,
+    ):
+        if ttl_seconds is None:
+            ttl_seconds = settings.auth_context_cache_ttl_seconds
+        if max_entries is None:
+            max_entries = settings.auth_context_cache_max_entries
+        if version_check_seconds is None:
+            version_check_seconds = settings.auth_context_version_check_seconds
+        self._ttl_seconds = max(0.0, float(ttl_seconds))
+        self._max_entries = max(1, int(max_entries))
+        self._version_check_seconds = max(0.0, float(version_check_seconds))
+        self._state_backend = state_backend
+        self._entries: OrderedDict[int, tuple[int, float, dict[str, Any]]] = OrderedDict()
+        self._epochs: dict[int, tuple[int, float, int]] = {}
+        self._lock = threading.Lock()
+        self._version = 0
+        self._shared_version = 0
+        self._last_version_check = 0.0
+
+    def _state(self) -> StateBackend:
+        if self._state_backend is None:
+            self._state_backend = get_state_backend()
+        return self._state_backend
+
+    def _refresh_shared_version(self, now: float) -> None:
+        with self._lock:
+            if now - self._last_version_check < self._version_check_seconds:
+                return
+            self._last_version_check = now
+        backend = self._state()
+        if not backend.shared:
+            return
+        try:
+            shared_version = backend.incr(AUTH_CONTEXT_VERSION_KEY, 0)
+        except Exception as exc:
+            logger.warning("Auth context version check failed: %s", exc)
+            return
+        with self._lock:
+            if shared_version != self._shared_version:
+                self._shared_version = shared_version
+                self._version += 1
+                self._entries.clear()
+                self._epochs.clear()
+
+    def version(self) -> int:
+        self._refresh_shared_version(time.time())
+        with self._lock:
+            return self._version
+
+    def get(self, user_id: int) -> dict[str, Any] | None:
+        if self._ttl_seconds <= 0:
+            return None
+        now = time.time()
+        self._refresh_shared_version(now)
+        with self._lock:
+            entry = self._entries.get(int(user_id))
+            if entry is None:
+                return None
+            version, expires_at, context = entry
+            if version != self._version or expires_at <= now:
+                self._entries.pop(int(user_id), None)
+                return None
+            self._entries.move_to_end(int(user_id))
+            return context
+
+    def put(self, user_id: int, context: dict[str, Any], *, version: int) -> None:
+        if self._ttl_seconds <= 0:
+            return
+        with self._lock:
+            # Loaded before an invalidation landed; caching it would resurrect stale grants.
+            if version != self._version:
+                return
+            self._entries[int(user_id)] = (version, time.time() + self._ttl_seconds, context)
+            self._entries.move_to_end(int(user_id))
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def get_epoch(self, account_id: int) -> int | None:
+        if self._ttl_seconds <= 0:
+            return None
+        now = time.time()
+        self._refresh_shared_version(now)
+        with self._lock:
+            entry = self._epochs.get(int(account_id))
+            if entry is None:
+                return None
+            version, expires_at, epoch = entry
+            if version != self._version or expires_at <= now:
+                self._epochs.pop(int(account_id), None)
+                return None
+            return epoch
+
+    def put_epoch(self, account_id: int, epoch: int, *, version: int) -> None:
+        if self._ttl_seconds <= 0:
+            return
+        with self._lock:
+            if version != self._version:
+                return
+            if len(self._epochs) >= self._max_entries:
+                self._epochs.clear()
+            self._epochs[int(account_id)] = (version, time.time() + self._ttl_seconds, int(epoch))
+
+    def invalidate(self, *, shared: bool = True) -> None:
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+            self._epochs.clear()
+        if not shared:
+            return
+        backend = self._state()
+        if not backend.shared:
+            return
+        try:
+            shared_version = backend.incr(AUTH_CONTEXT_VERSION_KEY)
+        except Exception as exc:
+            logger.warning("Auth context version bump failed: %s", exc)
+            return
+        with self._lock:
+            self._shared_version = shared_version
+
+    def invalidate_on_commit(self, db: Session, *, account_ids: Iterable[int] = ()) -> None:
+        """Invalidate locally now, and everywhere once ``db`` commits.
+
+        The second bump also drops anything another request loaded between the
+        change and its commit. The shared counter is only touched after commit
+        so it never waits on the write lock ``db`` may be holding. The
+        ``auth_epoch`` of ``account_ids`` is bumped in the same transaction,
+        revoking the permission claims of tokens issued to those accounts.
+        """
+        ids = sorted({int(item) for item in account_ids if item})
+        if ids:
+            db.execute(update(Account).where(Account.id.in_(ids)).values(auth_epoch=Account.auth_epoch + 1))
+        self.invalidate(shared=False)
+        event.listen(db, "after_commit", lambda _session: self.invalidate(), once=True)
+
+
+auth_context_cache = AuthContextCache()
+
+
+def _bump_auth_epoch(connection: Connection, account_ids: Iterable[int]) -> None:
+    ids = sorted({int(item) for item in account_ids if item})
+    if ids:
+        connection.execute(
+            update(Account.__table__).where(Account.__table__.c.id.in_(ids)).values(auth_epoch=Account.__table__.c.auth_epoch + 1)
+        )
+
+
+def _invalidate_for(target) -> None:
+    session = object_session(target)
+    if session is None:
+        auth_context_cache.invalidate()
+    else:
+        auth_context_cache.invalidate_on_commit(session)
+
+
+# Only changes to what a claims token asserts bump the epoch; profile edits just drop the cache.
+@event.listens_for(User, "after_update")
+def _invalidate_on_user_update(_mapper, connection, target: User) -> None:
+    moved = attributes.get_history(target, "account_id")
+    if moved.has_changes() or attributes.get_history(target, "role").has_changes():
+        _bump_auth_epoch(connection, [*moved.deleted, target.account_id])
+    _invalidate_for(target)
+
+
+@event.listens_for(User, "after_delete")
+def _invalidate_on_user_delete(_mapper, connection, target: User) -> None:
+    _bump_auth_epoch(connection, [target.account_id])
+    _invalidate_for(target)
+
+
+@event.listens_for(Account, "after_update")
+def _invalidate_on_account_update(_mapper, connection, target: Account) -> None:
+    if attributes.get_history(target, "status").has_changes():
+        _bump_auth_epoch(connection, [target.id])
+    _invalidate_for(target)
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import hashlib
+import json
+
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+
+from app.database import SessionLocal
+from app.errors import logger
+from app.models.book_chunk_checkpoint import BookChunkCheckpoint
+
+
+def chunk_hash(chunk: dict[str, str]) -> str:
+    """Identity of a chunk across runs: its text plus the chapter/page metadata sent with it."""
+    payload = json.dumps([chunk.get('chapter', ''), chunk.get('page_range', ''), chunk.get('text', '')], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class BookChunkCheckpointStore:
+    """Which chunks of a book already reached which OpenViking namespace.
+
+    A row is written in its own session as soon as OpenViking accepts a chunk
+    for one namespace, so an interrupted import loses at most the chunks that
+    were in flight. A file's rows are dropped once it is fully imported, and an
+    account's rows when a rebuild clears its books namespace.
+    """
+
+    def load(self, account_id: int, source_hash: str) -> dict[str, set[str]]:
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(BookChunkCheckpoint.chunk_hash, BookChunkCheckpoint.namespace).where(
+                    BookChunkCheckpoint.account_id == account_id,
+                    BookChunkCheckpoint.source_hash == source_hash,
+                )
+            )
+            done: dict[str, set[str]] = {}
+            for chunk, namespace in rows:
+                done.setdefault(chunk, set()).add(namespace)
+            return done
+        except Exception as e:
+            logger.warning('book_chunk_checkpoints unavailable, importing every chunk: %s', e)
+            return {}
+        finally:
+            db.close()
+
+    def record(self, account_id: int, source_hash: str, chunk: str, namespace: str) -> None:
+        db = SessionLocal()
+        try:
+            db.add(
+                BookChunkCheckpoint(
+                    account_id=account_id,
+                    source_hash=source_hash,
+                    chunk_hash=chunk,
+                    namespace=namespace[:500],
+                )
+            )
+            db.commit()
+        except IntegrityError:
+            # Another copy of the same book recorded it first.
+            db.rollback()
+        except Exception as e:
+            db.rollback()
+            logger.warning('Book chunk checkpoint failed, the chunk will be sent again on resume: %s', e)
+        finally:
+            db.close()
+
+    def forget(self, account_id: int, source_hash: str | None = None) -> None:
+        db = SessionLocal()
+        try:
+            statement = delete(BookChunkCheckpoint).where(BookChunkCheckpoint.account_id == account_id)
+            if source_hash is not None:
+                statement = statement.where(BookChunkCheckpoint.source_hash == source_hash)
+            db.execute(statement)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning('Book chunk checkpoint cleanup failed: account_id=%s err=%s', account_id, e)
+        finally:
+            db.close()
+
+
+book_chunk_checkpoints = BookChunkCheckpointStore()
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from sqlalchemy import delete, select
+
+from app.database import SessionLocal
+from app.errors import logger
+from app.models.book_chunk_fingerprint import BookChunkFingerprint
+from app.services.near_duplicates import SimHashIndex
+
+SIGN_BIT = 1 << 63
+
+
+def _to_signed(fingerprint: int) -> int:
+    return fingerprint - (1 << 64) if fingerprint & SIGN_BIT else fingerprint
+
+
+def _to_unsigned(value: int) -> int:
+    return value & ((1 << 64) - 1)
+
+
+class BookChunkFingerprintStore:
+    """SimHash fingerprints of the chunks each imported book sent, per account and doc_type.
+
+    A book's rows are replaced once it is fully imported and an account's rows
+    are dropped when a rebuild clears its books namespace, so the index only
+    ever describes chunks OpenViking holds. Chunks go to ``books/{doc_type}``
+    as well as ``books/common``, so a chunk only repeats another book's when
+    both books have the same doc_type.
+    """
+
+    def load(self, account_id: int, max_distance: int) -> dict[str, SimHashIndex]:
+        """One index per doc_type, each tagged by source hash."""
+        indexes: dict[str, SimHashIndex] = {}
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(
+                    BookChunkFingerprint.doc_type, BookChunkFingerprint.source_hash, BookChunkFingerprint.fingerprint
+                ).where(
+                    BookChunkFingerprint.account_id == account_id,
+                )
+            )
+            for doc_type, source_hash, value in rows:
+                if doc_type not in indexes:
+                    indexes[doc_type] = SimHashIndex(max_distance)
+                indexes[doc_type].add(_to_unsigned(value), source_hash)
+        except Exception as e:
+            logger.warning('book_chunk_fingerprints unavailable, deduplicating within this task only: %s', e)
+        finally:
+            db.close()
+        return indexes
+
+    def replace(self, account_id: int, source_hash: str, doc_type: str, fingerprints: list[int]) -> None:
+        db = SessionLocal()
+        try:
+            db.execute(
+                delete(BookChunkFingerprint).where(
+                    BookChunkFingerprint.account_id == account_id,
+                    BookChunkFingerprint.source_hash == source_hash,
+                )
+            )
+            db.add_all(
+                BookChunkFingerprint(
+                    account_id=account_id, source_hash=source_hash, doc_type=doc_type, fingerprint=_to_signed(value)
+                )
+                for value in dict.fromkeys(fingerprints)
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning('Book chunk fingerprints not saved, later books will not dedupe against it: %s', e)
+        finally:
+            db.close()
+
+    def forget(self, account_id: int, source_hash: str | None = None) -> None:
+        db = SessionLocal()
+        try:
+            statement = delete(BookChunkFingerprint).where(BookChunkFingerprint.account_id == account_id)
+            if source_hash is not None:
+                statement = statement.where(BookChunkFingerprint.source_hash == source_hash)
+            db.execute(statement)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning('Book chunk fingerprint cleanup failed: account_id=%s err=%s', account_id, e)
+        finally:
+            db.close()
+
+
+book_chunk_fingerprints = BookChunkFingerprintStore()
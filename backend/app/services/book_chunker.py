@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter
+from typing import Any, Iterator
+
+from app.services.near_duplicates import MIN_NEAR_DUPLICATE_CHARS, SimHashIndex, fingerprint, normalize
+
+# Sentence ends, optionally followed by closing quotes or brackets that belong to the sentence.
+SENTENCE_END = re.compile(r"[。！？；!?;…]+[”’」』）》)\]\"']*")
+SENTENCE_ENDS = ("。", "！", "？", "；", "!", "?", ";", "…")
+# Short lines in these shapes open a section: 第一章 / 一、 / （一） / 1.2 / 前言 ...
+HEADING = re.compile(
+    r"^(第[一二三四五六七八九十百千零〇两\d]+[编章节篇部讲课]"
+    r"|[一二三四五六七八九十]+、"
+    r"|[（(][一二三四五六七八九十]+[）)]"
+    r"|\d+(\.\d+)+\s*\S"
+    r"|(前言|序言|引言|导言|目录|后记|附录|附件)(\s|$|[一二三四五六七八九十\d：:]))"
+)
+HEADING_MAX_CHARS = 40
+PAGE_NUMBER = re.compile(r"^[-—–\s]*(第\s*)?\d+\s*([/／]\s*\d+\s*)?(页)?[-—–\s]*$|^(?i:page)\s*\d+(\s*(/|of)\s*\d+)?$")
+# The first and last lines of a PDF page are checked for running headers and footers: a short
+# line with no sentence end is dropped once it has been seen there on RUNNING_LINE_MIN_PAGES pages
+# (digits ignored); its first appearance, usually the title page, stays.
+EDGE_LINES = 2
+RUNNING_LINE_MAX_CHARS = 60
+RUNNING_LINE_MIN_PAGES = 2
+DIGITS = re.compile(r"\d+")
+
+
+def fixed_window_count(length: int, size: int, overlap: int) -> int:
+    """How many chunks fixed ``size``-character windows with ``overlap`` would cut from ``length`` characters."""
+    if length <= 0:
+        return 0
+    if length <= size:
+        return 1
+    return math.ceil((length - size) / max(1, size - overlap)) + 1
+
+
+def _is_heading(line: str) -> bool:
+    return len(line) <= HEADING_MAX_CHARS and not line.endswith(SENTENCE_ENDS) and HEADING.match(line) is not None
+
+
+def _join_lines(left: str, right: str) -> str:
+    # PDF lines break mid-sentence; only Latin words need a space put back between them.
+    if left[-1].isascii() and left[-1].isalnum() and right[0].isascii() and right[0].isalnum():
+        return f"{left} {right}"
+    return left + right
+
+
+class BookChunker:
+    """Cuts a book's chapters into chunks along sentence, paragraph and heading boundaries.
+
+    Chapters are fed in order and each chunk comes out as soon as it is
+    complete, so the book is never held whole. PDF pages (chapters with
+    ``page_start``) are one continuous text: a sentence running across a page
+    break stays together, short pages are packed with their neighbours, and
+    page numbers and running headers/footers are dropped. An EPUB chapter or a
+    heading line starts a new chunk; only an EPUB chapter also ends the one
+    before it however short it is.
+
+    Chunks hold whole sentences up to ``size`` characters (only a longer
+    sentence is cut), and within a section each repeats up to ``overlap``
+    characters of the previous chunk's last sentences. A section end that
+    leaves less than a quarter chunk is merged into the chunk before it.
+
+    With ``page_distance`` set, a PDF page whose text (furniture removed) is
+    within that many SimHash bits of an earlier page of the book is skipped,
+    e.g. a notice or blank form printed between every chapter.
+    """
+
+    def __init__(self, size: int, overlap: int, *, page_distance: int | None = None) -> None:
+        self.size = max(100, int(size))
+        self.overlap = max(0, min(int(overlap), self.size // 2))
+        self.min_chars = self.size // 4
+        # What the fixed-window chunker would have cut from the same chapters, and furniture lines dropped.
+        self.fixed_window_chunks = 0
+        self.boilerplate_lines = 0
+        self.duplicate_pages = 0
+        self._pages = SimHashIndex(page_distance) if page_distance is not None else None
+        self._index = 0
+        self._chapter_title = ""
+        self._heading = ""
+        self._page: int | None = None
+        self._edge_lines: Counter[str] = Counter()
+        # The chunk being filled: its segments (sentences, "\n"-prefixed when they open a paragraph),
+        # how many leading ones were carried over as overlap, and the characters added since.
+        self._segments: list[str] = []
+        self._carried = 0
+        self._length = 0
+        self._new_length = 0
+        self._title = ""
+        self._page_start: int | None = None
+        self._page_end: int | None = None
+        # Text of a sentence not finished yet, and whether it opens a paragraph.
+        self._pending = ""
+        self._pending_paragraph = True
+        # The last finished chunk is held back until the next one, so a short tail can be merged into it.
+        self._held: list[Any] | None = None
+
+    def feed(self, chapter: dict[str, Any]) -> Iterator[dict[str, str]]:
+        self._index += 1
+        title = str(chapter.get("chapter_title", f"Chapter {self._index}")).strip() or f"Chapter {self._index}"
+        text = str(chapter.get("text", ""))
+        self.fixed_window_chunks += fixed_window_count(len(text.strip()), self.size, self.overlap)
+        page = chapter.get("page_start")
+        paged = bool(page)
+        if paged:
+            self._page = int(page)
+            lines = self._page_lines(text)
+            if self._repeats_page(lines):
+                self.duplicate_pages += 1
+                return
+        else:
+            # A chapter of its own: whatever came before ends here, however short.
+            yield from self._end_sentence()
+            yield from self._end_section(final=True)
+            self._page = None
+            self._heading = ""
+            lines = [line.strip() for line in text.splitlines() if line.strip()]
+        self._chapter_title = title
+        if not paged:
+            self._title = title
+
+        for line in lines:
+            if _is_heading(line):
+                yield from self._end_sentence()
+                yield from self._end_section()
+                # A stub too short to stand alone stays and goes under this heading.
+                self._heading = self._title = line
+                yield from self._add(line, paragraph=True)
+                self._pending_paragraph = True
+                continue
+            self._pending = _join_lines(self._pending, line) if self._pending else line
+            start = 0
+            for end in SENTENCE_END.finditer(self._pending):
+                yield from self._add(self._pending[start : end.end()].strip(), paragraph=self._pending_paragraph)
+                self._pending_paragraph = False
+                start = end.end()
+            self._pending = self._pending[start:].strip()
+            if not paged:
+                # EPUB lines are paragraphs; a PDF line ending mid-sentence continues on the next line.
+                yield from self._end_sentence()
+            # A line that ends a sentence usually ends its paragraph too.
+            self._pending_paragraph = not self._pending
+
+    def finish(self) -> Iterator[dict[str, str]]:
+        yield from self._end_sentence()
+        yield from self._end_section(final=True)
+        if self._held is not None:
+            yield self._render(self._held)
+            self._held = None
+
+    def _page_lines(self, text: str) -> list[str]:
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        kept: list[str] = []
+        for position, line in enumerate(lines):
+            if position < EDGE_LINES or position >= len(lines) - EDGE_LINES:
+                if PAGE_NUMBER.match(line):
+                    self.boilerplate_lines += 1
+                    continue
+                if len(line) <= RUNNING_LINE_MAX_CHARS and not any(mark in line for mark in SENTENCE_ENDS[:4]):
+                    key = DIGITS.sub("#", line)
+                    self._edge_lines[key] += 1
+                    if self._edge_lines[key] >= RUNNING_LINE_MIN_PAGES:
+                        self.boilerplate_lines += 1
+                        continue
+            kept.append(line)
+        return kept
+
+    def _repeats_page(self, lines: list[str]) -> bool:
+        if self._pages is None:
+            return False
+        normalized = normalize("\n".join(lines))
+        if len(normalized) < MIN_NEAR_DUPLICATE_CHARS:
+            return False
+        value = fingerprint(normalized)
+        if self._pages.find(value):
+            return True
+        self._pages.add(value)
+        return False
+
+    def _end_sentence(self) -> Iterator[dict[str, str]]:
+        if self._pending:
+            pending, self._pending = self._pending, ""
+            yield from self._add(pending, paragraph=self._pending_paragraph)
+        self._pending_paragraph = True
+
+    def _add(self, sentence: str, *, paragraph: bool) -> Iterator[dict[str, str]]:
+        for start in range(0, len(sentence), self.size):
+            piece = sentence[start : start + self.size]
+            if self._new_length and self._length + len(piece) > self.size:
+                yield from self._emit(carry=True)
+            if not self._segments:
+                self._title = self._heading or self._chapter_title
+            if not self._new_length:
+                self._page_start = self._page
+            if paragraph and start == 0 and self._segments:
+                piece = "\n" + piece
+            self._segments.append(piece)
+            self._length += len(piece)
+            self._new_length += len(piece)
+            self._page_end = self._page
+
+    def _end_section(self, *, final: bool = False) -> Iterator[dict[str, str]]:
+        if not self._new_length:
+            self._reset()
+            return
+        if self._new_length < self.min_chars:
+            held = self._held
+            if held is not None and held[0] == self._title and len(held[3]) + self._new_length <= self.size + self.min_chars:
+                held[2] = self._page_end or held[2]
+                held[3] += "".join(self._segments[self._carried :])
+                self._reset()
+                return
+            if not final:
+                # Too little to stand alone (a cover or contents page, a lone heading): it opens the next section.
+                return
+        yield from self._emit(carry=False)
+
+    def _emit(self, *, carry: bool) -> Iterator[dict[str, str]]:
+        chunk = [self._title, self._page_start, self._page_end, "".join(self._segments).strip()]
+        if self._held is not None:
+            yield self._render(self._held)
+        self._held = chunk
+        tail: list[str] = []
+        if carry:
+            length = 0
+            for segment in reversed(self._segments):
+                if length + len(segment) > self.overlap:
+                    break
+                tail.insert(0, segment)
+                length += len(segment)
+        title = self._title
+        self._reset()
+        if tail:
+            tail[0] = tail[0].lstrip("\n")
+            self._segments = tail
+            self._carried = len(tail)
+            self._length = sum(len(segment) for segment in tail)
+            self._title = title
+
+    def _reset(self) -> None:
+        self._segments = []
+        self._carried = 0
+        self._length = 0
+        self._new_length = 0
+        self._page_start = None
+        self._page_end = None
+
+    @staticmethod
+    def _render(chunk: list[Any]) -> dict[str, str]:
+        title, page_start, page_end, body = chunk
+        page_range = ""
+        if page_start and page_end:
+            page_range = f"{page_start}-{page_end}"
+        elif page_start:
+            page_range = str(page_start)
+        return {
+            "chapter": title[:200],
+            "page_range": page_range,
+            "text": f"[{title}]\n{body}",
+        }
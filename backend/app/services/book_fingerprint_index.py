@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.errors import logger
+from app.models.book_file_fingerprint import BookFileFingerprint
+
+settings = get_settings()
+
+HASH_CHUNK_SIZE = 1024 * 1024
+# A file modified this recently may still be changing within one mtime tick; hash it again next scan.
+RACY_WINDOW_NS = 2_000_000_000
+
+
+@dataclass(slots=True)
+class FileFingerprint:
+    path: Path
+    relative_path: str
+    size: int
+    mtime_ns: int
+    inode: int
+    sha256: str = ''
+
+
+def sha256_file(file_path: Path) -> str:
+    h = hashlib.sha256()
+    with file_path.open('rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class BookFingerprintIndex:
+    """Persistent ``(relative path, size, mtime_ns, inode) -> sha256`` index for files under ``books_dir``.
+
+    A scan stats every file and only hashes the ones whose stat no longer matches
+    the stored row, so an unchanged library costs one ``stat`` per file and one
+    query. Without a session every file is hashed, as before the index existed.
+    """
+
+    def __init__(self, db: Session | None):
+        self.db = db
+
+    def fingerprint(self, root: Path, files: list[Path]) -> list[FileFingerprint]:
+        fingerprints: list[FileFingerprint] = []
+        for path in files:
+            stat = path.stat()
+            fingerprints.append(
+                FileFingerprint(
+                    path=path,
+                    relative_path=path.relative_to(root).as_posix(),
+                    size=stat.st_size,
+                    mtime_ns=stat.st_mtime_ns,
+                    inode=stat.st_ino,
+                ),
+            )
+
+        known = self._load()
+        changed: list[FileFingerprint] = []
+        for item in fingerprints:
+            row = known.get(item.relative_path)
+            if row is not None and (row.file_size, row.mtime_ns, row.inode) == (item.size, item.mtime_ns, item.inode):
+                item.sha256 = row.sha256
+            else:
+                changed.append(item)
+
+        self._hash(changed)
+        removed = set(known) - {item.relative_path for item in fingerprints}
+        self._store(changed, removed)
+        return fingerprints
+
+    def _load(self) -> dict[str, BookFileFingerprint]:
+        if self.db is None:
+            return {}
+        try:
+            return {row.relative_path: row for row in self.db.scalars(select(BookFileFingerprint))}
+        except Exception as e:
+            logger.warning('book_file_fingerprints unavailable, hashing every file: %s', e)
+            self.db.rollback()
+            return {}
+
+    @staticmethod
+    def _hash(items: list[FileFingerprint]) -> None:
+        workers = min(max(1, int(settings.book_scan_hash_workers)), len(items))
+        if workers <= 1:
+            for item in items:
+                item.sha256 = sha256_file(item.path)
+            return
+        # hashlib releases the GIL on large updates, so threads hash several files at disk speed.
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='book-hash') as pool:
+            for item, digest in zip(items, pool.map(sha256_file, [item.path for item in items])):
+                item.sha256 = digest
+
+    def _store(self, changed: list[FileFingerprint], removed: set[str]) -> None:
+        if self.db is None or not (changed or removed):
+            return
+        racy_after = time.time_ns() - RACY_WINDOW_NS
+        try:
+            if removed:
+                self.db.execute(delete(BookFileFingerprint).where(BookFileFingerprint.relative_path.in_(removed)))
+            for item in changed:
+                if item.mtime_ns >= racy_after:
+                    continue
+                self.db.merge(
+                    BookFileFingerprint(
+                        relative_path=item.relative_path,
+                        file_size=item.size,
+                        mtime_ns=item.mtime_ns,
+                        inode=item.inode,
+                        sha256=item.sha256,
+                    ),
+                )
+            self.db.commit()
+        except Exception as e:
+            # e.g. a concurrent scan inserted the same path first; the hashes are still valid for this scan.
+            logger.warning('book_file_fingerprints update failed, hashes will be recomputed next scan: %s', e)
+            self.db.rollback()
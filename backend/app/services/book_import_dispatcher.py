@@ -4,30 +4,106 @@ import asyncio
 import threading
 from concurrent.futures import Future, ThreadPoolExecutor
 
+from app.config import get_settings
 from app.database import SessionLocal
 from app.errors import logger
 
+settings = get_settings()
+
 
 class BookImportDispatcher:
-    def __init__(self) -> None:
-        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='book-import')
+    """Starts queued book imports, up to ``max_workers`` at once in this process.
+
+    The queue is the set of waiting ``book_import_tasks`` rows, ordered by
+    ``book_import_task_tracker.queue_order`` so accounts take turns. A task only
+    starts once the tracker grants it its account's lease and a runner lease,
+    which keeps every account to one import and all processes within
+    ``BOOK_IMPORT_MAX_CONCURRENT``. While tasks wait on slots held by another
+    process, the queue is checked again every ``retry_seconds``.
+    """
+
+    def __init__(self, *, max_workers: int | None = None, retry_seconds: float | None = None) -> None:
+        self.max_workers = max(1, int(max_workers or settings.book_import_max_concurrent))
+        if retry_seconds is None:
+            # Leases held elsewhere are renewed on this cadence and lapse a little later.
+            retry_seconds = settings.book_import_lease_seconds / 3
+        self.retry_seconds = max(1.0, float(retry_seconds))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='book-import')
         self._lock = threading.Lock()
-        self._scheduled_task_ids: set[str] = set()
+        # Reentrant: a task that finishes at once runs its done callback, which schedules, inside ``_submit``.
+        self._schedule_lock = threading.RLock()
         self._futures: dict[str, Future[None]] = {}
+        self._retry_timer: threading.Timer | None = None
         self._closed = False
 
-    def dispatch(self, task_id: str, *, account_id: int) -> bool:
+    def dispatch(self, task_id: str) -> bool:
+        """Queue a created task; it starts as soon as its turn comes and a slot is free."""
         with self._lock:
-            if self._closed or task_id in self._scheduled_task_ids:
+            if self._closed:
                 return False
-            future = self._executor.submit(self._run_task, task_id, int(account_id or 1))
-            self._scheduled_task_ids.add(task_id)
-            self._futures[task_id] = future
-            future.add_done_callback(lambda completed, current_task_id=task_id: self._on_done(current_task_id, completed))
-            return True
+        self.schedule()
+        return True
+
+    def schedule(self) -> int:
+        """Start waiting tasks in queue order while slots are free; returns how many started."""
+        from app.services.book_import_task_service import book_import_task_tracker
+
+        started = 0
+        with self._schedule_lock:
+            blocked = False
+            for task_id, account_id in book_import_task_tracker.queue_order():
+                with self._lock:
+                    if self._closed:
+                        return started
+                    if task_id in self._futures:
+                        continue
+                    if len(self._futures) >= self.max_workers:
+                        blocked = True
+                        break
+                reserved, active_task_id = book_import_task_tracker.reserve_slot(task_id, account_id=account_id)
+                if reserved and self._submit(task_id, account_id):
+                    started += 1
+                    continue
+                blocked = True
+                if not reserved and active_task_id is None:
+                    break  # every runner slot is taken; a busy account only skips its turn
+            book_import_task_tracker.publish_queue_positions()
+        if blocked:
+            self._schedule_retry()
+        return started
+
+    def _submit(self, task_id: str, account_id: int) -> bool:
+        from app.services.book_import_task_service import book_import_task_tracker
+
+        with self._lock:
+            if not self._closed:
+                future = self._executor.submit(self._run_task, task_id, account_id)
+                self._futures[task_id] = future
+                future.add_done_callback(lambda completed, current_task_id=task_id: self._on_done(current_task_id, completed))
+                return True
+        book_import_task_tracker.release_slot(task_id, account_id)
+        return False
+
+    def _schedule_retry(self) -> None:
+        with self._lock:
+            if self._closed or self._retry_timer is not None:
+                return
+            timer = threading.Timer(self.retry_seconds, self._retry)
+            timer.daemon = True
+            self._retry_timer = timer
+        timer.start()
+
+    def _retry(self) -> None:
+        with self._lock:
+            self._retry_timer = None
+        try:
+            self.schedule()
+        except Exception as exc:
+            logger.warning('Book import queue check failed: %s', exc)
 
     def _run_task(self, task_id: str, account_id: int) -> None:
         from app.services.book_import_service import BookImportService
+        from app.services.book_import_task_service import book_import_task_tracker
 
         db = SessionLocal()
         try:
@@ -35,8 +111,11 @@ class BookImportDispatcher:
             asyncio.run(service.execute_task(task_id))
         except Exception as exc:
             logger.exception('Book import dispatcher crashed. task_id=%s err=%s', task_id, exc)
+            # Frees the account's slot for the tasks queued behind this one.
+            book_import_task_tracker.fail(task_id, '任务执行异常中断')
         finally:
             db.close()
+            book_import_task_tracker.flush(task_id)
 
     def _on_done(self, task_id: str, future: Future[None]) -> None:
         error = None
@@ -47,34 +126,20 @@ class BookImportDispatcher:
             if error is not None:
                 logger.exception('Book import worker failed. task_id=%s err=%s', task_id, error)
         with self._lock:
-            self._scheduled_task_ids.discard(task_id)
             self._futures.pop(task_id, None)
-        self.resume_recoverable_tasks()
-
-    def resume_recoverable_tasks(self) -> bool:
-        from app.services.book_import_task_service import book_import_task_tracker
-
-        with self._lock:
-            if self._closed or any(not future.done() for future in self._futures.values()):
-                return False
-
-        for task_id in book_import_task_tracker.list_recoverable_task_ids():
-            with self._lock:
-                if self._closed or task_id in self._scheduled_task_ids:
-                    continue
-            task = book_import_task_tracker.get_state(task_id)
-            if task is None:
-                continue
-            if str(task.get('status', '')) not in {'pending', 'running', 'interrupted'}:
-                continue
-            return self.dispatch(task_id, account_id=int(task.get('account_id', 1) or 1))
-        return False
+        try:
+            self.schedule()
+        except Exception as exc:
+            logger.warning('Book import queue check failed: %s', exc)
 
     def shutdown(self, *, wait: bool = False, cancel_futures: bool = False) -> None:
         with self._lock:
             if self._closed:
                 return
             self._closed = True
+            timer, self._retry_timer = self._retry_timer, None
+        if timer is not None:
+            timer.cancel()
         self._executor.shutdown(wait=wait, cancel_futures=cancel_futures)
 
 
@@ -1,14 +1,17 @@
 from __future__ import annotations
 
 import asyncio
-import hashlib
 import json
 import re
 import uuid
+from collections import Counter
+from contextlib import aclosing
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any
+from typing import Any, AsyncIterator, BinaryIO, Iterable, Iterator
 
 import jieba.analyse
+from sqlalchemy import inspect
 from sqlalchemy.orm import Session
 
 from app.config import get_settings
@@ -17,13 +20,20 @@ from app.models.book_source import BookSource
 from app.models.book_style_rule import BookStyleRule
 from app.prompts.doc_types_catalog import DOC_TYPE_CHOICES_TEXT, OTHER_DOC_TYPE
 from app.prompts.validators import parse_json_response, validate_classify, validate_keywords, validate_title
+from app.services.book_chunk_checkpoints import book_chunk_checkpoints, chunk_hash
+from app.services.book_chunk_fingerprints import book_chunk_fingerprints
+from app.services.book_chunker import BookChunker
+from app.services.book_fingerprint_index import BookFingerprintIndex
 from app.services.book_import_dispatcher import book_import_dispatcher
 from app.services.book_import_task_service import book_import_task_tracker
 from app.services.book_rule_service import BookRuleService
 from app.services.context_bridge import ContextBridge
-from app.services.epub_parser import EpubParser
+from app.services.epub_parser import iter_epub
+from app.services.extraction_cache import extraction_cache
 from app.services.llm_service import LLMService
-from app.services.pdf_ocr_service import PdfOcrService
+from app.services.near_duplicates import NearDuplicateFilter, SimHashIndex
+from app.services.pdf_ocr_service import iter_pdf_file
+from app.services.upload_storage import store_stream
 
 settings = get_settings()
 
@@ -59,10 +69,52 @@ BOOK_ANALYSIS_PROMPT = """你是“公文写作知识提炼助手”。请基于
 """
 
 
-class BookImportConflictError(Exception):
-    def __init__(self, active_task_id: str):
-        self.active_task_id = active_task_id
-        super().__init__(f"book import task conflict, active_task_id={active_task_id}")
+IMPORTED_STATUSES = {"completed", "partial"}
+# The analysis reads up to ANALYSIS_MAX_CHARS of the opening chapters, at most ANALYSIS_SNIPPET_CHARS from each.
+ANALYSIS_MAX_CHARS = 12000
+ANALYSIS_SNIPPET_CHARS = 800
+# How long the pipeline's writer waits for more finished files before committing a partial batch.
+WRITE_BATCH_LINGER_SECONDS = 0.5
+
+
+@dataclass(slots=True)
+class BookFileOutcome:
+    """Result of one file's parse, analysis and chunk stages, waiting for the pipeline's DB writer."""
+
+    file_item: dict[str, Any]
+    status: str
+    doc_type: str
+    summary: str
+    keywords: list[str]
+    chunk_count: int
+    ocr_used: bool
+    ocr_pages: int
+    error_message: str
+    metadata: dict[str, Any]
+    # None leaves the source's existing rules alone (failed imports).
+    style_rules: list[dict[str, Any]] | None = None
+    # SimHash of every chunk kept, saved so later books drop their near-duplicates.
+    chunk_fingerprints: list[int] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class _PipelineStages:
+    files: asyncio.Semaphore
+    parse: asyncio.Semaphore
+    llm: asyncio.Semaphore
+    chunks: asyncio.Semaphore
+
+    @classmethod
+    def from_settings(cls) -> _PipelineStages:
+        parse = max(1, int(settings.book_import_parse_concurrency))
+        llm = max(1, int(settings.book_import_llm_concurrency))
+        return cls(
+            # Each open file buffers its analysis window and has an extraction spool on disk; cap how many are open.
+            files=asyncio.Semaphore(parse + llm),
+            parse=asyncio.Semaphore(parse),
+            llm=asyncio.Semaphore(llm),
+            chunks=asyncio.Semaphore(max(1, int(settings.book_import_chunk_concurrency))),
+        )
 
 
 def _safe_json_load(value: Any) -> Any:
@@ -87,8 +139,6 @@ class BookImportService:
         self.account_id = int(account_id or 1)
         self.ctx_bridge = ContextBridge()
         self.llm = LLMService(temperature=0.2)
-        self.epub_parser = EpubParser()
-        self.pdf_service = PdfOcrService()
 
     @staticmethod
     def _books_root() -> Path:
@@ -111,34 +161,39 @@ class BookImportService:
         stem = stem.strip(' ._-') or 'book'
         return f'{stem}{ext}'
 
-    def save_book_upload(self, file_bytes: bytes, filename: str) -> dict[str, Any]:
-        if len(file_bytes) > MAX_BOOK_UPLOAD_SIZE:
-            raise FileValidationError(f'文件大小超过限制（最大 {MAX_BOOK_UPLOAD_SIZE // 1024 // 1024}MB）')
-
+    def save_book_upload(self, source: BinaryIO, filename: str) -> dict[str, Any]:
+        """Stream ``source`` into the books upload folder; hash and size come from the same pass."""
         ext = Path(filename or '').suffix.lower()
         if ext not in SUPPORTED_BOOK_EXTS:
             raise FileValidationError('不支持的文件格式，仅支持 .epub、.pdf')
 
         upload_root = self._books_upload_root()
         safe_name = self._sanitize_upload_filename(filename)
-        destination = upload_root / safe_name
-        if destination.exists():
-            stem = destination.stem
-            suffix = destination.suffix
+
+        def pick_destination() -> Path:
+            destination = upload_root / safe_name
             index = 2
             while destination.exists():
-                destination = upload_root / f'{stem}-{index}{suffix}'
+                destination = upload_root / f'{Path(safe_name).stem}-{index}{Path(safe_name).suffix}'
                 index += 1
-
-        destination.write_bytes(file_bytes)
+            return destination
+
+        stored = store_stream(
+            source,
+            upload_root,
+            max_size=MAX_BOOK_UPLOAD_SIZE,
+            too_large_message=f'文件大小超过限制（最大 {MAX_BOOK_UPLOAD_SIZE // 1024 // 1024}MB）',
+            destination=pick_destination,
+        )
+        destination = Path(stored.path)
         relative_path = destination.relative_to(self._books_root()).as_posix()
         return {
             'source_name': destination.name,
             'relative_path': relative_path,
             'absolute_path': str(destination),
             'file_ext': destination.suffix.lower(),
-            'file_size': int(destination.stat().st_size),
-            'source_hash': self._sha256_file(destination),
+            'file_size': stored.size,
+            'source_hash': stored.sha256,
             'imported': False,
             'status': 'pending',
             'doc_type': '',
@@ -146,14 +201,6 @@ class BookImportService:
             'source_id': None,
         }
 
-    @staticmethod
-    def _sha256_file(file_path: Path) -> str:
-        h = hashlib.sha256()
-        with file_path.open("rb") as f:
-            for chunk in iter(lambda: f.read(1024 * 1024), b""):
-                h.update(chunk)
-        return h.hexdigest()
-
     @classmethod
     def _iter_book_files(cls) -> list[Path]:
         root = cls._books_root()
@@ -167,24 +214,19 @@ class BookImportService:
         return sorted(files, key=lambda p: str(p).lower())
 
     def scan_books(self) -> list[dict[str, Any]]:
-        files = self._iter_book_files()
-        hashes: list[str] = []
-        file_rows: list[dict[str, Any]] = []
-
-        for path in files:
-            file_hash = self._sha256_file(path)
-            hashes.append(file_hash)
-            relative_path = path.relative_to(self._books_root()).as_posix()
-            file_rows.append(
-                {
-                    "source_name": path.name,
-                    "relative_path": relative_path,
-                    "absolute_path": str(path),
-                    "file_ext": path.suffix.lower(),
-                    "file_size": path.stat().st_size,
-                    "source_hash": file_hash,
-                },
-            )
+        fingerprints = BookFingerprintIndex(self.db).fingerprint(self._books_root(), self._iter_book_files())
+        hashes = [item.sha256 for item in fingerprints]
+        file_rows: list[dict[str, Any]] = [
+            {
+                "source_name": item.path.name,
+                "relative_path": item.relative_path,
+                "absolute_path": str(item.path),
+                "file_ext": item.path.suffix.lower(),
+                "file_size": item.size,
+                "source_hash": item.sha256,
+            }
+            for item in fingerprints
+        ]
 
         source_map: dict[str, BookSource] = {}
         if self.db is not None and hashes:
@@ -255,13 +297,6 @@ class BookImportService:
         selected = self._select_scanned_files(scanned, selected_refs)
 
         task_id = uuid.uuid4().hex
-        reserved, active_task_id = book_import_task_tracker.reserve_slot(
-            task_id,
-            account_id=self.account_id,
-        )
-        if not reserved:
-            raise BookImportConflictError(active_task_id or '')
-
         book_import_task_tracker.create_task(
             task_id,
             total_files=len(selected),
@@ -269,7 +304,7 @@ class BookImportService:
             account_id=self.account_id,
             selected_files=selected_refs,
         )
-        if not book_import_dispatcher.dispatch(task_id, account_id=self.account_id):
+        if not book_import_dispatcher.dispatch(task_id):
             book_import_task_tracker.fail(task_id, message='任务调度失败，请稍后重试')
             raise RuntimeError('book import task dispatch failed')
         return task_id, len(selected)
@@ -277,24 +312,35 @@ class BookImportService:
     async def execute_task(self, task_id: str) -> None:
         task_state = book_import_task_tracker.claim_task(task_id)
         if task_state is None:
-            logger.info('Book import task skipped because another task is active: %s', task_id)
+            logger.info('Book import task not started, it was cancelled or its slot is held elsewhere: %s', task_id)
             return
 
         rebuild = bool(task_state.get('rebuild', False))
         selected_refs = self._normalize_selected_files(task_state.get('selected_files', []))
         scanned = self.scan_books()
         selected = self._select_scanned_files(scanned, selected_refs)
-        book_import_task_tracker.restart(
+        restarted = book_import_task_tracker.restart(
             task_id,
             total_files=len(selected),
             selected_files=selected_refs,
             stage='准备导入',
             message='任务已启动',
         )
-        await self._execute_import(task_id, selected, rebuild)
+        if restarted is None:
+            return
+        # Files with a result from an interrupted run of this task are done; resume with the rest.
+        finished = Counter(book_import_task_tracker.finished_source_names(task_id))
+        remaining: list[dict[str, Any]] = []
+        for item in selected:
+            if finished[item['source_name']] > 0:
+                finished[item['source_name']] -= 1
+                continue
+            remaining.append(item)
+        await self._execute_import(task_id, remaining, rebuild)
 
     async def _execute_import(self, task_id: str, selected_files: list[dict[str, Any]], rebuild: bool) -> None:
-        if not selected_files:
+        task = book_import_task_tracker.get_state(task_id) or {}
+        if not selected_files and not int(task.get("completed_files", 0)):
             book_import_task_tracker.finish(task_id, status="completed", message="无可导入文件")
             return
 
@@ -305,19 +351,24 @@ class BookImportService:
             message="任务已启动",
         )
 
-        if rebuild:
+        if rebuild and not task.get("rebuild_cleared"):
             book_import_task_tracker.update(task_id, stage="重建模式：清理历史书籍知识")
             await self.ctx_bridge.clear_namespace(f"viking://resources/accounts/{self.account_id}/books")
             self.db.query(BookStyleRule).filter(BookStyleRule.account_id == self.account_id).delete()
             self.db.query(BookSource).filter(BookSource.account_id == self.account_id).delete()
             self.db.commit()
+            await asyncio.to_thread(book_chunk_checkpoints.forget, self.account_id)
+            await asyncio.to_thread(book_chunk_fingerprints.forget, self.account_id)
+            book_import_task_tracker.mark_rebuild_cleared(task_id)
 
-        for file_item in selected_files:
-            await self._process_one_file(task_id, file_item, rebuild=rebuild)
+        await self._run_pipeline(task_id, selected_files)
 
         task = book_import_task_tracker.get(task_id)
         if not task:
             return
+        if book_import_task_tracker.is_cancel_requested(task_id):
+            book_import_task_tracker.finish(task_id, status="cancelled", message="任务已取消")
+            return
 
         failed_files = int(task.get("failed_files", 0))
         partial_files = int(task.get("partial_files", 0))
@@ -399,17 +450,22 @@ class BookImportService:
             )
         return parsed_rules
 
-    def _build_analysis_content(self, chapters: list[dict[str, Any]], max_chars: int = 12000) -> str:
+    @staticmethod
+    def _analysis_block(idx: int, chapter: dict[str, Any]) -> str:
+        title = str(chapter.get("chapter_title", f"Chapter {idx}")).strip() or f"Chapter {idx}"
+        text = str(chapter.get("text", "")).strip()
+        if not text:
+            return ""
+        return f"[{idx}] {title}\n{text[:ANALYSIS_SNIPPET_CHARS]}"
+
+    def _build_analysis_content(self, chapters: list[dict[str, Any]], max_chars: int = ANALYSIS_MAX_CHARS) -> str:
         blocks: list[str] = []
         total = 0
 
         for idx, chapter in enumerate(chapters, start=1):
-            title = str(chapter.get("chapter_title", f"Chapter {idx}")).strip() or f"Chapter {idx}"
-            text = str(chapter.get("text", "")).strip()
-            if not text:
+            block = self._analysis_block(idx, chapter)
+            if not block:
                 continue
-            snippet = text[:800]
-            block = f"[{idx}] {title}\n{snippet}"
             if total + len(block) > max_chars:
                 remain = max_chars - total
                 if remain > 100:
@@ -424,50 +480,42 @@ class BookImportService:
         keywords = jieba.analyse.extract_tags(text or "", topK=10)
         return [kw.strip() for kw in keywords if kw.strip()]
 
-    def _split_text(self, text: str, size: int, overlap: int) -> list[str]:
-        raw = (text or "").strip()
-        if not raw:
-            return []
-        if len(raw) <= size:
-            return [raw]
-
-        chunks: list[str] = []
-        step = max(1, size - overlap)
-        start = 0
-        while start < len(raw):
-            end = min(len(raw), start + size)
-            chunk = raw[start:end].strip()
-            if chunk:
-                chunks.append(chunk)
-            if end >= len(raw):
-                break
-            start += step
-        return chunks
-
-    def _build_chunks(self, chapters: list[dict[str, Any]]) -> list[dict[str, str]]:
-        size = max(100, int(settings.book_chunk_size))
-        overlap = max(0, int(settings.book_chunk_overlap))
-        chunk_rows: list[dict[str, str]] = []
+    @staticmethod
+    def _new_chunker() -> BookChunker:
+        page_distance = settings.book_chunk_simhash_distance if settings.book_chunk_dedupe_enabled else None
+        return BookChunker(settings.book_chunk_size, settings.book_chunk_overlap, page_distance=page_distance)
 
-        for idx, chapter in enumerate(chapters, start=1):
-            title = str(chapter.get("chapter_title", f"Chapter {idx}")).strip() or f"Chapter {idx}"
-            page_start = chapter.get("page_start")
-            page_end = chapter.get("page_end")
-            page_range = ""
-            if page_start and page_end:
-                page_range = f"{page_start}-{page_end}"
-            elif page_start:
-                page_range = str(page_start)
-
-            for piece in self._split_text(str(chapter.get("text", "")), size=size, overlap=overlap):
-                chunk_rows.append(
-                    {
-                        "chapter": title[:200],
-                        "page_range": page_range,
-                        "text": f"[{title}]\n{piece}",
-                    },
-                )
-        return chunk_rows
+    @staticmethod
+    def _kept_chunks(chunks: Iterable[dict[str, str]], dedupe: NearDuplicateFilter | None) -> Iterator[dict[str, str]]:
+        for chunk in chunks:
+            if dedupe is None or not dedupe.is_duplicate(chunk["text"]):
+                yield chunk
+
+    def _build_chunks(
+        self, chapters: Iterable[dict[str, Any]], dedupe: NearDuplicateFilter | None = None
+    ) -> Iterator[dict[str, str]]:
+        chunker = self._new_chunker()
+        for chapter in chapters:
+            yield from self._kept_chunks(chunker.feed(chapter), dedupe)
+        yield from self._kept_chunks(chunker.finish(), dedupe)
+
+    async def _stream_chunks(
+        self,
+        head: list[dict[str, Any]],
+        rest: AsyncIterator[dict[str, Any]],
+        chunker: BookChunker,
+        dedupe: NearDuplicateFilter | None,
+    ) -> AsyncIterator[dict[str, str]]:
+        """Chunks of the buffered ``head`` chapters, then of ``rest`` as each chapter arrives."""
+        while head:
+            # Popped, so buffered chapters are freed as soon as they are chunked.
+            for chunk in self._kept_chunks(chunker.feed(head.pop(0)), dedupe):
+                yield chunk
+        async for chapter in rest:
+            for chunk in self._kept_chunks(chunker.feed(chapter), dedupe):
+                yield chunk
+        for chunk in self._kept_chunks(chunker.finish(), dedupe):
+            yield chunk
 
     def _analyze_book_once(self, source_name: str, chapters: list[dict[str, Any]]) -> dict[str, Any]:
         content = self._build_analysis_content(chapters)
@@ -578,82 +626,301 @@ class BookImportService:
             self.db.refresh(row)
         return row
 
-    async def _process_one_file(self, task_id: str, file_item: dict[str, Any], rebuild: bool) -> None:
-        source_name = file_item["source_name"]
-        source_hash = file_item["source_hash"]
-        source_path = file_item["absolute_path"]
-        ext = file_item["file_ext"].lower()
-
-        book_import_task_tracker.update(
-            task_id,
-            stage="处理中",
-            running_file=source_name,
-            message=f"正在处理 {source_name}",
-        )
+    async def _run_pipeline(self, task_id: str, selected_files: list[dict[str, Any]]) -> None:
+        """Import files concurrently: each stage has its own limit and one writer batches the DB commits."""
+        stages = _PipelineStages.from_settings()
+        sources = self._load_sources([item["source_hash"] for item in selected_files])
+        chunk_index = None
+        if settings.book_chunk_dedupe_enabled:
+            # Fingerprints of every chunk the account's imported books sent, per doc_type; this task's books
+            # join it as their chunks are sent.
+            chunk_index = await asyncio.to_thread(
+                book_chunk_fingerprints.load, self.account_id, settings.book_chunk_simhash_distance
+            )
+        groups: dict[str, list[dict[str, Any]]] = {}
+        for file_item in selected_files:
+            groups.setdefault(file_item["source_hash"], []).append(file_item)
 
-        existing = (
+        outcomes: asyncio.Queue[BookFileOutcome | None] = asyncio.Queue()
+        writer = asyncio.create_task(self._write_outcomes(task_id, outcomes, sources))
+        try:
+            await asyncio.gather(
+                *(
+                    self._import_same_content(task_id, items, sources.get(source_hash), stages, outcomes, chunk_index)
+                    for source_hash, items in groups.items()
+                ),
+            )
+        finally:
+            await outcomes.put(None)
+            await writer
+
+    def _load_sources(self, hashes: list[str]) -> dict[str, BookSource]:
+        if not hashes:
+            return {}
+        rows = (
             self.db.query(BookSource)
             .filter(
                 BookSource.account_id == self.account_id,
-                BookSource.source_hash == source_hash,
+                BookSource.source_hash.in_(set(hashes)),
             )
-            .first()
+            .all()
+        )
+        return {row.source_hash: row for row in rows}
+
+    async def _import_same_content(
+        self,
+        task_id: str,
+        file_items: list[dict[str, Any]],
+        existing: BookSource | None,
+        stages: _PipelineStages,
+        outcomes: asyncio.Queue[BookFileOutcome | None],
+        chunk_index: dict[str, SimHashIndex] | None = None,
+    ) -> None:
+        # Copies of one book run in order; once one is imported the rest are skipped, as a serial import would.
+        imported: dict[str, Any] | None = None
+        if existing is not None and existing.status in IMPORTED_STATUSES:
+            imported = {
+                "chunk_count": existing.chunk_count,
+                "ocr_used": bool(existing.ocr_used),
+                "ocr_pages": int((existing.metadata_ or {}).get("ocr_pages", 0)),
+            }
+        for file_item in file_items:
+            if book_import_task_tracker.is_cancel_requested(task_id):
+                return
+            if imported is not None:
+                book_import_task_tracker.update(
+                    task_id,
+                    completed_files_add=1,
+                    skipped_files_add=1,
+                    file_result={"source_name": file_item["source_name"], "status": "skipped", "error_message": "", **imported},
+                )
+                continue
+            outcome = await self._process_one_file(task_id, file_item, stages, chunk_index)
+            if outcome is None:
+                return
+            await outcomes.put(outcome)
+            if outcome.status in IMPORTED_STATUSES:
+                imported = {"chunk_count": outcome.chunk_count, "ocr_used": outcome.ocr_used, "ocr_pages": outcome.ocr_pages}
+
+    async def _parse_book(
+        self, file_item: dict[str, Any], stages: _PipelineStages, parsed: dict[str, Any]
+    ) -> AsyncIterator[dict[str, Any]]:
+        """Yield the book's chapters (pages for a PDF) while it is still being parsed.
+
+        The parse slot is held until the extraction itself ends. Once the last
+        chapter is out, ``parsed`` holds ``chapter_count``, ``ocr_used``,
+        ``ocr_pages`` and ``parse_stats``.
+        """
+        source_hash = file_item["source_hash"]
+        source_path = file_item["absolute_path"]
+        ext = file_item["file_ext"].lower()
+        book_limit = settings.extraction_book_timeout_seconds
+        if ext == ".epub":
+            kind, parse, args = "epub", iter_epub, (source_path,)
+        elif ext == ".pdf":
+            kind, parse, args = "pdf", iter_pdf_file, (source_path, source_hash)
+        else:
+            raise FileValidationError(f"Unsupported book file type: {ext}")
+
+        await stages.parse.acquire()
+        stream = extraction_cache.stream(
+            kind,
+            source_hash,
+            parse,
+            *args,
+            on_extracted=stages.parse.release,
+            timeout=book_limit,
+            cpu_seconds=book_limit,
         )
-        if existing and existing.status in {"completed", "partial"} and not rebuild:
+        chapter_count = 0
+        async for chapter in stream:
+            chapter_count += 1
+            yield chapter
+
+        meta = stream.meta or {}
+        parsed["chapter_count"] = chapter_count
+        parsed["ocr_used"] = bool(meta.get("ocr_used", False))
+        parsed["ocr_pages"] = int(meta.get("ocr_pages", 0))
+        parsed["parse_stats"] = {}
+        if kind == "pdf":
+            parsed["parse_stats"] = {
+                "total_pages": meta.get("total_pages", 0),
+                "text_layer_chars": meta.get("text_layer_chars", 0),
+                "non_empty_ratio": meta.get("non_empty_ratio", 0.0),
+                "ocr_candidate_pages": meta.get("ocr_candidate_pages", 0),
+                "ocr_cached_pages": meta.get("ocr_cached_pages", 0),
+                "ocr_blank_pages": meta.get("ocr_blank_pages", 0),
+                "ocr_retried_pages": meta.get("ocr_retried_pages", 0),
+                "ocr_single_lang_pages": meta.get("ocr_single_lang_pages", 0),
+                "ocr_mean_confidence": meta.get("ocr_mean_confidence"),
+                "ocr_page_details": meta.get("ocr_page_details", []),
+                "ocr_settings": meta.get("ocr_settings", {}),
+                "page_sources": meta.get("page_sources", {}),
+            }
+
+    async def _read_analysis_head(self, chapters: AsyncIterator[dict[str, Any]]) -> list[dict[str, Any]]:
+        """The opening chapters, up to as much as ``_build_analysis_content`` uses; the rest stay in the stream."""
+        head: list[dict[str, Any]] = []
+        total = 0
+        async for chapter in chapters:
+            head.append(chapter)
+            total += len(self._analysis_block(len(head), chapter))
+            if total >= ANALYSIS_MAX_CHARS:
+                break
+        return head
+
+    async def _process_one_file(
+        self,
+        task_id: str,
+        file_item: dict[str, Any],
+        stages: _PipelineStages,
+        chunk_index: dict[str, SimHashIndex] | None = None,
+    ) -> BookFileOutcome | None:
+        """Parse, analyse and send one file; None when the task was cancelled before the file finished.
+
+        Chunks are sent while the book is still being parsed: only the opening
+        chapters are buffered, for the analysis that picks the namespace, and
+        after that each chapter is chunked and sent as it arrives. With
+        ``BOOK_CHUNK_DEDUPE_ENABLED`` a chunk that nearly repeats one kept
+        earlier in this book, or one sent by a book of the same doc_type in
+        ``chunk_index``, is dropped before sending.
+        """
+        source_name = file_item["source_name"]
+        parsed: dict[str, Any] = {}
+        chunker = self._new_chunker()
+        dedupe = None
+        if settings.book_chunk_dedupe_enabled:
+            dedupe = NearDuplicateFilter(settings.book_chunk_simhash_distance, source=file_item["source_hash"])
+
+        async with stages.files:
+            if book_import_task_tracker.is_cancel_requested(task_id):
+                return None
             book_import_task_tracker.update(
                 task_id,
-                completed_files_add=1,
-                skipped_files_add=1,
-                file_result={
-                    "source_name": source_name,
-                    "status": "skipped",
-                    "chunk_count": existing.chunk_count,
-                    "ocr_used": bool(existing.ocr_used),
-                    "ocr_pages": int((existing.metadata_ or {}).get("ocr_pages", 0)),
-                    "error_message": "",
-                },
+                stage="处理中",
+                running_file=source_name,
+                message=f"正在处理 {source_name}",
             )
-            return
+            try:
+                async with aclosing(self._parse_book(file_item, stages, parsed)) as chapters:
+                    head = await self._read_analysis_head(chapters)
+                    if not head:
+                        raise FileValidationError("No readable text extracted")
+
+                    async with stages.llm:
+                        analysis = await asyncio.to_thread(self._analyze_book_once, source_name, head)
+                    doc_type = validate_classify(str(analysis.get("doc_type", OTHER_DOC_TYPE)))
+                    if dedupe is not None and chunk_index is not None:
+                        dedupe.shared = chunk_index.setdefault(doc_type, SimHashIndex(settings.book_chunk_simhash_distance))
+
+                    imported_chunks, chunk_errors, resumed_chunks, first_error = await self._ingest_chunks(
+                        task_id,
+                        file_item,
+                        doc_type,
+                        self._stream_chunks(head, chapters, chunker, dedupe),
+                        stages.chunks,
+                        dedupe,
+                    )
+                if book_import_task_tracker.is_cancel_requested(task_id):
+                    # Sent chunks keep their checkpoints, so a later import of this file resumes from them.
+                    return None
+            except Exception as e:
+                err_id = _new_error_id()
+                public_message = _public_error_message(err_id)
+                logger.exception("Book import failed. error_id=%s source=%s err=%s", err_id, source_name, e)
+                ocr_pages = int(parsed.get("ocr_pages", 0))
+                return BookFileOutcome(
+                    file_item=file_item,
+                    status="failed",
+                    doc_type=OTHER_DOC_TYPE,
+                    summary=public_message,
+                    keywords=[],
+                    chunk_count=0,
+                    ocr_used=bool(parsed.get("ocr_used", False)),
+                    ocr_pages=ocr_pages,
+                    error_message=public_message,
+                    metadata={"ocr_pages": ocr_pages, "parse_stats": parsed.get("parse_stats", {}), "error_id": err_id},
+                )
 
-        ocr_used = False
-        ocr_pages = 0
-        parse_stats: dict[str, Any] = {}
+        chunk_total = imported_chunks + chunk_errors
+        duplicates_dropped = dedupe.dropped if dedupe is not None else 0
+        logger.info(
+            "Book chunked. source=%s chunks=%d fixed_window_chunks=%d reduction=%.1f%% "
+            "duplicate_chunks=%d duplicate_pages=%d boilerplate_lines=%d",
+            source_name,
+            chunk_total,
+            chunker.fixed_window_chunks,
+            100.0 * (1 - chunk_total / chunker.fixed_window_chunks) if chunker.fixed_window_chunks else 0.0,
+            duplicates_dropped,
+            chunker.duplicate_pages,
+            chunker.boilerplate_lines,
+        )
 
-        try:
-            if ext == ".epub":
-                chapters = self.epub_parser.parse(source_path)
-            elif ext == ".pdf":
-                parsed_pdf = self.pdf_service.parse_pdf(source_path)
-                chapters = list(parsed_pdf.get("chapters", []))
-                ocr_used = bool(parsed_pdf.get("ocr_used", False))
-                ocr_pages = int(parsed_pdf.get("ocr_pages", 0))
-                parse_stats = {
-                    "total_pages": parsed_pdf.get("total_pages", 0),
-                    "text_layer_chars": parsed_pdf.get("text_layer_chars", 0),
-                    "non_empty_ratio": parsed_pdf.get("non_empty_ratio", 0.0),
-                }
-            else:
-                raise FileValidationError(f"Unsupported book file type: {ext}")
-
-            if not chapters:
-                raise FileValidationError("No readable text extracted")
-
-            analysis = self._analyze_book_once(source_name, chapters)
-            doc_type = validate_classify(str(analysis.get("doc_type", OTHER_DOC_TYPE)))
-            keywords = analysis.get("keywords", []) or []
-            summary = str(analysis.get("summary", "")).strip()
-            candidates = analysis.get("doc_types_candidates", []) or []
-            style_rules = analysis.get("style_rules", []) or []
-            template_skeletons = analysis.get("template_skeletons", []) or []
-
-            chunk_rows = self._build_chunks(chapters)
-            book_import_task_tracker.update(task_id, total_chunks_add=len(chunk_rows))
-
-            imported_chunks = 0
-            chunk_errors = 0
-            first_error = ""
-            for chunk in chunk_rows:
-                try:
+        if chunk_errors == 0:
+            file_status = "completed"
+        elif imported_chunks > 0:
+            file_status = "partial"
+        else:
+            file_status = "failed"
+
+        return BookFileOutcome(
+            file_item=file_item,
+            status=file_status,
+            doc_type=doc_type,
+            summary=str(analysis.get("summary", "")).strip(),
+            keywords=analysis.get("keywords", []) or [],
+            chunk_count=imported_chunks,
+            ocr_used=parsed["ocr_used"],
+            ocr_pages=parsed["ocr_pages"],
+            error_message=first_error,
+            metadata={
+                "title": analysis.get("title", Path(source_name).stem),
+                "doc_types_candidates": analysis.get("doc_types_candidates", []) or [],
+                "template_skeletons": analysis.get("template_skeletons", []) or [],
+                "chapter_count": parsed["chapter_count"],
+                "chunk_total": chunk_total,
+                "chunk_imported": imported_chunks,
+                "chunk_failed": chunk_errors,
+                "chunk_resumed": resumed_chunks,
+                "chunk_fixed_window_total": chunker.fixed_window_chunks,
+                "chunk_duplicates_dropped": duplicates_dropped,
+                "chunk_duplicate_pages": chunker.duplicate_pages,
+                "chunk_boilerplate_lines": chunker.boilerplate_lines,
+                "ocr_pages": parsed["ocr_pages"],
+                "parse_stats": parsed["parse_stats"],
+            },
+            style_rules=analysis.get("style_rules", []) or [],
+            chunk_fingerprints=dedupe.kept if dedupe is not None else [],
+        )
+
+    async def _ingest_chunks(
+        self,
+        task_id: str,
+        file_item: dict[str, Any],
+        doc_type: str,
+        chunks: AsyncIterator[dict[str, str]],
+        slots: asyncio.Semaphore,
+        dedupe: NearDuplicateFilter | None = None,
+    ) -> tuple[int, int, int, str]:
+        """Send chunks as they are produced, with at most ``slots`` requests in flight across all files.
+
+        Each chunk is added to the task's total when it arrives. Chunks
+        checkpointed in every namespace by an earlier run are counted as
+        imported without being sent; returns (imported, failed, resumed, first error).
+        Each chunk's outcome is reported to ``dedupe``.
+        """
+        source_name = file_item["source_name"]
+        counts = {"imported": 0, "failed": 0, "resumed": 0}
+        first_error = ""
+
+        source_hash = file_item["source_hash"]
+        targets = self.ctx_bridge.book_chunk_targets(self.account_id, doc_type)
+        done = await asyncio.to_thread(book_chunk_checkpoints.load, self.account_id, source_hash)
+
+        async def send(chunk: dict[str, str], key: str, missing: list[str]) -> None:
+            nonlocal first_error
+            try:
+                for target in missing:
                     await self.ctx_bridge.add_book_chunk(
                         account_id=self.account_id,
                         doc_type=doc_type,
@@ -662,104 +929,151 @@ class BookImportService:
                         chapter=chunk["chapter"],
                         content_text=chunk["text"],
                         page_range=chunk["page_range"],
+                        targets=[target],
                     )
-                    imported_chunks += 1
-                except Exception as e:
-                    chunk_errors += 1
-                    if not first_error:
-                        err_id = _new_error_id()
-                        first_error = _public_error_message(err_id)
-                        logger.warning("Book chunk import failed. error_id=%s source=%s err=%s", err_id, source_name, e)
-                finally:
-                    book_import_task_tracker.update(task_id, completed_chunks_add=1)
-
-            if chunk_errors == 0:
-                file_status = "completed"
-            elif imported_chunks > 0:
-                file_status = "partial"
-            else:
-                file_status = "failed"
-
-            metadata = {
-                "title": analysis.get("title", Path(source_name).stem),
-                "doc_types_candidates": candidates,
-                "template_skeletons": template_skeletons,
-                "chapter_count": len(chapters),
-                "chunk_total": len(chunk_rows),
-                "chunk_imported": imported_chunks,
-                "chunk_failed": chunk_errors,
-                "ocr_pages": ocr_pages,
-                "parse_stats": parse_stats,
-            }
-
-            source_row = self._upsert_source_row(
-                existing=existing,
-                file_item=file_item,
-                status=file_status,
-                doc_type=doc_type,
-                summary=summary,
-                keywords=keywords,
-                chunk_count=imported_chunks,
-                ocr_used=ocr_used,
-                error_message=first_error,
-                metadata=metadata,
-                commit=False,
-            )
-
-            BookRuleService(self.db, account_id=self.account_id).replace_rules(
-                source_id=source_row.id,
-                doc_type=doc_type,
-                rules=style_rules,
-                commit=False,
-            )
+                    await asyncio.to_thread(book_chunk_checkpoints.record, self.account_id, source_hash, key, target)
+                counts["imported"] += 1
+                if dedupe is not None:
+                    dedupe.sent(chunk["text"])
+            except Exception as e:
+                counts["failed"] += 1
+                if dedupe is not None:
+                    dedupe.sent(chunk["text"], ok=False)
+                if not first_error:
+                    err_id = _new_error_id()
+                    first_error = _public_error_message(err_id)
+                    logger.warning("Book chunk import failed. error_id=%s source=%s err=%s", err_id, source_name, e)
+            finally:
+                slots.release()
+                book_import_task_tracker.update(task_id, completed_chunks_add=1)
+
+        pending: set[asyncio.Task[None]] = set()
+        try:
+            async for chunk in chunks:
+                if book_import_task_tracker.is_cancel_requested(task_id):
+                    break
+                key = chunk_hash(chunk)
+                missing = [target for target in targets if target not in done.get(key, ())]
+                if not missing:
+                    # Already in every namespace before an interruption; count it without sending it again.
+                    counts["imported"] += 1
+                    counts["resumed"] += 1
+                    if dedupe is not None:
+                        dedupe.sent(chunk["text"])
+                    book_import_task_tracker.update(task_id, total_chunks_add=1, completed_chunks_add=1)
+                    continue
+                book_import_task_tracker.update(task_id, total_chunks_add=1)
+                # Acquire before creating the task: the next chunk is not even built until a slot is free.
+                await slots.acquire()
+                task = asyncio.create_task(send(chunk, key, missing))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+        finally:
+            # Also when parsing fails part-way: chunks already sent finish and keep their checkpoints.
+            if pending:
+                await asyncio.gather(*pending)
+        return counts["imported"], counts["failed"], counts["resumed"], first_error
+
+    async def _write_outcomes(
+        self,
+        task_id: str,
+        outcomes: asyncio.Queue[BookFileOutcome | None],
+        sources: dict[str, BookSource],
+    ) -> None:
+        """Single DB writer for the pipeline: commits finished files in batches, then reports them."""
+        batch_size = max(1, int(settings.book_import_write_batch_size))
+        loop = asyncio.get_running_loop()
+        finished = False
+        while not finished:
+            batch = [await outcomes.get()]
+            deadline = loop.time() + WRITE_BATCH_LINGER_SECONDS
+            while len(batch) < batch_size and None not in batch:
+                try:
+                    batch.append(await asyncio.wait_for(outcomes.get(), max(0.0, deadline - loop.time())))
+                except asyncio.TimeoutError:
+                    break
+            finished = None in batch
+            self._persist_outcomes(task_id, [outcome for outcome in batch if outcome is not None], sources)
+
+    def _persist_outcomes(self, task_id: str, batch: list[BookFileOutcome], sources: dict[str, BookSource]) -> None:
+        if not batch:
+            return
+        try:
+            for outcome in batch:
+                self._apply_outcome(outcome, sources)
             self.db.commit()
-            self.db.refresh(source_row)
-
-            book_import_task_tracker.update(
-                task_id,
-                completed_files_add=1,
-                partial_files_add=1 if file_status == "partial" else 0,
-                failed_files_add=1 if file_status == "failed" else 0,
-                ocr_used_files_add=1 if ocr_used else 0,
-                ocr_pages_add=ocr_pages,
-                file_result={
-                    "source_name": source_name,
-                    "status": file_status,
-                    "chunk_count": imported_chunks,
-                    "ocr_used": ocr_used,
-                    "ocr_pages": ocr_pages,
-                    "error_message": first_error,
-                },
-            )
+            for outcome in batch:
+                if outcome.status in IMPORTED_STATUSES:
+                    # Imported sources are skipped from now on; their chunk checkpoints are no longer needed.
+                    book_chunk_checkpoints.forget(self.account_id, outcome.file_item["source_hash"])
+                    if settings.book_chunk_dedupe_enabled:
+                        book_chunk_fingerprints.replace(
+                            self.account_id, outcome.file_item["source_hash"], outcome.doc_type, outcome.chunk_fingerprints
+                        )
         except Exception as e:
             self.db.rollback()
+            self._forget_unsaved(batch, sources)
+            if len(batch) > 1:
+                # Retry one by one so a single bad row does not fail the files committed with it.
+                logger.warning("Book import batch commit failed, retrying per file: %s", e)
+                for outcome in batch:
+                    self._persist_outcomes(task_id, [outcome], sources)
+                return
             err_id = _new_error_id()
-            public_message = _public_error_message(err_id)
-            logger.exception("Book import failed. error_id=%s source=%s err=%s", err_id, source_name, e)
-            self._upsert_source_row(
-                existing=existing,
-                file_item=file_item,
-                status="failed",
-                doc_type=OTHER_DOC_TYPE,
-                summary=public_message,
-                keywords=[],
-                chunk_count=0,
-                ocr_used=ocr_used,
-                error_message=public_message,
-                metadata={"ocr_pages": ocr_pages, "parse_stats": parse_stats, "error_id": err_id},
-            )
-            book_import_task_tracker.update(
-                task_id,
-                completed_files_add=1,
-                failed_files_add=1,
-                ocr_used_files_add=1 if ocr_used else 0,
-                ocr_pages_add=ocr_pages,
-                file_result={
-                    "source_name": source_name,
-                    "status": "failed",
-                    "chunk_count": 0,
-                    "ocr_used": ocr_used,
-                    "ocr_pages": ocr_pages,
-                    "error_message": public_message,
-                },
+            logger.exception("Book import result persistence failed. error_id=%s source=%s err=%s", err_id, batch[0].file_item["source_name"], e)
+            batch[0].status = "failed"
+            batch[0].error_message = _public_error_message(err_id)
+            batch[0].chunk_count = 0
+        for outcome in batch:
+            self._report_outcome(task_id, outcome)
+
+    def _apply_outcome(self, outcome: BookFileOutcome, sources: dict[str, BookSource]) -> None:
+        source_hash = outcome.file_item["source_hash"]
+        row = self._upsert_source_row(
+            existing=sources.get(source_hash),
+            file_item=outcome.file_item,
+            status=outcome.status,
+            doc_type=outcome.doc_type,
+            summary=outcome.summary,
+            keywords=outcome.keywords,
+            chunk_count=outcome.chunk_count,
+            ocr_used=outcome.ocr_used,
+            error_message=outcome.error_message,
+            metadata=outcome.metadata,
+            commit=False,
+        )
+        sources[source_hash] = row
+        if outcome.style_rules is not None:
+            BookRuleService(self.db, account_id=self.account_id).replace_rules(
+                source_id=row.id,
+                doc_type=outcome.doc_type,
+                rules=outcome.style_rules,
+                commit=False,
             )
+
+    @staticmethod
+    def _forget_unsaved(batch: list[BookFileOutcome], sources: dict[str, BookSource]) -> None:
+        # Rows first inserted by a rolled-back batch are transient again; the retry must insert them anew.
+        for outcome in batch:
+            row = sources.get(outcome.file_item["source_hash"])
+            if row is not None and inspect(row).transient:
+                sources.pop(outcome.file_item["source_hash"], None)
+
+    @staticmethod
+    def _report_outcome(task_id: str, outcome: BookFileOutcome) -> None:
+        book_import_task_tracker.update(
+            task_id,
+            completed_files_add=1,
+            partial_files_add=1 if outcome.status == "partial" else 0,
+            failed_files_add=1 if outcome.status == "failed" else 0,
+            ocr_used_files_add=1 if outcome.ocr_used else 0,
+            ocr_pages_add=outcome.ocr_pages,
+            file_result={
+                "source_name": outcome.file_item["source_name"],
+                "status": outcome.status,
+                "chunk_count": outcome.chunk_count,
+                "ocr_used": outcome.ocr_used,
+                "ocr_pages": outcome.ocr_pages,
+                "error_message": outcome.error_message,
+            },
+        )
@@ -5,17 +5,95 @@ import time
 from datetime import datetime, timezone
 from typing import Any
 
+from app.config import get_settings
 from app.database import SessionLocal
 from app.errors import logger
+from app.models.book_import_file_result import BookImportFileResult
 from app.models.book_import_task import BookImportTask
+from app.services.progress_broker import ProgressBroker, ProgressSubscription
+from app.services.state_backend import INSTANCE_ID, StateBackend, get_state_backend
+
+settings = get_settings()
+
+# An account runs one book import at a time; the runner leases cap how many run at once across all
+# accounts and worker processes. A running task holds its account's lease and one runner lease.
+BOOK_IMPORT_ACCOUNT_LEASE = "book-import:account:{account_id}"
+BOOK_IMPORT_RUNNER_LEASE = "book-import:runner:{index}"
+BOOK_IMPORT_CANCEL_KEY = "book-import:cancel:{task_id}"
+# Waiting tasks are started by the dispatcher; active ones hold (or held, if their worker died) the slot.
+BOOK_IMPORT_WAITING_STATUSES = frozenset({"queued", "interrupted"})
+BOOK_IMPORT_ACTIVE_STATUSES = frozenset({"pending", "running"})
+# How often a running import re-reads a cancel request made in another worker process.
+CANCEL_POLL_SECONDS = 1.0
+
+
+def book_import_account_lease(account_id: int) -> str:
+    return BOOK_IMPORT_ACCOUNT_LEASE.format(account_id=int(account_id or 1))
+
+
+def book_import_task_id_from_lease_owner(owner: str | None) -> str | None:
+    if not owner:
+        return None
+    return owner.split(":", 1)[1] if ":" in owner else owner
 
 
 class BookImportTaskTracker:
-    def __init__(self, ttl_seconds: int = 24 * 3600):
+    """In-memory task state with coalesced write-behind persistence.
+
+    Progress counters live in memory and are flushed to ``book_import_tasks`` at
+    most every ``flush_interval_seconds`` or ``flush_max_updates`` updates.
+    State transitions (create/claim/restart/status change/finish/fail) are
+    flushed immediately. Per-file results are appended once to
+    ``book_import_file_results`` and never rewritten with the task row.
+
+    Import slots are leases in the shared state backend, renewed by a keeper
+    thread while held, so other worker processes see them: one per account and
+    ``max_concurrent`` runner leases shared by all accounts. Tasks this process
+    did not touch are re-read from the database on every lookup.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int = 24 * 3600,
+        *,
+        flush_interval_seconds: float | None = None,
+        flush_max_updates: int | None = None,
+        broker: ProgressBroker | None = None,
+        state_backend: StateBackend | None = None,
+        lease_seconds: float | None = None,
+        max_concurrent: int | None = None,
+    ):
         self._ttl_seconds = ttl_seconds
+        self._state_backend = state_backend
+        self._broker = broker or ProgressBroker(channel="progress:book-import", state_backend=state_backend)
         self._tasks: dict[str, dict[str, Any]] = {}
+        self._local_task_ids: set[str] = set()
         self._lock = threading.Lock()
-        self._active_task_id: str | None = None
+        self._persist_lock = threading.Lock()
+        if lease_seconds is None:
+            lease_seconds = settings.book_import_lease_seconds
+        self._lease_seconds = max(1.0, float(lease_seconds))
+        if max_concurrent is None:
+            max_concurrent = settings.book_import_max_concurrent
+        self.max_concurrent = max(1, int(max_concurrent))
+        # Lease name -> owner for every lease this process holds.
+        self._held_leases: dict[str, str] = {}
+        self._lease_keeper: threading.Thread | None = None
+        self._cancel_requested: set[str] = set()
+        self._cancel_polled_ts: dict[str, float] = {}
+        self._published_positions: dict[str, int] = {}
+        if flush_interval_seconds is None:
+            flush_interval_seconds = max(0, int(settings.book_import_flush_interval_ms)) / 1000
+        if flush_max_updates is None:
+            flush_max_updates = int(settings.book_import_flush_max_updates)
+        self._flush_interval_seconds = max(0.0, float(flush_interval_seconds))
+        self._flush_max_updates = max(1, int(flush_max_updates))
+        self._revisions: dict[str, int] = {}
+        self._persisted_revisions: dict[str, int] = {}
+        self._pending_updates: dict[str, int] = {}
+        self._last_flush_ts: dict[str, float] = {}
+        self._prune_interval_seconds = min(60.0, float(ttl_seconds))
+        self._last_prune_ts = 0.0
 
     def _now(self) -> float:
         return time.time()
@@ -39,6 +117,7 @@ class BookImportTaskTracker:
             "stage": row.stage,
             "message": row.message or "",
             "rebuild": bool(row.rebuild),
+            "rebuild_cleared": bool(row.rebuild_cleared),
             "account_id": int(row.account_id or 1),
             "started_ts": self._ts_from_dt(row.started_at) or self._now(),
             "updated_ts": self._ts_from_dt(row.updated_at) or self._now(),
@@ -53,7 +132,6 @@ class BookImportTaskTracker:
             "completed_chunks": int(row.completed_chunks or 0),
             "ocr_used_files": int(row.ocr_used_files or 0),
             "ocr_pages": int(row.ocr_pages or 0),
-            "file_results": list(row.file_results or []),
             "selected_files": list(row.selected_files or []),
         }
 
@@ -67,12 +145,15 @@ class BookImportTaskTracker:
         finally:
             db.close()
 
-    def _load_db_active_task(self) -> dict[str, Any] | None:
+    def _load_db_active_task(self, account_id: int) -> dict[str, Any] | None:
         db = SessionLocal()
         try:
             row = (
                 db.query(BookImportTask)
-                .filter(BookImportTask.status.in_(["pending", "running"]))
+                .filter(
+                    BookImportTask.account_id == account_id,
+                    BookImportTask.status.in_(BOOK_IMPORT_ACTIVE_STATUSES),
+                )
                 .order_by(BookImportTask.updated_at.desc(), BookImportTask.id.desc())
                 .first()
             )
@@ -87,7 +168,7 @@ class BookImportTaskTracker:
         try:
             rows = (
                 db.query(BookImportTask.task_id)
-                .filter(BookImportTask.status.in_(["pending", "running", "interrupted"]))
+                .filter(BookImportTask.status.in_(BOOK_IMPORT_WAITING_STATUSES | BOOK_IMPORT_ACTIVE_STATUSES))
                 .order_by(BookImportTask.started_at.asc(), BookImportTask.id.asc())
                 .all()
             )
@@ -95,7 +176,129 @@ class BookImportTaskTracker:
         finally:
             db.close()
 
-    def _persist_task(self, task: dict[str, Any]) -> None:
+    def _state(self) -> StateBackend:
+        if self._state_backend is None:
+            self._state_backend = get_state_backend()
+        return self._state_backend
+
+    @staticmethod
+    def _lease_owner_for(task_id: str) -> str:
+        return f"{INSTANCE_ID}:{task_id}"
+
+    def _runner_leases(self) -> list[str]:
+        return [BOOK_IMPORT_RUNNER_LEASE.format(index=index) for index in range(self.max_concurrent)]
+
+    def _acquire_slot(self, task_id: str, account_id: int) -> bool:
+        """Take the account's lease and a runner lease for ``task_id``: both, or neither."""
+        owner = self._lease_owner_for(task_id)
+        account_lease = book_import_account_lease(account_id)
+        state = self._state()
+        try:
+            if not state.acquire_lease(account_lease, owner, self._lease_seconds):
+                return False
+            runners = self._runner_leases()
+            # Renew the runner lease this task already holds rather than taking a second one.
+            owned = [name for name in runners if state.lease_owner(name) == owner]
+            runner = next((name for name in owned[:1] or runners if state.acquire_lease(name, owner, self._lease_seconds)), None)
+            if runner is None:
+                state.release_lease(account_lease, owner)
+                return False
+        except Exception as exc:
+            logger.warning("Book import lease acquisition failed: task_id=%s err=%s", task_id, exc)
+            return False
+        with self._lock:
+            self._held_leases[account_lease] = owner
+            self._held_leases[runner] = owner
+            if self._lease_keeper is None:
+                self._lease_keeper = threading.Thread(target=self._keep_lease, name="book-import-lease", daemon=True)
+                self._lease_keeper.start()
+        return True
+
+    def release_slot(self, task_id: str, account_id: int | None = None) -> None:
+        """Release every lease ``task_id`` holds; without ``account_id`` only the ones this process knows of."""
+        owner = self._lease_owner_for(task_id)
+        names = set(self._runner_leases())
+        if account_id is not None:
+            names.add(book_import_account_lease(account_id))
+        with self._lock:
+            for name, holder in list(self._held_leases.items()):
+                if holder == owner:
+                    names.add(name)
+                    del self._held_leases[name]
+        for name in names:
+            try:
+                self._state().release_lease(name, owner)
+            except Exception as exc:
+                logger.warning("Book import lease release failed: task_id=%s lease=%s err=%s", task_id, name, exc)
+
+    def _keep_lease(self) -> None:
+        while True:
+            time.sleep(self._lease_seconds / 3)
+            with self._lock:
+                held = list(self._held_leases.items())
+                if not held:
+                    self._lease_keeper = None
+                    return
+            for name, owner in held:
+                try:
+                    renewed = self._state().acquire_lease(name, owner, self._lease_seconds)
+                except Exception as exc:
+                    logger.warning("Book import lease renewal failed: lease=%s owner=%s err=%s", name, owner, exc)
+                    continue
+                if not renewed:
+                    # Stop renewing it: taking it back once it frees up would hand a slot to a task that gave it up.
+                    with self._lock:
+                        if self._held_leases.get(name) == owner:
+                            del self._held_leases[name]
+                    logger.warning("Book import lease lost to another worker: lease=%s owner=%s", name, owner)
+
+    def active_task_id(self, account_id: int) -> str | None:
+        return book_import_task_id_from_lease_owner(self._state().lease_owner(book_import_account_lease(account_id)))
+
+    def _preload(self, task_id: str) -> None:
+        """Refresh a task this process has not touched from the database, outside ``_lock``."""
+        with self._lock:
+            if task_id in self._local_task_ids and task_id in self._tasks:
+                return
+        task = self._load_db_task(task_id)
+        if task is None:
+            return
+        with self._lock:
+            if task_id not in self._local_task_ids:
+                self._tasks[task_id] = task
+
+    def _mark_dirty_locked(self, task_id: str) -> None:
+        self._revisions[task_id] = self._revisions.get(task_id, 0) + 1
+        self._pending_updates[task_id] = self._pending_updates.get(task_id, 0) + 1
+
+    def _should_flush_locked(self, task_id: str, now: float) -> bool:
+        if self._pending_updates.get(task_id, 0) >= self._flush_max_updates:
+            return True
+        return now - self._last_flush_ts.get(task_id, 0.0) >= self._flush_interval_seconds
+
+    def _snapshot_locked(self, task_id: str, now: float) -> dict[str, Any] | None:
+        task = self._tasks.get(task_id)
+        if task is None:
+            return None
+        self._pending_updates[task_id] = 0
+        self._last_flush_ts[task_id] = now
+        snapshot = dict(task)
+        snapshot["selected_files"] = list(task.get("selected_files", []))
+        snapshot["_revision"] = self._revisions.get(task_id, 0)
+        return snapshot
+
+    def _flush_snapshot(self, snapshot: dict[str, Any] | None) -> None:
+        if snapshot is None:
+            return
+        task_id = snapshot["task_id"]
+        revision = int(snapshot.get("_revision", 0))
+        with self._persist_lock:
+            if revision and self._persisted_revisions.get(task_id, 0) >= revision:
+                return
+            if self._persist_task(snapshot):
+                self._persisted_revisions[task_id] = revision
+
+    def _persist_task(self, task: dict[str, Any]) -> bool:
         db = SessionLocal()
         try:
             row = db.query(BookImportTask).filter(BookImportTask.task_id == task["task_id"]).first()
@@ -107,6 +310,7 @@ class BookImportTaskTracker:
             row.stage = str(task.get("stage", "") or "")
             row.message = str(task.get("message", "") or "")
             row.rebuild = bool(task.get("rebuild", False))
+            row.rebuild_cleared = bool(task.get("rebuild_cleared", False))
             row.total_files = int(task.get("total_files", 0) or 0)
             row.completed_files = int(task.get("completed_files", 0) or 0)
             row.failed_files = int(task.get("failed_files", 0) or 0)
@@ -117,28 +321,89 @@ class BookImportTaskTracker:
             row.completed_chunks = int(task.get("completed_chunks", 0) or 0)
             row.ocr_used_files = int(task.get("ocr_used_files", 0) or 0)
             row.ocr_pages = int(task.get("ocr_pages", 0) or 0)
-            row.file_results = list(task.get("file_results", []))
             row.selected_files = list(task.get("selected_files", []))
             row.started_at = self._dt_from_ts(task.get("started_ts")) or datetime.now(timezone.utc)
             row.updated_at = self._dt_from_ts(task.get("updated_ts")) or datetime.now(timezone.utc)
             row.finished_at = self._dt_from_ts(task.get("finished_ts"))
             db.commit()
+            return True
         except Exception as e:
             db.rollback()
             logger.warning("Book import task persistence failed: task_id=%s err=%s", task.get("task_id"), e)
+            return False
         finally:
             db.close()
 
+    def _insert_file_result(self, task_id: str, account_id: int, item: dict[str, Any]) -> None:
+        db = SessionLocal()
+        try:
+            db.add(
+                BookImportFileResult(
+                    task_id=task_id,
+                    account_id=account_id,
+                    source_name=str(item.get("source_name", "") or "")[:500],
+                    status=str(item.get("status", "pending") or "pending"),
+                    chunk_count=int(item.get("chunk_count", 0) or 0),
+                    ocr_used=bool(item.get("ocr_used", False)),
+                    ocr_pages=int(item.get("ocr_pages", 0) or 0),
+                    error_message=str(item.get("error_message", "") or ""),
+                )
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning("Book import file result persistence failed: task_id=%s err=%s", task_id, e)
+        finally:
+            db.close()
+
+    def _file_result_totals(self, task_id: str) -> dict[str, int]:
+        """Task counters rebuilt from the file results already stored, which are written before the counters."""
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(
+                    BookImportFileResult.status,
+                    BookImportFileResult.chunk_count,
+                    BookImportFileResult.ocr_used,
+                    BookImportFileResult.ocr_pages,
+                )
+                .filter(BookImportFileResult.task_id == task_id)
+                .all()
+            )
+        finally:
+            db.close()
+        chunks = sum(int(chunk_count or 0) for _status, chunk_count, _ocr_used, _ocr_pages in rows)
+        return {
+            "completed_files": len(rows),
+            "failed_files": sum(1 for status, *_rest in rows if status == "failed"),
+            "partial_files": sum(1 for status, *_rest in rows if status == "partial"),
+            "skipped_files": sum(1 for status, *_rest in rows if status == "skipped"),
+            "total_chunks": chunks,
+            "completed_chunks": chunks,
+            "ocr_used_files": sum(1 for _status, _chunk_count, ocr_used, _ocr_pages in rows if ocr_used),
+            "ocr_pages": sum(int(ocr_pages or 0) for *_rest, ocr_pages in rows),
+        }
+
     def _prune_locked(self, now: float) -> None:
+        if now - self._last_prune_ts < self._prune_interval_seconds:
+            return
+        self._last_prune_ts = now
         expired = [
             task_id
             for task_id, task in self._tasks.items()
             if now - float(task.get("updated_ts", now)) > self._ttl_seconds
         ]
         for task_id in expired:
+            if self._pending_updates.get(task_id):
+                continue
             self._tasks.pop(task_id, None)
-            if self._active_task_id == task_id:
-                self._active_task_id = None
+            self._revisions.pop(task_id, None)
+            self._pending_updates.pop(task_id, None)
+            self._last_flush_ts.pop(task_id, None)
+            self._persisted_revisions.pop(task_id, None)
+            self._local_task_ids.discard(task_id)
+            self._cancel_polled_ts.pop(task_id, None)
+            self._published_positions.pop(task_id, None)
 
     @staticmethod
     def _safe_percent(numerator: int, denominator: int) -> int:
@@ -176,55 +441,103 @@ class BookImportTaskTracker:
             "overall_progress": overall_progress,
             "ocr_used_files": task["ocr_used_files"],
             "ocr_pages": task["ocr_pages"],
-            "file_results": list(task.get("file_results", [])),
             "selected_files": list(task.get("selected_files", [])),
+            # Filled in by ``get`` for waiting tasks; 1 is started next.
+            "queue_position": None,
         }
 
     def reserve_slot(self, task_id: str, *, account_id: int) -> tuple[bool, str | None]:
-        del account_id
+        """Try to take an import slot for ``task_id`` in ``account_id``.
+
+        Returns ``(False, active_task_id)`` while another task of the account
+        holds its lease, and ``(False, None)`` when every runner slot is taken.
+        """
+        account_id = int(account_id or 1)
         now = self._now()
         with self._lock:
             self._prune_locked(now)
-            active_id = self._active_task_id
-            if active_id:
-                active = self._tasks.get(active_id) or self._load_db_task(active_id)
-                if active and active.get("status") in {"pending", "running"}:
-                    return False, active_id
-                self._active_task_id = None
-
-            db_active = self._load_db_active_task()
-            if db_active is not None and db_active["task_id"] != task_id:
-                self._active_task_id = db_active["task_id"]
-                self._tasks[db_active["task_id"]] = db_active
-                return False, db_active["task_id"]
-
-            self._active_task_id = task_id
-            return True, None
+        holder = self._state().lease_owner(book_import_account_lease(account_id))
+        if holder and holder != self._lease_owner_for(task_id):
+            return False, book_import_task_id_from_lease_owner(holder)
+
+        orphan_snapshot = None
+        db_active = self._load_db_active_task(account_id)
+        if db_active is not None and db_active["task_id"] != task_id:
+            # Nobody holds the account's lease, so the worker running this task is gone.
+            with self._lock:
+                orphan_id = db_active["task_id"]
+                db_active["status"] = "interrupted"
+                db_active["stage"] = "已中断"
+                db_active["message"] = db_active.get("message") or "执行进程已退出，任务中断"
+                db_active["finished_ts"] = now
+                db_active["updated_ts"] = now
+                self._tasks[orphan_id] = db_active
+                self._local_task_ids.add(orphan_id)
+                self._mark_dirty_locked(orphan_id)
+                orphan_snapshot = self._snapshot_locked(orphan_id, now)
+            logger.info("Book import task marked interrupted after lease expiry: %s", orphan_id)
+        self._flush_snapshot(orphan_snapshot)
+
+        reserved = self._acquire_slot(task_id, account_id)
+        return reserved, None if reserved else self.active_task_id(account_id)
 
     def claim_task(self, task_id: str) -> dict[str, Any] | None:
         now = self._now()
+        self._preload(task_id)
         with self._lock:
             self._prune_locked(now)
-            active_id = self._active_task_id
-            if active_id and active_id != task_id:
-                active = self._tasks.get(active_id) or self._load_db_task(active_id)
-                if active and active.get("status") in {"pending", "running"}:
-                    return None
-                self._active_task_id = None
-
-            task = self._tasks.get(task_id) or self._load_db_task(task_id)
-            if not task:
-                return None
-            if task.get("status") == "interrupted":
-                task["status"] = "pending"
-                task["stage"] = "等待恢复"
-                task["message"] = task.get("message") or "准备恢复执行"
-                task["finished_ts"] = None
-                task["updated_ts"] = now
-                self._persist_task(task)
-            self._active_task_id = task_id
-            self._tasks[task_id] = task
-            return self._format(task)
+            task = self._tasks.get(task_id)
+            account_id = int(task.get("account_id", 1) or 1) if task is not None else None
+        if account_id is None:
+            # The dispatcher may have reserved a slot for a task that has since disappeared.
+            self.release_slot(task_id)
+            return None
+        if not self._acquire_slot(task_id, account_id):
+            self._abandon_claim(task_id, account_id, now)
+            return None
+        with self._lock:
+            task = self._tasks.get(task_id)
+            status = task.get("status") if task else None
+            snapshot = None
+            result = None
+            if status in BOOK_IMPORT_WAITING_STATUSES | BOOK_IMPORT_ACTIVE_STATUSES:
+                self._local_task_ids.add(task_id)
+                self._published_positions.pop(task_id, None)
+                if status in BOOK_IMPORT_WAITING_STATUSES:
+                    task["status"] = "pending"
+                    task["stage"] = "等待恢复" if status == "interrupted" else "准备导入"
+                    task["message"] = task.get("message") or "准备恢复执行"
+                    task["finished_ts"] = None
+                    task["updated_ts"] = now
+                    self._mark_dirty_locked(task_id)
+                    snapshot = self._snapshot_locked(task_id, now)
+                result = self._format(task)
+        if result is None:
+            # Cancelled or finished before it got the slot.
+            self.release_slot(task_id, account_id)
+            return None
+        self._flush_snapshot(snapshot)
+        self._broker.publish(task_id, result)
+        return result
+
+    def _abandon_claim(self, task_id: str, account_id: int, now: float) -> None:
+        """Give up a slot ``task_id`` could not (re)take and put the task back in the queue if it had started."""
+        self.release_slot(task_id, account_id)
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None or task.get("status") not in BOOK_IMPORT_ACTIVE_STATUSES:
+                return
+            self._local_task_ids.add(task_id)
+            task["status"] = "interrupted"
+            task["stage"] = "已中断"
+            task["message"] = "导入槽位被其他进程占用，任务将重新排队"
+            task["running_file"] = ""
+            task["updated_ts"] = now
+            self._mark_dirty_locked(task_id)
+            snapshot = self._snapshot_locked(task_id, now)
+            result = self._format(task)
+        self._flush_snapshot(snapshot)
+        self._broker.publish(task_id, result)
 
     def create_task(
         self,
@@ -235,15 +548,17 @@ class BookImportTaskTracker:
         account_id: int = 1,
         selected_files: list[str] | None = None,
     ) -> dict[str, Any]:
+        """Record a new task; it waits in the queue until the dispatcher claims it."""
         now = self._now()
         with self._lock:
             self._prune_locked(now)
             task = {
                 "task_id": task_id,
-                "status": "pending",
-                "stage": "等待开始",
+                "status": "queued",
+                "stage": "排队中",
                 "message": "",
                 "rebuild": rebuild,
+                "rebuild_cleared": False,
                 "account_id": int(account_id or 1),
                 "started_ts": now,
                 "updated_ts": now,
@@ -258,12 +573,16 @@ class BookImportTaskTracker:
                 "completed_chunks": 0,
                 "ocr_used_files": 0,
                 "ocr_pages": 0,
-                "file_results": [],
                 "selected_files": list(selected_files or []),
             }
             self._tasks[task_id] = task
-            self._persist_task(task)
-            return self._format(task)
+            self._local_task_ids.add(task_id)
+            self._mark_dirty_locked(task_id)
+            snapshot = self._snapshot_locked(task_id, now)
+            result = self._format(task)
+        self._flush_snapshot(snapshot)
+        self._broker.publish(task_id, result)
+        return result
 
     def restart(
         self,
@@ -274,33 +593,51 @@ class BookImportTaskTracker:
         stage: str = "准备导入",
         message: str = "任务已启动",
     ) -> dict[str, Any] | None:
+        """Mark a claimed task running again.
+
+        File counters are rebuilt from the file results an earlier, interrupted
+        run already stored, so a resumed task keeps its progress; chunk counters
+        restart from the chunks of those finished files.
+        """
         now = self._now()
+        self._preload(task_id)
         with self._lock:
-            task = self._tasks.get(task_id) or self._load_db_task(task_id)
-            if not task:
-                return None
+            task = self._tasks.get(task_id)
+            account_id = int(task.get("account_id", 1) or 1) if task else None
+        if account_id is None:
+            self.release_slot(task_id)
+            return None
+        # The slot is normally held since claim_task; losing it means another worker took over.
+        if not self._acquire_slot(task_id, account_id):
+            logger.warning("Book import task not started because the import slot is held elsewhere: %s", task_id)
+            self._abandon_claim(task_id, account_id, now)
+            return None
+        totals = self._file_result_totals(task_id)
+        with self._lock:
+            task = self._tasks.get(task_id)
+            cancelled = task is not None and task.get("status") == "cancelled"
+        if task is None or cancelled:
+            self.release_slot(task_id, account_id)
+            return None
+        with self._lock:
+            self._local_task_ids.add(task_id)
             task["status"] = "running"
             task["stage"] = stage
             task["message"] = message
             task["updated_ts"] = now
             task["finished_ts"] = None
             task["total_files"] = int(total_files or 0)
-            task["completed_files"] = 0
-            task["failed_files"] = 0
-            task["partial_files"] = 0
-            task["skipped_files"] = 0
+            task.update(totals)
             task["running_file"] = ""
-            task["total_chunks"] = 0
-            task["completed_chunks"] = 0
-            task["ocr_used_files"] = 0
-            task["ocr_pages"] = 0
-            task["file_results"] = []
             if selected_files is not None:
                 task["selected_files"] = list(selected_files)
-            self._active_task_id = task_id
             self._tasks[task_id] = task
-            self._persist_task(task)
-            return self._format(task)
+            self._mark_dirty_locked(task_id)
+            snapshot = self._snapshot_locked(task_id, now)
+            result = self._format(task)
+        self._flush_snapshot(snapshot)
+        self._broker.publish(task_id, result)
+        return result
 
     def update(
         self,
@@ -321,12 +658,15 @@ class BookImportTaskTracker:
         file_result: dict[str, Any] | None = None,
     ) -> dict[str, Any] | None:
         now = self._now()
+        self._preload(task_id)
         with self._lock:
             self._prune_locked(now)
-            task = self._tasks.get(task_id) or self._load_db_task(task_id)
+            task = self._tasks.get(task_id)
             if not task:
                 return None
+            self._local_task_ids.add(task_id)
 
+            status_changed = status is not None and status != task.get("status")
             if status is not None:
                 task["status"] = status
             if stage is not None:
@@ -345,24 +685,70 @@ class BookImportTaskTracker:
             task["partial_files"] += max(0, int(partial_files_add))
             task["skipped_files"] += max(0, int(skipped_files_add))
 
-            if file_result:
-                task["file_results"].append(file_result)
-
             task["updated_ts"] = now
             self._tasks[task_id] = task
-            self._persist_task(task)
-            return self._format(task)
+            self._mark_dirty_locked(task_id)
+            snapshot = None
+            if status_changed or file_result or self._should_flush_locked(task_id, now):
+                snapshot = self._snapshot_locked(task_id, now)
+            result = self._format(task)
+        if file_result:
+            self._insert_file_result(task_id, int(task.get("account_id", 1) or 1), file_result)
+        self._flush_snapshot(snapshot)
+        # Other processes only see flushed states; relaying every chunk would undo the write coalescing.
+        self._broker.publish(task_id, result, relay=snapshot is not None)
+        return result
+
+    def mark_rebuild_cleared(self, task_id: str) -> None:
+        now = self._now()
+        self._preload(task_id)
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if not task:
+                return
+            self._local_task_ids.add(task_id)
+            task["rebuild_cleared"] = True
+            task["updated_ts"] = now
+            self._mark_dirty_locked(task_id)
+            snapshot = self._snapshot_locked(task_id, now)
+        self._flush_snapshot(snapshot)
 
-    def _release_slot_locked(self, task_id: str) -> None:
-        if self._active_task_id == task_id:
-            self._active_task_id = None
+    def finished_source_names(self, task_id: str) -> list[str]:
+        """Source names with a stored result in this task, once per result (a resumed run skips these files)."""
+        db = SessionLocal()
+        try:
+            rows = db.query(BookImportFileResult.source_name).filter(BookImportFileResult.task_id == task_id).all()
+            return [str(source_name or "") for (source_name,) in rows]
+        finally:
+            db.close()
+
+    def flush(self, task_id: str | None = None) -> None:
+        """Persist pending in-memory progress for one task, or for all tasks."""
+        now = self._now()
+        with self._lock:
+            task_ids = [task_id] if task_id is not None else list(self._tasks.keys())
+            snapshots = [
+                self._snapshot_locked(current_id, now)
+                for current_id in task_ids
+                if self._pending_updates.get(current_id)
+            ]
+        for snapshot in snapshots:
+            self._flush_snapshot(snapshot)
+
+    def subscribe(self, task_id: str) -> ProgressSubscription:
+        return self._broker.subscribe(task_id)
+
+    def unsubscribe(self, subscription: ProgressSubscription) -> None:
+        self._broker.unsubscribe(subscription)
 
     def finish(self, task_id: str, *, status: str = "completed", message: str = "") -> dict[str, Any] | None:
         now = self._now()
+        self._preload(task_id)
         with self._lock:
-            task = self._tasks.get(task_id) or self._load_db_task(task_id)
+            task = self._tasks.get(task_id)
             if not task:
                 return None
+            self._local_task_ids.add(task_id)
             task["status"] = status
             task["stage"] = "已完成" if status == "completed" else "已结束"
             task["message"] = message
@@ -370,16 +756,25 @@ class BookImportTaskTracker:
             task["finished_ts"] = now
             task["updated_ts"] = now
             self._tasks[task_id] = task
-            self._persist_task(task)
-            self._release_slot_locked(task_id)
-            return self._format(task)
+            self._mark_dirty_locked(task_id)
+            snapshot = self._snapshot_locked(task_id, now)
+            result = self._format(task)
+        self._flush_snapshot(snapshot)
+        self.release_slot(task_id, int(task.get("account_id", 1) or 1))
+        with self._lock:
+            self._cancel_requested.discard(task_id)
+            self._cancel_polled_ts.pop(task_id, None)
+        self._broker.publish(task_id, result)
+        return result
 
     def fail(self, task_id: str, message: str) -> dict[str, Any] | None:
         now = self._now()
+        self._preload(task_id)
         with self._lock:
-            task = self._tasks.get(task_id) or self._load_db_task(task_id)
+            task = self._tasks.get(task_id)
             if not task:
                 return None
+            self._local_task_ids.add(task_id)
             task["status"] = "failed"
             task["stage"] = "执行失败"
             task["message"] = message
@@ -387,41 +782,178 @@ class BookImportTaskTracker:
             task["finished_ts"] = now
             task["updated_ts"] = now
             self._tasks[task_id] = task
-            self._persist_task(task)
-            self._release_slot_locked(task_id)
-            return self._format(task)
+            self._mark_dirty_locked(task_id)
+            snapshot = self._snapshot_locked(task_id, now)
+            result = self._format(task)
+        self._flush_snapshot(snapshot)
+        self.release_slot(task_id, int(task.get("account_id", 1) or 1))
+        with self._lock:
+            self._cancel_requested.discard(task_id)
+            self._cancel_polled_ts.pop(task_id, None)
+        self._broker.publish(task_id, result)
+        return result
+
+    def cancel(self, task_id: str) -> dict[str, Any] | None:
+        """Cancel a task: a waiting one ends at once, a running one after the chunks in flight.
+
+        Files a running task has not finished get no result; their chunk
+        checkpoints stay, so importing them again later resumes where this run stopped.
+        """
+        now = self._now()
+        self._preload(task_id)
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                return None
+            status = task.get("status")
+            snapshot = None
+            if status in BOOK_IMPORT_WAITING_STATUSES:
+                self._local_task_ids.add(task_id)
+                self._published_positions.pop(task_id, None)
+                task["status"] = "cancelled"
+                task["stage"] = "已取消"
+                task["message"] = "任务已取消"
+                task["finished_ts"] = now
+                task["updated_ts"] = now
+                self._mark_dirty_locked(task_id)
+                snapshot = self._snapshot_locked(task_id, now)
+                result = self._format(task)
+        if status in BOOK_IMPORT_WAITING_STATUSES:
+            self._flush_snapshot(snapshot)
+            self._broker.publish(task_id, result)
+            return result
+        if status not in BOOK_IMPORT_ACTIVE_STATUSES:
+            return self.get(task_id)
+        try:
+            # The worker running the task may be another process.
+            self._state().set_value(
+                BOOK_IMPORT_CANCEL_KEY.format(task_id=task_id), {"requested_ts": now}, ttl_seconds=self._ttl_seconds
+            )
+        except Exception as exc:
+            logger.warning("Book import cancel request not shared: task_id=%s err=%s", task_id, exc)
+        with self._lock:
+            self._cancel_requested.add(task_id)
+        return self.update(task_id, stage="正在取消", message="已请求取消，等待进行中的片段完成")
+
+    def is_cancel_requested(self, task_id: str) -> bool:
+        now = self._now()
+        with self._lock:
+            if task_id in self._cancel_requested:
+                return True
+            if now - self._cancel_polled_ts.get(task_id, 0.0) < CANCEL_POLL_SECONDS:
+                return False
+            self._cancel_polled_ts[task_id] = now
+        try:
+            requested = self._state().get_value(BOOK_IMPORT_CANCEL_KEY.format(task_id=task_id)) is not None
+        except Exception as exc:
+            logger.warning("Book import cancel lookup failed: task_id=%s err=%s", task_id, exc)
+            return False
+        if requested:
+            with self._lock:
+                self._cancel_requested.add(task_id)
+        return requested
+
+    def queue_order(self) -> list[tuple[str, int]]:
+        """Waiting ``(task_id, account_id)`` pairs in the order the dispatcher starts them.
+
+        Each account's tasks keep their submission order, and accounts take
+        turns: every round gives each account with waiting tasks one place,
+        accounts without a running import first, then by their oldest waiting task.
+        """
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(BookImportTask.task_id, BookImportTask.account_id, BookImportTask.status)
+                .filter(BookImportTask.status.in_(BOOK_IMPORT_WAITING_STATUSES | BOOK_IMPORT_ACTIVE_STATUSES))
+                .order_by(BookImportTask.started_at.asc(), BookImportTask.id.asc())
+                .all()
+            )
+        finally:
+            db.close()
+        busy = {int(account_id or 1) for _task_id, account_id, status in rows if status in BOOK_IMPORT_ACTIVE_STATUSES}
+        queues: dict[int, list[str]] = {}
+        for task_id, account_id, status in rows:
+            if status in BOOK_IMPORT_WAITING_STATUSES:
+                queues.setdefault(int(account_id or 1), []).append(str(task_id))
+        accounts = sorted(queues, key=lambda account: account in busy)
+        order: list[tuple[str, int]] = []
+        for turn in range(max((len(queue) for queue in queues.values()), default=0)):
+            order.extend((queues[account][turn], account) for account in accounts if turn < len(queues[account]))
+        return order
+
+    def queue_position(self, task_id: str) -> int | None:
+        for position, (queued_id, _account_id) in enumerate(self.queue_order(), start=1):
+            if queued_id == task_id:
+                return position
+        return None
+
+    def publish_queue_positions(self) -> None:
+        """Tell subscribers of waiting tasks whose place in the queue changed."""
+        order = self.queue_order()
+        waiting = {task_id for task_id, _account_id in order}
+        with self._lock:
+            for task_id in list(self._published_positions):
+                if task_id not in waiting:
+                    del self._published_positions[task_id]
+        for position, (task_id, _account_id) in enumerate(order, start=1):
+            with self._lock:
+                if self._published_positions.get(task_id) == position:
+                    continue
+                self._published_positions[task_id] = position
+            task = self.get_state(task_id)
+            if task is None:
+                continue
+            result = self._format(task)
+            result["queue_position"] = position
+            self._broker.publish(task_id, result)
 
     def get(self, task_id: str) -> dict[str, Any] | None:
         now = self._now()
+        self._preload(task_id)
         with self._lock:
             self._prune_locked(now)
             task = self._tasks.get(task_id)
             if task is None:
-                task = self._load_db_task(task_id)
-                if task is None:
-                    return None
-                self._tasks[task_id] = task
-            return self._format(task)
+                return None
+            result = self._format(task)
+        if result["status"] in BOOK_IMPORT_WAITING_STATUSES:
+            result["queue_position"] = self.queue_position(task_id)
+        return result
 
     def get_state(self, task_id: str) -> dict[str, Any] | None:
+        self._preload(task_id)
         with self._lock:
             task = self._tasks.get(task_id)
             if task is None:
-                task = self._load_db_task(task_id)
-                if task is None:
-                    return None
-                self._tasks[task_id] = task
+                return None
             return dict(task)
 
     def list_recoverable_task_ids(self) -> list[str]:
         task_ids = self._load_db_recoverable_task_ids()
-        with self._lock:
-            for task_id in task_ids:
-                if task_id not in self._tasks:
-                    task = self._load_db_task(task_id)
-                    if task is not None:
-                        self._tasks[task_id] = task
-            return task_ids
+        for task_id in task_ids:
+            self._preload(task_id)
+        return task_ids
+
+    def list_file_results(self, task_id: str, *, skip: int = 0, limit: int = 20) -> tuple[list[dict[str, Any]], int]:
+        db = SessionLocal()
+        try:
+            query = db.query(BookImportFileResult).filter(BookImportFileResult.task_id == task_id)
+            total = query.count()
+            rows = query.order_by(BookImportFileResult.id.asc()).offset(max(0, skip)).limit(max(1, limit)).all()
+            items = [
+                {
+                    "source_name": row.source_name or "",
+                    "status": row.status or "pending",
+                    "chunk_count": int(row.chunk_count or 0),
+                    "ocr_used": bool(row.ocr_used),
+                    "ocr_pages": int(row.ocr_pages or 0),
+                    "error_message": row.error_message or "",
+                }
+                for row in rows
+            ]
+            return items, total
+        finally:
+            db.close()
 
 
 book_import_task_tracker = BookImportTaskTracker()
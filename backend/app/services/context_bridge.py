@@ -152,6 +152,11 @@ class ContextBridge:
             timeout=120.0,
         )
 
+    @classmethod
+    def book_chunk_targets(cls, account_id: int, doc_type: str) -> list[str]:
+        account_root = f'{cls._account_root(account_id)}/books'
+        return [f'{account_root}/{doc_type}', f'{account_root}/common']
+
     async def add_book_chunk(
         self,
         *,
@@ -162,12 +167,14 @@ class ContextBridge:
         chapter: str,
         content_text: str,
         page_range: str = '',
+        targets: list[str] | None = None,
     ) -> None:
+        """Write one chunk to ``targets`` (default: every namespace from ``book_chunk_targets``)."""
         if not content_text.strip():
             return
 
-        account_root = f'{self._account_root(account_id)}/books'
-        targets = [f'{account_root}/{doc_type}', f'{account_root}/common']
+        if targets is None:
+            targets = self.book_chunk_targets(account_id, doc_type)
         instruction = (
             f'doc_type={doc_type}; source={source_name}; source_hash={source_hash}; '
             f'chapter={chapter}; page_range={page_range}'
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from pathlib import Path
+from typing import Any, Iterator
 
 try:
     from bs4 import BeautifulSoup
@@ -12,11 +13,15 @@ except Exception:  # pragma: no cover - fallback path for optional deps
 
 from app.errors import FileValidationError, logger
 
+# Bump when parse output changes, so cached extractions are not reused.
+EXTRACTOR_VERSION = 1
+
 
 class EpubParser:
     """Parse EPUB into chapter-level plain text."""
 
-    def parse(self, file_path: str) -> list[dict[str, str]]:
+    def parse(self, file_path: str) -> Iterator[dict[str, str]]:
+        """Yield each chapter with text as soon as it is read, in spine order."""
         if epub is None or BeautifulSoup is None or ITEM_DOCUMENT is None:
             raise FileValidationError("EPUB parser dependency missing: install ebooklib + beautifulsoup4")
 
@@ -29,7 +34,7 @@ class EpubParser:
         except Exception as e:
             raise FileValidationError(f"EPUB parsing failed: {e}")
 
-        chapters: list[dict[str, str]] = []
+        chapter_count = 0
         chapter_index = 0
 
         for item in book.get_items_of_type(ITEM_DOCUMENT):
@@ -58,13 +63,21 @@ class EpubParser:
                 logger.warning("EPUB chapter has empty text: %s", item.get_name())
                 continue
 
-            chapters.append(
-                {
-                    "chapter_title": chapter_title[:200],
-                    "text": clean_text,
-                },
-            )
+            chapter_count += 1
+            yield {
+                "chapter_title": chapter_title[:200],
+                "text": clean_text,
+            }
 
-        if not chapters:
+        if not chapter_count:
             raise FileValidationError("EPUB has no readable chapter content")
-        return chapters
+
+
+def parse_epub(file_path: str) -> list[dict[str, str]]:
+    """All of ``EpubParser.parse`` at once, as a list of chapters."""
+    return list(EpubParser().parse(file_path))
+
+
+def iter_epub(file_path: str, meta: dict[str, Any]) -> Iterator[dict[str, str]]:
+    """``EpubParser.parse`` as a module-level generator, for ``extraction_cache.stream``; EPUBs have no ``meta``."""
+    yield from EpubParser().parse(file_path)
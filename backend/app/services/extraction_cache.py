@@ -0,0 +1,526 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import aclosing
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Iterator
+
+from app.config import get_settings
+from app.errors import FileValidationError, logger
+from app.services import epub_parser, material_service, pdf_ocr_service
+from app.services.extraction_pool import extraction_pool
+
+settings = get_settings()
+
+CACHE_SUFFIX = '.jsonl.gz'
+# Lists of chapters/pages are written one JSON line per entry; everything else goes in the header line.
+ITEMS_FIELD = 'chapters'
+# A streaming extraction ends its spool file with this line, carrying the scalar fields.
+SPOOL_END = '__end__'
+# Created next to a spool file when its reader is gone; the worker stops before its next item.
+SPOOL_STOP_SUFFIX = '.stop'
+# How often a stream looks for lines the extraction worker has not written yet.
+SPOOL_POLL_SECONDS = 0.05
+# Cache hits are streamed this many lines per read.
+STREAM_READ_LINES = 64
+
+
+def extractor_signature(kind: str, variant: str = '') -> dict[str, Any]:
+    """Everything besides the file bytes that shapes an extraction result; part of the cache key."""
+    if kind == 'material':
+        # The extension picks the parser, so the same bytes under another suffix are a different entry.
+        return {'version': material_service.EXTRACTOR_VERSION, 'suffix': variant}
+    if kind == 'epub':
+        return {'version': epub_parser.EXTRACTOR_VERSION}
+    if kind == 'pdf':
+        return {
+            'version': pdf_ocr_service.EXTRACTOR_VERSION,
+            'ocr_enabled': bool(settings.pdf_ocr_enabled),
+            'ocr_lang': settings.pdf_ocr_lang,
+            'ocr_dpi': int(settings.pdf_ocr_dpi),
+            'ocr_adaptive': bool(settings.pdf_ocr_adaptive),
+            'ocr_fast_dpi': int(settings.pdf_ocr_fast_dpi),
+            'ocr_min_confidence': float(settings.pdf_ocr_min_confidence),
+            'ocr_max_pages': int(settings.pdf_ocr_max_pages),
+        }
+    raise ValueError(f'unknown extraction kind: {kind}')
+
+
+def _split(result: Any) -> tuple[str, dict[str, Any], list[Any]]:
+    if isinstance(result, str):
+        return 'text', {'text': result}, []
+    if isinstance(result, list):
+        return 'list', {}, result
+    if isinstance(result, dict):
+        meta = {key: value for key, value in result.items() if key != ITEMS_FIELD}
+        return 'dict', meta, list(result.get(ITEMS_FIELD, []) or [])
+    raise TypeError(f'cannot cache extraction result of type {type(result).__name__}')
+
+
+def _join(shape: str, meta: dict[str, Any], items: list[Any]) -> Any:
+    if shape == 'text':
+        return str(meta['text'])
+    if shape == 'list':
+        return items
+    return {**meta, ITEMS_FIELD: items}
+
+
+def spool_items(fn: Callable[..., Iterator[Any]], spool_path: str, *args: Any) -> int:
+    """Run the generator ``fn(*args, meta)`` in an extraction worker, writing each item to ``spool_path`` as it comes.
+
+    ``fn`` fills ``meta`` with the result's scalar fields; they follow the items
+    as a ``SPOOL_END`` line, which also tells the reader the extraction finished.
+    The worker gives up between items once the reader creates the stop file
+    (``spool_path`` plus ``SPOOL_STOP_SUFFIX``). Returns the number of items.
+    """
+    meta: dict[str, Any] = {}
+    count = 0
+    stop_path = spool_path + SPOOL_STOP_SUFFIX
+    with open(spool_path, 'w', encoding='utf-8') as handle:
+        for item in fn(*args, meta):
+            if os.path.exists(stop_path):
+                return count
+            handle.write(json.dumps(item, ensure_ascii=False) + '\n')
+            handle.flush()
+            count += 1
+        handle.write(json.dumps({SPOOL_END: True, 'meta': meta}, ensure_ascii=False) + '\n')
+    return count
+
+
+class _EntryWriter:
+    """Writes one cache entry, taking its items before the header that counts them.
+
+    Items go to a temporary gzip member; ``commit`` writes the header as its own
+    member in front of them and renames the file into place. Gzip readers treat
+    concatenated members as one stream, so the entry reads like any other.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.count = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, self._items_name = tempfile.mkstemp(dir=path.parent, prefix='.cache-', suffix='.items')
+        self._raw = os.fdopen(fd, 'wb')
+        self._items = gzip.GzipFile(fileobj=self._raw, mode='wb', compresslevel=6)
+
+    def add(self, item: Any) -> None:
+        self._items.write((json.dumps(item, ensure_ascii=False) + '\n').encode('utf-8'))
+        self.count += 1
+
+    def commit(self, header: dict[str, Any]) -> None:
+        self._close()
+        fd, temp_name = tempfile.mkstemp(dir=self.path.parent, prefix='.cache-', suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as raw:
+                with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6) as handle:
+                    handle.write((json.dumps({**header, 'items': self.count}, ensure_ascii=False) + '\n').encode('utf-8'))
+                with open(self._items_name, 'rb') as items:
+                    shutil.copyfileobj(items, raw)
+            os.replace(temp_name, self.path)
+        except BaseException:
+            Path(temp_name).unlink(missing_ok=True)
+            raise
+        finally:
+            Path(self._items_name).unlink(missing_ok=True)
+
+    def discard(self) -> None:
+        self._close()
+        Path(self._items_name).unlink(missing_ok=True)
+
+    def _close(self) -> None:
+        if not self._raw.closed:
+            self._items.close()
+            self._raw.close()
+
+
+@dataclass(slots=True)
+class CacheEntry:
+    path: Path
+    size: int
+    last_used: float
+
+
+class ExtractionCache:
+    """On-disk cache of extraction output keyed by (sha256, extractor version, OCR settings).
+
+    Each entry is one gzip-compressed JSON Lines file: a header line with the key,
+    the signature and the scalar fields, then one line per chapter or page. Files
+    are written to a temporary name and renamed into place, so concurrent readers
+    (other API workers included) only ever see complete entries. A hit refreshes
+    the entry's mtime, and eviction removes the least recently used entries once
+    the directory grows past ``max_bytes``.
+    """
+
+    def __init__(self, root: str | Path, *, max_bytes: int, enabled: bool = True) -> None:
+        self.root = Path(root)
+        self.max_bytes = max(0, int(max_bytes))
+        self.enabled = bool(enabled)
+        self._evict_lock = threading.Lock()
+
+    def path_for(self, kind: str, sha256: str, variant: str = '') -> Path:
+        signature = extractor_signature(kind, variant)
+        digest = hashlib.sha256(json.dumps([kind, signature], sort_keys=True).encode('utf-8')).hexdigest()
+        return self.root / sha256[:2] / f'{sha256}-{kind}-{digest[:16]}{CACHE_SUFFIX}'
+
+    def get(self, kind: str, sha256: str, variant: str = '') -> Any | None:
+        path = self.path_for(kind, sha256, variant)
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as handle:
+                header = json.loads(handle.readline())
+                items = [json.loads(line) for line in handle]
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, zlib.error, ValueError) as exc:
+            logger.warning('Dropping unreadable extraction cache entry %s: %s', path.name, exc)
+            path.unlink(missing_ok=True)
+            return None
+        if header.get('sha256') != sha256 or header.get('signature') != extractor_signature(kind, variant) or len(items) != header.get('items'):
+            logger.warning('Dropping mismatched extraction cache entry %s', path.name)
+            path.unlink(missing_ok=True)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return _join(header['shape'], header['meta'], items)
+
+    @staticmethod
+    def _header(kind: str, sha256: str, variant: str, shape: str, meta: dict[str, Any]) -> dict[str, Any]:
+        return {
+            'kind': kind,
+            'sha256': sha256,
+            'signature': extractor_signature(kind, variant),
+            'created_at': time.time(),
+            'shape': shape,
+            'meta': meta,
+        }
+
+    def put(self, kind: str, sha256: str, result: Any, variant: str = '') -> None:
+        shape, meta, items = _split(result)
+        writer = _EntryWriter(self.path_for(kind, sha256, variant))
+        try:
+            for item in items:
+                writer.add(item)
+        except BaseException:
+            writer.discard()
+            raise
+        writer.commit(self._header(kind, sha256, variant, shape, meta))
+        self.evict()
+
+    async def fetch(
+        self,
+        kind: str,
+        sha256: str,
+        fn: Callable[..., Any],
+        /,
+        *args: Any,
+        variant: str = '',
+        **run_kwargs: Any,
+    ) -> Any:
+        """Return the cached result for this file, or run ``fn(*args)`` in the extraction pool and cache it."""
+        if not self.enabled or not sha256:
+            return await extraction_pool.run(fn, *args, **run_kwargs)
+        cached = await asyncio.to_thread(self.get, kind, sha256, variant)
+        if cached is not None:
+            return cached
+        result = await extraction_pool.run(fn, *args, **run_kwargs)
+        try:
+            await asyncio.to_thread(self.put, kind, sha256, result, variant)
+        except (OSError, TypeError, ValueError) as exc:
+            # The cache is an optimisation; a full disk must not fail the upload or import.
+            logger.warning('Extraction cache write failed for %s %s: %s', kind, sha256[:12], exc)
+        return result
+
+    def stream(
+        self,
+        kind: str,
+        sha256: str,
+        fn: Callable[..., Iterator[Any]],
+        /,
+        *args: Any,
+        variant: str = '',
+        on_extracted: Callable[[], None] | None = None,
+        **run_kwargs: Any,
+    ) -> ExtractionStream:
+        """Like ``fetch``, but yields the items while ``fn(*args, meta)`` is still producing them.
+
+        ``fn`` must be a module-level generator (see ``spool_items``). ``on_extracted``
+        is called once the extraction no longer runs: at once on a cache hit,
+        otherwise when the pool job ends, even if the stream was abandoned. An
+        abandoned stream stops the job before its next item.
+        """
+        return ExtractionStream(self, kind, sha256, fn, args, variant=variant, on_extracted=on_extracted, run_kwargs=run_kwargs)
+
+    def _open_entry(self, kind: str, sha256: str, variant: str) -> tuple[Any, dict[str, Any]] | None:
+        path = self.path_for(kind, sha256, variant)
+        try:
+            handle = gzip.open(path, 'rt', encoding='utf-8')
+        except FileNotFoundError:
+            return None
+        try:
+            header = json.loads(handle.readline())
+        except (OSError, EOFError, zlib.error, ValueError) as exc:
+            handle.close()
+            logger.warning('Dropping unreadable extraction cache entry %s: %s', path.name, exc)
+            path.unlink(missing_ok=True)
+            return None
+        if header.get('sha256') != sha256 or header.get('signature') != extractor_signature(kind, variant):
+            handle.close()
+            logger.warning('Dropping mismatched extraction cache entry %s', path.name)
+            path.unlink(missing_ok=True)
+            return None
+        return handle, header
+
+    def entries(self) -> list[CacheEntry]:
+        found: list[CacheEntry] = []
+        for path in self.root.glob(f'*/*{CACHE_SUFFIX}'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            found.append(CacheEntry(path=path, size=stat.st_size, last_used=stat.st_mtime))
+        return found
+
+    @staticmethod
+    def read_header(path: Path) -> dict[str, Any]:
+        with gzip.open(path, 'rt', encoding='utf-8') as handle:
+            return json.loads(handle.readline())
+
+    def is_stale(self, path: Path) -> bool:
+        """True when the entry was written by another extractor version or under other OCR settings."""
+        try:
+            header = self.read_header(path)
+            return header.get('signature') != extractor_signature(header['kind'], header['signature'].get('suffix', ''))
+        except (OSError, EOFError, zlib.error, ValueError, KeyError, AttributeError):
+            return True
+
+    def prune(
+        self,
+        *,
+        max_bytes: int | None = None,
+        stale: bool = False,
+        older_than_seconds: float | None = None,
+        execute: bool = True,
+    ) -> dict[str, int]:
+        """Remove stale or unused entries, then the least recently used ones until under ``max_bytes``."""
+        entries = sorted(self.entries(), key=lambda entry: entry.last_used)
+        cutoff = time.time() - older_than_seconds if older_than_seconds is not None else None
+        keep: list[CacheEntry] = []
+        doomed: list[CacheEntry] = []
+        for entry in entries:
+            if (cutoff is not None and entry.last_used < cutoff) or (stale and self.is_stale(entry.path)):
+                doomed.append(entry)
+            else:
+                keep.append(entry)
+        remaining = sum(entry.size for entry in keep)
+        limit = self.max_bytes if max_bytes is None else max(0, int(max_bytes))
+        while keep and remaining > limit:
+            entry = keep.pop(0)
+            remaining -= entry.size
+            doomed.append(entry)
+        if execute:
+            for entry in doomed:
+                entry.path.unlink(missing_ok=True)
+        return {
+            'scanned': len(entries),
+            'removed': len(doomed),
+            'freed_bytes': sum(entry.size for entry in doomed),
+            'remaining_bytes': remaining,
+        }
+
+    def evict(self) -> None:
+        # One eviction pass at a time per process; racing processes at worst both delete the same old files.
+        if not self._evict_lock.acquire(blocking=False):
+            return
+        try:
+            result = self.prune()
+        finally:
+            self._evict_lock.release()
+        if result['removed']:
+            logger.info('Extraction cache evicted %s entries (%s bytes)', result['removed'], result['freed_bytes'])
+
+    def clear(self) -> None:
+        self.prune(max_bytes=0)
+
+
+class ExtractionStream:
+    """Async iterator over one extraction's items; ``meta`` holds its scalar fields once iteration ends.
+
+    A cache hit is read back line by line. Otherwise the extraction runs in the
+    pool through ``spool_items``, and its spool file is followed like a log while
+    the worker writes it: neither process holds the whole document, and the
+    items are copied into a new cache entry on the way past.
+    """
+
+    def __init__(
+        self,
+        cache: ExtractionCache,
+        kind: str,
+        sha256: str,
+        fn: Callable[..., Iterator[Any]],
+        args: tuple[Any, ...],
+        *,
+        variant: str,
+        on_extracted: Callable[[], None] | None,
+        run_kwargs: dict[str, Any],
+    ) -> None:
+        self._cache = cache
+        self._kind = kind
+        self._sha256 = sha256
+        self._fn = fn
+        self._args = args
+        self._variant = variant
+        self._on_extracted = on_extracted
+        self._run_kwargs = run_kwargs
+        self._job: asyncio.Future[int] | None = None
+        self.meta: dict[str, Any] | None = None
+
+    def _extracted(self) -> None:
+        callback, self._on_extracted = self._on_extracted, None
+        if callback is not None:
+            callback()
+
+    async def __aiter__(self) -> AsyncIterator[Any]:
+        try:
+            use_cache = self._cache.enabled and bool(self._sha256)
+            cached = await asyncio.to_thread(self._cache._open_entry, self._kind, self._sha256, self._variant) if use_cache else None
+            if cached is not None:
+                self._extracted()
+                async with aclosing(self._read_entry(*cached)) as items:
+                    async for item in items:
+                        yield item
+                return
+            async with aclosing(self._extract(use_cache)) as items:
+                async for item in items:
+                    yield item
+        finally:
+            if self._job is None:
+                self._extracted()
+
+    async def _read_entry(self, handle: Any, header: dict[str, Any]) -> AsyncIterator[Any]:
+        path = self._cache.path_for(self._kind, self._sha256, self._variant)
+        count = 0
+        try:
+            while True:
+                lines = await asyncio.to_thread(_read_lines, handle, STREAM_READ_LINES)
+                for line in lines:
+                    count += 1
+                    yield json.loads(line)
+                if len(lines) < STREAM_READ_LINES:
+                    break
+            if count != header.get('items'):
+                raise ValueError(f'{count} of {header.get("items")} items')
+        except (OSError, EOFError, zlib.error, ValueError) as exc:
+            logger.warning('Dropping unreadable extraction cache entry %s: %s', path.name, exc)
+            path.unlink(missing_ok=True)
+            raise FileValidationError('解析缓存已损坏，请重新导入') from exc
+        finally:
+            handle.close()
+        self.meta = header.get('meta', {})
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    async def _extract(self, use_cache: bool) -> AsyncIterator[Any]:
+        # Spooled under the cache directory rather than /tmp, which may be a small tmpfs.
+        self._cache.root.mkdir(parents=True, exist_ok=True)
+        fd, spool_name = tempfile.mkstemp(dir=self._cache.root, prefix='.spool-', suffix='.jsonl')
+        os.close(fd)
+        writer: _EntryWriter | None = None
+        committed = False
+        try:
+            job = self._job = asyncio.ensure_future(
+                extraction_pool.run(spool_items, self._fn, spool_name, *self._args, **self._run_kwargs)
+            )
+            job.add_done_callback(self._job_done)
+            if use_cache:
+                try:
+                    writer = _EntryWriter(self._cache.path_for(self._kind, self._sha256, self._variant))
+                except OSError as exc:
+                    logger.warning('Extraction cache write failed for %s %s: %s', self._kind, self._sha256[:12], exc)
+            with open(spool_name, encoding='utf-8') as spool:
+                partial = ''
+                while True:
+                    # Checked before reading: once the job is done, everything it wrote is on disk.
+                    job_done = job.done()
+                    line = spool.readline()
+                    if line.endswith('\n'):
+                        item = json.loads(partial + line)
+                        partial = ''
+                        if isinstance(item, dict) and item.get(SPOOL_END) is True:
+                            self.meta = item['meta']
+                            break
+                        if writer is not None:
+                            writer = self._write(writer, 'add', item)
+                        yield item
+                        continue
+                    partial += line
+                    if job_done:
+                        await job
+                        raise FileValidationError('文件解析意外中断')
+                    await asyncio.sleep(SPOOL_POLL_SECONDS)
+            await job
+            if writer is not None:
+                header = self._cache._header(self._kind, self._sha256, self._variant, 'dict', self.meta)
+                await asyncio.to_thread(self._commit, writer, header)
+                committed = True
+        finally:
+            if writer is not None and not committed:
+                writer.discard()
+            if self._job is not None and not self._job.done():
+                # The reader stopped early: stop the worker too, and leave the files to it until it has.
+                Path(spool_name + SPOOL_STOP_SUFFIX).touch()
+                self._job.add_done_callback(lambda _job: _remove_spool(spool_name))
+            else:
+                _remove_spool(spool_name)
+
+    def _job_done(self, job: asyncio.Future[int]) -> None:
+        if not job.cancelled():
+            job.exception()  # retrieved here so an abandoned stream does not log it as unhandled
+        self._extracted()
+
+    def _write(self, writer: _EntryWriter, method: str, *args: Any) -> _EntryWriter | None:
+        # The cache is an optimisation; a full disk must not fail the import.
+        try:
+            getattr(writer, method)(*args)
+            return writer
+        except OSError as exc:
+            logger.warning('Extraction cache write failed for %s %s: %s', self._kind, self._sha256[:12], exc)
+            writer.discard()
+            return None
+
+    def _commit(self, writer: _EntryWriter, header: dict[str, Any]) -> None:
+        if self._write(writer, 'commit', header) is not None:
+            self._cache.evict()
+
+
+def _remove_spool(spool_name: str) -> None:
+    Path(spool_name).unlink(missing_ok=True)
+    Path(spool_name + SPOOL_STOP_SUFFIX).unlink(missing_ok=True)
+
+
+def _read_lines(handle: Any, limit: int) -> list[str]:
+    lines: list[str] = []
+    for line in handle:
+        lines.append(line)
+        if len(lines) >= limit:
+            break
+    return lines
+
+
+extraction_cache = ExtractionCache(
+    settings.extraction_cache_dir,
+    max_bytes=settings.extraction_cache_max_mb * 1024 * 1024,
+    enabled=settings.extraction_cache_enabled,
+)
@@ -0,0 +1,290 @@
+from __future__ import annotations
+
+import asyncio
+import atexit
+import multiprocessing
+import queue
+import signal
+import threading
+from concurrent.futures import Future
+from multiprocessing.connection import Connection
+from typing import Any, Callable, TypeVar
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows has no rlimits; only the parent-side timeout applies
+    resource = None
+
+from app.config import get_settings
+from app.errors import FileValidationError, logger
+
+settings = get_settings()
+
+T = TypeVar('T')
+
+# Extra wall time, counted from when the job reached its worker, that the parent allows before it
+# stops trusting the worker's own alarm and kills that worker.
+KILL_GRACE_SECONDS = 10
+
+
+class ExtractionLimitError(FileValidationError):
+    """A job ran out of its CPU time, wall time or memory in the extraction pool."""
+
+    def __init__(self, message: str = '文件解析超出资源限制', detail: str = ''):
+        super().__init__(message, detail=detail)
+
+
+def _raise_cpu_limit(_signum, _frame) -> None:
+    raise ExtractionLimitError('文件解析超出 CPU 时间限制')
+
+
+def _raise_timeout(_signum, _frame) -> None:
+    raise ExtractionLimitError('文件解析超时')
+
+
+def _init_worker(memory_bytes: int) -> None:
+    # Children (antiword, pdftoppm, tesseract) inherit the address-space limit.
+    if resource is not None and memory_bytes > 0:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+    if hasattr(signal, 'SIGXCPU'):
+        signal.signal(signal.SIGXCPU, _raise_cpu_limit)
+    if hasattr(signal, 'setitimer'):
+        signal.signal(signal.SIGALRM, _raise_timeout)
+
+
+def _cpu_seconds_used() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _run_limited(fn: Callable[..., T], args: tuple[Any, ...], cpu_seconds: float, timeout: float) -> T:
+    """Run ``fn`` in a worker under a CPU budget (RLIMIT_CPU is cumulative, so it is re-armed per job)."""
+    if resource is not None and cpu_seconds > 0:
+        _soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        budget = int(_cpu_seconds_used() + cpu_seconds) + 1
+        if hard != resource.RLIM_INFINITY:
+            budget = min(budget, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (budget, hard))
+    if hasattr(signal, 'setitimer') and timeout > 0:
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return fn(*args)
+    except MemoryError as exc:
+        raise ExtractionLimitError('文件解析超出内存限制') from exc
+    finally:
+        if hasattr(signal, 'setitimer'):
+            signal.setitimer(signal.ITIMER_REAL, 0)
+        if resource is not None and cpu_seconds > 0:
+            resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+
+
+def _serve(conn: Connection, memory_bytes: int) -> None:
+    """Worker loop: run each job sent over ``conn`` and send back ``(ok, result or exception)``."""
+    _init_worker(memory_bytes)
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        fn, args, cpu_seconds, timeout = job
+        try:
+            reply = (True, _run_limited(fn, args, cpu_seconds, timeout))
+        except BaseException as exc:
+            reply = (False, exc)
+        try:
+            conn.send(reply)
+        except Exception as exc:
+            # The result or exception does not pickle; report that instead.
+            conn.send((False, RuntimeError(f'{type(exc).__name__}: {exc}')))
+
+
+class _Worker:
+    """One spawned worker process and the pipe its jobs go through."""
+
+    def __init__(self, context: Any, memory_bytes: int) -> None:
+        self.conn, child_conn = context.Pipe()
+        # Not a daemon: PDF OCR starts its own process pool inside the job.
+        self.process = context.Process(target=_serve, args=(child_conn, memory_bytes), name='extraction-worker')
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+
+    def stop(self, *, kill: bool = False) -> None:
+        try:
+            if kill:
+                self.process.kill()
+            else:
+                self.conn.send(None)
+        except Exception:
+            pass
+        self.conn.close()
+        self.process.join(timeout=5)
+
+
+class ExtractionPool:
+    """Worker processes for CPU-heavy parsing (material text, EPUB, PDF/OCR), started on first use.
+
+    Every job runs under a CPU-time budget, a wall-clock timeout and the workers'
+    address-space limit, so a pathological file fails on its own instead of
+    pinning a core or exhausting memory in the API process. Workers are replaced
+    after ``max_tasks_per_child`` jobs to return fragmented memory.
+
+    Jobs wait in one queue and each of the ``max_workers`` slots feeds its own
+    worker, so a job's timeout only starts once it reaches a worker, and a
+    worker that dies or ignores its timeout is replaced on its own without
+    touching the jobs running in the other workers.
+
+    Workers are spawned rather than forked: the API process runs threads, and
+    forking those is unsafe. ``fn`` must be a module-level function so it can be
+    pickled.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_workers: int,
+        max_tasks_per_child: int,
+        memory_mb: int,
+        cpu_seconds: int,
+        timeout_seconds: int,
+    ) -> None:
+        self.max_workers = max(1, int(max_workers))
+        self.max_tasks_per_child = max(1, int(max_tasks_per_child))
+        self.memory_bytes = max(0, int(memory_mb)) * 1024 * 1024
+        self.cpu_seconds = max(0, int(cpu_seconds))
+        self.timeout_seconds = max(0, int(timeout_seconds))
+        self._lock = threading.Lock()
+        self._jobs: queue.SimpleQueue[tuple[Future[Any], Callable[..., Any], tuple[Any, ...], float, float] | None] = (
+            queue.SimpleQueue()
+        )
+        self._slots: list[threading.Thread] = []
+        self._workers: set[_Worker] = set()
+        self._closed = False
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('extraction pool is shut down')
+            if self._slots:
+                return
+            for index in range(self.max_workers):
+                slot = threading.Thread(target=self._serve_slot, name=f'extraction-slot-{index}', daemon=True)
+                slot.start()
+                self._slots.append(slot)
+            # Workers are not daemons; make sure none outlives the API process.
+            atexit.register(self._kill_workers)
+
+    def _serve_slot(self) -> None:
+        context = multiprocessing.get_context('spawn')
+        worker: _Worker | None = None
+        try:
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    return
+                future, fn, args, cpu_seconds, timeout = job
+                if not future.set_running_or_notify_cancel():
+                    continue  # the caller gave up while the job was queued
+                name = getattr(fn, '__name__', fn)
+                try:
+                    if worker is None:
+                        worker = self._spawn(context)
+                    worker.conn.send((fn, args, cpu_seconds, timeout))
+                except Exception as exc:
+                    if worker is not None and not worker.process.is_alive():
+                        self._retire(worker, kill=True)
+                        worker = None
+                    future.set_exception(exc)
+                    continue
+                worker.jobs += 1
+                # Only the job's own run counts: the clock starts now that its worker has it.
+                if not worker.conn.poll(timeout + KILL_GRACE_SECONDS if timeout > 0 else None):
+                    logger.warning('Extraction job ignored its %ss timeout, killing its worker: %s', timeout, name)
+                    self._retire(worker, kill=True)
+                    worker = None
+                    future.set_exception(ExtractionLimitError('文件解析超时'))
+                    continue
+                try:
+                    ok, value = worker.conn.recv()
+                except (EOFError, OSError):
+                    # The worker died (crash, OOM kill, CPU hard limit); the next job gets a new one.
+                    logger.warning('Extraction worker died, starting a new one: %s', name)
+                    self._retire(worker, kill=True)
+                    worker = None
+                    future.set_exception(ExtractionLimitError('文件解析进程异常退出'))
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+                if worker.jobs >= self.max_tasks_per_child:
+                    self._retire(worker)
+                    worker = None
+        finally:
+            if worker is not None:
+                self._retire(worker)
+
+    def _spawn(self, context: Any) -> _Worker:
+        worker = _Worker(context, self.memory_bytes)
+        with self._lock:
+            self._workers.add(worker)
+        return worker
+
+    def _retire(self, worker: _Worker, *, kill: bool = False) -> None:
+        with self._lock:
+            self._workers.discard(worker)
+        worker.stop(kill=kill)
+
+    def _kill_workers(self) -> None:
+        with self._lock:
+            workers = list(self._workers)
+        for worker in workers:
+            worker.process.kill()
+
+    async def run(
+        self,
+        fn: Callable[..., T],
+        /,
+        *args: Any,
+        timeout: float | None = None,
+        cpu_seconds: float | None = None,
+    ) -> T:
+        """Run ``fn(*args)`` in a worker; limits default to the pool's ``EXTRACTION_*`` settings."""
+        timeout = self.timeout_seconds if timeout is None else timeout
+        cpu_seconds = self.cpu_seconds if cpu_seconds is None else cpu_seconds
+        self._start()
+        future: Future[T] = Future()
+        self._jobs.put((future, fn, args, cpu_seconds, timeout))
+        # Cancelling the caller cancels a job still in the queue; a running job finishes in its worker.
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self, *, wait: bool = False, cancel_futures: bool = False) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            slots, self._slots = self._slots, []
+        if cancel_futures:
+            while True:
+                try:
+                    job = self._jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if job is not None:
+                    job[0].cancel()
+        for _slot in slots:
+            self._jobs.put(None)
+        if wait:
+            for slot in slots:
+                slot.join()
+
+
+extraction_pool = ExtractionPool(
+    max_workers=settings.extraction_workers,
+    max_tasks_per_child=settings.extraction_max_tasks_per_worker,
+    memory_mb=settings.extraction_memory_mb,
+    cpu_seconds=settings.extraction_cpu_seconds,
+    timeout_seconds=settings.extraction_timeout_seconds,
+)
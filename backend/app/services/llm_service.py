@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import asyncio
 import time
+from functools import lru_cache
 from typing import Generator
 
 from langchain_openai import ChatOpenAI
@@ -16,18 +17,24 @@ MAX_RETRIES = 2
 RETRY_DELAY = 1.0
 
 
+@lru_cache(maxsize=8)
+def _chat_model(temperature: float) -> ChatOpenAI:
+    # Building a client loads the CA bundle (~0.1s); services are created per request/file, clients are shared.
+    return ChatOpenAI(
+        model=settings.openai_model,
+        api_key=settings.openai_api_key,
+        base_url=settings.openai_base_url,
+        temperature=temperature,
+        request_timeout=60,
+        max_retries=0,
+    )
+
+
 class LLMService:
     """LLM 调用封装，包含重试和统一异常。"""
 
     def __init__(self, temperature: float = 0.3):
-        self.llm = ChatOpenAI(
-            model=settings.openai_model,
-            api_key=settings.openai_api_key,
-            base_url=settings.openai_base_url,
-            temperature=temperature,
-            request_timeout=60,
-            max_retries=0,
-        )
+        self.llm = _chat_model(temperature)
 
     def invoke(self, prompt: str) -> str:
         last_error = None
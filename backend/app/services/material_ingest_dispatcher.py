@@ -0,0 +1,440 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.config import get_settings
+from app.database import SessionLocal
+from app.errors import AppError, logger
+from app.models.material_ingest_job import MaterialIngestJob
+from app.services.state_backend import INSTANCE_ID
+from app.services.upload_progress_service import upload_progress_tracker
+from app.services.upload_storage import StoredUpload
+from app.side_effects import new_error_id
+
+settings = get_settings()
+
+MAX_JOB_ATTEMPTS = 3
+RECOVERY_BATCH_SIZE = 50
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class MaterialIngestDispatcher:
+    """Bounded worker pool for ``material_ingest_jobs``.
+
+    Jobs are rows, so a restart loses nothing: queued jobs and running jobs whose
+    heartbeat went stale are picked up again by ``resume_pending_jobs``. A worker
+    claims a job with a conditional UPDATE, so several processes may share the
+    table without running a job twice.
+    """
+
+    def __init__(self, *, max_workers: int | None = None, stale_seconds: int | None = None) -> None:
+        self.max_workers = max(1, int(max_workers or settings.material_ingest_workers))
+        self.stale_seconds = max(10, int(stale_seconds or settings.material_ingest_stale_seconds))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='material-ingest')
+        self._lock = threading.Lock()
+        self._futures: dict[str, Future[None]] = {}
+        self._closed = False
+
+    def enqueue(
+        self,
+        db: Session,
+        *,
+        task_id: str,
+        account_id: int,
+        user_id: int,
+        filename: str,
+        stored: StoredUpload,
+        allow_duplicate: bool = False,
+    ) -> MaterialIngestJob:
+        job = MaterialIngestJob(
+            task_id=task_id,
+            account_id=int(account_id or 1),
+            user_id=int(user_id),
+            filename=filename,
+            file_path=stored.path,
+            file_size=stored.size,
+            content_hash=stored.sha256,
+            allow_duplicate=bool(allow_duplicate),
+            status='queued',
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        upload_progress_tracker.update(
+            task_id,
+            account_id=job.account_id,
+            parse_progress=10,
+            status='queued',
+            stage='已进入处理队列',
+            message='',
+        )
+        self.dispatch(task_id)
+        return job
+
+    def enqueue_batch(
+        self,
+        db: Session,
+        *,
+        batch_id: str,
+        account_id: int,
+        user_id: int,
+        files: list[tuple[str, StoredUpload]],
+        allow_duplicate: bool = False,
+    ) -> list[MaterialIngestJob]:
+        """Queue the files of one batch upload; they are processed together by one worker."""
+        jobs = [
+            MaterialIngestJob(
+                task_id=f'{batch_id}:{index}',
+                batch_id=batch_id,
+                account_id=int(account_id or 1),
+                user_id=int(user_id),
+                filename=filename,
+                file_path=stored.path,
+                file_size=stored.size,
+                content_hash=stored.sha256,
+                allow_duplicate=bool(allow_duplicate),
+                status='queued',
+            )
+            for index, (filename, stored) in enumerate(files)
+        ]
+        db.add_all(jobs)
+        db.commit()
+        upload_progress_tracker.update(
+            batch_id,
+            account_id=int(account_id or 1),
+            parse_progress=10,
+            status='queued',
+            stage='已进入处理队列',
+            message=f'共 {len(jobs)} 个文件',
+        )
+        self.dispatch(batch_id, batch=True)
+        return jobs
+
+    def dispatch(self, task_id: str, *, batch: bool = False) -> bool:
+        with self._lock:
+            if self._closed or task_id in self._futures:
+                return False
+            future = self._executor.submit(self._run_batch if batch else self._run_job, task_id)
+            self._futures[task_id] = future
+            future.add_done_callback(lambda completed, current_task_id=task_id: self._on_done(current_task_id, completed))
+            return True
+
+    def join(self, task_id: str, timeout: float | None = None) -> None:
+        """Block until ``task_id`` finished in this process (no-op when it is not scheduled here)."""
+        with self._lock:
+            future = self._futures.get(task_id)
+        if future is not None:
+            future.exception(timeout=timeout)
+
+    def _claim(self, db: Session, task_id: str) -> MaterialIngestJob | None:
+        claimed = db.execute(
+            update(MaterialIngestJob)
+            .where(MaterialIngestJob.task_id == task_id, MaterialIngestJob.status == 'queued')
+            .values(
+                status='running',
+                worker_id=INSTANCE_ID,
+                attempts=MaterialIngestJob.attempts + 1,
+                heartbeat_at=_utcnow(),
+            )
+        ).rowcount
+        db.commit()
+        if not claimed:
+            return None
+        return db.query(MaterialIngestJob).filter(MaterialIngestJob.task_id == task_id).first()
+
+    def _keep_alive(self, criterion: ColumnElement[bool], stop: threading.Event) -> None:
+        while not stop.wait(self.stale_seconds / 3):
+            db = SessionLocal()
+            try:
+                db.execute(
+                    update(MaterialIngestJob)
+                    .where(criterion, MaterialIngestJob.status == 'running')
+                    .values(heartbeat_at=_utcnow())
+                )
+                db.commit()
+            except Exception as exc:
+                db.rollback()
+                logger.warning('Material ingest heartbeat failed. err=%s', exc)
+            finally:
+                db.close()
+
+    def _start_heartbeat(self, criterion: ColumnElement[bool], name: str) -> threading.Event:
+        stop = threading.Event()
+        threading.Thread(
+            target=self._keep_alive,
+            args=(criterion, stop),
+            name=f'material-ingest-heartbeat-{name[:8]}',
+            daemon=True,
+        ).start()
+        return stop
+
+    def _run_job(self, task_id: str) -> None:
+        db = SessionLocal()
+        stop: threading.Event | None = None
+        try:
+            job = self._claim(db, task_id)
+            if job is None:
+                return
+            stop = self._start_heartbeat(MaterialIngestJob.task_id == task_id, task_id)
+            asyncio.run(self._ingest(db, job))
+        except Exception as exc:
+            logger.exception('Material ingest worker crashed. task_id=%s err=%s', task_id, exc)
+        finally:
+            if stop is not None:
+                stop.set()
+            db.close()
+
+    def _run_batch(self, batch_id: str) -> None:
+        db = SessionLocal()
+        stop: threading.Event | None = None
+        try:
+            db.execute(
+                update(MaterialIngestJob)
+                .where(MaterialIngestJob.batch_id == batch_id, MaterialIngestJob.status == 'queued')
+                .values(
+                    status='running',
+                    worker_id=INSTANCE_ID,
+                    attempts=MaterialIngestJob.attempts + 1,
+                    heartbeat_at=_utcnow(),
+                )
+            )
+            db.commit()
+            jobs = (
+                db.query(MaterialIngestJob)
+                .filter(
+                    MaterialIngestJob.batch_id == batch_id,
+                    MaterialIngestJob.status == 'running',
+                    MaterialIngestJob.worker_id == INSTANCE_ID,
+                )
+                .order_by(MaterialIngestJob.id.asc())
+                .all()
+            )
+            if not jobs:
+                return
+            stop = self._start_heartbeat(MaterialIngestJob.batch_id == batch_id, batch_id)
+            asyncio.run(self._ingest_batch(db, batch_id, jobs))
+        except Exception as exc:
+            logger.exception('Material batch ingest worker crashed. batch_id=%s err=%s', batch_id, exc)
+            requeued = self._requeue_unfinished(batch_id)
+            message = f'批量处理中断，未完成的 {len(requeued)} 个文件将自动重试' if requeued else '批量处理中断'
+            upload_progress_tracker.fail(batch_id, message=message)
+            for task_id in requeued:
+                self.dispatch(task_id)
+        finally:
+            if stop is not None:
+                stop.set()
+            db.close()
+
+    def _requeue_unfinished(self, batch_id: str) -> list[str]:
+        """Queue the files of a crashed batch again, one job each; files out of attempts fail instead."""
+        unfinished = (
+            (MaterialIngestJob.batch_id == batch_id)
+            & (MaterialIngestJob.status == 'running')
+            & (MaterialIngestJob.worker_id == INSTANCE_ID)
+        )
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(MaterialIngestJob)
+                .where(unfinished, MaterialIngestJob.attempts >= MAX_JOB_ATTEMPTS)
+                .values(status='failed', message='多次处理中断，请重新上传', finished_at=_utcnow())
+            )
+            task_ids = [
+                task_id
+                for (task_id,) in db.query(MaterialIngestJob.task_id)
+                .filter(unfinished)
+                .order_by(MaterialIngestJob.id.asc())
+                .all()
+            ]
+            db.execute(update(MaterialIngestJob).where(unfinished).values(status='queued', worker_id=''))
+            db.commit()
+        except Exception as exc:
+            db.rollback()
+            # Left "running"; resume_pending_jobs requeues them after the next restart.
+            logger.warning('Material batch requeue failed. batch_id=%s err=%s', batch_id, exc)
+            return []
+        finally:
+            db.close()
+        return task_ids
+
+    async def _ingest_batch(self, db: Session, batch_id: str, jobs: list[MaterialIngestJob]) -> None:
+        from app.services.context_bridge import ContextBridge
+        from app.services.material_ingestion_service import (
+            BatchIngestItem,
+            MaterialIngestionResult,
+            MaterialIngestionService,
+        )
+
+        first = jobs[0]
+        account_id = int(first.account_id or 1)
+        by_task_id = {job.task_id: job for job in jobs}
+        items = [
+            BatchIngestItem(
+                key=job.task_id,
+                filename=job.filename,
+                stored=StoredUpload(path=job.file_path, size=int(job.file_size or 0), sha256=job.content_hash),
+            )
+            for job in jobs
+        ]
+        counts = {'completed': 0, 'failed': 0}
+        upload_progress_tracker.update(batch_id, account_id=account_id, parse_progress=12, status='parsing', stage='开始解析')
+
+        def on_item_done(task_id: str, result: MaterialIngestionResult | None, error: str) -> None:
+            job = by_task_id[task_id]
+            if result is None:
+                counts['failed'] += 1
+                self._finish(db, job, status='failed', message=error)
+            else:
+                counts['completed'] += 1
+                self._finish(
+                    db,
+                    job,
+                    status='completed',
+                    message='；'.join(result.warnings),
+                    material_id=int(result.material.id),
+                    duplicate=result.duplicate,
+                )
+            done = counts['completed'] + counts['failed']
+            upload_progress_tracker.update(
+                batch_id,
+                account_id=account_id,
+                parse_progress=12 + 88 * done // len(jobs),
+                stage=f'已处理 {done}/{len(jobs)}',
+            )
+
+        context_bridge = ContextBridge()
+        try:
+            await MaterialIngestionService(db, account_id=account_id, user_id=first.user_id).ingest_batch(
+                items,
+                context_bridge=context_bridge,
+                item_callback=on_item_done,
+                allow_duplicate=bool(first.allow_duplicate),
+            )
+        finally:
+            await context_bridge.close()
+        upload_progress_tracker.update(
+            batch_id,
+            account_id=account_id,
+            parse_progress=100,
+            status='completed' if counts['completed'] else 'failed',
+            stage='解析完成',
+            message=f'成功 {counts["completed"]} 个，失败 {counts["failed"]} 个',
+        )
+
+    async def _ingest(self, db: Session, job: MaterialIngestJob) -> None:
+        from app.services.context_bridge import ContextBridge
+        from app.services.material_ingestion_service import MaterialIngestionService
+
+        task_id = job.task_id
+        account_id = int(job.account_id or 1)
+
+        def update_progress(progress: int, stage: str, status: str = 'parsing', message: str = '') -> None:
+            upload_progress_tracker.update(
+                task_id,
+                account_id=account_id,
+                parse_progress=progress,
+                stage=stage,
+                status=status,
+                message=message,
+            )
+
+        context_bridge = ContextBridge()
+        try:
+            result = await MaterialIngestionService(db, account_id=account_id, user_id=job.user_id).ingest_stored(
+                stored=StoredUpload(path=job.file_path, size=int(job.file_size or 0), sha256=job.content_hash),
+                filename=job.filename,
+                context_bridge=context_bridge,
+                progress_callback=update_progress,
+                allow_duplicate=bool(job.allow_duplicate),
+            )
+        except AppError as exc:
+            db.rollback()
+            self._finish(db, job, status='failed', message=exc.message)
+            upload_progress_tracker.fail(task_id, message=exc.message)
+            return
+        except Exception as exc:
+            db.rollback()
+            error_id = new_error_id()
+            logger.exception('Material ingest failed. error_id=%s task_id=%s err=%s', error_id, task_id, exc)
+            message = f'处理失败，请重试（错误ID: {error_id}）'
+            self._finish(db, job, status='failed', message=message)
+            upload_progress_tracker.fail(task_id, message=message)
+            return
+        finally:
+            await context_bridge.close()
+        self._finish(
+            db,
+            job,
+            status='completed',
+            message='；'.join(result.warnings),
+            material_id=int(result.material.id),
+            duplicate=result.duplicate,
+        )
+
+    @staticmethod
+    def _finish(db: Session, job: MaterialIngestJob, *, status: str, message: str, **values) -> None:
+        job.status = status
+        job.message = message
+        job.finished_at = _utcnow()
+        for key, value in values.items():
+            setattr(job, key, value)
+        db.commit()
+
+    def _on_done(self, task_id: str, future: Future[None]) -> None:
+        if future.cancelled():
+            logger.info('Material ingest worker cancelled. task_id=%s', task_id)
+        with self._lock:
+            self._futures.pop(task_id, None)
+
+    def resume_pending_jobs(self) -> int:
+        """Dispatch queued jobs and requeue running ones whose worker stopped heartbeating."""
+        with self._lock:
+            if self._closed:
+                return 0
+        db = SessionLocal()
+        try:
+            cutoff = _utcnow() - timedelta(seconds=self.stale_seconds)
+            stale = MaterialIngestJob.status == 'running'
+            stale = stale & or_(MaterialIngestJob.heartbeat_at.is_(None), MaterialIngestJob.heartbeat_at < cutoff)
+            db.execute(
+                update(MaterialIngestJob)
+                .where(stale, MaterialIngestJob.attempts >= MAX_JOB_ATTEMPTS)
+                .values(status='failed', message='多次处理中断，请重新上传', finished_at=_utcnow())
+            )
+            db.execute(update(MaterialIngestJob).where(stale).values(status='queued', worker_id=''))
+            db.commit()
+            task_ids = [
+                task_id
+                for (task_id,) in db.query(MaterialIngestJob.task_id)
+                .filter(MaterialIngestJob.status == 'queued')
+                .order_by(MaterialIngestJob.id.asc())
+                .limit(RECOVERY_BATCH_SIZE)
+                .all()
+            ]
+        except Exception as exc:
+            db.rollback()
+            logger.warning('Material ingest recovery failed: %s', exc)
+            return 0
+        finally:
+            db.close()
+        return sum(1 for task_id in task_ids if self.dispatch(task_id))
+
+    def shutdown(self, *, wait: bool = False, cancel_futures: bool = False) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+
+material_ingest_dispatcher = MaterialIngestDispatcher()
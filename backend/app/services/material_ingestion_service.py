@@ -2,21 +2,30 @@ from __future__ import annotations
 
 import asyncio
 import json
+import os
 from collections.abc import Callable
 from dataclasses import dataclass
+from pathlib import Path
 
 from sqlalchemy.orm import Session
 
-from app.errors import FileValidationError, logger
+from app.config import get_settings
+from app.errors import AppError, FileValidationError, logger
 from app.models.material import Material
 from app.prompts.doc_types_catalog import DOC_TYPE_CHOICES_TEXT
 from app.prompts.material_analysis import MATERIAL_ANALYSIS_PROMPT
 from app.prompts.validators import parse_json_response, validate_classify, validate_keywords, validate_title
+from app.services import material_search_index
 from app.services.context_bridge import ContextBridge
+from app.services.extraction_cache import extraction_cache
+from app.services.extraction_pool import extraction_pool
 from app.services.llm_service import LLMService
-from app.services.material_service import MaterialService
+from app.services.material_service import MaterialService, extract_material_text
 from app.services.style_analyzer import StyleAnalyzer
-from app.side_effects import collect_side_effect_warning
+from app.services.upload_storage import StoredUpload
+from app.side_effects import collect_side_effect_warning, new_error_id
+
+settings = get_settings()
 
 ProgressCallback = Callable[[int, str, str, str], None]
 
@@ -25,6 +34,19 @@ ProgressCallback = Callable[[int, str, str, str], None]
 class MaterialIngestionResult:
     material: Material
     warnings: list[str]
+    # True when the upload matched one of the user's materials and no new entry was made.
+    duplicate: bool = False
+
+
+@dataclass(slots=True)
+class BatchIngestItem:
+    key: str
+    filename: str
+    stored: StoredUpload
+
+
+# Called once per batch item with its key and either the result or a user-facing error.
+BatchItemCallback = Callable[[str, MaterialIngestionResult | None, str], None]
 
 
 class MaterialIngestionService:
@@ -35,21 +57,29 @@ class MaterialIngestionService:
         self.materials = MaterialService(db)
         self.llm = LLMService()
 
-    async def ingest_upload(
+    async def ingest_stored(
         self,
         *,
-        file_bytes: bytes,
+        stored: StoredUpload,
         filename: str,
         context_bridge: ContextBridge,
         progress_callback: ProgressCallback | None = None,
+        allow_duplicate: bool = False,
     ) -> MaterialIngestionResult:
+        """Extract, analyse and persist a file already saved by ``MaterialService.save_upload``."""
         warnings: list[str] = []
-        self._update_progress(progress_callback, 3, "开始解析")
+        file_path = stored.path
+        self._update_progress(progress_callback, 12, "开始解析")
 
-        file_path = await asyncio.to_thread(self.materials.save_upload, file_bytes, filename, self.user_id)
-        self._update_progress(progress_callback, 12, "文件已保存")
+        existing = self.materials.find_by_content_hash(stored.sha256, account_id=self.account_id, user_id=self.user_id)
+        if existing is not None:
+            return await asyncio.to_thread(
+                self._reuse_existing, existing, stored, filename, progress_callback, allow_duplicate
+            )
 
-        content_text = await asyncio.to_thread(self.materials.extract_text, file_path, filename)
+        content_text = await extraction_cache.fetch(
+            "material", stored.sha256, extract_material_text, file_path, filename, variant=Path(filename).suffix.lower()
+        )
         if not content_text.strip():
             raise FileValidationError("文件内容为空，无法处理")
         self._update_progress(progress_callback, 28, "文本提取完成")
@@ -63,6 +93,7 @@ class MaterialIngestionService:
 
         style_features = await self._analyze_style(content_text, filename, warnings)
         self._update_progress(progress_callback, 76, "风格特征分析完成")
+        search_values = await extraction_pool.run(material_search_index.index_values, title, keywords, content_text)
 
         if style_features:
             StyleAnalyzer(self.db, account_id=self.account_id).store_analysis(
@@ -81,6 +112,8 @@ class MaterialIngestionService:
             summary,
             keywords,
             self.account_id,
+            content_hash=stored.sha256,
+            search_index_values=search_values,
             commit=False,
         )
         self.db.commit()
@@ -93,6 +126,161 @@ class MaterialIngestionService:
         self._update_progress(progress_callback, 100, "解析完成", status="completed", message=final_message)
         return MaterialIngestionResult(material=material, warnings=warnings)
 
+    async def ingest_batch(
+        self,
+        items: list[BatchIngestItem],
+        *,
+        context_bridge: ContextBridge,
+        item_callback: BatchItemCallback | None = None,
+        allow_duplicate: bool = False,
+    ) -> None:
+        """Ingest many stored files concurrently, failing items individually.
+
+        Extraction runs in the process pool, LLM work is capped by
+        ``material_batch_llm_concurrency``, and the style samples of the whole batch
+        are folded into the profiles once at the end. Files repeating an earlier
+        file of the batch wait for it and then take the content-hash shortcut.
+        """
+        llm_slots = asyncio.Semaphore(max(1, settings.material_batch_llm_concurrency))
+        style_samples: list[tuple[str, dict]] = []
+        first_by_hash: dict[str, BatchIngestItem] = {}
+        repeats: list[BatchIngestItem] = []
+        for item in items:
+            if item.stored.sha256 in first_by_hash:
+                repeats.append(item)
+            else:
+                first_by_hash[item.stored.sha256] = item
+
+        async def run(item: BatchIngestItem) -> None:
+            try:
+                result = await self._ingest_batch_item(item, context_bridge, llm_slots, style_samples, allow_duplicate)
+            except AppError as exc:
+                self.db.rollback()
+                self._report(item_callback, item.key, None, exc.message)
+            except Exception as exc:
+                self.db.rollback()
+                error_id = new_error_id()
+                logger.exception("Batch material ingest failed. error_id=%s file=%s err=%s", error_id, item.filename, exc)
+                self._report(item_callback, item.key, None, f"处理失败，请重试（错误ID: {error_id}）")
+            else:
+                self._report(item_callback, item.key, result, "")
+
+        await asyncio.gather(*(run(item) for item in first_by_hash.values()))
+        await asyncio.gather(*(run(item) for item in repeats))
+        if style_samples:
+            StyleAnalyzer(self.db, account_id=self.account_id).store_analyses(style_samples)
+
+    async def _ingest_batch_item(
+        self,
+        item: BatchIngestItem,
+        context_bridge: ContextBridge,
+        llm_slots: asyncio.Semaphore,
+        style_samples: list[tuple[str, dict]],
+        allow_duplicate: bool,
+    ) -> MaterialIngestionResult:
+        # Session work stays on the event loop thread and never spans an await.
+        existing = self.materials.find_by_content_hash(item.stored.sha256, account_id=self.account_id, user_id=self.user_id)
+        if existing is not None:
+            return self._reuse_existing(existing, item.stored, item.filename, None, allow_duplicate)
+
+        content_text = await extraction_cache.fetch(
+            "material",
+            item.stored.sha256,
+            extract_material_text,
+            item.stored.path,
+            item.filename,
+            variant=Path(item.filename).suffix.lower(),
+        )
+        if not content_text.strip():
+            raise FileValidationError("文件内容为空，无法处理")
+
+        warnings: list[str] = []
+        async with llm_slots:
+            analysis = await self._analyze_material(content_text, item.filename)
+            style_features = await self._analyze_style(content_text, item.filename, warnings)
+        search_values = await extraction_pool.run(
+            material_search_index.index_values, analysis["title"], analysis["keywords"], content_text
+        )
+
+        material = self.materials.create_material(
+            self.user_id,
+            analysis["title"],
+            item.filename,
+            item.stored.path,
+            content_text,
+            analysis["doc_type"],
+            analysis["summary"],
+            analysis["keywords"],
+            self.account_id,
+            content_hash=item.stored.sha256,
+            search_index_values=search_values,
+        )
+        if style_features:
+            style_samples.append((str(analysis["doc_type"]), style_features))
+        await self._sync_context(
+            context_bridge,
+            material,
+            item.stored.path,
+            str(analysis["doc_type"]),
+            str(analysis["title"]),
+            content_text,
+            warnings,
+        )
+        return MaterialIngestionResult(material=material, warnings=warnings)
+
+    @staticmethod
+    def _report(
+        item_callback: BatchItemCallback | None,
+        key: str,
+        result: MaterialIngestionResult | None,
+        error: str,
+    ) -> None:
+        if item_callback is not None:
+            item_callback(key, result, error)
+
+    def _reuse_existing(
+        self,
+        existing: Material,
+        stored: StoredUpload,
+        filename: str,
+        progress_callback: ProgressCallback | None,
+        allow_duplicate: bool,
+    ) -> MaterialIngestionResult:
+        """Skip extraction, LLM analysis, style update and knowledge-base sync for known content.
+
+        The user's own copy is returned as is unless ``allow_duplicate`` (pointed at the new
+        upload if its file went missing); otherwise a new entry reuses the stored file,
+        analysis and search index values (the account knowledge base already has it).
+        """
+        if existing.file_path and existing.file_path != stored.path and os.path.exists(existing.file_path):
+            self.materials.cleanup_material_file(stored.path)
+            file_path = existing.file_path
+        else:
+            file_path = stored.path
+        if existing.user_id == self.user_id and not allow_duplicate:
+            if existing.file_path != file_path:
+                # The stored file was gone; the upload replaces it instead of being orphaned.
+                existing.file_path = file_path
+                self.db.commit()
+            self._update_progress(progress_callback, 100, "解析完成", status="completed", message="素材已存在")
+            return MaterialIngestionResult(material=existing, warnings=["已存在相同内容的素材，未重复入库"], duplicate=True)
+
+        material = self.materials.create_material(
+            self.user_id,
+            existing.title,
+            filename,
+            file_path,
+            existing.content_text or "",
+            existing.doc_type,
+            existing.summary,
+            list(existing.keywords or []),
+            self.account_id,
+            content_hash=stored.sha256,
+            search_index_values=material_search_index.stored_values(self.db.connection(), existing.id),
+        )
+        self._update_progress(progress_callback, 100, "解析完成", status="completed", message="已复用相同文件的解析结果")
+        return MaterialIngestionResult(material=material, warnings=["已复用相同文件的解析结果"])
+
     async def _analyze_material(self, content_text: str, filename: str) -> dict[str, object]:
         fallback_title = await asyncio.to_thread(self.materials.guess_title, content_text, filename)
         raw_analysis = (
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import html
+import re
+import threading
+from typing import Any, Iterable
+
+import jieba
+from sqlalchemy import Column, Integer, MetaData, Table, Text, bindparam, delete, event, func, insert, literal_column, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import attributes
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.errors import logger
+from app.models.material import Material
+
+MATERIALS_FTS_TABLE = "materials_fts"
+# Segmented words are joined with ZERO WIDTH SPACE, declared as an FTS5 separator, so the
+# stored column reads exactly like the original text once the separators are stripped.
+TOKEN_SEPARATOR = "\u200b"
+FTS5_TOKENIZE = f"unicode61 separators '{TOKEN_SEPARATOR}'"
+# bm25 weights for title, keywords, content and the sub-word column.
+BM25_WEIGHTS = (10.0, 5.0, 1.0, 0.5)
+SNIPPET_OPEN = "\ue000"
+SNIPPET_CLOSE = "\ue001"
+SNIPPET_TOKENS = 24
+
+# Not part of Base.metadata: the virtual table is created by its migration.
+materials_fts = Table(
+    MATERIALS_FTS_TABLE,
+    MetaData(),
+    Column("rowid", Integer, primary_key=True),
+    Column("title", Text),
+    Column("keywords", Text),
+    Column("content", Text),
+    Column("terms", Text),
+)
+
+_INDEXED_COLUMNS = ("title", "keywords", "content_text")
+# Instance attribute holding index_values() computed ahead of the flush, e.g. in an extraction worker.
+_PRECOMPUTED_ATTR = "_search_index_values"
+_available_lock = threading.Lock()
+_available_engines: set[int] = set()
+
+
+def segment(text: str | None) -> str:
+    """Precise-mode jieba words joined by ``TOKEN_SEPARATOR``."""
+    cleaned = (text or "").replace(TOKEN_SEPARATOR, "")
+    return TOKEN_SEPARATOR.join(jieba.cut(cleaned))
+
+
+def search_terms(text: str | None) -> str:
+    """Sub-words of long words (``国务院`` inside ``国务院办公厅``) that precise mode does not emit."""
+    cleaned = (text or "").replace(TOKEN_SEPARATOR, "")
+    precise = set(jieba.cut(cleaned))
+    extra = {word for word in jieba.cut_for_search(cleaned) if word.strip() and word not in precise}
+    return " ".join(sorted(extra))
+
+
+def match_expression(keyword: str | None) -> str | None:
+    """FTS5 query requiring every word of ``keyword``; None when nothing is searchable."""
+    words = [word.strip() for word in jieba.cut((keyword or "").replace(TOKEN_SEPARATOR, "")) if word.strip()]
+    words = [word for word in words if re.search(r"\w", word)]
+    if not words:
+        return None
+    return " ".join('"' + word.replace('"', '""') + '"' for word in words)
+
+
+def index_values(title: str | None, keywords: Any, content_text: str | None) -> dict[str, str]:
+    keyword_text = " ".join(str(item) for item in keywords) if isinstance(keywords, list) else str(keywords or "")
+    return {
+        "title": segment(title),
+        "keywords": segment(keyword_text),
+        "content": segment(content_text),
+        "terms": search_terms(" ".join([title or "", keyword_text, content_text or ""])),
+    }
+
+
+def attach_values(material: Material, values: dict[str, str]) -> None:
+    """Use ``values`` (from ``index_values``) when ``material`` is next inserted, instead of segmenting on flush."""
+    setattr(material, _PRECOMPUTED_ATTR, values)
+
+
+def _values_for(target: Material) -> dict[str, str]:
+    values = target.__dict__.pop(_PRECOMPUTED_ATTR, None)
+    if values is None:
+        values = index_values(target.title, target.keywords, target.content_text)
+    return values
+
+
+def is_available(connection: Connection) -> bool:
+    """Whether ``connection``'s database has the FTS5 index (SQLite only)."""
+    if connection.dialect.name != "sqlite":
+        return False
+    engine_key = id(connection.engine)
+    with _available_lock:
+        if engine_key in _available_engines:
+            return True
+    found = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (MATERIALS_FTS_TABLE,)
+    ).first()
+    if found is None:
+        return False
+    with _available_lock:
+        _available_engines.add(engine_key)
+    return True
+
+
+def ensure_index(connection: Connection) -> bool:
+    """Create the FTS5 table if missing and (re)index every material; False without FTS5."""
+    if connection.dialect.name != "sqlite":
+        return False
+    try:
+        connection.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {MATERIALS_FTS_TABLE} "
+            f'USING fts5(title, keywords, content, terms, tokenize="{FTS5_TOKENIZE}")'
+        )
+    except OperationalError as exc:
+        logger.warning("FTS5 unavailable, material search keeps the LIKE fallback: %s", exc)
+        return False
+    rebuild(connection)
+    return True
+
+
+def upsert(connection: Connection, material_id: int, values: dict[str, str]) -> None:
+    if not is_available(connection):
+        return
+    connection.execute(delete(materials_fts).where(materials_fts.c.rowid == material_id))
+    connection.execute(insert(materials_fts).values(rowid=material_id, **values))
+
+
+def stored_values(connection: Connection, material_id: int) -> dict[str, str] | None:
+    """The indexed values of an existing material, to reuse for a copy without segmenting again."""
+    if not is_available(connection):
+        return None
+    row = connection.execute(
+        select(materials_fts.c.title, materials_fts.c.keywords, materials_fts.c.content, materials_fts.c.terms).where(
+            materials_fts.c.rowid == material_id
+        )
+    ).first()
+    return dict(row._mapping) if row is not None else None
+
+
+def remove(connection: Connection, material_ids: Iterable[int]) -> None:
+    ids = [int(item) for item in material_ids]
+    if not ids or not is_available(connection):
+        return
+    connection.execute(delete(materials_fts).where(materials_fts.c.rowid.in_(ids)))
+
+
+def rebuild(connection: Connection, *, batch_size: int = 200) -> int:
+    """Re-index every material; used after restores or legacy bootstraps."""
+    if not is_available(connection):
+        return 0
+    connection.execute(delete(materials_fts))
+    rows = connection.execute(
+        Material.__table__.select()
+        .with_only_columns(Material.__table__.c.id, Material.__table__.c.title, Material.__table__.c.keywords, Material.__table__.c.content_text)
+        .order_by(Material.__table__.c.id.asc())
+    )
+    total = 0
+    while True:
+        batch = rows.fetchmany(batch_size)
+        if not batch:
+            break
+        connection.execute(
+            insert(materials_fts),
+            [{"rowid": row.id, **index_values(row.title, row.keywords, row.content_text)} for row in batch],
+        )
+        total += len(batch)
+    return total
+
+
+def segment_backfilled(connection: Connection, *, batch_size: int = 200) -> int:
+    """Re-index the rows the FTS migration copied in unsegmented (``terms`` NULL); SQL cannot run jieba."""
+    if not is_available(connection):
+        return 0
+    pending = [rowid for (rowid,) in connection.execute(select(materials_fts.c.rowid).where(materials_fts.c.terms.is_(None)))]
+    table = Material.__table__
+    for start in range(0, len(pending), batch_size):
+        rows = connection.execute(
+            select(table.c.id, table.c.title, table.c.keywords, table.c.content_text).where(
+                table.c.id.in_(pending[start : start + batch_size])
+            )
+        ).all()
+        for row in rows:
+            upsert(connection, row.id, index_values(row.title, row.keywords, row.content_text))
+    return len(pending)
+
+
+def match_clause(expression: str) -> ColumnElement[bool]:
+    return literal_column(MATERIALS_FTS_TABLE).op("MATCH")(bindparam("fts_match", expression))
+
+
+def rank_column() -> ColumnElement[float]:
+    return func.bm25(literal_column(MATERIALS_FTS_TABLE), *BM25_WEIGHTS)
+
+
+def snippet_column() -> ColumnElement[str]:
+    # Column 2 is the segmented content_text.
+    return func.snippet(literal_column(MATERIALS_FTS_TABLE), 2, SNIPPET_OPEN, SNIPPET_CLOSE, "…", SNIPPET_TOKENS)
+
+
+def render_snippet(raw: str | None) -> str | None:
+    """HTML-escaped snippet with matches wrapped in ``<mark>``."""
+    if not raw:
+        return None
+    text = html.escape(raw.replace(TOKEN_SEPARATOR, ""))
+    return text.replace(SNIPPET_OPEN, "<mark>").replace(SNIPPET_CLOSE, "</mark>")
+
+
+@event.listens_for(Material, "after_insert")
+def _index_on_insert(_mapper, connection, target: Material) -> None:
+    upsert(connection, target.id, _values_for(target))
+
+
+@event.listens_for(Material, "after_update")
+def _index_on_update(_mapper, connection, target: Material) -> None:
+    if any(attributes.get_history(target, name).has_changes() for name in _INDEXED_COLUMNS):
+        upsert(connection, target.id, index_values(target.title, target.keywords, target.content_text))
+
+
+@event.listens_for(Material, "after_delete")
+def _index_on_delete(_mapper, connection, target: Material) -> None:
+    remove(connection, [target.id])
@@ -6,20 +6,38 @@ import shutil
 import subprocess
 import uuid
 from pathlib import Path
+from typing import BinaryIO
 
 import jieba
 import jieba.analyse
 from PyPDF2 import PdfReader
 from docx import Document as DocxDocument
-from sqlalchemy.orm import Session
+from sqlalchemy import update
+from sqlalchemy.orm import Session, load_only
 
 from app.config import get_settings
 from app.errors import FileValidationError, logger
 from app.models.material import Material
+from app.services import material_search_index
+from app.services.material_search_index import match_clause, materials_fts, rank_column, snippet_column
+from app.services.upload_storage import StoredUpload, store_stream
 
 settings = get_settings()
 
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+# Bump when extract_text output changes, so cached extractions are not reused.
+EXTRACTOR_VERSION = 1
+
+# Columns a material list row needs; content_text and metadata stay in the database.
+MATERIAL_LIST_COLUMNS = (
+    Material.id,
+    Material.title,
+    Material.doc_type,
+    Material.summary,
+    Material.keywords,
+    Material.char_count,
+    Material.created_at,
+)
 
 
 class MaterialService:
@@ -28,20 +46,21 @@ class MaterialService:
     def __init__(self, db: Session):
         self.db = db
 
-    def save_upload(self, file_bytes: bytes, filename: str, user_id: int) -> str:
-        if len(file_bytes) > MAX_FILE_SIZE:
-            raise FileValidationError(f"文件大小超过限制（最大 {MAX_FILE_SIZE // 1024 // 1024}MB）")
+    def save_upload(self, source: BinaryIO, filename: str, user_id: int) -> StoredUpload:
         ext = Path(filename).suffix.lower()
         if ext not in {".doc", ".docx", ".pdf", ".txt"}:
             raise FileValidationError(f"不支持的文件格式: {ext}")
 
-        unique_name = f"{uuid.uuid4().hex}{ext}"
         upload_dir = Path(settings.upload_dir)
-        upload_dir.mkdir(parents=True, exist_ok=True)
-        file_path = upload_dir / unique_name
-        file_path.write_bytes(file_bytes)
-        logger.info("File saved: %s (%d bytes) user_id=%s", file_path, len(file_bytes), user_id)
-        return str(file_path)
+        stored = store_stream(
+            source,
+            upload_dir,
+            max_size=MAX_FILE_SIZE,
+            too_large_message=f"文件大小超过限制（最大 {MAX_FILE_SIZE // 1024 // 1024}MB）",
+            destination=lambda: upload_dir / f"{uuid.uuid4().hex}{ext}",
+        )
+        logger.info("File saved: %s (%d bytes) user_id=%s", stored.path, stored.size, user_id)
+        return stored
 
     def extract_text(self, file_path: str, filename: str) -> str:
         ext = Path(filename).suffix.lower()
@@ -148,6 +167,8 @@ class MaterialService:
         keywords: list[str] | None = None,
         account_id: int = 1,
         *,
+        content_hash: str | None = None,
+        search_index_values: dict[str, str] | None = None,
         commit: bool = True,
     ) -> Material:
         material = Material(
@@ -156,12 +177,15 @@ class MaterialService:
             title=title,
             original_filename=filename,
             file_path=file_path,
+            content_hash=content_hash,
             content_text=content_text,
             doc_type=doc_type,
             summary=summary,
             keywords=keywords or [],
             char_count=self.calculate_char_count(content_text),
         )
+        if search_index_values is not None:
+            material_search_index.attach_values(material, search_index_values)
         self.db.add(material)
         self.db.flush()
         if commit:
@@ -176,22 +200,36 @@ class MaterialService:
         normalized = re.sub(r"[\s\u00a0\u3000\u200b-\u200f\u2060\u2066-\u2069\ufeff]+", "", normalized)
         return len(normalized)
 
-    def normalize_material_char_count(self, material: Material) -> int:
-        expected = self.calculate_char_count(material.content_text or "")
-        if material.char_count != expected:
-            material.char_count = expected
-        return expected
-
-    def normalize_materials_char_count(self, materials: list[Material], *, commit: bool = False) -> bool:
-        changed = False
-        for material in materials:
-            expected = self.calculate_char_count(material.content_text or "")
-            if material.char_count != expected:
-                material.char_count = expected
-                changed = True
-        if changed and commit:
-            self.db.commit()
-        return changed
+    def backfill_char_counts(self, *, batch_size: int = 500, execute: bool = True) -> dict[str, int]:
+        """Recompute ``char_count`` for rows written before it was stored at ingest.
+
+        Walks the table by primary key so only one batch of ``content_text`` is in memory.
+        """
+        scanned = 0
+        updated = 0
+        last_id = 0
+        while True:
+            rows = (
+                self.db.query(Material.id, Material.char_count, Material.content_text)
+                .filter(Material.id > last_id)
+                .order_by(Material.id.asc())
+                .limit(batch_size)
+                .all()
+            )
+            if not rows:
+                break
+            last_id = rows[-1].id
+            scanned += len(rows)
+            changes = [
+                {"id": row.id, "char_count": expected}
+                for row in rows
+                if row.char_count != (expected := self.calculate_char_count(row.content_text or ""))
+            ]
+            updated += len(changes)
+            if changes and execute:
+                self.db.execute(update(Material), changes)
+                self.db.commit()
+        return {"scanned": scanned, "updated": updated}
 
     def get_materials(
         self,
@@ -202,8 +240,37 @@ class MaterialService:
         skip: int = 0,
         limit: int = 20,
     ) -> list[Material]:
+        hits = self.get_material_hits(
+            user_id=user_id, account_id=account_id, doc_type=doc_type, keyword=keyword, skip=skip, limit=limit
+        )
+        return [material for material, _snippet in hits]
+
+    def get_material_hits(
+        self,
+        user_id: int,
+        account_id: int,
+        doc_type: str | None = None,
+        keyword: str | None = None,
+        skip: int = 0,
+        limit: int = 20,
+    ) -> list[tuple[Material, str | None]]:
+        """Page of materials with a highlighted snippet; keyword matches are ranked by bm25.
+
+        Only ``MATERIAL_LIST_COLUMNS`` are loaded; touching any other attribute raises.
+        """
         q = self._build_query(user_id=user_id, account_id=account_id, doc_type=doc_type, keyword=keyword)
-        return q.order_by(Material.created_at.desc()).offset(skip).limit(limit).all()
+        q = q.options(load_only(*MATERIAL_LIST_COLUMNS, raiseload=True))
+        if self._search_expression(keyword) is None:
+            rows = q.order_by(Material.created_at.desc()).offset(skip).limit(limit).all()
+            return [(material, None) for material in rows]
+        rows = (
+            q.add_columns(snippet_column())
+            .order_by(rank_column(), Material.created_at.desc())
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
+        return [(material, material_search_index.render_snippet(snippet)) for material, snippet in rows]
 
     def count_materials(
         self,
@@ -224,6 +291,32 @@ class MaterialService:
             .first()
         )
 
+    def find_by_content_hash(self, content_hash: str, *, account_id: int, user_id: int) -> Material | None:
+        """Material in the account with the same file content, preferring the user's own."""
+        return (
+            self.db.query(Material)
+            .filter(
+                Material.content_hash == content_hash,
+                Material.account_id == account_id,
+            )
+            .order_by((Material.user_id == user_id).desc(), Material.id.asc())
+            .first()
+        )
+
+    def _file_shared(self, material: Material) -> bool:
+        if not material.content_hash or not material.file_path:
+            return False
+        other = (
+            self.db.query(Material.id)
+            .filter(
+                Material.content_hash == material.content_hash,
+                Material.file_path == material.file_path,
+                Material.id != material.id,
+            )
+            .first()
+        )
+        return other is not None
+
     @staticmethod
     def cleanup_material_file(file_path: str | None) -> None:
         if file_path and os.path.exists(file_path):
@@ -233,7 +326,8 @@ class MaterialService:
         material = self.get_material(material_id, account_id=account_id)
         if not material:
             return None
-        file_path = material.file_path or None
+        # Duplicate uploads point at one stored file; it goes with the last material using it.
+        file_path = None if self._file_shared(material) else (material.file_path or None)
         self.db.delete(material)
         self.db.flush()
         if commit:
@@ -255,5 +349,20 @@ class MaterialService:
         if doc_type:
             q = q.filter(Material.doc_type == doc_type)
         if keyword:
-            q = q.filter(Material.content_text.contains(keyword))
+            expression = self._search_expression(keyword)
+            if expression is None:
+                q = q.filter(Material.content_text.contains(keyword))
+            else:
+                q = q.join(materials_fts, materials_fts.c.rowid == Material.id).filter(match_clause(expression))
         return q
+
+    def _search_expression(self, keyword: str | None) -> str | None:
+        """FTS5 query for ``keyword``, or None to fall back to a substring scan."""
+        if not keyword or not material_search_index.is_available(self.db.connection()):
+            return None
+        return material_search_index.match_expression(keyword)
+
+
+def extract_material_text(file_path: str, filename: str) -> str:
+    """``MaterialService.extract_text`` without a session, for the extraction process pool."""
+    return MaterialService(None).extract_text(file_path, filename)
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import re
+
+try:
+    import numpy as np
+except Exception:  # pragma: no cover - numpy is optional; the pure-Python path gives the same fingerprints
+    np = None
+
+FINGERPRINT_BITS = 64
+MASK = (1 << FINGERPRINT_BITS) - 1
+SHINGLE_CHARS = 3
+GOLDEN_GAMMA = 0x9E3779B97F4A7C15
+MIX_1 = 0xBF58476D1CE4E5B9
+MIX_2 = 0x94D049BB133111EB
+# Below this many characters (after normalising) a few changed characters flip too many bits,
+# so short texts only count as duplicates when their fingerprints are identical.
+MIN_NEAR_DUPLICATE_CHARS = 40
+NOISE = re.compile(r"[\s\W_]+")
+
+
+def normalize(text: str) -> str:
+    """Text with whitespace and punctuation removed; digits stay."""
+    return NOISE.sub("", text).lower()
+
+
+def _mix(value: int) -> int:
+    # splitmix64 finaliser: spreads a shingle's packed code points over all 64 bits.
+    value = (value + GOLDEN_GAMMA) & MASK
+    value = ((value ^ (value >> 30)) * MIX_1) & MASK
+    value = ((value ^ (value >> 27)) * MIX_2) & MASK
+    return value ^ (value >> 31)
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash over the character 3-grams of ``normalize(text)``.
+
+    Texts that share most of their 3-grams get fingerprints a few bits apart,
+    so a running header, a re-typeset page or a reprinted preface lands within
+    a small Hamming distance of the original. Each 3-gram is its three code
+    points packed into one integer and mixed, which numpy does for a whole
+    chunk at once; the pure-Python path gives the same fingerprint.
+    """
+    return fingerprint(normalize(text))
+
+
+def fingerprint(normalized: str) -> int:
+    """``simhash`` of text that has already been through ``normalize``."""
+    if not normalized:
+        return 0
+    normalized = normalized.ljust(SHINGLE_CHARS, "\0")
+    if np is not None:
+        codes = np.frombuffer(normalized.encode("utf-32-le"), dtype="<u4").astype(np.uint64)
+        keys = (codes[:-2] << np.uint64(42)) | (codes[1:-1] << np.uint64(21)) | codes[2:]
+        with np.errstate(over="ignore"):
+            keys = keys + np.uint64(GOLDEN_GAMMA)
+            keys = (keys ^ (keys >> np.uint64(30))) * np.uint64(MIX_1)
+            keys = (keys ^ (keys >> np.uint64(27))) * np.uint64(MIX_2)
+        hashes = keys ^ (keys >> np.uint64(31))
+        bits = np.unpackbits(hashes.astype("<u8").view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+        votes = bits.sum(axis=0, dtype=np.int64) * 2 > len(hashes)
+        return sum(1 << bit for bit in np.flatnonzero(votes).tolist())
+    codes = [ord(char) for char in normalized]
+    hashes = [_mix((codes[i] << 42) | (codes[i + 1] << 21) | codes[i + 2]) for i in range(len(codes) - SHINGLE_CHARS + 1)]
+    counts = [0] * FINGERPRINT_BITS
+    for value in hashes:
+        for bit in range(FINGERPRINT_BITS):
+            counts[bit] += (value >> bit) & 1
+    return sum(1 << bit for bit, count in enumerate(counts) if count * 2 > len(hashes))
+
+
+class SimHashIndex:
+    """Finds stored fingerprints within ``max_distance`` bits of a query without scanning them all.
+
+    The 64 bits are cut into ``max_distance + 1`` bands; two fingerprints that
+    differ in at most ``max_distance`` bits agree on at least one whole band, so
+    only fingerprints sharing a band value with the query are compared.
+    """
+
+    def __init__(self, max_distance: int) -> None:
+        self.max_distance = max(0, min(int(max_distance), FINGERPRINT_BITS // 4))
+        bands = self.max_distance + 1
+        width = -(-FINGERPRINT_BITS // bands)
+        self._bands = [(start, (1 << min(width, FINGERPRINT_BITS - start)) - 1) for start in range(0, FINGERPRINT_BITS, width)]
+        self._buckets: list[dict[int, list[tuple[int, str]]]] = [{} for _ in self._bands]
+        self.size = 0
+
+    def add(self, value: int, tag: str = "") -> None:
+        for (shift, mask), buckets in zip(self._bands, self._buckets):
+            buckets.setdefault((value >> shift) & mask, []).append((value, tag))
+        self.size += 1
+
+    def find(self, value: int, *, max_distance: int | None = None, exclude_tag: str | None = None) -> bool:
+        limit = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        for (shift, mask), buckets in zip(self._bands, self._buckets):
+            for candidate, tag in buckets.get((value >> shift) & mask, ()):
+                if tag != exclude_tag and (candidate ^ value).bit_count() <= limit:
+                    return True
+        return False
+
+
+class NearDuplicateFilter:
+    """Drops chunks of one book that nearly repeat a chunk kept before, in this book or in ``shared``.
+
+    ``shared`` holds the fingerprints of the account's other books, tagged by
+    source hash; the book's own earlier imports are skipped so a re-import or a
+    resume keeps its chunks. A kept chunk's fingerprint only goes into
+    ``shared`` and ``kept`` once ``sent`` reports it reached OpenViking, so
+    books imported side by side in one task dedupe against each other without
+    dropping text whose only copy failed to send.
+    """
+
+    def __init__(self, max_distance: int, *, shared: SimHashIndex | None = None, source: str = "") -> None:
+        self.local = SimHashIndex(max_distance)
+        self.shared = shared
+        self.source = source
+        self.kept: list[int] = []
+        self.dropped = 0
+        # Chunk text -> fingerprint for kept chunks not yet reported by ``sent``.
+        self._unsent: dict[str, int] = {}
+
+    def is_duplicate(self, text: str) -> bool:
+        original = text
+        if text.startswith("["):
+            # A chunk's "[chapter]" line differs between copies of the same text.
+            _, _, text = text.partition("\n")
+        normalized = normalize(text)
+        value = fingerprint(normalized)
+        max_distance = None if len(normalized) >= MIN_NEAR_DUPLICATE_CHARS else 0
+        if self.local.find(value, max_distance=max_distance) or (
+            self.shared is not None and self.shared.find(value, max_distance=max_distance, exclude_tag=self.source)
+        ):
+            self.dropped += 1
+            return True
+        self.local.add(value)
+        self._unsent[original] = value
+        return False
+
+    def sent(self, text: str, ok: bool = True) -> None:
+        """Report the fate of a chunk ``is_duplicate`` kept; only a chunk that reached OpenViking is shared."""
+        value = self._unsent.pop(text, None)
+        if value is None or not ok:
+            return
+        if self.shared is not None:
+            self.shared.add(value, self.source)
+        self.kept.append(value)
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+from app.config import get_settings
+from app.errors import logger
+
+settings = get_settings()
+
+PAGE_SUFFIX = '.json'
+
+
+@dataclass(slots=True)
+class OcrPage:
+    text: str
+    blank: bool = False
+    # Mean word confidence (0-100) and the resolution/language of the pass that produced ``text``.
+    confidence: float = -1.0
+    dpi: int = 0
+    lang: str = ''
+
+
+@dataclass(slots=True)
+class PageEntry:
+    path: Path
+    size: int
+    last_used: float
+
+
+class OcrPageCache:
+    """On-disk OCR output per page, keyed by (file sha256, page number, OCR signature).
+
+    The signature holds everything besides the page pixels that shapes the text
+    (DPI, language, adaptive thresholds, preprocessing version). Pages are stored
+    as they finish, so an import that is interrupted or retried, or a PDF whose
+    document-level extraction entry was invalidated, only OCRs the pages it has
+    not seen yet.
+    Files are written to a temporary name and renamed into place; a hit refreshes
+    the file's mtime, and eviction removes the least recently used pages once the
+    directory grows past ``max_bytes``.
+    """
+
+    def __init__(self, root: str | Path, *, max_bytes: int, enabled: bool = True) -> None:
+        self.root = Path(root)
+        self.max_bytes = max(0, int(max_bytes))
+        self.enabled = bool(enabled)
+        self._evict_lock = threading.Lock()
+
+    def directory_for(self, sha256: str, signature: dict[str, Any]) -> Path:
+        digest = hashlib.sha256(json.dumps(signature, sort_keys=True).encode('utf-8')).hexdigest()
+        return self.root / sha256[:2] / f'{sha256}-{digest[:16]}'
+
+    def get_many(self, sha256: str, pages: list[int], signature: dict[str, Any]) -> dict[int, OcrPage]:
+        if not self.enabled or not sha256:
+            return {}
+        directory = self.directory_for(sha256, signature)
+        if not directory.is_dir():
+            return {}
+        found: dict[int, OcrPage] = {}
+        for page_no in pages:
+            path = directory / f'{page_no}{PAGE_SUFFIX}'
+            try:
+                payload = json.loads(path.read_text(encoding='utf-8'))
+            except FileNotFoundError:
+                continue
+            except (OSError, ValueError) as exc:
+                logger.warning('Dropping unreadable OCR page cache entry %s: %s', path, exc)
+                path.unlink(missing_ok=True)
+                continue
+            if payload.get('signature') != signature:
+                path.unlink(missing_ok=True)
+                continue
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            found[page_no] = OcrPage(
+                text=str(payload.get('text', '')),
+                blank=bool(payload.get('blank', False)),
+                confidence=float(payload.get('confidence', -1.0)),
+                dpi=int(payload.get('dpi', 0)),
+                lang=str(payload.get('lang', '')),
+            )
+        return found
+
+    def put(self, sha256: str, page_no: int, signature: dict[str, Any], page: OcrPage) -> None:
+        if not self.enabled or not sha256:
+            return
+        directory = self.directory_for(sha256, signature)
+        payload = {'signature': signature, 'page': page_no, **asdict(page)}
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            fd, temp_name = tempfile.mkstemp(dir=directory, prefix='.page-', suffix='.part')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as handle:
+                    json.dump(payload, handle, ensure_ascii=False)
+                os.replace(temp_name, directory / f'{page_no}{PAGE_SUFFIX}')
+            except BaseException:
+                Path(temp_name).unlink(missing_ok=True)
+                raise
+        except OSError as exc:
+            # The cache is an optimisation; a full disk must not fail the OCR run.
+            logger.warning('OCR page cache write failed for %s page %s: %s', sha256[:12], page_no, exc)
+
+    def entries(self) -> list[PageEntry]:
+        found: list[PageEntry] = []
+        for path in self.root.glob(f'*/*/*{PAGE_SUFFIX}'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            found.append(PageEntry(path=path, size=stat.st_size, last_used=stat.st_mtime))
+        return found
+
+    def prune(
+        self,
+        *,
+        max_bytes: int | None = None,
+        older_than_seconds: float | None = None,
+        execute: bool = True,
+    ) -> dict[str, int]:
+        """Remove pages unused for ``older_than_seconds``, then the least recently used ones until under ``max_bytes``."""
+        entries = sorted(self.entries(), key=lambda entry: entry.last_used)
+        cutoff = time.time() - older_than_seconds if older_than_seconds is not None else None
+        keep = [entry for entry in entries if cutoff is None or entry.last_used >= cutoff]
+        doomed = [entry for entry in entries if cutoff is not None and entry.last_used < cutoff]
+        remaining = sum(entry.size for entry in keep)
+        limit = self.max_bytes if max_bytes is None else max(0, int(max_bytes))
+        while keep and remaining > limit:
+            entry = keep.pop(0)
+            remaining -= entry.size
+            doomed.append(entry)
+        if execute:
+            for entry in doomed:
+                entry.path.unlink(missing_ok=True)
+                try:
+                    entry.path.parent.rmdir()
+                except OSError:
+                    pass  # other pages of the document are still cached
+        return {
+            'scanned': len(entries),
+            'removed': len(doomed),
+            'freed_bytes': sum(entry.size for entry in doomed),
+            'remaining_bytes': remaining,
+        }
+
+    def evict(self) -> None:
+        if not self._evict_lock.acquire(blocking=False):
+            return
+        try:
+            result = self.prune()
+        finally:
+            self._evict_lock.release()
+        if result['removed']:
+            logger.info('OCR page cache evicted %s pages (%s bytes)', result['removed'], result['freed_bytes'])
+
+    def clear(self) -> None:
+        self.prune(max_bytes=0)
+
+
+ocr_page_cache = OcrPageCache(
+    Path(settings.extraction_cache_dir) / 'ocr-pages',
+    max_bytes=settings.ocr_page_cache_max_mb * 1024 * 1024,
+    enabled=settings.extraction_cache_enabled,
+)
@@ -1,10 +1,24 @@
 from __future__ import annotations
 
+import multiprocessing
+import os
+import re
+import tempfile
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Callable, Iterable, Iterator
 
 try:
-    from PIL import ImageEnhance, ImageFilter
+    import numpy as np
 except Exception:  # pragma: no cover
+    np = None
+
+try:
+    from PIL import Image, ImageEnhance, ImageFilter
+except Exception:  # pragma: no cover
+    Image = None
     ImageEnhance = None
     ImageFilter = None
 
@@ -16,15 +30,46 @@ except Exception:  # pragma: no cover
     convert_from_path = None
 
 try:
-    from pytesseract import image_to_string
+    from pytesseract import image_to_data
 except Exception:  # pragma: no cover
-    image_to_string = None
+    image_to_data = None
 
 from app.config import get_settings
 from app.errors import FileValidationError, logger
+from app.services.book_fingerprint_index import sha256_file
+from app.services.ocr_page_cache import OcrPage, ocr_page_cache
 
 settings = get_settings()
 OCR_BATCH_PAGES = 8
+# parse_pdf reads at most this many batches of pages ahead of the first page still being OCRed.
+OCR_LOOKAHEAD_BATCHES = 3
+# Pages with less text-layer text than this, or a lower share of plausible characters, are OCRed.
+OCR_MIN_PAGE_CHARS = 20
+OCR_MIN_TEXT_QUALITY = 0.6
+PLAUSIBLE_PUNCTUATION = frozenset("，。、；：？！“”‘’（）《》【】—…·％,.;:?!\"'()[]<>{}-_/\\%&*+=#@|~`$^")
+# A rendered page is blank when its grey levels barely vary, or when almost no pixels
+# differ from the background (most common grey level) by more than the ink contrast.
+OCR_BLANK_MAX_STD = 3.0
+OCR_BLANK_INK_CONTRAST = 64
+OCR_BLANK_MAX_INK_RATIO = 0.0005
+# A first pass with no Latin word in it re-reads the page in the first configured language only.
+LATIN_WORD = re.compile(r"[A-Za-z]{2,}")
+# Bump when preprocessing, text normalisation or the blank check change, so cached OCR pages are not reused.
+OCR_PREPROCESS_VERSION = 2
+# Bump when parse_pdf output changes, so cached extractions are not reused.
+EXTRACTOR_VERSION = 5
+
+
+@dataclass(slots=True)
+class OcrPlan:
+    """How the pages of one PDF are OCRed; sent to the OCR workers with every page."""
+
+    file_path: str
+    lang: str
+    dpi: int
+    # Adaptive mode: pages read below ``min_confidence`` at ``dpi`` are read again at ``retry_dpi`` (0 = one pass).
+    retry_dpi: int = 0
+    min_confidence: float = 0.0
 
 
 class PdfOcrService:
@@ -39,6 +84,20 @@ class PdfOcrService:
         denoised = enhanced.filter(ImageFilter.MedianFilter(size=3))
         return denoised.filter(ImageFilter.SHARPEN)
 
+    @staticmethod
+    def _is_blank_page(image) -> bool:
+        """Cheap histogram check on the rendered page, so separator and empty scan pages skip tesseract."""
+        if np is None:
+            return False
+        pixels = np.asarray(image.convert("L"))
+        if pixels.size == 0 or float(pixels.std()) < OCR_BLANK_MAX_STD:
+            return True
+        histogram = np.bincount(pixels.ravel(), minlength=256)
+        background = int(histogram.argmax())
+        ink = int(histogram[: max(background - OCR_BLANK_INK_CONTRAST, 0)].sum())
+        ink += int(histogram[background + OCR_BLANK_INK_CONTRAST + 1 :].sum())
+        return ink / pixels.size < OCR_BLANK_MAX_INK_RATIO
+
     @staticmethod
     def _normalize_page_text(text: str) -> str:
         if not text:
@@ -46,153 +105,522 @@ class PdfOcrService:
         lines = [line.strip() for line in text.splitlines() if line.strip()]
         return "\n".join(lines).strip()
 
-    def _extract_text_layer(self, file_path: str) -> dict[str, object]:
+    @staticmethod
+    def _text_quality(text: str) -> float:
+        """Share of characters that are CJK, ASCII letters/digits, common punctuation or whitespace."""
+        if not text:
+            return 0.0
+        plausible = sum(
+            1
+            for char in text
+            if char.isspace()
+            or ("0" <= char <= "9")
+            or ("a" <= char.lower() <= "z")
+            or ("\u4e00" <= char <= "\u9fff")
+            or char in PLAUSIBLE_PUNCTUATION
+        )
+        return plausible / len(text)
+
+    def _page_needs_ocr(self, text: str) -> bool:
+        # Empty or near-empty pages are usually scans; low-quality text is a broken font encoding.
+        return len(text) < OCR_MIN_PAGE_CHARS or self._text_quality(text) < OCR_MIN_TEXT_QUALITY
+
+    def _page_text(self, page) -> str:
+        text = ""
         try:
-            reader = PdfReader(file_path)
+            text = page.extract_text() or ""
         except Exception as e:
-            raise FileValidationError("PDF 文件损坏或已加密") from e
+            logger.warning("PDF text extraction warning: %s", e)
+        return self._normalize_page_text(text)
 
-        page_texts: list[str] = []
-        non_empty_pages = 0
-
-        for page in reader.pages:
-            text = ""
-            try:
-                text = page.extract_text() or ""
-            except Exception as e:
-                logger.warning("PDF text extraction warning: %s", e)
-            clean = self._normalize_page_text(text)
-            if clean:
-                non_empty_pages += 1
-            page_texts.append(clean)
-
-        total_pages = len(page_texts)
-        total_chars = sum(len(page_text) for page_text in page_texts)
-        non_empty_ratio = (non_empty_pages / total_pages) if total_pages else 0.0
-
-        chapters = [
-            {
-                "chapter_title": f"Page {idx + 1}",
-                "text": page_text,
-                "page_start": idx + 1,
-                "page_end": idx + 1,
-            }
-            for idx, page_text in enumerate(page_texts)
-            if page_text
-        ]
+    @staticmethod
+    def _ocr_workers() -> int:
+        configured = int(settings.pdf_ocr_workers)
+        return max(1, configured if configured > 0 else (os.cpu_count() or 1))
 
-        return {
-            "chapters": chapters,
-            "total_pages": total_pages,
-            "total_chars": total_chars,
-            "non_empty_pages": non_empty_pages,
-            "non_empty_ratio": non_empty_ratio,
-        }
+    @staticmethod
+    def _ocr_plan(file_path: str) -> OcrPlan:
+        lang = settings.pdf_ocr_lang or "chi_sim+eng"
+        dpi = int(settings.pdf_ocr_dpi)
+        fast_dpi = int(settings.pdf_ocr_fast_dpi)
+        if settings.pdf_ocr_adaptive and 0 < fast_dpi < dpi:
+            return OcrPlan(
+                file_path=file_path,
+                lang=lang,
+                dpi=fast_dpi,
+                retry_dpi=dpi,
+                min_confidence=float(settings.pdf_ocr_min_confidence),
+            )
+        return OcrPlan(file_path=file_path, lang=lang, dpi=dpi)
+
+    def _extract_ocr(self, file_path: str, pages: list[int], sha256: str = "") -> dict[str, object]:
+        """OCR the given 1-based page numbers; returns their texts keyed by page number.
 
-    def _extract_ocr(self, file_path: str, total_pages: int) -> dict[str, object]:
+        Pages already in the OCR page cache for this file hash are not rendered
+        again, and blank pages are recorded without running tesseract.
+        """
         if not settings.pdf_ocr_enabled:
-            return {
-                "chapters": [],
-                "ocr_pages": 0,
-                "ocr_used": False,
-                "warning": "ocr_disabled",
-            }
-        if convert_from_path is None or image_to_string is None:
-            raise FileValidationError("OCR dependency missing: pdf2image + pytesseract + poppler + tesseract")
-
-        ocr_pages_limit = min(max(total_pages, 0), max(int(settings.pdf_ocr_max_pages), 0))
-        if ocr_pages_limit <= 0:
-            return {
-                "chapters": [],
-                "ocr_pages": 0,
-                "ocr_used": False,
-                "warning": "ocr_pages_limit_zero",
-            }
-
-        chapters: list[dict[str, object]] = []
-        ocr_pages = 0
-        batch_size = max(1, OCR_BATCH_PAGES)
-
-        for start_page in range(1, ocr_pages_limit + 1, batch_size):
-            end_page = min(start_page + batch_size - 1, ocr_pages_limit)
-            images = []
-            try:
-                images = convert_from_path(
-                    file_path,
-                    dpi=int(settings.pdf_ocr_dpi),
-                    first_page=start_page,
-                    last_page=end_page,
-                )
-            except Exception as e:
-                logger.warning("PDF OCR batch conversion failed: pages=%s-%s err=%s", start_page, end_page, e)
-                continue
-
-            try:
-                for offset, image in enumerate(images):
-                    page_no = start_page + offset
-                    try:
-                        processed = self._preprocess_image(image)
-                        text = image_to_string(processed, lang=settings.pdf_ocr_lang or "chi_sim+eng")
-                        clean = self._normalize_page_text(text)
-                    except Exception as e:
-                        logger.warning("PDF OCR warning: page=%s err=%s", page_no, e)
-                        continue
-
-                    ocr_pages += 1
-                    if not clean:
-                        continue
-                    chapters.append(
-                        {
-                            "chapter_title": f"Page {page_no}",
-                            "text": clean,
-                            "page_start": page_no,
-                            "page_end": page_no,
-                        },
-                    )
-            finally:
-                for image in images:
-                    try:
-                        image.close()
-                    except Exception:
-                        pass
+            return _empty_ocr_result("ocr_disabled")
+        _require_ocr_dependencies()
+
+        pages = sorted(set(pages))[: max(int(settings.pdf_ocr_max_pages), 0)]
+        if not pages:
+            return _empty_ocr_result("ocr_pages_limit_zero")
+
+        session = _OcrSession(file_path, sha256)
+        finished = False
+        try:
+            session.submit(pages)
+            session.collect(keep=0)
+            finished = True
+        finally:
+            session.close(finished=finished)
 
         return {
-            "chapters": chapters,
-            "ocr_pages": ocr_pages,
+            "texts": {page_no: page.text for page_no, page in session.done.items() if page is not None},
+            **session.stats(),
             "ocr_used": True,
             "warning": "",
         }
 
-    def parse_pdf(self, file_path: str) -> dict[str, object]:
+    def parse_pdf(
+        self,
+        file_path: str,
+        sha256: str = "",
+        stats: dict[str, object] | None = None,
+    ) -> Iterator[dict[str, object]]:
+        """Yield one chapter per page with text, in page order; ``stats`` is filled once the last page is out.
+
+        Each page is taken from its text layer when that looks usable, and the other
+        pages are OCRed in runs of consecutive pages while reading goes on. A page only
+        waits for the OCR of the pages before it, and reading stops to wait once
+        ``OCR_LOOKAHEAD_BATCHES`` batches of pages are held back, so memory stays
+        bounded by that window however long the PDF is.
+        """
         path = Path(file_path)
         if not path.exists():
             raise FileValidationError("PDF 文件不存在")
+        try:
+            reader = PdfReader(file_path)
+        except Exception as e:
+            raise FileValidationError("PDF 文件损坏或已加密") from e
+
+        ocr_budget = max(int(settings.pdf_ocr_max_pages), 0) if settings.pdf_ocr_enabled else 0
+        lookahead = OCR_LOOKAHEAD_BATCHES * max(OCR_BATCH_PAGES, self._ocr_workers())
+        session: _OcrSession | None = None
+        # OCR pages not yet submitted, and pages read but not yet yielded: (page_no, layer text, OCR it).
+        run: list[int] = []
+        held: deque[tuple[int, str, bool]] = deque()
+        page_sources: dict[str, list[int]] = {"text_layer": [], "ocr": [], "empty": []}
+        total_pages = non_empty_pages = total_chars = ocr_candidates = 0
+        finished = False
 
-        text_layer = self._extract_text_layer(file_path)
-        total_chars = int(text_layer["total_chars"])
-        non_empty_ratio = float(text_layer["non_empty_ratio"])
-        total_pages = int(text_layer["total_pages"])
-
-        should_ocr = total_chars < 200 or non_empty_ratio < 0.3
-        if should_ocr and settings.pdf_ocr_enabled:
-            ocr_result = self._extract_ocr(file_path, total_pages=total_pages)
-            chapters = ocr_result.get("chapters", []) or []
-            if chapters:
-                return {
-                    "chapters": chapters,
-                    "ocr_used": bool(ocr_result.get("ocr_used", False)),
-                    "ocr_pages": int(ocr_result.get("ocr_pages", 0)),
-                    "total_pages": total_pages,
-                    "text_layer_chars": total_chars,
-                    "non_empty_ratio": non_empty_ratio,
-                }
-            logger.warning("OCR produced no content, fallback to text-layer output")
+        try:
+            for page_no, page in enumerate(reader.pages, start=1):
+                layer_text = self._page_text(page)
+                total_pages += 1
+                total_chars += len(layer_text)
+                non_empty_pages += bool(layer_text)
+                use_ocr = False
+                if self._page_needs_ocr(layer_text):
+                    ocr_candidates += 1
+                    use_ocr = ocr_candidates <= ocr_budget
+                if use_ocr:
+                    if session is None:
+                        session = _OcrSession(file_path, sha256)
+                    if run and (page_no != run[-1] + 1 or len(run) >= session.batch_size):
+                        session.submit(run)
+                        run = []
+                    run.append(page_no)
+                elif run:
+                    session.submit(run)
+                    run = []
+                held.append((page_no, layer_text, use_ocr))
+                while held and (len(held) > lookahead or _page_ready(session, held[0], run)):
+                    if held[0][0] in run:
+                        session.submit(run)
+                        run = []
+                    chapter = self._settle_page(session, *held.popleft(), page_sources)
+                    if chapter is not None:
+                        yield chapter
+            if run:
+                session.submit(run)
+            while held:
+                chapter = self._settle_page(session, *held.popleft(), page_sources)
+                if chapter is not None:
+                    yield chapter
+            finished = True
+        finally:
+            if session is not None:
+                session.close(finished=finished)
+
+        if stats is None:
+            return
+        ocr_stats = session.stats() if session is not None else {}
+        page_details: list[dict[str, object]] = ocr_stats.get("page_details", [])
+        stats.update(
+            {
+                "ocr_used": bool(page_sources["ocr"]),
+                "ocr_pages": int(ocr_stats.get("ocr_pages", 0)),
+                "ocr_cached_pages": int(ocr_stats.get("ocr_cached_pages", 0)),
+                "ocr_blank_pages": int(ocr_stats.get("ocr_blank_pages", 0)),
+                "ocr_retried_pages": int(ocr_stats.get("ocr_retried_pages", 0)),
+                "ocr_single_lang_pages": int(ocr_stats.get("ocr_single_lang_pages", 0)),
+                "ocr_mean_confidence": (
+                    round(sum(float(item["confidence"]) for item in page_details) / len(page_details), 1)
+                    if page_details
+                    else None
+                ),
+                "ocr_page_details": page_details,
+                "ocr_settings": ocr_stats.get("ocr_settings", {}),
+                "total_pages": total_pages,
+                "text_layer_chars": total_chars,
+                "non_empty_ratio": (non_empty_pages / total_pages) if total_pages else 0.0,
+                "ocr_candidate_pages": ocr_candidates,
+                "page_sources": {source: _format_page_ranges(numbers) for source, numbers in page_sources.items()},
+            },
+        )
 
+    @staticmethod
+    def _settle_page(
+        session: _OcrSession | None,
+        page_no: int,
+        layer_text: str,
+        use_ocr: bool,
+        page_sources: dict[str, list[int]],
+    ) -> dict[str, object] | None:
+        ocr_page = session.take(page_no) if use_ocr and session is not None else None
+        # A garbled text layer is still kept when OCR was skipped or found nothing.
+        if ocr_page is not None and ocr_page.text:
+            text, source = ocr_page.text, "ocr"
+        elif layer_text:
+            text, source = layer_text, "text_layer"
+        else:
+            text, source = "", "empty"
+        page_sources[source].append(page_no)
+        if not text:
+            return None
         return {
-            "chapters": text_layer["chapters"],
-            "ocr_used": False,
-            "ocr_pages": 0,
-            "total_pages": total_pages,
-            "text_layer_chars": total_chars,
-            "non_empty_ratio": non_empty_ratio,
-        }
+            "chapter_title": f"Page {page_no}",
+            "text": text,
+            "page_start": page_no,
+            "page_end": page_no,
+        }
+
+
+class _OcrSession:
+    """OCR of one PDF's pages, submitted a run of consecutive pages at a time.
+
+    Cached pages come from the OCR page cache; the others are rasterized and sent
+    to the OCR workers, and each result is cached as soon as it arrives. Results
+    wait in ``done`` until ``take`` hands them out, so a caller taking pages in
+    order only holds the pages still in flight.
+    """
+
+    def __init__(self, file_path: str, sha256: str = "") -> None:
+        _require_ocr_dependencies()
+        self.file_path = file_path
+        self.plan = PdfOcrService._ocr_plan(file_path)
+        self.signature = _ocr_page_signature(self.plan)
+        if not sha256 and ocr_page_cache.enabled:
+            sha256 = sha256_file(Path(file_path))
+        self.sha256 = sha256
+        self.workers = PdfOcrService._ocr_workers()
+        self.batch_size = max(OCR_BATCH_PAGES, self.workers)
+        # None for pages that are blank or failed.
+        self.done: dict[int, OcrPage | None] = {}
+        self.page_details: list[dict[str, object]] = []
+        self.cached_pages = 0
+        self.blank_pages = 0
+        self.retried_pages = 0
+        self.single_lang_pages = 0
+        self._pending: dict[Future[OcrPage], tuple[int, str]] = {}
+        self._executor: ProcessPoolExecutor | None = None
+        self._workdir: tempfile.TemporaryDirectory | None = None
+
+    def submit(self, pages: list[int]) -> None:
+        cached = ocr_page_cache.get_many(self.sha256, pages, self.signature)
+        self.cached_pages += len(cached)
+        for page_no, page in cached.items():
+            self._record(page_no, page)
+        for start_page, end_page in _page_batches([page_no for page_no in pages if page_no not in cached], self.batch_size):
+            # Rasterize the next batch while workers OCR the previous one; at most two batches sit on disk.
+            self.collect(keep=self.batch_size)
+            self._render(start_page, end_page)
+
+    def _render(self, start_page: int, end_page: int) -> None:
+        if self._workdir is None:
+            self._workdir = tempfile.TemporaryDirectory(prefix="pdf-ocr-")
+            if self.workers > 1:
+                self._executor = _start_ocr_pool(self.workers)
+        batch_dir = tempfile.mkdtemp(dir=self._workdir.name)
+        paths: list[str] = []
+        try:
+            paths = convert_from_path(
+                self.file_path,
+                dpi=self.plan.dpi,
+                first_page=start_page,
+                last_page=end_page,
+                output_folder=batch_dir,
+                fmt="ppm",
+                grayscale=True,
+                paths_only=True,
+                thread_count=min(self.workers, end_page - start_page + 1),
+            )
+        except Exception as e:
+            logger.warning("PDF OCR batch conversion failed: pages=%s-%s err=%s", start_page, end_page, e)
+        for offset, image_path in enumerate(paths):
+            page_no = start_page + offset
+            self._pending[_submit_ocr_page(self._executor, image_path, page_no, self.plan)] = (page_no, image_path)
+        for page_no in range(start_page + len(paths), end_page + 1):
+            self.done[page_no] = None
+
+    def collect(self, *, keep: int) -> None:
+        """Wait until at most ``keep`` pages are in flight."""
+        _collect_ocr_results(self._pending, self._store, keep=keep)
+
+    def ready(self, page_no: int) -> bool:
+        if page_no not in self.done:
+            _record_finished(self._pending, [future for future in self._pending if future.done()], self._store)
+        return page_no in self.done
+
+    def take(self, page_no: int) -> OcrPage | None:
+        """Hand out a submitted page's result, waiting for it if it is still in flight."""
+        while page_no not in self.done and self._pending:
+            self.collect(keep=len(self._pending) - 1)
+        return self.done.pop(page_no, None)
+
+    def _store(self, page_no: int, page: OcrPage | None) -> None:
+        if page is not None:
+            # Stored as soon as each page finishes, so an interrupted run resumes from here.
+            ocr_page_cache.put(self.sha256, page_no, self.signature, page)
+        self._record(page_no, page)
+
+    def _record(self, page_no: int, page: OcrPage | None) -> None:
+        if page is None or page.blank:
+            self.blank_pages += page is not None
+            self.done[page_no] = None
+            return
+        self.done[page_no] = page
+        self.page_details.append({"page": page_no, "confidence": round(page.confidence, 1), "dpi": page.dpi, "lang": page.lang})
+        self.retried_pages += bool(self.plan.retry_dpi and page.dpi == self.plan.retry_dpi)
+        self.single_lang_pages += page.lang != self.plan.lang
+
+    def stats(self) -> dict[str, object]:
+        page_details = sorted(self.page_details, key=lambda item: item["page"])
+        return {
+            "page_details": page_details,
+            "ocr_pages": len(page_details),
+            "ocr_cached_pages": self.cached_pages,
+            "ocr_blank_pages": self.blank_pages,
+            "ocr_retried_pages": self.retried_pages,
+            "ocr_single_lang_pages": self.single_lang_pages,
+            "ocr_settings": {key: value for key, value in self.signature.items() if key != "preprocess"},
+        }
+
+    def close(self, *, finished: bool) -> None:
+        if self._executor is not None:
+            _stop_ocr_pool(self._executor, kill=not finished)
+        if self._workdir is not None:
+            self._workdir.cleanup()
+            ocr_page_cache.evict()
+
+
+def _require_ocr_dependencies() -> None:
+    if convert_from_path is None or image_to_data is None or Image is None:
+        raise FileValidationError("OCR dependency missing: pdf2image + pytesseract + poppler + tesseract")
+
+
+def _page_ready(session: _OcrSession | None, held_page: tuple[int, str, bool], run: list[int]) -> bool:
+    page_no, _layer_text, use_ocr = held_page
+    return not use_ocr or (page_no not in run and session.ready(page_no))
+
+
+def _init_ocr_worker() -> None:
+    # One tesseract thread per worker process; the pool already spreads pages over the cores.
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+def _ocr_page_signature(plan: OcrPlan) -> dict[str, object]:
+    return {
+        "preprocess": OCR_PREPROCESS_VERSION,
+        "lang": plan.lang,
+        "dpi": plan.dpi,
+        "retry_dpi": plan.retry_dpi,
+        "min_confidence": plan.min_confidence,
+    }
+
+
+def _empty_ocr_result(warning: str) -> dict[str, object]:
+    return {
+        "texts": {},
+        "page_details": [],
+        "ocr_pages": 0,
+        "ocr_cached_pages": 0,
+        "ocr_blank_pages": 0,
+        "ocr_retried_pages": 0,
+        "ocr_single_lang_pages": 0,
+        "ocr_settings": {},
+        "ocr_used": False,
+        "warning": warning,
+    }
+
+
+def _is_cjk(char: str) -> bool:
+    return "\u4e00" <= char <= "\u9fff" or "\u3000" <= char <= "\u303f" or "\uff00" <= char <= "\uffef"
+
+
+def _join_words(words: list[str]) -> str:
+    # tesseract reports each Chinese character as its own word; only Latin words are space separated.
+    joined = words[0]
+    for word in words[1:]:
+        joined += word if _is_cjk(joined[-1]) and _is_cjk(word[0]) else f" {word}"
+    return joined
+
+
+def _recognize(image, lang: str) -> tuple[str, float]:
+    """Preprocess and OCR one page image; returns its text and character-weighted mean word confidence (0-100)."""
+    data = image_to_data(PdfOcrService._preprocess_image(image), lang=lang, output_type="dict")
+    lines: dict[tuple[int, int, int], list[str]] = {}
+    weighted = 0.0
+    chars = 0
+    for word, conf, block_num, par_num, line_num in zip(
+        data["text"], data["conf"], data["block_num"], data["par_num"], data["line_num"]
+    ):
+        word = str(word).strip()
+        if not word:
+            continue
+        lines.setdefault((block_num, par_num, line_num), []).append(word)
+        confidence = float(conf)
+        if confidence >= 0:
+            weighted += confidence * len(word)
+            chars += len(word)
+    text = "\n".join(_join_words(words) for words in lines.values())
+    return PdfOcrService._normalize_page_text(text), (weighted / chars if chars else 0.0)
+
+
+def _ocr_page_file(image_path: str, page_no: int, plan: OcrPlan) -> OcrPage:
+    """OCR one rasterized page from disk; runs in an OCR worker process.
+
+    Blank pages return without running tesseract. In adaptive mode a page read
+    below ``plan.min_confidence`` is rendered again at ``plan.retry_dpi`` (in the
+    first configured language only when the first pass found no Latin words), and
+    the more confident reading is kept.
+    """
+    try:
+        with Image.open(image_path) as image:
+            if PdfOcrService._is_blank_page(image):
+                return OcrPage(text="", blank=True, dpi=plan.dpi)
+            text, confidence = _recognize(image, plan.lang)
+        page = OcrPage(text=text, confidence=confidence, dpi=plan.dpi, lang=plan.lang)
+        if not plan.retry_dpi or confidence >= plan.min_confidence:
+            return page
+        retry_lang = plan.lang if LATIN_WORD.search(text) else plan.lang.split("+")[0]
+        with tempfile.TemporaryDirectory(prefix="retry-", dir=Path(image_path).parent) as retry_dir:
+            paths = convert_from_path(
+                plan.file_path,
+                dpi=plan.retry_dpi,
+                first_page=page_no,
+                last_page=page_no,
+                output_folder=retry_dir,
+                fmt="ppm",
+                grayscale=True,
+                paths_only=True,
+            )
+            with Image.open(paths[0]) as retry_image:
+                retry_text, retry_confidence = _recognize(retry_image, retry_lang)
+        if retry_confidence >= confidence:
+            page = OcrPage(text=retry_text, confidence=retry_confidence, dpi=plan.retry_dpi, lang=retry_lang)
+        return page
+    except Exception as e:
+        # Some of pytesseract's errors cannot be unpickled, which would break the whole pool; send the text instead.
+        raise RuntimeError(f"{type(e).__name__}: {e}") from None
+
+
+def _start_ocr_pool(workers: int) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_ocr_worker,
+    )
+
+
+def _stop_ocr_pool(executor: ProcessPoolExecutor, *, kill: bool) -> None:
+    if kill:
+        # Interrupted (timeout, CPU limit): do not leave workers OCRing pages nobody will read.
+        for process in list((executor._processes or {}).values()):
+            process.kill()
+    executor.shutdown(wait=not kill, cancel_futures=True)
+
+
+def _submit_ocr_page(
+    executor: ProcessPoolExecutor | None,
+    image_path: str,
+    page_no: int,
+    plan: OcrPlan,
+) -> Future[OcrPage]:
+    if executor is not None:
+        return executor.submit(_ocr_page_file, image_path, page_no, plan)
+    future: Future[OcrPage] = Future()
+    try:
+        future.set_result(_ocr_page_file(image_path, page_no, plan))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def _page_batches(pages: list[int], batch_size: int) -> list[tuple[int, int]]:
+    """Split sorted page numbers into runs of consecutive pages, at most ``batch_size`` long each."""
+    batches: list[tuple[int, int]] = []
+    for page_no in pages:
+        if batches and page_no == batches[-1][1] + 1 and page_no - batches[-1][0] < batch_size:
+            batches[-1] = (batches[-1][0], page_no)
+        else:
+            batches.append((page_no, page_no))
+    return batches
+
+
+def _format_page_ranges(pages: list[int]) -> str:
+    """``[1, 2, 3, 7, 9, 10]`` -> ``"1-3,7,9-10"``."""
+    return ",".join(f"{start}-{end}" if end > start else str(start) for start, end in _page_batches(pages, len(pages) or 1))
+
+
+def _collect_ocr_results(
+    pending: dict[Future[OcrPage], tuple[int, str]],
+    record: Callable[[int, OcrPage | None], None],
+    *,
+    keep: int,
+) -> None:
+    """Wait until at most ``keep`` pages are outstanding, passing finished pages to ``record``."""
+    while len(pending) > keep:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        _record_finished(pending, done, record)
+
+
+def _record_finished(
+    pending: dict[Future[OcrPage], tuple[int, str]],
+    finished: Iterable[Future[OcrPage]],
+    record: Callable[[int, OcrPage | None], None],
+) -> None:
+    """Pass finished pages to ``record``; a page whose OCR failed is recorded as None."""
+    for future in finished:
+        page_no, image_path = pending.pop(future)
+        Path(image_path).unlink(missing_ok=True)
+        try:
+            page = future.result()
+        except Exception as e:
+            logger.warning("PDF OCR warning: page=%s err=%s", page_no, e)
+            page = None
+        record(page_no, page)
+
+
+def parse_pdf_file(file_path: str, sha256: str = "") -> dict[str, object]:
+    """All of ``PdfOcrService.parse_pdf`` at once: its statistics plus the list of ``chapters``."""
+    stats: dict[str, object] = {}
+    chapters = list(PdfOcrService().parse_pdf(file_path, sha256, stats))
+    return {"chapters": chapters, **stats}
+
+
+def iter_pdf_file(file_path: str, sha256: str, meta: dict[str, object]) -> Iterator[dict[str, object]]:
+    """``PdfOcrService.parse_pdf`` as a module-level generator, for ``extraction_cache.stream``."""
+    yield from PdfOcrService().parse_pdf(file_path, sha256, meta)
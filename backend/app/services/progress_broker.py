@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from typing import Any
+
+from app.config import get_settings
+from app.errors import logger
+from app.services.state_backend import INSTANCE_ID, StateBackend, get_state_backend
+
+settings = get_settings()
+
+
+class ProgressSubscription:
+    """Bounded per-subscriber queue bound to the event loop that created it.
+
+    Progress payloads are full snapshots, so when a slow subscriber falls
+    behind the oldest queued snapshot is dropped instead of blocking publishers.
+    """
+
+    def __init__(self, topic: str, *, loop: asyncio.AbstractEventLoop, maxsize: int):
+        self.topic = topic
+        self._loop = loop
+        self._queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue(maxsize=max(1, int(maxsize)))
+        self.dropped = 0
+
+    def _offer(self, payload: dict[str, Any]) -> None:
+        if self._queue.full():
+            try:
+                self._queue.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+        self._queue.put_nowait(payload)
+
+    def deliver(self, payload: dict[str, Any]) -> None:
+        try:
+            self._loop.call_soon_threadsafe(self._offer, payload)
+        except RuntimeError:
+            # Event loop already closed; the subscriber is gone.
+            pass
+
+    async def get(self, timeout: float | None = None) -> dict[str, Any] | None:
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class ProgressBroker:
+    """Per-topic fan-out to local subscribers, optionally relayed across processes.
+
+    With a ``channel`` and a shared state backend, published payloads are also
+    appended to that channel, and a relay thread forwards messages published by
+    other processes to local subscribers while any are connected.
+    """
+
+    def __init__(
+        self,
+        *,
+        queue_size: int | None = None,
+        channel: str | None = None,
+        state_backend: StateBackend | None = None,
+        poll_interval_seconds: float = 0.5,
+    ):
+        self._queue_size = int(queue_size if queue_size is not None else settings.progress_stream_queue_size)
+        self._subscribers: dict[str, set[ProgressSubscription]] = {}
+        self._lock = threading.Lock()
+        self._channel = channel
+        self._state_backend = state_backend
+        self._poll_interval_seconds = max(0.05, float(poll_interval_seconds))
+        self._relay_thread: threading.Thread | None = None
+
+    def _state(self) -> StateBackend:
+        if self._state_backend is None:
+            self._state_backend = get_state_backend()
+        return self._state_backend
+
+    def _relay_enabled(self) -> bool:
+        return bool(self._channel) and self._state().shared
+
+    def subscribe(self, topic: str) -> ProgressSubscription:
+        subscription = ProgressSubscription(topic, loop=asyncio.get_running_loop(), maxsize=self._queue_size)
+        relay = self._relay_enabled()
+        with self._lock:
+            self._subscribers.setdefault(topic, set()).add(subscription)
+            if relay and self._relay_thread is None:
+                self._relay_thread = threading.Thread(
+                    target=self._relay_loop,
+                    name="progress-relay",
+                    daemon=True,
+                )
+                self._relay_thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription: ProgressSubscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.topic)
+            if not subscribers:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                self._subscribers.pop(subscription.topic, None)
+
+    def _deliver_local(self, topic: str, payload: dict[str, Any]) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(topic, ()))
+        for subscription in subscribers:
+            subscription.deliver(payload)
+
+    def publish(self, topic: str, payload: dict[str, Any], *, relay: bool = True) -> None:
+        self._deliver_local(topic, payload)
+        if not relay or not self._relay_enabled():
+            return
+        try:
+            self._state().publish(self._channel, {"origin": INSTANCE_ID, "topic": topic, "payload": payload})
+        except Exception as exc:
+            logger.warning("Progress relay publish failed: channel=%s topic=%s err=%s", self._channel, topic, exc)
+
+    def _relay_loop(self) -> None:
+        backend = self._state()
+        try:
+            cursor = backend.latest_cursor(self._channel)
+        except Exception as exc:
+            logger.warning("Progress relay start failed: channel=%s err=%s", self._channel, exc)
+            cursor = "0"
+        while True:
+            time.sleep(self._poll_interval_seconds)
+            with self._lock:
+                if not self._subscribers:
+                    self._relay_thread = None
+                    return
+            try:
+                messages, cursor = backend.read_messages(self._channel, cursor)
+            except Exception as exc:
+                logger.debug("Progress relay poll failed: channel=%s err=%s", self._channel, exc)
+                continue
+            for message in messages:
+                if message.get("origin") == INSTANCE_ID or not isinstance(message.get("payload"), dict):
+                    continue
+                self._deliver_local(str(message.get("topic") or ""), message["payload"])
+
+    def subscriber_count(self, topic: str) -> int:
+        with self._lock:
+            return len(self._subscribers.get(topic, ()))
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Callable, Protocol
+
+from app.config import get_settings
+from app.serializers import (
+    serialize_sse_keepalive,
+    serialize_task_delta_sse,
+    serialize_task_snapshot_sse,
+    serialize_task_stream_done_sse,
+)
+from app.services.progress_broker import ProgressSubscription
+
+settings = get_settings()
+
+UPLOAD_TERMINAL_STATUSES = frozenset({"completed", "failed"})
+BOOK_IMPORT_TERMINAL_STATUSES = frozenset({"completed", "partial", "failed", "cancelled"})
+
+
+class ProgressSource(Protocol):
+    def get(self, task_id: str) -> dict[str, Any] | None: ...
+
+    def subscribe(self, task_id: str) -> ProgressSubscription: ...
+
+    def unsubscribe(self, subscription: ProgressSubscription) -> None: ...
+
+
+class ProgressStreamService:
+    """Turns tracker pub/sub updates into an SSE stream of snapshot + deltas.
+
+    The first event carries the full serialized task; later events only carry
+    fields that changed since the previous event. The stream ends with
+    ``[DONE]`` once the task reaches a terminal status, or right away if the
+    task has not appeared within ``pending_seconds``.
+    """
+
+    def __init__(
+        self,
+        source: ProgressSource,
+        *,
+        serialize_task: Callable[[dict[str, Any]], dict[str, Any]],
+        terminal_statuses: frozenset[str],
+        keepalive_seconds: float | None = None,
+        pending_seconds: float | None = None,
+    ):
+        self.source = source
+        self.serialize_task = serialize_task
+        self.terminal_statuses = terminal_statuses
+        if keepalive_seconds is None:
+            keepalive_seconds = settings.progress_stream_keepalive_seconds
+        self.keepalive_seconds = max(0.1, float(keepalive_seconds))
+        if pending_seconds is None:
+            pending_seconds = settings.progress_stream_pending_seconds
+        self.pending_seconds = max(0.0, float(pending_seconds))
+
+    async def stream(self, task_id: str, *, account_id: int):
+        # Subscribe before reading the current state so no update can slip in between.
+        subscription = self.source.subscribe(task_id)
+        try:
+            # Lookups may reach the database or the shared state backend.
+            task = await asyncio.to_thread(self.source.get, task_id)
+            deadline = time.monotonic() + self.pending_seconds
+            while task is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    yield serialize_task_stream_done_sse()
+                    return
+                task = await subscription.get(timeout=min(self.keepalive_seconds, remaining))
+                if task is None:
+                    yield serialize_sse_keepalive()
+            if int(task.get("account_id", 1)) != int(account_id):
+                yield serialize_task_stream_done_sse()
+                return
+
+            previous = self.serialize_task(task)
+            yield serialize_task_snapshot_sse(previous)
+            while previous.get("status") not in self.terminal_statuses:
+                task = await subscription.get(timeout=self.keepalive_seconds)
+                if task is None:
+                    yield serialize_sse_keepalive()
+                    continue
+                current = self.serialize_task(task)
+                event = serialize_task_delta_sse(previous, current)
+                if event is not None:
+                    yield event
+                previous = current
+            yield serialize_task_stream_done_sse()
+        finally:
+            self.source.unsubscribe(subscription)
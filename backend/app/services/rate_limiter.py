@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any
+
+from app.auth import decode_access_token_user_id
+from app.config import get_settings
+from app.errors import logger
+from app.services.state_backend import LocalStateBackend, StateBackend, get_state_backend
+
+settings = get_settings()
+
+# (route group, method, path pattern, cost in tokens). First match wins; unmatched
+# requests belong to "default" and cost one token.
+ROUTE_COSTS: tuple[tuple[str, str, re.Pattern[str], int], ...] = (
+    ("llm", "POST", re.compile(r"^/api/chat/(send|send-stream|review)$"), 5),
+    ("llm", "POST", re.compile(r"^/api/chat/sessions/[^/]+/finish$"), 3),
+    ("upload", "POST", re.compile(r"^/api/materials/(upload|books/upload|books/import)$"), 3),
+    ("upload", "POST", re.compile(r"^/api/materials/upload-batch$"), 10),
+    ("export", "POST", re.compile(r"^/api/documents/(export|export-editor)$"), 2),
+)
+DEFAULT_ROUTE_GROUP = "default"
+
+
+@dataclass(slots=True)
+class RateLimitDecision:
+    allowed: bool
+    key: str
+    route_group: str
+    cost: int
+    remaining: int
+    retry_after: float
+
+
+class RateLimiter:
+    """GCRA limiter keyed by the authenticated user, falling back to the client IP.
+
+    Each key holds one timestamp in the state backend (bounded LRU in-process,
+    expiring rows/keys when shared). ``rate_per_minute`` is the sustained refill
+    rate and ``burst`` the bucket capacity, both in tokens.
+    """
+
+    def __init__(
+        self,
+        *,
+        rate_per_minute: int | None = None,
+        burst: int | None = None,
+        state_backend: StateBackend | None = None,
+    ):
+        self.rate_per_minute = max(1, int(rate_per_minute or settings.rate_limit_per_minute))
+        self.burst = max(1, int(burst or settings.rate_limit_burst))
+        self._emission_interval = 60.0 / self.rate_per_minute
+        self._state_backend = state_backend
+        self._lock = threading.Lock()
+        self._decisions: dict[tuple[str, bool], int] = {}
+
+    def _state(self) -> StateBackend:
+        if self._state_backend is None:
+            # Per-request writes against a shared SQLite table are too costly to be the default;
+            # the in-process LRU is used unless shared counting is explicitly switched on.
+            self._state_backend = get_state_backend() if settings.rate_limit_shared else LocalStateBackend()
+        return self._state_backend
+
+    @staticmethod
+    def route_cost(method: str, path: str) -> tuple[str, int]:
+        for group, route_method, pattern, cost in ROUTE_COSTS:
+            if method == route_method and pattern.match(path):
+                return group, cost
+        return DEFAULT_ROUTE_GROUP, 1
+
+    @staticmethod
+    def client_key(authorization: str | None, client_ip: str) -> str:
+        scheme, _, token = (authorization or "").partition(" ")
+        if scheme.lower() == "bearer" and token:
+            user_id = decode_access_token_user_id(token.strip())
+            if user_id:
+                return f"user:{user_id}"
+        return f"ip:{client_ip}"
+
+    def check(self, *, method: str, path: str, authorization: str | None, client_ip: str) -> RateLimitDecision:
+        key = self.client_key(authorization, client_ip)
+        group, cost = self.route_cost(method, path)
+        allowed, remaining, retry_after = self._state().throttle(
+            key,
+            cost=min(cost, self.burst),
+            emission_interval=self._emission_interval,
+            capacity=self.burst,
+        )
+        with self._lock:
+            self._decisions[(group, allowed)] = self._decisions.get((group, allowed), 0) + 1
+        if not allowed:
+            logger.info("Rate limited: key=%s group=%s cost=%s retry_after=%.2fs", key, group, cost, retry_after)
+        return RateLimitDecision(
+            allowed=allowed,
+            key=key,
+            route_group=group,
+            cost=cost,
+            remaining=remaining,
+            retry_after=retry_after,
+        )
+
+    def metrics(self) -> dict[str, Any]:
+        """Decision counters of this process since start, per route group."""
+        costs = {DEFAULT_ROUTE_GROUP: 1}
+        for group, _, _, cost in ROUTE_COSTS:
+            costs[group] = max(costs.get(group, 0), cost)
+        with self._lock:
+            decisions = dict(self._decisions)
+        return {
+            "rate_per_minute": self.rate_per_minute,
+            "burst": self.burst,
+            "routes": [
+                {
+                    "route_group": group,
+                    "cost": cost,
+                    "allowed": decisions.get((group, True), 0),
+                    "limited": decisions.get((group, False), 0),
+                }
+                for group, cost in costs.items()
+            ],
+        }
+
+
+rate_limiter = RateLimiter()
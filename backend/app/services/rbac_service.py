@@ -12,6 +12,7 @@ from app.models.role_permission import RolePermission
 from app.models.user import User
 from app.models.user_role import UserRole
 from app.rbac import ALL_PERMISSION_CODES, PERMISSION_DEFINITIONS, ROLE_ADMIN, ROLE_WRITER, SYSTEM_ROLE_DEFINITIONS
+from app.services.auth_context_cache import auth_context_cache
 
 
 class RBACError(ValueError):
@@ -202,8 +203,9 @@ class RBACService:
     def get_user_role_codes(self, user: User) -> list[str]:
         return [role.code for role in self.get_user_roles(user)]
 
-    def get_user_permissions(self, user: User) -> list[str]:
-        roles = self.get_user_roles(user)
+    def get_user_permissions(self, user: User, roles: list[Role] | None = None) -> list[str]:
+        if roles is None:
+            roles = self.get_user_roles(user)
         if not roles:
             return []
         role_ids = [role.id for role in roles]
@@ -228,12 +230,22 @@ class RBACService:
             return codes[0]
         return legacy or ROLE_WRITER
 
-    def attach_user_access_context(self, user: User) -> User:
-        role_codes = self.get_user_role_codes(user)
-        permission_codes = self.get_user_permissions(user)
-        setattr(user, "_role_codes", role_codes)
-        setattr(user, "_permission_codes", permission_codes)
-        setattr(user, "_primary_role", self.get_primary_role_code(user, role_codes))
+    def build_user_access_context(self, user: User) -> dict[str, Any]:
+        roles = self.get_user_roles(user)
+        role_codes = [role.code for role in roles]
+        return {
+            "account_id": int(user.account_id or 0),
+            "role_codes": role_codes,
+            "permission_codes": self.get_user_permissions(user, roles),
+            "primary_role": self.get_primary_role_code(user, role_codes),
+        }
+
+    def attach_user_access_context(self, user: User, context: dict[str, Any] | None = None) -> User:
+        if context is None:
+            context = self.build_user_access_context(user)
+        setattr(user, "_role_codes", list(context["role_codes"]))
+        setattr(user, "_permission_codes", list(context["permission_codes"]))
+        setattr(user, "_primary_role", context["primary_role"])
         return user
 
     def sync_legacy_role_field(self, user: User) -> str:
@@ -293,6 +305,7 @@ class RBACService:
         role.description = (description or "").strip()
         role.status = cleaned_status
         self.db.flush()
+        auth_context_cache.invalidate_on_commit(self.db, account_ids=[role.account_id])
         return role
 
     def set_role_permissions(self, role: Role, permission_codes: list[str]) -> None:
@@ -312,6 +325,7 @@ class RBACService:
                 RolePermission.permission_id.in_(list(current_ids - target_ids)),
             ).delete(synchronize_session=False)
         self.db.flush()
+        auth_context_cache.invalidate_on_commit(self.db, account_ids=[role.account_id])
 
     def delete_role(self, role: Role) -> None:
         if role.is_system:
@@ -322,6 +336,7 @@ class RBACService:
         self.db.query(RolePermission).filter(RolePermission.role_id == role.id).delete(synchronize_session=False)
         self.db.delete(role)
         self.db.flush()
+        auth_context_cache.invalidate_on_commit(self.db, account_ids=[role.account_id])
 
     def set_user_roles(self, user: User, role_codes: list[str]) -> list[Role]:
         requested = sorted({(code or "").strip() for code in role_codes if (code or "").strip()})
@@ -348,6 +363,7 @@ class RBACService:
         self.db.flush()
         self.sync_legacy_role_field(user)
         self.db.flush()
+        auth_context_cache.invalidate_on_commit(self.db, account_ids=[user.account_id])
         return roles
 
     def remap_user_roles_for_account_change(self, user: User, target_account_id: int) -> list[Role]:
@@ -368,6 +384,7 @@ class RBACService:
         self.db.flush()
         self.sync_legacy_role_field(user)
         self.db.flush()
+        auth_context_cache.invalidate_on_commit(self.db, account_ids=[target_account_id])
         return target_roles
 
 
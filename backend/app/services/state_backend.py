@@ -0,0 +1,564 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict, defaultdict
+from typing import Any, Mapping
+
+from sqlalchemy import and_, case, delete, or_, select, update
+
+from app.config import get_settings
+from app.database import engine
+from app.errors import logger
+from app.models.shared_state import SharedCounter, SharedLease, SharedMessage, SharedValue
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - optional dependency
+    redis = None
+
+settings = get_settings()
+
+# Unique per process; used as the lease owner prefix and to skip our own pub/sub echoes.
+INSTANCE_ID = uuid.uuid4().hex
+
+
+def gcra_step(
+    tat: float,
+    now: float,
+    *,
+    cost: float,
+    emission_interval: float,
+    capacity: float,
+) -> tuple[float | None, int, float]:
+    """Apply one GCRA (virtual scheduling) step for a request of ``cost`` tokens.
+
+    ``tat`` is the stored theoretical arrival time. Returns the new TAT (None when
+    the request is limited), the whole tokens left afterwards and the seconds to
+    wait before retrying.
+    """
+    tolerance = capacity * emission_interval
+    start = max(tat, now)
+    new_tat = start + cost * emission_interval
+    overflow = new_tat - now - tolerance
+    if overflow > 1e-9:
+        remaining = int((tolerance - (start - now)) / emission_interval + 1e-9)
+        return None, max(0, remaining), overflow
+    return new_tat, int((tolerance - (new_tat - now)) / emission_interval + 1e-9), 0.0
+
+
+class StateBackend(ABC):
+    """Shared state primitives used to coordinate API worker processes.
+
+    ``shared`` is False for backends whose state is only visible inside the
+    current process, so callers can skip cross-process relaying.
+    """
+
+    shared = True
+
+    @abstractmethod
+    def incr(self, key: str, amount: int = 1, *, ttl_seconds: float | None = None) -> int:
+        """Atomically add ``amount`` and return the new value.
+
+        ``ttl_seconds`` applies when the counter is created (or recreated after
+        expiry); later increments do not extend it.
+        """
+
+    @abstractmethod
+    def acquire_lease(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        """Take or extend a lease. Succeeds if it is free, expired or already ours."""
+
+    @abstractmethod
+    def release_lease(self, name: str, owner: str) -> bool:
+        ...
+
+    @abstractmethod
+    def lease_owner(self, name: str) -> str | None:
+        ...
+
+    @abstractmethod
+    def set_value(self, key: str, value: dict[str, Any], *, ttl_seconds: float | None = None) -> None:
+        ...
+
+    @abstractmethod
+    def get_value(self, key: str) -> dict[str, Any] | None:
+        ...
+
+    @abstractmethod
+    def publish(self, channel: str, message: dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    def latest_cursor(self, channel: str) -> str:
+        """Cursor positioned after the newest message currently on ``channel``."""
+
+    @abstractmethod
+    def read_messages(self, channel: str, cursor: str, *, limit: int = 100) -> tuple[list[dict[str, Any]], str]:
+        """Return messages published after ``cursor`` and the cursor to resume from."""
+
+    @abstractmethod
+    def throttle(
+        self,
+        key: str,
+        *,
+        cost: float,
+        emission_interval: float,
+        capacity: float,
+    ) -> tuple[bool, int, float]:
+        """Charge ``cost`` against the GCRA bucket ``key``; see :func:`gcra_step`.
+
+        Returns ``(allowed, remaining, retry_after_seconds)``. Each key stores a
+        single timestamp that becomes meaningless once it is in the past, so idle
+        keys can be dropped at any time.
+        """
+
+
+class LocalStateBackend(StateBackend):
+    """In-process stand-in with the same semantics; intended for tests and single-worker runs."""
+
+    shared = False
+
+    def __init__(self, *, max_messages: int = 1000, max_rate_keys: int | None = None):
+        self._lock = threading.Lock()
+        self._rate_tats: OrderedDict[str, float] = OrderedDict()
+        if max_rate_keys is None:
+            max_rate_keys = settings.rate_limit_max_keys
+        self._max_rate_keys = max(1, int(max_rate_keys))
+        self._counters: dict[str, tuple[int, float | None]] = {}
+        self._leases: dict[str, tuple[str, float]] = {}
+        self._values: dict[str, tuple[dict[str, Any], float | None]] = {}
+        self._messages: dict[str, list[tuple[int, dict[str, Any]]]] = defaultdict(list)
+        self._next_message_id = 0
+        self._max_messages = max(1, int(max_messages))
+
+    def incr(self, key: str, amount: int = 1, *, ttl_seconds: float | None = None) -> int:
+        now = time.time()
+        with self._lock:
+            current = self._counters.get(key)
+            if current is None or (current[1] is not None and current[1] <= now):
+                current = (0, now + ttl_seconds if ttl_seconds else None)
+            value = current[0] + int(amount)
+            self._counters[key] = (value, current[1])
+            return value
+
+    def acquire_lease(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        now = time.time()
+        with self._lock:
+            current = self._leases.get(name)
+            if current is not None and current[0] != owner and current[1] > now:
+                return False
+            self._leases[name] = (owner, now + float(ttl_seconds))
+            return True
+
+    def release_lease(self, name: str, owner: str) -> bool:
+        with self._lock:
+            current = self._leases.get(name)
+            if current is None or current[0] != owner:
+                return False
+            self._leases.pop(name, None)
+            return True
+
+    def lease_owner(self, name: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            current = self._leases.get(name)
+            if current is None or current[1] <= now:
+                return None
+            return current[0]
+
+    def set_value(self, key: str, value: dict[str, Any], *, ttl_seconds: float | None = None) -> None:
+        expires_at = time.time() + ttl_seconds if ttl_seconds else None
+        with self._lock:
+            self._values[key] = (dict(value), expires_at)
+
+    def get_value(self, key: str) -> dict[str, Any] | None:
+        now = time.time()
+        with self._lock:
+            current = self._values.get(key)
+            if current is None:
+                return None
+            if current[1] is not None and current[1] <= now:
+                self._values.pop(key, None)
+                return None
+            return dict(current[0])
+
+    def publish(self, channel: str, message: dict[str, Any]) -> None:
+        with self._lock:
+            self._next_message_id += 1
+            messages = self._messages[channel]
+            messages.append((self._next_message_id, dict(message)))
+            if len(messages) > self._max_messages:
+                del messages[: len(messages) - self._max_messages]
+
+    def latest_cursor(self, channel: str) -> str:
+        with self._lock:
+            messages = self._messages.get(channel) or []
+            return str(messages[-1][0]) if messages else "0"
+
+    def read_messages(self, channel: str, cursor: str, *, limit: int = 100) -> tuple[list[dict[str, Any]], str]:
+        after_id = int(cursor or 0)
+        with self._lock:
+            selected = [item for item in self._messages.get(channel, []) if item[0] > after_id][:limit]
+        if not selected:
+            return [], str(after_id)
+        return [dict(message) for _, message in selected], str(selected[-1][0])
+
+    def throttle(
+        self,
+        key: str,
+        *,
+        cost: float,
+        emission_interval: float,
+        capacity: float,
+    ) -> tuple[bool, int, float]:
+        now = time.time()
+        with self._lock:
+            tat = self._rate_tats.pop(key, 0.0)
+            new_tat, remaining, retry_after = gcra_step(
+                tat, now, cost=cost, emission_interval=emission_interval, capacity=capacity
+            )
+            if new_tat is not None:
+                tat = new_tat
+            if tat > now:
+                self._rate_tats[key] = tat
+                # Least recently used keys go first; an evicted key simply starts with a full bucket.
+                while len(self._rate_tats) > self._max_rate_keys:
+                    self._rate_tats.popitem(last=False)
+        return new_tat is not None, remaining, retry_after
+
+
+class DatabaseStateBackend(StateBackend):
+    """State kept in ``shared_*`` tables of the application database (SQLite by default)."""
+
+    def __init__(self, bind=None, *, message_retention_seconds: float | None = None):
+        self._engine = bind or engine
+        if message_retention_seconds is None:
+            message_retention_seconds = settings.state_message_retention_seconds
+        self._message_retention_seconds = max(1.0, float(message_retention_seconds))
+        self._last_message_prune = 0.0
+        self._prune_lock = threading.Lock()
+
+    def _insert(self, table):
+        dialect = self._engine.dialect.name
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        elif dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            raise RuntimeError(f"unsupported database for shared state: {dialect}")
+        return insert(table)
+
+    def incr(self, key: str, amount: int = 1, *, ttl_seconds: float | None = None) -> int:
+        now = time.time()
+        expires_at = now + ttl_seconds if ttl_seconds else None
+        table = SharedCounter.__table__
+        stmt = self._insert(table).values(key=key, value=int(amount), expires_at=expires_at)
+        expired = and_(table.c.expires_at.is_not(None), table.c.expires_at <= now)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.key],
+            set_={
+                "value": case((expired, int(amount)), else_=table.c.value + int(amount)),
+                "expires_at": case((expired, expires_at), else_=table.c.expires_at),
+            },
+        ).returning(table.c.value)
+        with self._engine.begin() as conn:
+            return int(conn.execute(stmt).scalar_one())
+
+    def acquire_lease(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        now = time.time()
+        table = SharedLease.__table__
+        stmt = self._insert(table).values(name=name, owner=owner, expires_at=now + float(ttl_seconds))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.name],
+            set_={"owner": owner, "expires_at": now + float(ttl_seconds)},
+            where=or_(table.c.owner == owner, table.c.expires_at <= now),
+        )
+        with self._engine.begin() as conn:
+            conn.execute(stmt)
+            current = conn.execute(select(table.c.owner).where(table.c.name == name)).scalar_one_or_none()
+        return current == owner
+
+    def release_lease(self, name: str, owner: str) -> bool:
+        table = SharedLease.__table__
+        with self._engine.begin() as conn:
+            result = conn.execute(delete(table).where(table.c.name == name, table.c.owner == owner))
+        return bool(result.rowcount)
+
+    def lease_owner(self, name: str) -> str | None:
+        table = SharedLease.__table__
+        with self._engine.connect() as conn:
+            return conn.execute(
+                select(table.c.owner).where(table.c.name == name, table.c.expires_at > time.time())
+            ).scalar_one_or_none()
+
+    def set_value(self, key: str, value: dict[str, Any], *, ttl_seconds: float | None = None) -> None:
+        expires_at = time.time() + ttl_seconds if ttl_seconds else None
+        table = SharedValue.__table__
+        stmt = self._insert(table).values(key=key, value=value, expires_at=expires_at)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.key],
+            set_={"value": value, "expires_at": expires_at},
+        )
+        with self._engine.begin() as conn:
+            conn.execute(stmt)
+
+    def get_value(self, key: str) -> dict[str, Any] | None:
+        table = SharedValue.__table__
+        now = time.time()
+        with self._engine.connect() as conn:
+            row = conn.execute(
+                select(table.c.value).where(
+                    table.c.key == key,
+                    or_(table.c.expires_at.is_(None), table.c.expires_at > now),
+                )
+            ).first()
+        if row is None or not isinstance(row[0], dict):
+            return None
+        return dict(row[0])
+
+    def publish(self, channel: str, message: dict[str, Any]) -> None:
+        now = time.time()
+        table = SharedMessage.__table__
+        with self._engine.begin() as conn:
+            conn.execute(table.insert().values(channel=channel, payload=message, created_at=now))
+        self._prune_messages(now)
+
+    def _prune_messages(self, now: float) -> None:
+        with self._prune_lock:
+            if now - self._last_message_prune < self._message_retention_seconds:
+                return
+            self._last_message_prune = now
+        table = SharedMessage.__table__
+        with self._engine.begin() as conn:
+            conn.execute(delete(table).where(table.c.created_at < now - self._message_retention_seconds))
+            conn.execute(delete(SharedCounter.__table__).where(SharedCounter.__table__.c.expires_at < now))
+            conn.execute(delete(SharedValue.__table__).where(SharedValue.__table__.c.expires_at < now))
+
+    def latest_cursor(self, channel: str) -> str:
+        table = SharedMessage.__table__
+        with self._engine.connect() as conn:
+            latest = conn.execute(
+                select(table.c.id).where(table.c.channel == channel).order_by(table.c.id.desc()).limit(1)
+            ).scalar_one_or_none()
+        return str(latest or 0)
+
+    def read_messages(self, channel: str, cursor: str, *, limit: int = 100) -> tuple[list[dict[str, Any]], str]:
+        after_id = int(cursor or 0)
+        table = SharedMessage.__table__
+        with self._engine.connect() as conn:
+            rows = conn.execute(
+                select(table.c.id, table.c.payload)
+                .where(table.c.channel == channel, table.c.id > after_id)
+                .order_by(table.c.id.asc())
+                .limit(limit)
+            ).all()
+        if not rows:
+            return [], str(after_id)
+        return [dict(payload or {}) for _, payload in rows], str(rows[-1][0])
+
+    def throttle(
+        self,
+        key: str,
+        *,
+        cost: float,
+        emission_interval: float,
+        capacity: float,
+    ) -> tuple[bool, int, float]:
+        # The TAT is kept in milliseconds in a shared counter row and swapped with a
+        # compare-and-set; ``expires_at`` is the TAT itself so idle keys get pruned.
+        counter_key = f"gcra:{key}"
+        table = SharedCounter.__table__
+        for _ in range(8):
+            now = time.time()
+            with self._engine.begin() as conn:
+                current = conn.execute(select(table.c.value).where(table.c.key == counter_key)).scalar_one_or_none()
+                new_tat, remaining, retry_after = gcra_step(
+                    (current or 0) / 1000.0,
+                    now,
+                    cost=cost,
+                    emission_interval=emission_interval,
+                    capacity=capacity,
+                )
+                if new_tat is None:
+                    return False, remaining, retry_after
+                value = int(new_tat * 1000)
+                if current is None:
+                    stmt = self._insert(table).values(key=counter_key, value=value, expires_at=new_tat)
+                    result = conn.execute(stmt.on_conflict_do_nothing(index_elements=[table.c.key]))
+                else:
+                    result = conn.execute(
+                        update(table)
+                        .where(table.c.key == counter_key, table.c.value == current)
+                        .values(value=value, expires_at=new_tat)
+                    )
+            if result.rowcount:
+                self._prune_messages(now)
+                return True, remaining, 0.0
+        logger.warning("Rate limit state contended, allowing request: key=%s", key)
+        return True, 0, 0.0
+
+
+class RedisStateBackend(StateBackend):
+    """Redis-compatible backend (Redis, Valkey, KeyDB). Messages use streams."""
+
+    _RENEW_SCRIPT = (
+        "local current = redis.call('GET', KEYS[1]) "
+        "if (not current) or current == ARGV[1] then "
+        "return redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2]) and 1 "
+        "end return 0"
+    )
+    _RELEASE_SCRIPT = (
+        "if redis.call('GET', KEYS[1]) == ARGV[1] then "
+        "return redis.call('DEL', KEYS[1]) end return 0"
+    )
+
+    # Returns whether the request was admitted and max(TAT, now) - now before the step.
+    _GCRA_SCRIPT = (
+        "local now = tonumber(ARGV[1]) local increment = tonumber(ARGV[2]) local tolerance = tonumber(ARGV[3]) "
+        "local tat = tonumber(redis.call('GET', KEYS[1]) or '0') "
+        "if tat < now then tat = now end "
+        "local new_tat = tat + increment "
+        "if new_tat - now > tolerance + 1e-9 then return {0, tostring(tat - now)} end "
+        "redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000)) "
+        "return {1, tostring(tat - now)}"
+    )
+
+    def __init__(self, url: str, *, key_prefix: str = "writer:", max_messages: int = 1000):
+        if redis is None:
+            raise RuntimeError("redis package is required for STATE_BACKEND=redis")
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+        self._prefix = key_prefix
+        self._max_messages = max(1, int(max_messages))
+        self._acquire = self._client.register_script(self._RENEW_SCRIPT)
+        self._release = self._client.register_script(self._RELEASE_SCRIPT)
+        self._gcra = self._client.register_script(self._GCRA_SCRIPT)
+
+    def _key(self, kind: str, key: str) -> str:
+        return f"{self._prefix}{kind}:{key}"
+
+    def incr(self, key: str, amount: int = 1, *, ttl_seconds: float | None = None) -> int:
+        redis_key = self._key("counter", key)
+        pipe = self._client.pipeline()
+        pipe.incrby(redis_key, int(amount))
+        if ttl_seconds:
+            pipe.pexpire(redis_key, int(ttl_seconds * 1000), nx=True)
+        return int(pipe.execute()[0])
+
+    def acquire_lease(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        return bool(self._acquire(keys=[self._key("lease", name)], args=[owner, int(ttl_seconds * 1000)]))
+
+    def release_lease(self, name: str, owner: str) -> bool:
+        return bool(self._release(keys=[self._key("lease", name)], args=[owner]))
+
+    def lease_owner(self, name: str) -> str | None:
+        return self._client.get(self._key("lease", name))
+
+    def set_value(self, key: str, value: dict[str, Any], *, ttl_seconds: float | None = None) -> None:
+        payload = json.dumps(value, ensure_ascii=False)
+        if ttl_seconds:
+            self._client.set(self._key("value", key), payload, px=int(ttl_seconds * 1000))
+        else:
+            self._client.set(self._key("value", key), payload)
+
+    def get_value(self, key: str) -> dict[str, Any] | None:
+        payload = self._client.get(self._key("value", key))
+        if not payload:
+            return None
+        value = json.loads(payload)
+        return value if isinstance(value, dict) else None
+
+    def publish(self, channel: str, message: dict[str, Any]) -> None:
+        self._client.xadd(
+            self._key("channel", channel),
+            {"payload": json.dumps(message, ensure_ascii=False)},
+            maxlen=self._max_messages,
+            approximate=True,
+        )
+
+    def latest_cursor(self, channel: str) -> str:
+        latest = self._client.xrevrange(self._key("channel", channel), count=1)
+        return latest[0][0] if latest else "0-0"
+
+    def read_messages(self, channel: str, cursor: str, *, limit: int = 100) -> tuple[list[dict[str, Any]], str]:
+        start = f"({cursor}" if cursor and cursor not in {"0", "0-0"} else "-"
+        rows = self._client.xrange(self._key("channel", channel), min=start, count=limit)
+        if not rows:
+            return [], cursor
+        messages = [json.loads(fields.get("payload") or "{}") for _, fields in rows]
+        return messages, rows[-1][0]
+
+    def throttle(
+        self,
+        key: str,
+        *,
+        cost: float,
+        emission_interval: float,
+        capacity: float,
+    ) -> tuple[bool, int, float]:
+        now = time.time()
+        admitted, offset = self._gcra(
+            keys=[self._key("gcra", key)],
+            args=[now, cost * emission_interval, capacity * emission_interval],
+        )
+        _, remaining, retry_after = gcra_step(
+            now + float(offset), now, cost=cost, emission_interval=emission_interval, capacity=capacity
+        )
+        return bool(int(admitted)), remaining, retry_after
+
+
+_backend_lock = threading.Lock()
+_backend: StateBackend | None = None
+
+
+def create_state_backend(kind: str | None = None) -> StateBackend:
+    kind = (kind or settings.state_backend or "local").strip().lower()
+    if kind == "local":
+        return LocalStateBackend()
+    if kind == "redis":
+        return RedisStateBackend(settings.state_redis_url)
+    if kind in {"sqlite", "database"}:
+        return DatabaseStateBackend()
+    raise ValueError(f"unknown STATE_BACKEND: {kind}")
+
+
+def configured_worker_count(argv: list[str] | None = None, environ: Mapping[str, str] | None = None) -> int:
+    """Server worker processes requested by ``WEB_CONCURRENCY`` or ``--workers``/``-w`` on the command line.
+
+    uvicorn and gunicorn both read ``WEB_CONCURRENCY``; spawned uvicorn workers
+    see the parent's ``sys.argv``, so every worker reaches the same answer.
+    """
+    argv = sys.argv if argv is None else argv
+    environ = os.environ if environ is None else environ
+    counts = [environ.get("WEB_CONCURRENCY", "")]
+    for index, arg in enumerate(argv):
+        if arg in {"--workers", "-w"} and index + 1 < len(argv):
+            counts.append(argv[index + 1])
+        elif arg.startswith("--workers="):
+            counts.append(arg.partition("=")[2])
+    return max([1, *(int(count) for count in counts if count.strip().isdigit())])
+
+
+def check_worker_support() -> None:
+    """Refuse to start several workers on a backend that keeps its state inside each process."""
+    workers = configured_worker_count()
+    if workers > 1 and not get_state_backend().shared:
+        message = (
+            f"STATE_BACKEND={settings.state_backend} keeps rate limits, book import leases and progress in each "
+            f"process, but the server was started with {workers} workers; set STATE_BACKEND=sqlite or redis"
+        )
+        logger.error(message)
+        raise RuntimeError(message)
+
+
+def get_state_backend() -> StateBackend:
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_state_backend()
+            logger.info("Shared state backend: %s", type(_backend).__name__)
+        return _backend
@@ -88,32 +88,48 @@ class StyleAnalyzer:
         return self.db
 
     def store_analysis(self, doc_type: str, features: dict, *, commit: bool = True) -> dict:
+        self.store_analyses([(doc_type, features)], commit=commit)
+        return features
+
+    def store_analyses(self, analyses: list[tuple[str, dict]], *, commit: bool = True) -> None:
+        """Fold several samples into the profiles at once, as if stored one after another.
+
+        Each feature keeps the latest sample's value and counts every sample; profiles
+        are loaded once per doc type instead of once per feature and sample.
+        """
         db = self._require_db()
-        for name, value in features.items():
-            existing = db.query(StyleProfile).filter(
-                StyleProfile.account_id == self.account_id,
-                StyleProfile.doc_type == doc_type,
-                StyleProfile.feature_name == name,
-            ).first()
-
-            if existing:
-                existing.feature_value = value
-                existing.sample_count += 1
-            else:
-                profile = StyleProfile(
-                    account_id=self.account_id,
-                    doc_type=doc_type,
-                    feature_name=name,
-                    feature_value=value,
-                    sample_count=1,
+        by_doc_type: dict[str, list[dict]] = {}
+        for doc_type, features in analyses:
+            by_doc_type.setdefault(doc_type, []).append(features)
+
+        for doc_type, samples in by_doc_type.items():
+            profiles = {
+                profile.feature_name: profile
+                for profile in db.query(StyleProfile).filter(
+                    StyleProfile.account_id == self.account_id,
+                    StyleProfile.doc_type == doc_type,
                 )
-                db.add(profile)
+            }
+            for features in samples:
+                for name, value in features.items():
+                    existing = profiles.get(name)
+                    if existing:
+                        existing.feature_value = value
+                        existing.sample_count += 1
+                    else:
+                        profiles[name] = StyleProfile(
+                            account_id=self.account_id,
+                            doc_type=doc_type,
+                            feature_name=name,
+                            feature_value=value,
+                            sample_count=1,
+                        )
+                        db.add(profiles[name])
 
         if commit:
             db.commit()
         else:
             db.flush()
-        return features
 
     def analyze_and_store(self, text: str, doc_type: str, *, commit: bool = True):
         features = self.analyze(text)
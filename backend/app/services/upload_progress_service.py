@@ -4,17 +4,71 @@ import threading
 import time
 from typing import Any
 
+from app.errors import logger
+from app.services.progress_broker import ProgressBroker, ProgressSubscription
+from app.services.state_backend import StateBackend, get_state_backend
+
 
 class UploadProgressTracker:
-    def __init__(self, ttl_seconds: int = 1800):
+    """Upload parse progress; mirrored to the shared state backend so any worker can serve it.
+
+    Mirroring and cross-process relaying happen on status changes and at most
+    once per ``mirror_interval_seconds`` in between.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int = 1800,
+        *,
+        broker: ProgressBroker | None = None,
+        state_backend: StateBackend | None = None,
+        mirror_interval_seconds: float = 1.0,
+    ):
         self._ttl_seconds = ttl_seconds
         self._tasks: dict[str, dict[str, Any]] = {}
         self._lock = threading.Lock()
+        self._state_backend = state_backend
+        self._broker = broker or ProgressBroker(channel="progress:upload", state_backend=state_backend)
+        self._prune_interval_seconds = min(60.0, float(ttl_seconds))
+        self._last_prune_ts = 0.0
+        self._mirror_interval_seconds = max(0.0, float(mirror_interval_seconds))
+        self._last_mirror_ts: dict[str, float] = {}
 
     def _now(self) -> float:
         return time.time()
 
+    def _state(self) -> StateBackend:
+        if self._state_backend is None:
+            self._state_backend = get_state_backend()
+        return self._state_backend
+
+    @staticmethod
+    def _state_key(task_id: str) -> str:
+        return f"upload-task:{task_id}"
+
+    def _mirror(self, task: dict[str, Any]) -> None:
+        backend = self._state()
+        if not backend.shared:
+            return
+        try:
+            backend.set_value(self._state_key(task["task_id"]), task, ttl_seconds=self._ttl_seconds)
+        except Exception as exc:
+            logger.warning("Upload progress mirror failed: task_id=%s err=%s", task.get("task_id"), exc)
+
+    def _load_shared(self, task_id: str) -> dict[str, Any] | None:
+        backend = self._state()
+        if not backend.shared:
+            return None
+        try:
+            return backend.get_value(self._state_key(task_id))
+        except Exception as exc:
+            logger.warning("Upload progress lookup failed: task_id=%s err=%s", task_id, exc)
+            return None
+
     def _prune_locked(self, now: float) -> None:
+        if now - self._last_prune_ts < self._prune_interval_seconds:
+            return
+        self._last_prune_ts = now
         expired = [
             task_id
             for task_id, task in self._tasks.items()
@@ -22,6 +76,7 @@ class UploadProgressTracker:
         ]
         for task_id in expired:
             self._tasks.pop(task_id, None)
+            self._last_mirror_ts.pop(task_id, None)
 
     def update(
         self,
@@ -53,6 +108,7 @@ class UploadProgressTracker:
                 task["account_id"] = int(account_id or 1)
             if parse_progress is not None:
                 task["parse_progress"] = max(0, min(100, int(parse_progress)))
+            status_changed = status is not None and status != task["status"]
             if status is not None:
                 task["status"] = status
             if stage is not None:
@@ -61,7 +117,15 @@ class UploadProgressTracker:
                 task["message"] = message
             task["updated_ts"] = now
             self._tasks[task_id] = task
-            return self._format(task)
+            result = self._format(task)
+            mirror = status_changed or now - self._last_mirror_ts.get(task_id, 0.0) >= self._mirror_interval_seconds
+            if mirror:
+                self._last_mirror_ts[task_id] = now
+            shared = dict(task)
+        if mirror:
+            self._mirror(shared)
+        self._broker.publish(task_id, result, relay=mirror)
+        return result
 
     def complete(self, task_id: str, stage: str = "解析完成") -> dict[str, Any]:
         return self.update(
@@ -85,9 +149,18 @@ class UploadProgressTracker:
         with self._lock:
             self._prune_locked(now)
             task = self._tasks.get(task_id)
-            if not task:
-                return None
-            return self._format(task)
+            if task:
+                return self._format(task)
+        task = self._load_shared(task_id)
+        if not task:
+            return None
+        return self._format(task)
+
+    def subscribe(self, task_id: str) -> ProgressSubscription:
+        return self._broker.subscribe(task_id)
+
+    def unsubscribe(self, subscription: ProgressSubscription) -> None:
+        self._broker.unsubscribe(subscription)
 
     def _format(self, task: dict[str, Any]) -> dict[str, Any]:
         return {
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO
+
+from app.errors import FileValidationError
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass(slots=True)
+class StoredUpload:
+    path: str
+    size: int
+    sha256: str
+
+
+def store_stream(
+    source: BinaryIO,
+    directory: Path,
+    *,
+    max_size: int,
+    too_large_message: str,
+    destination: Callable[[], Path],
+) -> StoredUpload:
+    """Copy ``source`` into ``directory`` chunk by chunk, hashing and size-checking on the way.
+
+    Data lands in a hidden ``.part`` file next to the target and is renamed onto
+    ``destination()`` only once complete, so readers never see a partial upload and
+    at most one chunk is held in memory.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_name = tempfile.mkstemp(dir=directory, prefix=".upload-", suffix=".part")
+    temp_path = Path(temp_name)
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            while chunk := source.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_size:
+                    raise FileValidationError(too_large_message)
+                digest.update(chunk)
+                handle.write(chunk)
+        target = destination()
+        os.replace(temp_path, target)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+    return StoredUpload(path=str(target), size=size, sha256=digest.hexdigest())
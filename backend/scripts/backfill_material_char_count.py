@@ -0,0 +1,53 @@
+"""Recompute `materials.char_count` for rows written before it was stored at ingest.
+
+The material list endpoint is read-only and serves the stored value, so legacy rows
+need this one-off pass. Default mode is dry-run. Use `--execute` to write the fixes.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+
+def _bootstrap_import_path() -> Path:
+    backend_root = Path(__file__).resolve().parents[1]
+    sys.path.insert(0, str(backend_root))
+    return backend_root
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backfill material char_count values.")
+    parser.add_argument(
+        "--execute",
+        action="store_true",
+        help="Actually write the corrected counts. Without this flag, runs in dry-run mode.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=500,
+        help="Rows loaded per batch (default: 500).",
+    )
+    args = parser.parse_args()
+
+    _bootstrap_import_path()
+
+    from app.database import SessionLocal  # noqa: PLC0415
+    from app.services.material_service import MaterialService  # noqa: PLC0415
+
+    mode = "EXECUTE" if args.execute else "DRY-RUN"
+    print(f"== Backfill material char_count ({mode}) ==")
+    with SessionLocal() as session:
+        result = MaterialService(session).backfill_char_counts(
+            batch_size=max(1, args.batch_size),
+            execute=args.execute,
+        )
+    print(f"[DB] Scanned: {result['scanned']}")
+    print(f"[DB] {'Updated' if args.execute else 'To update'}: {result['updated']}")
+    print("== Done ==")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Measure book chunking throughput and how many chunks the structured chunker saves.
+
+Chunks a corpus three ways and reports MB/s of input text and the chunk count
+of each: the old fixed ``BOOK_CHUNK_SIZE`` windows per chapter, ``BookChunker``
+(sentences, headings, merged short pages, page furniture removed), and
+``BookChunker`` with near-duplicate removal within and across the books. The
+default corpus is synthetic PDF pages with a running header, page numbers, a
+notice page repeated every few pages and a preface every book shares; pass
+``--file`` to chunk real EPUB/PDF files instead (PDFs may need OCR tools).
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+
+def _bootstrap_import_path() -> Path:
+    backend_root = Path(__file__).resolve().parents[1]
+    sys.path.insert(0, str(backend_root))
+    return backend_root
+
+
+def _prepare_environment() -> None:
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-1234567890")
+    os.environ.setdefault("OPENVIKING_ROOT_API_KEY", "ov-benchmark-secret-key-1234567890")
+
+
+WORDS = "发展改革工作会议要求各地区部门坚持问题导向落实责任推进项目建设加强监督管理提升服务水平保障民生统筹协调安全稳定"
+NOTICE = "本书仅供内部学习使用，未经出版单位书面许可，任何单位和个人不得复制、转载或者用于其他商业用途。"
+
+
+def _sentences(rng: random.Random, count: int) -> str:
+    return "".join("".join(rng.choices(WORDS, k=rng.randint(12, 40))) + rng.choice("。。。；！") for _ in range(count))
+
+
+def _synthetic_books(books: int, pages: int, seed: int) -> list[tuple[str, list[dict[str, object]]]]:
+    rng = random.Random(seed)
+    preface = [_sentences(rng, 18) for _ in range(3)]
+    corpus = []
+    for book in range(1, books + 1):
+        header = f"公文写作实务（第{book}册）"
+        chapters: list[dict[str, object]] = []
+        for page in range(1, pages + 1):
+            if page <= len(preface):
+                body = ("前言\n" if page == 1 else "") + preface[page - 1]
+            elif page % 12 == 0:
+                body = NOTICE
+            else:
+                heading = f"第{page // 12 + 1}章 要求\n" if page % 12 == 1 else ""
+                # Lines break mid-sentence, as in a PDF text layer.
+                text = _sentences(rng, rng.randint(4, 22))
+                body = heading + "\n".join(text[i : i + 36] for i in range(0, len(text), 36))
+            chapters.append(
+                {"chapter_title": f"Page {page}", "text": f"{header}\n{body}\n- {page} -", "page_start": page, "page_end": page}
+            )
+        corpus.append((f"synthetic-{book}", chapters))
+    return corpus
+
+
+def _file_books(paths: list[str]) -> list[tuple[str, list[dict[str, object]]]]:
+    from app.services.epub_parser import parse_epub  # noqa: PLC0415
+    from app.services.pdf_ocr_service import parse_pdf_file  # noqa: PLC0415
+
+    corpus = []
+    for path in paths:
+        if path.lower().endswith(".epub"):
+            corpus.append((Path(path).name, parse_epub(path)))
+        elif path.lower().endswith(".pdf"):
+            corpus.append((Path(path).name, list(parse_pdf_file(path)["chapters"])))
+        else:
+            raise SystemExit(f"unsupported book file: {path}")
+    return corpus
+
+
+def _fixed_windows(text: str, size: int, overlap: int) -> list[str]:
+    # The chunking books had before BookChunker: fixed windows over each chapter.
+    raw = text.strip()
+    if len(raw) <= size:
+        return [raw] if raw else []
+    step = max(1, size - overlap)
+    return [raw[start : start + size] for start in range(0, len(raw) - overlap, step)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark structure-aware book chunking and near-duplicate removal.")
+    parser.add_argument("--books", type=int, default=4, help="Synthetic books (default: 4).")
+    parser.add_argument("--pages", type=int, default=300, help="Pages per synthetic book (default: 300).")
+    parser.add_argument("--file", action="append", default=[], help="EPUB/PDF file to chunk instead; repeatable.")
+    parser.add_argument("--size", type=int, default=0, help="Chunk size (default: BOOK_CHUNK_SIZE).")
+    parser.add_argument("--overlap", type=int, default=-1, help="Chunk overlap (default: BOOK_CHUNK_OVERLAP).")
+    parser.add_argument("--distance", type=int, default=-1, help="SimHash distance (default: BOOK_CHUNK_SIMHASH_DISTANCE).")
+    parser.add_argument("--rounds", type=int, default=3, help="Runs per variant; the fastest counts (default: 3).")
+    parser.add_argument("--seed", type=int, default=50, help="Synthetic corpus seed (default: 50).")
+    args = parser.parse_args()
+
+    _bootstrap_import_path()
+    _prepare_environment()
+
+    from app.config import get_settings  # noqa: PLC0415
+    from app.services.book_chunker import BookChunker  # noqa: PLC0415
+    from app.services.near_duplicates import NearDuplicateFilter, SimHashIndex, np  # noqa: PLC0415
+
+    settings = get_settings()
+    size = args.size or settings.book_chunk_size
+    overlap = args.overlap if args.overlap >= 0 else settings.book_chunk_overlap
+    distance = args.distance if args.distance >= 0 else settings.book_chunk_simhash_distance
+
+    corpus = _file_books(args.file) if args.file else _synthetic_books(args.books, args.pages, args.seed)
+    megabytes = sum(len(str(chapter.get("text", "")).encode("utf-8")) for _, chapters in corpus for chapter in chapters) / 1e6
+
+    def fixed() -> tuple[int, str]:
+        count = sum(len(_fixed_windows(str(chapter.get("text", "")), size, overlap)) for _, chapters in corpus for chapter in chapters)
+        return count, ""
+
+    def structured(dedupe: bool) -> tuple[int, str]:
+        shared = SimHashIndex(distance)
+        count = duplicate_chunks = duplicate_pages = boilerplate = 0
+        for name, chapters in corpus:
+            chunker = BookChunker(size, overlap, page_distance=distance if dedupe else None)
+            near = NearDuplicateFilter(distance, shared=shared, source=name) if dedupe else None
+            chunks = [chunk for chapter in chapters for chunk in chunker.feed(chapter)] + list(chunker.finish())
+            for chunk in chunks:
+                if near is None or not near.is_duplicate(chunk["text"]):
+                    count += 1
+                    if near is not None:
+                        # As if the chunk was sent; only sent chunks are shared with the other books.
+                        near.sent(chunk["text"])
+            duplicate_chunks += near.dropped if near is not None else 0
+            duplicate_pages += chunker.duplicate_pages
+            boilerplate += chunker.boilerplate_lines
+        detail = f"furniture lines {boilerplate}"
+        if dedupe:
+            detail += f", duplicate pages {duplicate_pages}, duplicate chunks {duplicate_chunks}"
+        return count, detail
+
+    print(
+        f"== {len(corpus)} books, {sum(len(chapters) for _, chapters in corpus)} chapters/pages, {megabytes:.2f} MB, "
+        f"size={size} overlap={overlap} distance={distance}, numpy {'on' if np is not None else 'off'} =="
+    )
+    baseline = None
+    for label, run in (("fixed windows", fixed), ("structured", lambda: structured(False)), ("+ dedupe", lambda: structured(True))):
+        best = None
+        for _ in range(max(1, args.rounds)):
+            started = time.perf_counter()
+            count, detail = run()
+            seconds = time.perf_counter() - started
+            best = min(best or seconds, seconds)
+        baseline = baseline or count
+        print(
+            f"[{label:<13}] {count:>7} chunks ({count / baseline - 1:+6.1%})  {megabytes / best:7.2f} MB/s"
+            + (f"  {detail}" if detail else "")
+        )
+    print("== Done ==")
+
+
+if __name__ == "__main__":
+    main()
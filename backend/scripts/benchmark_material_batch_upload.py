@@ -0,0 +1,149 @@
+"""Compare `POST /api/materials/upload-batch` against one-by-one `POST /api/materials/upload`.
+
+Runs the real API, ingest workers and extraction processes against a throwaway SQLite
+database. The LLM, the style analysis and the knowledge-base sync are replaced by
+fixed delays (`--llm-latency`), so the numbers show how the pipeline overlaps that
+latency rather than the speed of any particular model.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+def _bootstrap_import_path() -> Path:
+    backend_root = Path(__file__).resolve().parents[1]
+    sys.path.insert(0, str(backend_root))
+    return backend_root
+
+
+def _prepare_environment(workdir: Path) -> None:
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir / 'benchmark.db'}"
+    os.environ["UPLOAD_DIR"] = str(workdir / "uploads")
+    os.environ["RATE_LIMIT_PER_MINUTE"] = "1000000"
+    os.environ["RATE_LIMIT_BURST"] = "1000000"
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-1234567890")
+    os.environ.setdefault("OPENVIKING_ROOT_API_KEY", "ov-benchmark-secret-key-1234567890")
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    os.environ.setdefault("INITIAL_ADMIN_USERNAME", "")
+    os.environ.setdefault("INITIAL_ADMIN_PASSWORD", "")
+
+
+def _documents(count: int, paragraphs: int) -> list[tuple[str, bytes]]:
+    body = "为进一步做好相关工作，现将有关事项通知如下。各单位要高度重视，认真组织实施，确保各项任务落到实处。"
+    return [
+        (f"document-{index:03d}.txt", "\n".join(f"{index}-{line} {body}" for line in range(paragraphs)).encode("utf-8"))
+        for index in range(count)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark batch material uploads against sequential uploads.")
+    parser.add_argument("--files", type=int, default=100, help="Files per run (default: 100).")
+    parser.add_argument("--paragraphs", type=int, default=200, help="Paragraphs per generated file (default: 200).")
+    parser.add_argument(
+        "--llm-latency",
+        type=float,
+        default=0.3,
+        help="Seconds each simulated LLM call (analysis, style) takes (default: 0.3).",
+    )
+    args = parser.parse_args()
+
+    _bootstrap_import_path()
+    workdir = Path(tempfile.mkdtemp(prefix="material-batch-benchmark-"))
+    _prepare_environment(workdir)
+
+    import asyncio  # noqa: PLC0415
+    import json  # noqa: PLC0415
+    from unittest.mock import patch  # noqa: PLC0415
+
+    from fastapi.testclient import TestClient  # noqa: PLC0415
+
+    from app.auth import create_access_token, hash_password  # noqa: PLC0415
+    from app.database import SessionLocal, engine  # noqa: PLC0415
+    from app.main import app  # noqa: PLC0415
+    from app.models.material_ingest_job import MaterialIngestJob  # noqa: PLC0415
+    from app.models.user import User  # noqa: PLC0415
+    from app.schema_bootstrap import ensure_account_schema  # noqa: PLC0415
+    from app.services.context_bridge import ContextBridge  # noqa: PLC0415
+    from app.services.llm_service import LLMService  # noqa: PLC0415
+    from app.services.material_ingest_dispatcher import material_ingest_dispatcher  # noqa: PLC0415
+    from app.services.rbac_service import RBACService  # noqa: PLC0415
+    from app.services.style_analyzer import StyleAnalyzer  # noqa: PLC0415
+
+    ensure_account_schema(engine, run_post_schema_tasks=False)
+    with SessionLocal() as db:
+        users = []
+        for username in ("sequential", "batch"):
+            user = User(account_id=1, username=username, password_hash=hash_password("benchmark"), display_name=username, role="writer")
+            db.add(user)
+            db.flush()
+            rbac = RBACService(db)
+            rbac.ensure_account_system_roles(1)
+            rbac.set_user_roles(user, ["writer"])
+            users.append(user.id)
+        db.commit()
+    sequential_headers, batch_headers = ({"Authorization": f"Bearer {create_access_token(user_id)}"} for user_id in users)
+
+    analysis = json.dumps({"title": "基准测试", "doc_type": "通知", "summary": "摘要", "keywords": ["基准"]}, ensure_ascii=False)
+
+    async def invoke(_self, _prompt: str) -> str:
+        await asyncio.sleep(args.llm_latency)
+        return analysis
+
+    def analyze_style(_self, _text: str) -> dict:
+        time.sleep(args.llm_latency)
+        return {"statistics": {"avg_sentence_length": 20.0}}
+
+    async def add_material(*_args, **_kwargs) -> None:
+        return None
+
+    # Distinct contents per run so neither run takes the content-hash shortcut.
+    sequential_docs = _documents(args.files, args.paragraphs)
+    batch_docs = [(name, b"batch-" + content) for name, content in _documents(args.files, args.paragraphs)]
+
+    with TestClient(app) as client, patch.object(LLMService, "invoke_async", invoke), patch.object(
+        StyleAnalyzer, "analyze", analyze_style
+    ), patch.object(ContextBridge, "add_material", add_material):
+        # Warm the extraction processes so neither run pays their start-up.
+        warm = client.post("/api/materials/upload-batch", headers=batch_headers, files=[("files", ("warm.txt", "预热".encode("utf-8"), "text/plain"))])
+        material_ingest_dispatcher.join(warm.json()["task_id"], timeout=300)
+
+        print(f"== {args.files} files, {args.paragraphs} paragraphs each, {args.llm_latency:.2f}s per LLM call ==")
+        started = time.perf_counter()
+        for name, content in sequential_docs:
+            response = client.post("/api/materials/upload", headers=sequential_headers, files={"file": (name, content, "text/plain")})
+            response.raise_for_status()
+            material_ingest_dispatcher.join(response.json()["task_id"], timeout=300)
+        sequential_seconds = time.perf_counter() - started
+        with SessionLocal() as db:
+            failed = db.query(MaterialIngestJob).filter(MaterialIngestJob.batch_id.is_(None), MaterialIngestJob.status != "completed").count()
+        if failed:
+            raise SystemExit(f"{failed} sequential uploads failed")
+        print(f"[sequential] {sequential_seconds:.2f}s ({sequential_seconds / args.files * 1000:.0f} ms/file)")
+
+        started = time.perf_counter()
+        response = client.post(
+            "/api/materials/upload-batch",
+            headers=batch_headers,
+            files=[("files", (name, content, "text/plain")) for name, content in batch_docs],
+        )
+        response.raise_for_status()
+        task_id = response.json()["task_id"]
+        material_ingest_dispatcher.join(task_id, timeout=600)
+        batch_seconds = time.perf_counter() - started
+        summary = client.get(f"/api/materials/upload-batches/{task_id}", headers=batch_headers).json()
+        if summary["status"] != "completed" or any(item["status"] != "completed" for item in summary["files"]):
+            raise SystemExit(f"batch upload failed: {summary['message']}")
+        print(f"[batch]      {batch_seconds:.2f}s ({batch_seconds / args.files * 1000:.0f} ms/file) - {summary['message']}")
+        print(f"[speedup]    {sequential_seconds / batch_seconds:.1f}x")
+    print("== Done ==")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Measure how scanned-PDF OCR scales with `PDF_OCR_WORKERS`.
+
+Builds a synthetic scanned PDF (text rendered to images, no text layer) and runs
+`PdfOcrService._extract_ocr` on it once per worker count. Needs poppler
+(`pdftoppm`) and tesseract with the requested language installed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+def _bootstrap_import_path() -> Path:
+    backend_root = Path(__file__).resolve().parents[1]
+    sys.path.insert(0, str(backend_root))
+    return backend_root
+
+
+def _prepare_environment() -> None:
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-1234567890")
+    os.environ.setdefault("OPENVIKING_ROOT_API_KEY", "ov-benchmark-secret-key-1234567890")
+
+
+def _build_scanned_pdf(path: Path, pages: int, dpi: int) -> None:
+    from PIL import Image, ImageDraw, ImageFont  # noqa: PLC0415
+
+    width, height = int(8.27 * dpi), int(11.69 * dpi)  # A4
+    font = ImageFont.load_default(size=max(12, dpi // 8))
+    line_height = int(font.size * 1.6)
+    sentence = "The quick brown fox jumps over the lazy dog while the committee reviews the annual work report."
+    images = []
+    for page in range(pages):
+        image = Image.new("L", (width, height), color=255)
+        draw = ImageDraw.Draw(image)
+        for row, y in enumerate(range(dpi // 2, height - dpi // 2, line_height)):
+            draw.text((dpi // 2, y), f"{page + 1}.{row + 1} {sentence}", fill=0, font=font)
+        images.append(image)
+    images[0].save(path, save_all=True, append_images=images[1:], resolution=dpi)
+
+
+def main() -> None:
+    cpu_count = os.cpu_count() or 1
+    default_workers = sorted({1, *(2**exp for exp in range(1, cpu_count.bit_length()) if 2**exp <= cpu_count), cpu_count})
+    parser = argparse.ArgumentParser(description="Benchmark page-parallel PDF OCR.")
+    parser.add_argument("--pages", type=int, default=32, help="Pages in the synthetic PDF (default: 32).")
+    parser.add_argument("--dpi", type=int, default=300, help="Render and OCR resolution (default: 300).")
+    parser.add_argument("--lang", default="eng", help="Tesseract language (default: eng).")
+    parser.add_argument(
+        "--fast-dpi",
+        type=int,
+        default=0,
+        help="Adaptive first-pass DPI; pages below PDF_OCR_MIN_CONFIDENCE are re-read at --dpi (default: 0, one pass).",
+    )
+    parser.add_argument(
+        "--workers",
+        default=",".join(str(count) for count in default_workers),
+        help=f"Comma-separated worker counts to compare (default: {','.join(str(count) for count in default_workers)}).",
+    )
+    args = parser.parse_args()
+
+    missing = [tool for tool in ("pdftoppm", "tesseract") if shutil.which(tool) is None]
+    if missing:
+        raise SystemExit(f"missing OCR tools: {', '.join(missing)}")
+
+    _bootstrap_import_path()
+    _prepare_environment()
+
+    from app.config import get_settings  # noqa: PLC0415
+    from app.services.ocr_page_cache import ocr_page_cache  # noqa: PLC0415
+    from app.services.pdf_ocr_service import PdfOcrService  # noqa: PLC0415
+
+    settings = get_settings()
+    settings.pdf_ocr_dpi = args.dpi
+    settings.pdf_ocr_lang = args.lang
+    settings.pdf_ocr_adaptive = args.fast_dpi > 0
+    settings.pdf_ocr_fast_dpi = args.fast_dpi
+    settings.pdf_ocr_max_pages = args.pages
+    # Every run must OCR the pages itself rather than read the previous run's output.
+    ocr_page_cache.enabled = False
+
+    with tempfile.TemporaryDirectory(prefix="pdf-ocr-benchmark-") as workdir:
+        pdf_path = Path(workdir) / "scanned.pdf"
+        _build_scanned_pdf(pdf_path, args.pages, args.dpi)
+        print(f"== {args.pages} scanned pages at {args.dpi} DPI, {cpu_count} CPU cores ==")
+
+        baseline = None
+        for workers in [int(value) for value in args.workers.split(",") if value.strip()]:
+            settings.pdf_ocr_workers = workers
+            started = time.perf_counter()
+            result = PdfOcrService()._extract_ocr(str(pdf_path), list(range(1, args.pages + 1)))
+            seconds = time.perf_counter() - started
+            if result["ocr_pages"] != args.pages:
+                raise SystemExit(f"OCR finished {result['ocr_pages']}/{args.pages} pages with {workers} workers")
+            baseline = baseline or (seconds, workers)
+            speedup = baseline[0] / seconds
+            print(
+                f"[workers={workers:>2}] {seconds:7.2f}s  {args.pages / seconds:5.2f} pages/s  "
+                f"speedup {speedup:4.1f}x  efficiency {speedup / (workers / baseline[1]):4.0%}  "
+                f"re-read {result['ocr_retried_pages']}"
+            )
+    print("== Done ==")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Inspect and prune the on-disk extraction cache (`EXTRACTION_CACHE_DIR`).
+
+`stats` prints the entry count and size, `list` shows entries most recently used first,
+and `prune` removes stale, unused or excess entries. The per-page OCR cache under
+`ocr-pages/` is reported and pruned alongside. Default prune mode is dry-run.
+Use `--execute` to delete.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from datetime import datetime
+from pathlib import Path
+
+
+def _bootstrap_import_path() -> Path:
+    backend_root = Path(__file__).resolve().parents[1]
+    sys.path.insert(0, str(backend_root))
+    return backend_root
+
+
+def _format_bytes(size: int) -> str:
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Inspect and prune the extraction cache.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("stats", help="Show entry count and total size.")
+    list_parser = subparsers.add_parser("list", help="List entries, most recently used first.")
+    list_parser.add_argument("--limit", type=int, default=50, help="Entries shown (default: 50).")
+    prune_parser = subparsers.add_parser("prune", help="Remove stale, unused or excess entries.")
+    prune_parser.add_argument(
+        "--stale",
+        action="store_true",
+        help="Remove entries from older extractor versions or other OCR settings.",
+    )
+    prune_parser.add_argument("--older-than-days", type=float, help="Remove entries not used for this many days.")
+    prune_parser.add_argument("--max-mb", type=float, help="Evict least recently used entries down to this size (default: EXTRACTION_CACHE_MAX_MB).")
+    prune_parser.add_argument(
+        "--execute",
+        action="store_true",
+        help="Actually delete entries. Without this flag, runs in dry-run mode.",
+    )
+    args = parser.parse_args()
+
+    _bootstrap_import_path()
+
+    from app.services.extraction_cache import extraction_cache  # noqa: PLC0415
+    from app.services.ocr_page_cache import ocr_page_cache  # noqa: PLC0415
+
+    entries = extraction_cache.entries()
+    total = sum(entry.size for entry in entries)
+    pages = ocr_page_cache.entries()
+    print(f"== Extraction cache: {extraction_cache.root} ==")
+    print(f"[Cache] Entries: {len(entries)}, size: {_format_bytes(total)} / {_format_bytes(extraction_cache.max_bytes)}")
+    print(
+        f"[OCR pages] Pages: {len(pages)}, size: {_format_bytes(sum(page.size for page in pages))} "
+        f"/ {_format_bytes(ocr_page_cache.max_bytes)}"
+    )
+
+    if args.command == "list":
+        for entry in sorted(entries, key=lambda item: item.last_used, reverse=True)[: max(0, args.limit)]:
+            try:
+                header = extraction_cache.read_header(entry.path)
+                label = f"{header['kind']:<8} {header['sha256'][:12]} items={header['items']}"
+            except Exception as exc:  # noqa: BLE001 - listing should survive a corrupt entry
+                label = f"unreadable ({exc})"
+            stale = " stale" if extraction_cache.is_stale(entry.path) else ""
+            used = datetime.fromtimestamp(entry.last_used).strftime("%Y-%m-%d %H:%M")
+            print(f"{used}  {_format_bytes(entry.size):>9}  {label}{stale}")
+    elif args.command == "prune":
+        mode = "EXECUTE" if args.execute else "DRY-RUN"
+        result = extraction_cache.prune(
+            max_bytes=int(args.max_mb * 1024 * 1024) if args.max_mb is not None else None,
+            stale=args.stale,
+            older_than_seconds=args.older_than_days * 86400 if args.older_than_days is not None else None,
+            execute=args.execute,
+        )
+        page_result = ocr_page_cache.prune(
+            older_than_seconds=args.older_than_days * 86400 if args.older_than_days is not None else None,
+            execute=args.execute,
+        )
+        print(f"[Prune] ({mode}) {'Removed' if args.execute else 'To remove'}: {result['removed']} entries, {_format_bytes(result['freed_bytes'])}")
+        print(f"[Prune] Remaining: {_format_bytes(result['remaining_bytes'])}")
+        print(
+            f"[Prune] ({mode}) OCR pages {'removed' if args.execute else 'to remove'}: {page_result['removed']}, "
+            f"{_format_bytes(page_result['freed_bytes'])}; remaining {_format_bytes(page_result['remaining_bytes'])}"
+        )
+    print("== Done ==")
+
+
+if __name__ == "__main__":
+    main()
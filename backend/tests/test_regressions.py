@@ -1,10 +1,16 @@
+import asyncio
 import hashlib
 import json
 import os
+import random
 import sys
 import tempfile
+import threading
+import time
+import tracemalloc
 import unittest
 import uuid
+from contextlib import aclosing
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from unittest.mock import AsyncMock, patch
@@ -14,6 +20,7 @@ os.environ.setdefault("SECRET_KEY", "test-secret-key-1234567890")
 os.environ.setdefault("OPENVIKING_ROOT_API_KEY", "ov-test-secret-key-1234567890")
 os.environ.setdefault("OPENAI_API_KEY", "test-openai-key")
 os.environ["DATABASE_URL"] = f"sqlite:///{TEMP_DIR / 'writer-test.db'}"
+os.environ["EXTRACTION_CACHE_DIR"] = str(TEMP_DIR / "extraction-cache")
 os.environ.setdefault("INITIAL_ADMIN_USERNAME", "")
 os.environ.setdefault("INITIAL_ADMIN_PASSWORD", "")
 
@@ -22,26 +29,33 @@ if str(BACKEND_ROOT) not in sys.path:
     sys.path.insert(0, str(BACKEND_ROOT))
 
 import app.models  # noqa: E402,F401
+from alembic import command as alembic_command  # noqa: E402
 from alembic.script import ScriptDirectory  # noqa: E402
 from fastapi.testclient import TestClient  # noqa: E402
 
+from app import auth as auth_module  # noqa: E402
 from app.api import chat as chat_api  # noqa: E402
 from app.api import documents as documents_api  # noqa: E402
 from app.api import materials as materials_api  # noqa: E402
 from app.auth import create_access_token, hash_password  # noqa: E402
 from app.database import Base, SessionLocal, engine  # noqa: E402
-from sqlalchemy import text  # noqa: E402
+from app.errors import FileValidationError  # noqa: E402
+from sqlalchemy import event, text  # noqa: E402
 from app.main import app  # noqa: E402
-from app.migration import _alembic_config  # noqa: E402
+from app.migration import _alembic_config, run_database_migrations  # noqa: E402
+from app.models.book_file_fingerprint import BookFileFingerprint  # noqa: E402
 from app.models.book_import_task import BookImportTask  # noqa: E402
+from app.models.book_source import BookSource  # noqa: E402
+from app.models.book_style_rule import BookStyleRule  # noqa: E402
 from app.models.account import Account  # noqa: E402
 from app.models.chat import ChatMessage, ChatSession, SessionDraft  # noqa: E402
 from app.models.document import GeneratedDocument  # noqa: E402
 from app.models.material import Material  # noqa: E402
+from app.models.material_ingest_job import MaterialIngestJob  # noqa: E402
 from app.models.invite_code import InviteCode  # noqa: E402
 from app.models.user import User  # noqa: E402
 from app.models.preference import UserPreference  # noqa: E402
-from app.models.style import WritingHabit  # noqa: E402
+from app.models.style import StyleProfile, WritingHabit  # noqa: E402
 from app.schema_bootstrap import ensure_account_schema, _mark_interrupted_book_tasks  # noqa: E402
 from app.serializers import (  # noqa: E402
     serialize_book_scan_item,
@@ -50,13 +64,44 @@ from app.serializers import (  # noqa: E402
     serialize_chat_error_sse,
     serialize_chat_final_sse,
     serialize_chat_workflow_sse,
+    serialize_upload_task,
 )
+from app.services import book_fingerprint_index as book_fingerprint_index_module  # noqa: E402
 from app.services import book_import_service as book_import_service_module  # noqa: E402
+from app.services import book_import_task_service as book_import_task_service_module  # noqa: E402
+from app.services import extraction_cache as extraction_cache_module  # noqa: E402
 from app.services import material_ingestion_service as material_ingestion_service_module  # noqa: E402
+from app.services import material_search_index as material_search_index_module  # noqa: E402
+from app.services import material_service as material_service_module  # noqa: E402
+from app.services import pdf_ocr_service as pdf_ocr_service_module  # noqa: E402
+from app.services.account_membership_service import AccountMembershipService  # noqa: E402
 from app.services.account_resource_sync_service import AccountResourceSyncService  # noqa: E402
+from app.services.auth_context_cache import auth_context_cache  # noqa: E402
+from app.services.book_chunk_checkpoints import book_chunk_checkpoints, chunk_hash  # noqa: E402
+from app.services.book_chunk_fingerprints import book_chunk_fingerprints  # noqa: E402
+from app.services.book_chunker import BookChunker  # noqa: E402
+from app.services.book_import_dispatcher import BookImportDispatcher  # noqa: E402
 from app.services.book_import_task_service import BookImportTaskTracker, book_import_task_tracker  # noqa: E402
+from app.services.context_bridge import ContextBridge  # noqa: E402
+from app.services.extraction_cache import ExtractionCache, extraction_cache  # noqa: E402
+from app.services.extraction_pool import ExtractionLimitError, ExtractionPool  # noqa: E402
+from app.services.ocr_page_cache import ocr_page_cache  # noqa: E402
+from app.services.near_duplicates import NearDuplicateFilter, simhash  # noqa: E402
+from app.services.material_ingest_dispatcher import MaterialIngestDispatcher, material_ingest_dispatcher  # noqa: E402
+from app.services.progress_broker import ProgressBroker  # noqa: E402
+from app.services.progress_stream_service import UPLOAD_TERMINAL_STATUSES, ProgressStreamService  # noqa: E402
+from app.services.rate_limiter import RateLimiter, rate_limiter  # noqa: E402
+from app.services.material_service import MaterialService  # noqa: E402
 from app.services.rbac_service import RBACService  # noqa: E402
-from app.services.upload_progress_service import upload_progress_tracker  # noqa: E402
+from app.services.state_backend import (  # noqa: E402
+    INSTANCE_ID,
+    DatabaseStateBackend,
+    LocalStateBackend,
+    check_worker_support,
+    configured_worker_count,
+)
+from app.services.upload_progress_service import UploadProgressTracker, upload_progress_tracker  # noqa: E402
+from app.services.upload_storage import StoredUpload, store_stream  # noqa: E402
 
 
 class BackendRegressionTests(unittest.TestCase):
@@ -69,6 +114,11 @@ class BackendRegressionTests(unittest.TestCase):
         with engine.begin() as conn:
             conn.execute(text('DROP TABLE IF EXISTS alembic_version'))
         ensure_account_schema(engine, run_post_schema_tasks=False)
+        auth_context_cache.invalidate(shared=False)
+        # User ids restart with every test database, so buckets must not carry over.
+        rate_limiter._state_backend = LocalStateBackend()
+        extraction_cache.clear()
+        ocr_page_cache.clear()
 
     def _db(self):
         return SessionLocal()
@@ -248,6 +298,117 @@ class BackendRegressionTests(unittest.TestCase):
         payload = allowed.json()
         self.assertTrue(any(item["code"] == "accounts:read" for item in payload.get("items", [])))
 
+    def test_auth_context_is_cached_until_access_changes(self) -> None:
+        admin = self._create_user("cache_admin", role_codes=["admin"], legacy_role="admin")
+        user = self._create_user("cache_writer", role_codes=["writer"])
+        headers = self._auth_headers(user.id)
+        self.assertEqual(self.client.get("/api/auth/permissions", headers=headers).status_code, 200)
+
+        statements: list[str] = []
+
+        def record(_conn, _cursor, statement, *_args) -> None:
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            response = self.client.get("/api/auth/permissions", headers=headers)
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        self.assertEqual(response.status_code, 200, response.text)
+        self.assertIn("materials:read", response.json()["permissions"])
+        self.assertEqual([sql for sql in statements if "shared_" not in sql], [])
+
+        def assert_invalidated(change) -> None:
+            self.client.get("/api/auth/permissions", headers=headers)
+            self.assertIsNotNone(auth_context_cache.get(user.id))
+            db = self._db()
+            try:
+                change(db)
+                db.commit()
+            finally:
+                db.close()
+            self.assertIsNone(auth_context_cache.get(user.id))
+
+        assert_invalidated(lambda db: RBACService(db).set_user_roles(db.get(User, user.id), ["admin"]))
+        self.assertIn("accounts:read", self.client.get("/api/auth/permissions", headers=headers).json()["permissions"])
+        assert_invalidated(
+            lambda db: RBACService(db).set_role_permissions(
+                RBACService(db).get_role_by_code(1, "admin"), ["accounts:write", "materials:read"]
+            )
+        )
+        self.assertEqual(
+            self.client.get("/api/auth/permissions", headers=headers).json()["permissions"],
+            ["accounts:write", "materials:read"],
+        )
+
+        db = self._db()
+        try:
+            db.add(Account(id=2, code="cache-2", name="Cache Account", status="active"))
+            db.commit()
+        finally:
+            db.close()
+        assert_invalidated(
+            lambda db: AccountMembershipService(db).rebind_user(
+                db.get(User, user.id), target_account_id=2, migrate_data=False
+            )
+        )
+
+        self.client.get("/api/auth/permissions", headers=headers)
+        self.assertIsNotNone(auth_context_cache.get(user.id))
+        response = self.client.put("/api/accounts/2/status", json={"status": "disabled"}, headers=self._auth_headers(admin.id))
+        self.assertEqual(response.status_code, 200, response.text)
+        self.assertIsNone(auth_context_cache.get(user.id))
+        self.assertEqual(self.client.get("/api/auth/permissions", headers=headers).status_code, 403)
+
+    def test_claims_token_authorizes_without_queries_until_epoch_bumps(self) -> None:
+        admin = self._create_user("claims_admin", role_codes=["admin"], legacy_role="admin")
+        user = self._create_user("claims_writer", role_codes=["writer"])
+        db = self._db()
+        try:
+            epoch = db.get(Account, 1).auth_epoch
+        finally:
+            db.close()
+        with patch.object(auth_module.settings, "auth_token_claims", True):
+            login = self.client.post("/api/auth/login", json={"username": user.username, "password": "password123"})
+            self.assertEqual(login.status_code, 200, login.text)
+            headers = {"Authorization": f"Bearer {login.json()['token']}"}
+            self.assertEqual(self.client.get("/api/auth/permissions", headers=headers).status_code, 200)
+
+            statements: list[str] = []
+
+            def record(_conn, _cursor, statement, *_args) -> None:
+                statements.append(statement)
+
+            event.listen(engine, "before_cursor_execute", record)
+            try:
+                response = self.client.get("/api/auth/permissions", headers=headers)
+            finally:
+                event.remove(engine, "before_cursor_execute", record)
+            self.assertEqual(response.status_code, 200, response.text)
+            self.assertIn("materials:read", response.json()["permissions"])
+            self.assertEqual([sql for sql in statements if "shared_" not in sql], [])
+            self.assertIsNone(auth_context_cache.get(user.id))
+
+            # Profile edits load the remaining columns lazily and do not revoke the claims.
+            profile = self.client.put("/api/auth/profile", json={"display_name": "Renamed"}, headers=headers)
+            self.assertEqual(profile.status_code, 200, profile.text)
+            db = self._db()
+            try:
+                self.assertEqual(db.get(Account, 1).auth_epoch, epoch)
+                rbac = RBACService(db)
+                rbac.set_role_permissions(rbac.get_role_by_code(1, "writer"), ["materials:write"])
+                db.commit()
+                self.assertEqual(db.get(Account, 1).auth_epoch, epoch + 1)
+            finally:
+                db.close()
+            self.assertEqual(
+                self.client.get("/api/auth/permissions", headers=headers).json()["permissions"], ["materials:write"]
+            )
+
+            response = self.client.put("/api/accounts/1/status", json={"status": "disabled"}, headers=self._auth_headers(admin.id))
+            self.assertEqual(response.status_code, 200, response.text)
+            self.assertEqual(self.client.get("/api/auth/permissions", headers=headers).status_code, 403)
+
     def test_auth_serialized_responses(self) -> None:
         user = self._create_user('auth_shape_user', role_codes=['writer'])
 
@@ -717,23 +878,854 @@ class BackendRegressionTests(unittest.TestCase):
             "llm_analysis": {"opening_pattern": "直接开头"},
         }
 
-        with patch.object(material_ingestion_service_module.MaterialService, "save_upload", return_value=str(TEMP_DIR / "fake-upload.txt")):
-            with patch.object(material_ingestion_service_module.MaterialService, "extract_text", return_value="这是测试素材正文"):
-                with patch.object(material_ingestion_service_module.MaterialService, "guess_title", return_value="测试材料"):
-                    with patch.object(material_ingestion_service_module.LLMService, "invoke_async", AsyncMock(return_value=llm_payload)):
-                        with patch.object(material_ingestion_service_module.StyleAnalyzer, "analyze", return_value=style_features):
-                            with patch.object(materials_api.ctx_bridge, "add_material", AsyncMock(side_effect=RuntimeError("ov down"))):
-                                response = self.client.post(
-                                    "/api/materials/upload",
-                                    headers=headers,
-                                    files={"file": ("warning.txt", b"test-content", "text/plain")},
-                                )
+        # Extraction runs in worker processes, so the stored file is real rather than patched.
+        stored_path = TEMP_DIR / "warning-upload.txt"
+        stored_path.write_text("这是测试素材正文", encoding="utf-8")
+        with patch.object(
+            material_ingestion_service_module.MaterialService,
+            "save_upload",
+            return_value=StoredUpload(path=str(stored_path), size=12, sha256="0" * 64),
+        ):
+            with patch.object(material_ingestion_service_module.MaterialService, "guess_title", return_value="测试材料"):
+                with patch.object(material_ingestion_service_module.LLMService, "invoke_async", AsyncMock(return_value=llm_payload)):
+                    with patch.object(material_ingestion_service_module.StyleAnalyzer, "analyze", return_value=style_features):
+                        with patch.object(ContextBridge, "add_material", AsyncMock(side_effect=RuntimeError("ov down"))):
+                            response = self.client.post(
+                                "/api/materials/upload",
+                                headers=headers,
+                                files={"file": ("warning.txt", b"test-content", "text/plain")},
+                            )
+                            self.assertEqual(response.status_code, 202, response.text)
+                            task_id = response.json()["task_id"]
+                            material_ingest_dispatcher.join(task_id, timeout=30)
+
+        task = self.client.get(f"/api/materials/upload-tasks/{task_id}", headers=headers).json()
+        self.assertEqual((task["status"], task["message"]), ("completed", "部分增强处理已降级"))
+        db = self._db()
+        try:
+            job = db.query(MaterialIngestJob).filter(MaterialIngestJob.task_id == task_id).one()
+            material = db.get(Material, job.material_id)
+            self.assertEqual(material.title, "测试材料")
+            self.assertIn("知识库同步未完成", job.message)
+        finally:
+            db.close()
 
-        self.assertEqual(response.status_code, 200, response.text)
-        payload = response.json()
-        self.assertEqual(payload["title"], "测试材料")
-        self.assertIn("warnings", payload)
-        self.assertTrue(any("知识库同步未完成" in item for item in payload["warnings"]))
+    def test_duplicate_material_upload_short_circuits_on_content_hash(self) -> None:
+        owner = self._create_user("dedupe_owner")
+        teammate = self._create_user("dedupe_teammate")
+        upload_dir = TEMP_DIR / "dedupe-uploads"
+        llm_payload = json.dumps({"title": "模板", "doc_type": "其他", "summary": "摘要", "keywords": ["模板"]}, ensure_ascii=False)
+        llm = AsyncMock(return_value=llm_payload)
+        add_material = AsyncMock()
+
+        def upload(user_id: int, **data) -> MaterialIngestJob:
+            response = self.client.post(
+                "/api/materials/upload",
+                headers=self._auth_headers(user_id),
+                data=data,
+                files={"file": ("template.txt", "通用模板正文".encode("utf-8"), "text/plain")},
+            )
+            self.assertEqual(response.status_code, 202, response.text)
+            task_id = response.json()["task_id"]
+            material_ingest_dispatcher.join(task_id, timeout=30)
+            db = self._db()
+            try:
+                return db.query(MaterialIngestJob).filter(MaterialIngestJob.task_id == task_id).one()
+            finally:
+                db.close()
+
+        with patch.object(material_service_module.settings, "upload_dir", str(upload_dir)), patch.object(
+            material_ingestion_service_module.LLMService, "invoke_async", llm
+        ), patch.object(material_ingestion_service_module.StyleAnalyzer, "analyze", return_value=None), patch.object(
+            ContextBridge, "add_material", add_material
+        ):
+            first = upload(owner.id)
+            again = upload(owner.id)
+            separate = upload(owner.id, allow_duplicate="true")
+            shared = upload(teammate.id)
+
+        self.assertEqual({job.status for job in (first, again, separate, shared)}, {"completed"})
+        self.assertFalse(first.duplicate)
+        self.assertTrue(again.duplicate)
+        self.assertEqual(again.material_id, first.material_id)
+        self.assertNotIn(separate.material_id, {first.material_id, shared.material_id})
+        self.assertEqual(
+            self.client.get(f"/api/materials/{separate.material_id}", headers=self._auth_headers(owner.id)).json()["title"],
+            "模板",
+        )
+        self.assertEqual(llm.await_count, 1)
+        self.assertEqual(add_material.await_count, 1)
+        stored_files = list(upload_dir.iterdir())
+        self.assertEqual(len(stored_files), 1)
+
+        db = self._db()
+        try:
+            rows = db.query(Material).order_by(Material.id.asc()).all()
+            self.assertEqual({row.file_path for row in rows}, {str(stored_files[0])})
+            self.assertEqual(len({row.content_hash for row in rows}), 1)
+            svc = MaterialService(db)
+            for row in rows[:-1]:
+                self.assertIsNone(svc.delete_material(row.id, account_id=1))
+            self.assertTrue(stored_files[0].exists())
+            self.assertEqual(svc.delete_material(rows[-1].id, account_id=1), str(stored_files[0]))
+        finally:
+            db.close()
+        self.assertFalse(stored_files[0].exists())
+
+    def test_duplicate_upload_replaces_missing_file_and_copies_search_index(self) -> None:
+        owner = self._create_user("dedupe_missing_owner")
+        upload_dir = TEMP_DIR / "dedupe-missing-uploads"
+        llm_payload = json.dumps({"title": "报告", "doc_type": "其他", "summary": "摘要", "keywords": ["报告"]}, ensure_ascii=False)
+
+        def upload(**data) -> MaterialIngestJob:
+            response = self.client.post(
+                "/api/materials/upload",
+                headers=self._auth_headers(owner.id),
+                data=data,
+                files={"file": ("report.txt", "年度工作报告正文".encode("utf-8"), "text/plain")},
+            )
+            self.assertEqual(response.status_code, 202, response.text)
+            task_id = response.json()["task_id"]
+            material_ingest_dispatcher.join(task_id, timeout=30)
+            db = self._db()
+            try:
+                return db.query(MaterialIngestJob).filter(MaterialIngestJob.task_id == task_id).one()
+            finally:
+                db.close()
+
+        def material(material_id: int) -> Material:
+            db = self._db()
+            try:
+                return db.query(Material).filter(Material.id == material_id).one()
+            finally:
+                db.close()
+
+        with patch.object(material_service_module.settings, "upload_dir", str(upload_dir)), patch.object(
+            material_ingestion_service_module.LLMService, "invoke_async", AsyncMock(return_value=llm_payload)
+        ), patch.object(material_ingestion_service_module.StyleAnalyzer, "analyze", return_value=None), patch.object(
+            ContextBridge, "add_material", AsyncMock()
+        ):
+            first = upload()
+            Path(material(first.material_id).file_path).unlink()
+            again = upload()
+            # A copy reuses the original's index values instead of segmenting its text again.
+            with patch.object(
+                material_search_index_module, "index_values", side_effect=AssertionError("segmented again")
+            ):
+                copy = upload(allow_duplicate="true")
+
+        self.assertTrue(again.duplicate)
+        self.assertEqual(again.material_id, first.material_id)
+        restored = material(first.material_id).file_path
+        self.assertTrue(Path(restored).exists())
+        self.assertEqual([path.name for path in upload_dir.iterdir()], [Path(restored).name])
+        self.assertEqual(copy.status, "completed")
+        self.assertEqual(material(copy.material_id).file_path, restored)
+        db = self._db()
+        try:
+            connection = db.connection()
+            original = material_search_index_module.stored_values(connection, first.material_id)
+            self.assertIn("年度", original["content"])
+            self.assertEqual(material_search_index_module.stored_values(connection, copy.material_id), original)
+        finally:
+            db.close()
+
+    def test_material_ingest_jobs_survive_restart_and_stale_workers(self) -> None:
+        user = self._create_user("ingest_resume_user")
+        now = datetime.now(timezone.utc)
+        stale = now - timedelta(hours=1)
+        db = self._db()
+        try:
+            for task_id, status, attempts, heartbeat in (
+                ("resume-queued", "queued", 0, None),
+                ("resume-stale", "running", 1, stale),
+                ("resume-exhausted", "running", 3, stale),
+                ("resume-alive", "running", 1, now),
+            ):
+                (TEMP_DIR / f"{task_id}.txt").write_text(task_id, encoding="utf-8")
+                db.add(
+                    MaterialIngestJob(
+                        task_id=task_id,
+                        account_id=user.account_id,
+                        user_id=user.id,
+                        filename=f"{task_id}.txt",
+                        file_path=str(TEMP_DIR / f"{task_id}.txt"),
+                        file_size=len(task_id),
+                        content_hash=hashlib.sha256(task_id.encode("utf-8")).hexdigest(),
+                        status=status,
+                        attempts=attempts,
+                        heartbeat_at=heartbeat,
+                    )
+                )
+            db.commit()
+        finally:
+            db.close()
+
+        llm_payload = json.dumps({"title": "恢复", "doc_type": "其他", "summary": "摘要", "keywords": []}, ensure_ascii=False)
+        dispatcher = MaterialIngestDispatcher(max_workers=2, stale_seconds=60)
+        try:
+            with patch.object(
+                material_ingestion_service_module.LLMService, "invoke_async", AsyncMock(return_value=llm_payload)
+            ), patch.object(material_ingestion_service_module.StyleAnalyzer, "analyze", return_value=None), patch.object(
+                ContextBridge, "add_material", AsyncMock()
+            ):
+                self.assertEqual(dispatcher.resume_pending_jobs(), 2)
+                dispatcher.join("resume-queued", timeout=30)
+                dispatcher.join("resume-stale", timeout=30)
+        finally:
+            dispatcher.shutdown(wait=True)
+
+        db = self._db()
+        try:
+            jobs = {job.task_id: job for job in db.query(MaterialIngestJob).all()}
+            self.assertEqual(jobs["resume-queued"].status, "completed")
+            self.assertEqual((jobs["resume-stale"].status, jobs["resume-stale"].attempts), ("completed", 2))
+            self.assertEqual(jobs["resume-exhausted"].status, "failed")
+            self.assertEqual(jobs["resume-alive"].status, "running")
+            self.assertEqual(db.query(Material).count(), 2)
+        finally:
+            db.close()
+        headers = self._auth_headers(user.id)
+        task = self.client.get("/api/materials/upload-tasks/resume-exhausted", headers=headers).json()
+        self.assertEqual((task["status"], task["message"]), ("failed", "多次处理中断，请重新上传"))
+
+    def test_crashed_material_batch_requeues_its_unfinished_files(self) -> None:
+        user = self._create_user("batch_crash_user")
+        files = []
+        for index in range(3):
+            path = TEMP_DIR / f"batch-crash-{index}.txt"
+            path.write_text(f"批量中断素材 {index}", encoding="utf-8")
+            digest = hashlib.sha256(path.read_bytes()).hexdigest()
+            files.append((path.name, StoredUpload(path=str(path), size=path.stat().st_size, sha256=digest)))
+
+        async def crash(_self, items, *, context_bridge, item_callback=None, allow_duplicate=False) -> None:
+            item_callback(items[0].key, None, "首个文件失败")
+            raise RuntimeError("batch worker crashed")
+
+        llm_payload = json.dumps({"title": "重试", "doc_type": "其他", "summary": "摘要", "keywords": []}, ensure_ascii=False)
+        dispatcher = MaterialIngestDispatcher(max_workers=2, stale_seconds=60)
+        db = self._db()
+        try:
+            with patch.object(material_ingestion_service_module.MaterialIngestionService, "ingest_batch", crash), patch.object(
+                material_ingestion_service_module.LLMService, "invoke_async", AsyncMock(return_value=llm_payload)
+            ), patch.object(material_ingestion_service_module.StyleAnalyzer, "analyze", return_value=None), patch.object(
+                ContextBridge, "add_material", AsyncMock()
+            ):
+                dispatcher.enqueue_batch(db, batch_id="batch-crash", account_id=user.account_id, user_id=user.id, files=files)
+                dispatcher.join("batch-crash", timeout=30)
+                for index in (1, 2):
+                    dispatcher.join(f"batch-crash:{index}", timeout=30)
+            jobs = {job.task_id: job for job in db.query(MaterialIngestJob).filter(MaterialIngestJob.batch_id == "batch-crash")}
+        finally:
+            db.close()
+            dispatcher.shutdown(wait=True)
+
+        # The file the batch finished keeps its result; the others ran again as single jobs.
+        self.assertEqual((jobs["batch-crash:0"].status, jobs["batch-crash:0"].message), ("failed", "首个文件失败"))
+        for index in (1, 2):
+            self.assertEqual((jobs[f"batch-crash:{index}"].status, jobs[f"batch-crash:{index}"].attempts), ("completed", 2))
+        batch = self.client.get("/api/materials/upload-batches/batch-crash", headers=self._auth_headers(user.id)).json()
+        self.assertEqual(batch["message"], "批量处理中断，未完成的 2 个文件将自动重试")
+
+    def test_batch_material_upload_bounds_llm_work_and_reports_each_file(self) -> None:
+        user = self._create_user("batch_upload_user")
+        headers = self._auth_headers(user.id)
+        running = {"now": 0, "peak": 0}
+
+        async def analyse(_prompt: str) -> str:
+            running["now"] += 1
+            running["peak"] = max(running["peak"], running["now"])
+            await asyncio.sleep(0.05)
+            running["now"] -= 1
+            return json.dumps({"title": "批量", "doc_type": "通知", "summary": "摘要", "keywords": ["批量"]}, ensure_ascii=False)
+
+        style_features = {"statistics": {"avg_sentence_length": 10.0}}
+        files = [("files", (f"doc-{index}.txt", f"批量素材正文 {index}".encode("utf-8"), "text/plain")) for index in range(4)]
+        files.append(("files", ("doc-0-copy.txt", "批量素材正文 0".encode("utf-8"), "text/plain")))
+        files.append(("files", ("empty.txt", b"   ", "text/plain")))
+
+        with patch.object(material_service_module.settings, "upload_dir", str(TEMP_DIR / "batch-uploads")), patch.object(
+            material_ingestion_service_module.settings, "material_batch_llm_concurrency", 2
+        ), patch.object(material_ingestion_service_module.LLMService, "invoke_async", side_effect=analyse), patch.object(
+            material_ingestion_service_module.StyleAnalyzer, "analyze", return_value=style_features
+        ), patch.object(ContextBridge, "add_material", AsyncMock()) as add_material:
+            response = self.client.post("/api/materials/upload-batch", headers=headers, files=files)
+            self.assertEqual(response.status_code, 202, response.text)
+            accepted = response.json()
+            self.assertEqual(len(accepted["files"]), 6)
+            material_ingest_dispatcher.join(accepted["task_id"], timeout=120)
+
+        batch = self.client.get(f"/api/materials/upload-batches/{accepted['task_id']}", headers=headers).json()
+        self.assertEqual((batch["status"], batch["parse_progress"]), ("completed", 100))
+        self.assertEqual(batch["message"], "成功 5 个，失败 1 个")
+        by_name = {item["filename"]: item for item in batch["files"]}
+        self.assertEqual(by_name["empty.txt"]["status"], "failed")
+        self.assertEqual(by_name["empty.txt"]["message"], "文件内容为空，无法处理")
+        self.assertTrue(by_name["doc-0-copy.txt"]["duplicate"])
+        self.assertEqual(by_name["doc-0-copy.txt"]["material_id"], by_name["doc-0.txt"]["material_id"])
+        self.assertEqual(len({by_name[f"doc-{index}.txt"]["material_id"] for index in range(4)}), 4)
+        self.assertEqual(running["peak"], 2)
+        self.assertEqual(add_material.await_count, 4)
+
+        db = self._db()
+        try:
+            profile = db.query(StyleProfile).filter(StyleProfile.doc_type == "通知").one()
+            self.assertEqual(profile.sample_count, 4)
+        finally:
+            db.close()
+
+    def test_extraction_pool_enforces_limits_and_recovers(self) -> None:
+        pool = ExtractionPool(max_workers=1, max_tasks_per_child=2, memory_mb=0, cpu_seconds=30, timeout_seconds=1)
+
+        async def scenario() -> list:
+            outcomes = []
+            # Builtins pickle by reference, so spawned workers can run them without importing this module.
+            for fn, args, limits in (
+                (time.sleep, (30,), {}),
+                (exec, ("while True: pass",), {"timeout": 20, "cpu_seconds": 1}),
+                (pow, (2, 10), {}),
+                (pow, (3, 3), {}),
+            ):
+                try:
+                    outcomes.append(await pool.run(fn, *args, **limits))
+                except ExtractionLimitError as exc:
+                    outcomes.append(exc.message)
+            return outcomes
+
+        started = time.monotonic()
+        try:
+            outcomes = asyncio.run(scenario())
+        finally:
+            pool.shutdown(wait=True)
+
+        self.assertEqual(outcomes, ["文件解析超时", "文件解析超出 CPU 时间限制", 1024, 27])
+        self.assertLess(time.monotonic() - started, 25)
+
+    def test_extraction_pool_times_jobs_from_their_start_and_only_kills_the_stuck_worker(self) -> None:
+        # A worker that ignores its alarm, as one stuck in C code would.
+        stuck = "import signal, time\nsignal.signal(signal.SIGALRM, signal.SIG_IGN)\ntime.sleep(30)"
+
+        async def queued_behind_long_job() -> list:
+            pool = ExtractionPool(max_workers=1, max_tasks_per_child=10, memory_mb=0, cpu_seconds=30, timeout_seconds=30)
+            try:
+                return await asyncio.gather(pool.run(time.sleep, 2, timeout=5), pool.run(pow, 2, 10, timeout=0.2))
+            finally:
+                pool.shutdown(wait=True)
+
+        async def stuck_next_to_running_job() -> list:
+            pool = ExtractionPool(max_workers=2, max_tasks_per_child=10, memory_mb=0, cpu_seconds=30, timeout_seconds=30)
+            try:
+                long_job = asyncio.ensure_future(pool.run(time.sleep, 3, timeout=10))
+                await asyncio.sleep(0.5)
+                outcomes: list = []
+                try:
+                    outcomes.append(await pool.run(exec, stuck, timeout=0.5))
+                except ExtractionLimitError as exc:
+                    outcomes.append(exc.message)
+                outcomes.append(await long_job)
+                outcomes.append(await pool.run(pow, 3, 3))
+                return outcomes
+            finally:
+                pool.shutdown(wait=True)
+
+        with patch("app.services.extraction_pool.KILL_GRACE_SECONDS", 0.5):
+            # The queued job's 0.2s (+0.5s grace) only starts once the 2s job has freed the worker.
+            self.assertEqual(asyncio.run(queued_behind_long_job()), [None, 1024])
+            # Killing the stuck worker leaves the job in the other worker running, and the pool keeps working.
+            self.assertEqual(asyncio.run(stuck_next_to_running_job()), ["文件解析超时", None, 27])
+
+    def test_extraction_cache_reuses_results_by_hash_and_settings(self) -> None:
+        cache = ExtractionCache(TEMP_DIR / "cache-test", max_bytes=10 * 1024 * 1024)
+        cache.clear()
+        parsed_pdf = {
+            "chapters": [{"chapter_title": "Page 1", "text": "第一页", "page_start": 1, "page_end": 1}],
+            "ocr_used": True,
+            "ocr_pages": 1,
+            "total_pages": 1,
+        }
+        runs = AsyncMock(side_effect=[parsed_pdf, dict(parsed_pdf, ocr_pages=2)])
+
+        async def fetch_twice() -> list:
+            return [await cache.fetch("pdf", "a" * 64, len, "book.pdf") for _ in range(2)]
+
+        with patch("app.services.extraction_cache.extraction_pool.run", runs):
+            self.assertEqual(asyncio.run(fetch_twice()), [parsed_pdf, parsed_pdf])
+            self.assertEqual(runs.await_count, 1)
+            # Other OCR settings make a new key, and the old entry is reported stale.
+            with patch.object(extraction_cache_module.settings, "pdf_ocr_dpi", 150):
+                self.assertEqual(asyncio.run(cache.fetch("pdf", "a" * 64, len, "book.pdf"))["ocr_pages"], 2)
+                self.assertEqual(cache.prune(stale=True, execute=False)["removed"], 1)
+        self.assertEqual(cache.get("material", "a" * 64, ".txt"), None)
+
+        cache.put("material", "b" * 64, "素材正文", ".txt")
+        self.assertEqual(cache.get("material", "b" * 64, ".txt"), "素材正文")
+        self.assertIsNone(cache.get("material", "b" * 64, ".docx"))
+
+        # A truncated entry is a miss and is removed rather than served.
+        corrupt = cache.path_for("material", "b" * 64, ".txt")
+        corrupt.write_bytes(corrupt.read_bytes()[:10])
+        self.assertIsNone(cache.get("material", "b" * 64, ".txt"))
+        self.assertFalse(corrupt.exists())
+
+        # Past the size cap the least recently used entries go first.
+        oldest, newest = sorted(cache.entries(), key=lambda entry: entry.last_used)
+        os.utime(oldest.path, (oldest.last_used - 60, oldest.last_used - 60))
+        ExtractionCache(cache.root, max_bytes=newest.size).evict()
+        self.assertEqual([entry.path for entry in cache.entries()], [newest.path])
+
+    def test_abandoned_extraction_stream_stops_its_worker(self) -> None:
+        cache = ExtractionCache(TEMP_DIR / "cache-stream-stop", max_bytes=10 * 1024 * 1024)
+        produced: list[int] = []
+        finished = threading.Event()
+
+        def pages(_path: str, meta: dict):
+            for number in range(1, 201):
+                produced.append(number)
+                time.sleep(0.01)
+                yield {"chapter_title": f"Page {number}", "text": f"第{number}页"}
+            meta["total_pages"] = 200
+
+        async def run_in_thread(fn, *args, **_limits):
+            return await asyncio.to_thread(fn, *args)
+
+        async def read_two() -> list:
+            stream = cache.stream("pdf", "c" * 64, pages, "book.pdf", on_extracted=finished.set)
+            read = []
+            async with aclosing(stream.__aiter__()) as items:
+                async for item in items:
+                    read.append(item["chapter_title"])
+                    if len(read) == 2:
+                        break
+            await asyncio.to_thread(finished.wait, 5)
+            return read
+
+        with patch("app.services.extraction_cache.extraction_pool.run", run_in_thread):
+            self.assertEqual(asyncio.run(read_two()), ["Page 1", "Page 2"])
+        self.assertTrue(finished.is_set())
+        # The worker stopped soon after the reader left instead of extracting all 200 pages.
+        self.assertLess(len(produced), 20)
+        # The spool lived in the cache directory and is gone, and nothing half-read was cached.
+        self.assertEqual(list(cache.root.glob(".spool-*")), [])
+        self.assertIsNone(cache.get("pdf", "c" * 64))
+
+    def test_scan_books_only_hashes_new_or_changed_files(self) -> None:
+        books_dir = TEMP_DIR / "books-fingerprint"
+        (books_dir / "sub").mkdir(parents=True, exist_ok=True)
+        old = time.time() - 3600
+        for name, content in (("a.epub", b"book-a"), ("sub/b.pdf", b"book-b"), ("c.pdf", b"book-c")):
+            (books_dir / name).write_bytes(content)
+            os.utime(books_dir / name, (old, old))
+
+        db = self._db()
+        try:
+            with patch.object(book_import_service_module.settings, "books_dir", str(books_dir)), patch(
+                "app.services.book_fingerprint_index.sha256_file", wraps=book_fingerprint_index_module.sha256_file
+            ) as hashed:
+                service = book_import_service_module.BookImportService(db)
+                first = {item["relative_path"]: item["source_hash"] for item in service.scan_books()}
+                self.assertEqual(hashed.call_count, 3)
+                self.assertEqual(first["sub/b.pdf"], hashlib.sha256(b"book-b").hexdigest())
+
+                hashed.reset_mock()
+                self.assertEqual({item["relative_path"]: item["source_hash"] for item in service.scan_books()}, first)
+                self.assertEqual(hashed.call_count, 0)
+
+                (books_dir / "a.epub").write_bytes(b"book-a-v2")
+                os.utime(books_dir / "a.epub", (old + 60, old + 60))
+                (books_dir / "c.pdf").unlink()
+                second = {item["relative_path"]: item["source_hash"] for item in service.scan_books()}
+                self.assertEqual(hashed.call_count, 1)
+                self.assertEqual(second, {"a.epub": hashlib.sha256(b"book-a-v2").hexdigest(), "sub/b.pdf": first["sub/b.pdf"]})
+            self.assertEqual(
+                sorted(row.relative_path for row in db.query(BookFileFingerprint).all()),
+                ["a.epub", "sub/b.pdf"],
+            )
+        finally:
+            db.close()
+
+    def test_book_import_pipeline_overlaps_files_and_batches_writes(self) -> None:
+        def book(name: str, source_hash: str) -> dict:
+            return {
+                "source_name": name,
+                "relative_path": name,
+                "absolute_path": str(TEMP_DIR / name),
+                "file_ext": Path(name).suffix,
+                "file_size": 1,
+                "source_hash": source_hash,
+            }
+
+        files = [book("a.pdf", "1" * 64), book("b.pdf", "2" * 64), book("copy/b.pdf", "2" * 64), book("c.epub", "3" * 64)]
+        chapters = {
+            "1" * 64: [{"chapter_title": "一", "text": "正文甲"}],
+            "2" * 64: [{"chapter_title": "一", "text": "正文乙"}, {"chapter_title": "坏章", "text": "正文丙"}],
+        }
+        in_flight = {"now": 0, "max": 0}
+        in_flight_lock = threading.Lock()
+
+        def iter_pdf(_path: str, source_hash: str, meta: dict):
+            with in_flight_lock:
+                in_flight["now"] += 1
+                in_flight["max"] = max(in_flight["max"], in_flight["now"])
+            try:
+                time.sleep(0.05)
+                yield from chapters[source_hash]
+                meta.update(ocr_used=False, ocr_pages=0)
+            finally:
+                with in_flight_lock:
+                    in_flight["now"] -= 1
+
+        def iter_epub(_path: str, _meta: dict):
+            raise FileValidationError("EPUB has no readable chapter content")
+            yield
+
+        async def run_in_thread(fn, *args, **_limits):
+            return await asyncio.to_thread(fn, *args)
+
+        async def add_book_chunk(_self, **kwargs) -> None:
+            if kwargs["chapter"] == "坏章":
+                raise RuntimeError("ov down")
+
+        analysis = {"title": "书", "doc_type": "通知", "summary": "摘要", "keywords": ["书"], "style_rules": [{"rule_text": "先讲结论"}]}
+        task_id = f"pipeline-{uuid.uuid4().hex}"
+        book_import_task_tracker.create_task(task_id, total_files=len(files), account_id=1)
+        db = self._db()
+        try:
+            service = book_import_service_module.BookImportService(db)
+            settings = book_import_service_module.settings
+            with patch.object(settings, "book_import_parse_concurrency", 2), patch.object(
+                settings, "book_import_write_batch_size", 2
+            ), patch.object(book_import_service_module, "iter_pdf_file", iter_pdf), patch.object(
+                book_import_service_module, "iter_epub", iter_epub
+            ), patch.object(extraction_cache_module.extraction_pool, "run", run_in_thread), patch.object(
+                book_import_service_module.BookImportService, "_analyze_book_once", return_value=analysis
+            ), patch.object(ContextBridge, "add_book_chunk", add_book_chunk), patch.object(
+                service, "_persist_outcomes", wraps=service._persist_outcomes
+            ) as persist:
+                asyncio.run(service._execute_import(task_id, files, rebuild=False))
+
+            self.assertEqual(in_flight["max"], 2)
+            self.assertLess(persist.call_count, 3)
+            task = book_import_task_tracker.get(task_id)
+            self.assertEqual(
+                (task["status"], task["completed_files"], task["skipped_files"], task["partial_files"], task["failed_files"]),
+                ("partial", 4, 1, 1, 1),
+            )
+            self.assertEqual((task["total_chunks"], task["completed_chunks"]), (3, 3))
+            rows = {row.source_hash: row for row in db.query(BookSource).all()}
+            self.assertEqual(
+                {key: (row.status, row.chunk_count) for key, row in rows.items()},
+                {"1" * 64: ("completed", 1), "2" * 64: ("partial", 1), "3" * 64: ("failed", 0)},
+            )
+            self.assertEqual(db.query(BookStyleRule).count(), 2)
+        finally:
+            db.close()
+
+    def test_resumed_book_import_skips_finished_files_and_checkpointed_chunks(self) -> None:
+        def book(name: str, source_hash: str) -> dict:
+            return {
+                "source_name": name,
+                "relative_path": name,
+                "absolute_path": str(TEMP_DIR / name),
+                "file_ext": Path(name).suffix,
+                "file_size": 1,
+                "source_hash": source_hash,
+            }
+
+        done_book, resumed_book = book("done.pdf", "4" * 64), book("resumed.pdf", "5" * 64)
+        chapters = {
+            done_book["source_hash"]: [{"chapter_title": "一", "text": "正文甲"}],
+            resumed_book["source_hash"]: [{"chapter_title": f"第{n}章", "text": f"正文{n}"} for n in (1, 2, 3)],
+        }
+        parsed: list[str] = []
+        sent: list[tuple[str, str]] = []
+
+        def iter_pdf(path: str, source_hash: str, _meta: dict):
+            parsed.append(Path(path).name)
+            yield from chapters[source_hash]
+
+        async def run_in_thread(fn, *args, **_limits):
+            return await asyncio.to_thread(fn, *args)
+
+        async def add_book_chunk(_self, **kwargs) -> None:
+            sent.append((kwargs["chapter"], kwargs["targets"][0].rsplit("/", 1)[-1]))
+
+        analysis = {"title": "书", "doc_type": "通知", "summary": "摘要", "keywords": ["书"], "style_rules": []}
+        task_id = f"resume-{uuid.uuid4().hex}"
+        stale_task_id = book_import_task_tracker.active_task_id(1)
+        if stale_task_id is not None:
+            # Other tests reserve the account's import slot without running the task.
+            book_import_task_tracker.release_slot(stale_task_id, 1)
+        book_import_task_tracker.create_task(task_id, total_files=2, rebuild=True, account_id=1)
+        db = self._db()
+        try:
+            service = book_import_service_module.BookImportService(db)
+            with patch.object(book_import_service_module, "iter_pdf_file", iter_pdf), patch.object(
+                extraction_cache_module.extraction_pool, "run", run_in_thread
+            ), patch.object(
+                book_import_service_module.BookImportService, "_analyze_book_once", return_value=analysis
+            ), patch.object(ContextBridge, "add_book_chunk", add_book_chunk), patch.object(
+                ContextBridge, "clear_namespace", AsyncMock()
+            ) as clear_namespace, patch.object(
+                book_import_service_module.BookImportService, "scan_books", return_value=[done_book, resumed_book]
+            ):
+                # First run: done.pdf is imported, then the process dies while resumed.pdf is half sent.
+                self.assertIsNotNone(book_import_task_tracker.claim_task(task_id))
+                book_import_task_tracker.restart(task_id, total_files=2)
+                asyncio.run(service._execute_import(task_id, [done_book], rebuild=True))
+                targets = ContextBridge.book_chunk_targets(1, "通知")
+                chunk_rows = list(service._build_chunks(chapters[resumed_book["source_hash"]]))
+                for target in targets:
+                    book_chunk_checkpoints.record(1, resumed_book["source_hash"], chunk_hash(chunk_rows[0]), target)
+                book_chunk_checkpoints.record(1, resumed_book["source_hash"], chunk_hash(chunk_rows[1]), targets[0])
+                book_import_task_tracker.update(task_id, status="interrupted", total_chunks_add=3, completed_chunks_add=2)
+                _mark_interrupted_book_tasks()
+                self.assertEqual(clear_namespace.await_count, 1)
+
+                parsed.clear()
+                sent.clear()
+                asyncio.run(service.execute_task(task_id))
+
+            # The rebuild purge is not repeated, done.pdf is not parsed again, and only unsent chunk copies go out.
+            self.assertEqual(clear_namespace.await_count, 1)
+            self.assertEqual(parsed, ["resumed.pdf"])
+            self.assertEqual(sorted(sent), [("第2章", "common"), ("第3章", "common"), ("第3章", "通知")])
+            task = book_import_task_tracker.get(task_id)
+            self.assertEqual((task["status"], task["completed_files"], task["total_files"]), ("completed", 2, 2))
+            self.assertEqual((task["total_chunks"], task["completed_chunks"]), (4, 4))
+            row = db.query(BookSource).filter(BookSource.source_hash == resumed_book["source_hash"]).one()
+            self.assertEqual((row.status, row.chunk_count, row.metadata_["chunk_resumed"]), ("completed", 3, 1))
+            self.assertEqual(book_chunk_checkpoints.load(1, resumed_book["source_hash"]), {})
+            self.assertEqual(len(book_import_task_tracker.list_file_results(task_id)[0]), 2)
+        finally:
+            db.close()
+
+    def test_book_chunks_are_sent_while_the_book_is_still_being_parsed(self) -> None:
+        source_hash = "6" * 64
+        file_item = {
+            "source_name": "long.pdf",
+            "relative_path": "long.pdf",
+            "absolute_path": str(TEMP_DIR / "long.pdf"),
+            "file_ext": ".pdf",
+            "file_size": 1,
+            "source_hash": source_hash,
+        }
+        # Distinct text on every page, so none of it is dropped as a near-duplicate.
+        rng = random.Random(17)
+        words = "发展改革工作会议要求各地区部门坚持问题导向落实责任推进项目建设加强监督管理提升服务水平保障民生"
+        pages = [
+            {
+                "chapter_title": f"Page {page_no}",
+                "text": "".join("".join(rng.choices(words, k=rng.randint(12, 30))) + "。" for _ in range(50)),
+                "page_start": page_no,
+                "page_end": page_no,
+            }
+            for page_no in range(1, 18)
+        ]
+        first_chunk_sent = threading.Event()
+        waited: list[bool] = []
+
+        def iter_pdf(_path: str, _source_hash: str, meta: dict):
+            yield from pages[:-1]
+            # The last page only comes once a chunk of the first ones has reached OpenViking.
+            waited.append(first_chunk_sent.wait(timeout=10))
+            yield pages[-1]
+            meta.update(ocr_used=False, ocr_pages=0, total_pages=len(pages))
+
+        async def run_in_thread(fn, *args, **_limits):
+            return await asyncio.to_thread(fn, *args)
+
+        async def add_book_chunk(_self, **_kwargs) -> None:
+            first_chunk_sent.set()
+
+        analysis = {"title": "书", "doc_type": "通知", "summary": "摘要", "keywords": ["书"], "style_rules": []}
+        task_id = f"stream-{uuid.uuid4().hex}"
+        book_import_task_tracker.create_task(task_id, total_files=1, account_id=1)
+        db = self._db()
+        try:
+            service = book_import_service_module.BookImportService(db)
+            with patch.object(book_import_service_module, "iter_pdf_file", iter_pdf), patch.object(
+                extraction_cache_module.extraction_pool, "run", run_in_thread
+            ), patch.object(
+                book_import_service_module.BookImportService, "_analyze_book_once", return_value=analysis
+            ) as analyze, patch.object(ContextBridge, "add_book_chunk", add_book_chunk):
+                asyncio.run(service._execute_import(task_id, [file_item], rebuild=False))
+
+            self.assertEqual(waited, [True])
+            # The analysis only saw the opening pages that fill its window.
+            self.assertLess(len(analyze.call_args.args[1]), len(pages))
+            chunk_total = len(list(service._build_chunks(pages)))
+            task = book_import_task_tracker.get(task_id)
+            self.assertEqual((task["status"], task["total_chunks"], task["completed_chunks"]), ("completed", chunk_total, chunk_total))
+            row = db.query(BookSource).filter(BookSource.source_hash == source_hash).one()
+            self.assertEqual((row.chunk_count, row.metadata_["chapter_count"]), (chunk_total, len(pages)))
+            self.assertEqual(row.metadata_["parse_stats"]["total_pages"], len(pages))
+            # The streamed pages were cached on the way past, in the same format as a finished extraction.
+            self.assertEqual(extraction_cache.get("pdf", source_hash), {"chapters": pages, "ocr_used": False, "ocr_pages": 0, "total_pages": len(pages)})
+        finally:
+            db.close()
+
+    def test_book_chunker_follows_sentences_and_drops_furniture_and_near_duplicates(self) -> None:
+        rng = random.Random(50)
+        words = "发展改革工作会议要求各地区部门坚持问题导向落实责任推进项目建设加强监督管理提升服务水平保障民生"
+
+        def sentences(count: int) -> str:
+            return "".join("".join(rng.choices(words, k=rng.randint(12, 30))) + "。" for _ in range(count))
+
+        notice = "本书仅供内部学习使用，未经出版单位书面许可，任何单位和个人不得复制、转载或者用于其他商业用途。"
+        page_texts = [
+            f"某市公文写作手册\n第一章 总则\n{sentences(12)}各单位要",
+            f"某市公文写作手册\n高度重视。{sentences(10)}",
+            f"某市公文写作手册\n{sentences(1)}",
+            f"某市公文写作手册\n{notice}",
+            f"某市公文写作手册\n第二章 要求\n{sentences(15)}",
+            f"某市公文写作手册\n{notice}",
+        ]
+        pages = [
+            {"chapter_title": f"Page {n}", "text": f"{text}\n- {n} -", "page_start": n, "page_end": n}
+            for n, text in enumerate(page_texts, start=1)
+        ]
+        chunker = BookChunker(300, 60, page_distance=3)
+        chunks = [chunk for page in pages for chunk in chunker.feed(page)] + list(chunker.finish())
+
+        bodies = [chunk["text"].split("\n", 1)[1] for chunk in chunks]
+        # Every chunk ends on a sentence end, and a sentence cut by a page break is joined back together.
+        self.assertTrue(all(body.endswith("。") for body in bodies))
+        self.assertTrue(any("各单位要高度重视。" in body for body in bodies))
+        # Page numbers and the running header are gone, and the repeated notice page is kept only once.
+        self.assertFalse(any("- 3 -" in body for body in bodies))
+        self.assertEqual(sum(body.count("某市公文写作手册") for body in bodies), 1)
+        self.assertEqual(sum(body.count(notice) for body in bodies), 1)
+        self.assertEqual((chunker.boilerplate_lines, chunker.duplicate_pages), (11, 1))
+        # The one-sentence page is packed with its neighbours, and headings start new chunks.
+        self.assertFalse(any(chunk["page_range"] == "3-3" for chunk in chunks))
+        self.assertEqual(chunks[-1]["chapter"], "第二章 要求")
+        # A short section end is merged into the chunk before it, so a chunk may exceed the size by a quarter.
+        self.assertTrue(all(len(body) <= 300 + 300 // 4 for body in bodies))
+        self.assertLess(len(chunks), chunker.fixed_window_chunks)
+
+        # Across books: a book repeating an imported book's chapter only sends its own text.
+        chapter = {"chapter_title": "序言", "text": sentences(8)}
+        own = {"chapter_title": "第一章", "text": sentences(8)}
+        service = book_import_service_module.BookImportService(self._db())
+        book_chunk_fingerprints.replace(1, "7" * 64, "通知", [simhash(chunk["text"]) for chunk in service._build_chunks([chapter])])
+        indexes = book_chunk_fingerprints.load(1, 3)
+        shared = indexes["通知"]
+        dedupe = NearDuplicateFilter(3, shared=shared, source="8" * 64)
+        kept = list(service._build_chunks([dict(chapter, text=chapter["text"].replace("。", "；", 1) + "要"), own, chapter], dedupe))
+        self.assertEqual([chunk["chapter"] for chunk in kept], ["第一章"])
+        self.assertEqual((dedupe.dropped, len(dedupe.kept)), (2, 0))
+        # A kept chunk is only shared with other books once it was sent.
+        parallel = NearDuplicateFilter(3, shared=shared, source="9" * 64)
+        self.assertEqual(len(list(service._build_chunks([own], parallel))), 1)
+        dedupe.sent(kept[0]["text"])
+        self.assertEqual(len(dedupe.kept), 1)
+        self.assertEqual(list(service._build_chunks([own], NearDuplicateFilter(3, shared=shared, source="a" * 64))), [])
+        # A book of another doc_type goes to another namespace, so it keeps the chapter.
+        self.assertNotIn("报告", indexes)
+        self.assertEqual(len(list(service._build_chunks([chapter], NearDuplicateFilter(3, source="b" * 64)))), 1)
+        # Re-importing the first book itself keeps its chunks.
+        self.assertEqual(len(list(service._build_chunks([chapter], NearDuplicateFilter(3, shared=shared, source="7" * 64)))), 1)
+        service.db.close()
+
+    def test_pdf_ocr_streams_pages_and_only_ocrs_pages_without_usable_text(self) -> None:
+        from PIL import Image, ImageDraw
+
+        rendered: list[dict] = []
+        recognized: list[tuple[int, int, str]] = []
+        numerals = "一二三四五六七八九十"
+
+        def convert_from_path(_path, **kwargs) -> list[str]:
+            rendered.append(kwargs)
+            paths = []
+            for page_no in range(kwargs["first_page"], kwargs["last_page"] + 1):
+                # Width encodes the page number and height the DPI; page 7 is a blank separator page.
+                image = Image.new("L", (32 + page_no, kwargs["dpi"] // 10), color=255)
+                if page_no != 7:
+                    ImageDraw.Draw(image).rectangle((4, 4, 20, 12), fill=0)
+                path = Path(kwargs["output_folder"]) / f"page-{page_no:03d}-{kwargs['dpi']}.pgm"
+                image.save(path)
+                paths.append(str(path))
+            return paths
+
+        def image_to_data(image, lang: str, output_type: str) -> dict:
+            page_no, dpi = image.size[0] - 32, image.size[1] * 10
+            recognized.append((page_no, dpi, lang))
+            if page_no == 5:
+                raise RuntimeError("tesseract crashed")
+            words = ["第", numerals[page_no - 1], "页"] + (["GDP", "growth"] if page_no == 6 else [])
+            # Pages 4 and 6 are hard to read at the fast DPI.
+            conf = 95 if dpi == 300 else (40 if page_no in (4, 6) else 90)
+            return {
+                "text": ["", *words],
+                "conf": [-1, *([conf] * len(words))],
+                "block_num": [0, *([1] * len(words))],
+                "par_num": [0, *([1] * len(words))],
+                "line_num": [0, *([1] * len(words))],
+            }
+
+        def page_text(page_no: int) -> str:
+            return f"第{numerals[page_no - 1]}页" + (" GDP growth" if page_no == 6 else "")
+
+        scan_hash = hashlib.sha256(b"scan.pdf").hexdigest()
+        with patch.object(pdf_ocr_service_module.settings, "pdf_ocr_workers", 1), patch.object(
+            pdf_ocr_service_module.settings, "pdf_ocr_adaptive", True
+        ), patch.object(pdf_ocr_service_module.settings, "pdf_ocr_fast_dpi", 200), patch.object(
+            pdf_ocr_service_module.settings, "pdf_ocr_dpi", 300
+        ), patch.object(pdf_ocr_service_module.settings, "pdf_ocr_min_confidence", 70.0), patch.object(
+            pdf_ocr_service_module, "convert_from_path", convert_from_path
+        ), patch.object(pdf_ocr_service_module, "image_to_data", image_to_data):
+            result = pdf_ocr_service_module.PdfOcrService()._extract_ocr("scan.pdf", list(range(1, 11)), scan_hash)
+
+            batches = [(item["first_page"], item["last_page"], item["dpi"]) for item in rendered]
+            self.assertEqual(batches, [(1, 8, 200), (4, 4, 300), (6, 6, 300), (9, 10, 200)])
+            self.assertTrue(all(item["paths_only"] and item["grayscale"] for item in rendered))
+            # Blank page 7 never reaches tesseract; page 4 has no Latin words, so its re-read is single-language.
+            self.assertNotIn(7, [page_no for page_no, _dpi, _lang in recognized])
+            self.assertIn((4, 300, "chi_sim"), recognized)
+            self.assertIn((6, 300, "chi_sim+eng"), recognized)
+            self.assertEqual((result["ocr_pages"], result["ocr_blank_pages"], result["ocr_cached_pages"]), (8, 1, 0))
+            self.assertEqual((result["ocr_retried_pages"], result["ocr_single_lang_pages"]), (2, 1))
+            self.assertEqual(sorted(result["texts"].items()), [(page_no, page_text(page_no)) for page_no in (1, 2, 3, 4, 6, 8, 9, 10)])
+            details = {item["page"]: item for item in result["page_details"]}
+            self.assertEqual(details[4], {"page": 4, "confidence": 95.0, "dpi": 300, "lang": "chi_sim"})
+            self.assertEqual(details[1], {"page": 1, "confidence": 90.0, "dpi": 200, "lang": "chi_sim+eng"})
+            self.assertFalse(Path(rendered[0]["output_folder"]).exists())
+
+            # A second run renders only the page that failed; finished and blank pages come from the page cache.
+            rendered.clear()
+            recognized.clear()
+            again = pdf_ocr_service_module.PdfOcrService()._extract_ocr("scan.pdf", list(range(1, 11)), scan_hash)
+            self.assertEqual([(item["first_page"], item["last_page"]) for item in rendered], [(5, 5)])
+            self.assertEqual(recognized, [(5, 200, "chi_sim+eng")])
+            self.assertEqual(again["texts"], result["texts"])
+            self.assertEqual(again["page_details"], result["page_details"])
+            self.assertEqual((again["ocr_cached_pages"], again["ocr_blank_pages"]), (9, 1))
+
+            # Other OCR settings are another cache key; with adaptive mode off every page is read once at PDF_OCR_DPI.
+            rendered.clear()
+            with patch.object(pdf_ocr_service_module.settings, "pdf_ocr_adaptive", False):
+                fixed = pdf_ocr_service_module.PdfOcrService()._extract_ocr("scan.pdf", [4, 6], scan_hash)
+            self.assertEqual([(item["first_page"], item["last_page"], item["dpi"]) for item in rendered], [(4, 4, 300), (6, 6, 300)])
+            self.assertEqual((fixed["ocr_pages"], fixed["ocr_retried_pages"]), (2, 0))
+
+            # parse_pdf only sends empty or garbled text-layer pages to OCR.
+            layer = ["为进一步做好相关工作，现将有关事项通知如下。" * 2, "", "\ue000\ue001\ue002" * 10, "各单位要高度重视，认真组织实施，确保各项任务落到实处。"]
+            reader = type("Reader", (), {"pages": [type("Page", (), {"extract_text": lambda self, text=text: text})() for text in layer]})
+            rendered.clear()
+            mixed_pdf = TEMP_DIR / "mixed.pdf"
+            mixed_pdf.write_bytes(b"%PDF-1.4")
+            with patch.object(pdf_ocr_service_module, "PdfReader", lambda _path: reader()):
+                parsed = pdf_ocr_service_module.parse_pdf_file(str(mixed_pdf))
+
+        self.assertEqual([(item["first_page"], item["last_page"]) for item in rendered], [(2, 3)])
+        self.assertEqual([chapter["text"] for chapter in parsed["chapters"]], [layer[0], "第二页", "第三页", layer[3]])
+        self.assertEqual((parsed["ocr_used"], parsed["ocr_pages"], parsed["ocr_candidate_pages"]), (True, 2, 2))
+        self.assertEqual(parsed["page_sources"], {"text_layer": "1,4", "ocr": "2-3", "empty": ""})
+        self.assertEqual((parsed["ocr_mean_confidence"], parsed["ocr_retried_pages"]), (90.0, 0))
+        self.assertEqual(
+            parsed["ocr_settings"],
+            {"lang": "chi_sim+eng", "dpi": 200, "retry_dpi": 300, "min_confidence": 70.0},
+        )
 
     def test_chat_send_and_task_endpoints_use_serializers(self) -> None:
         user = self._create_user("chat_task_shape_user")
@@ -800,12 +1792,24 @@ class BackendRegressionTests(unittest.TestCase):
         self.assertEqual(book_payload["task_id"], book_task_id)
         self.assertEqual(book_payload["status"], "running")
         self.assertEqual(book_payload["running_file"], "book-a.pdf")
-        self.assertEqual(book_payload["file_results"][0]["source_name"], "book-a.pdf")
-        self.assertEqual(book_payload["file_results"][0]["ocr_pages"], 12)
+        self.assertEqual(book_payload["completed_files"], 1)
+        self.assertNotIn("file_results", book_payload)
         self.assertIsInstance(book_payload["started_at"], int)
         self.assertIsInstance(book_payload["updated_at"], int)
         self.assertNotIn("account_id", book_payload)
 
+        files_response = self.client.get(
+            f"/api/materials/books/tasks/{book_task_id}/files",
+            params={"skip": 0, "limit": 10},
+            headers=headers,
+        )
+        self.assertEqual(files_response.status_code, 200, files_response.text)
+        files_payload = files_response.json()
+        self.assertEqual(files_payload["total"], 1)
+        self.assertEqual(files_payload["items"][0]["source_name"], "book-a.pdf")
+        self.assertEqual(files_payload["items"][0]["ocr_pages"], 12)
+        self.assertTrue(files_payload["items"][0]["ocr_used"])
+
     def test_book_scan_item_serializer_formats_shanghai_time(self) -> None:
         payload = serialize_book_scan_item(
             {
@@ -824,6 +1828,120 @@ class BackendRegressionTests(unittest.TestCase):
         self.assertEqual(payload["source_name"], "book-a.pdf")
         self.assertEqual(payload["updated_at"], "2026-03-06T08:00:00+08:00")
 
+    def test_material_keyword_search_uses_ranked_fts_index(self) -> None:
+        user = self._create_user("fts_user")
+        db = self._db()
+        try:
+            svc = MaterialService(db)
+            body = svc.create_material(
+                user.id, "年度总结", "a.txt", "", "国务院办公厅关于加强政务公开工作的通知，各地要落实<要求>。", summary=""
+            )
+            titled = svc.create_material(user.id, "政务公开工作方案", "b.txt", "", "本方案明确了工作目标和责任分工。", summary="")
+            svc.create_material(user.id, "会议纪要", "c.txt", "", "会议研究了预算执行情况。", summary="")
+            body_id, titled_id = body.id, titled.id
+        finally:
+            db.close()
+        headers = self._auth_headers(user.id)
+
+        def search(keyword: str) -> dict:
+            response = self.client.get("/api/materials", params={"keyword": keyword}, headers=headers)
+            self.assertEqual(response.status_code, 200, response.text)
+            return response.json()
+
+        payload = search("政务公开")
+        self.assertEqual(payload["total"], 2)
+        # Title hits outrank body hits; snippets are escaped and highlight the matched words.
+        self.assertEqual([item["id"] for item in payload["items"]], [titled_id, body_id])
+        snippet = payload["items"][1]["snippet"]
+        self.assertIn("<mark>政务</mark><mark>公开</mark>", snippet)
+        self.assertIn("&lt;要求&gt;", snippet)
+        self.assertNotIn("\u200b", snippet)
+        # Sub-words of longer dictionary words are searchable too.
+        self.assertEqual([item["id"] for item in search("国务院")["items"]], [body_id])
+        self.assertIsNone(self.client.get("/api/materials", headers=headers).json()["items"][0]["snippet"])
+
+        db = self._db()
+        try:
+            material = db.get(Material, body_id)
+            material.content_text = "预算调整说明"
+            db.commit()
+            MaterialService(db).delete_material(titled_id, account_id=1)
+        finally:
+            db.close()
+        self.assertEqual(search("政务公开")["total"], 0)
+        self.assertEqual([item["id"] for item in search("预算")["items"]][0], body_id)
+
+    def test_materials_fts_migration_backfills_and_segments_existing_materials(self) -> None:
+        user = self._create_user("fts_migration_user")
+        db = self._db()
+        try:
+            material_id = MaterialService(db).create_material(
+                user.id, "年度总结", "a.txt", "", "国务院办公厅关于加强政务公开工作的通知。", summary=""
+            ).id
+        finally:
+            db.close()
+        config = _alembic_config(engine.url.render_as_string(hide_password=False))
+        alembic_command.downgrade(config, "e2b7a9c4d813")
+        with engine.begin() as conn:
+            self.assertIsNone(conn.execute(text("SELECT name FROM sqlite_master WHERE name = 'materials_fts'")).first())
+
+        run_database_migrations(engine)
+
+        with engine.begin() as conn:
+            self.assertEqual(conn.execute(text("SELECT count(*) FROM materials_fts WHERE terms IS NULL")).scalar_one(), 0)
+        found = self.client.get("/api/materials", params={"keyword": "国务院"}, headers=self._auth_headers(user.id)).json()
+        self.assertEqual([item["id"] for item in found["items"]], [material_id])
+
+    def test_material_list_is_read_only_and_skips_large_columns(self) -> None:
+        user = self._create_user("lean_list_user")
+        db = self._db()
+        try:
+            legacy = Material(
+                account_id=1,
+                user_id=user.id,
+                title="legacy",
+                content_text="旧 素\u3000材",
+                summary="",
+                keywords=[],
+                metadata_={"large": "x" * 1000},
+                char_count=99,
+            )
+            db.add(legacy)
+            db.commit()
+            legacy_id = legacy.id
+        finally:
+            db.close()
+        headers = self._auth_headers(user.id)
+
+        statements: list[str] = []
+
+        def record(_conn, _cursor, statement, *_args) -> None:
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            listed = self.client.get("/api/materials", headers=headers)
+            detail = self.client.get(f"/api/materials/{legacy_id}", headers=headers)
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        self.assertEqual(listed.status_code, 200, listed.text)
+        self.assertEqual(listed.json()["items"][0]["char_count"], 99)
+        self.assertEqual(detail.json()["char_count"], 99)
+        material_selects = [sql for sql in statements if "FROM materials" in sql and "count(*)" not in sql]
+        self.assertNotIn("content_text", material_selects[0])
+        self.assertNotIn("metadata", material_selects[0])
+        self.assertFalse([sql for sql in statements if sql.lstrip().upper().startswith(("UPDATE", "INSERT", "DELETE"))])
+
+        db = self._db()
+        try:
+            svc = MaterialService(db)
+            self.assertEqual(svc.backfill_char_counts(batch_size=1, execute=False), {"scanned": 1, "updated": 1})
+            self.assertEqual(svc.backfill_char_counts(batch_size=1), {"scanned": 1, "updated": 1})
+            self.assertEqual(svc.backfill_char_counts(), {"scanned": 1, "updated": 0})
+        finally:
+            db.close()
+        self.assertEqual(self.client.get("/api/materials", headers=headers).json()["items"][0]["char_count"], 3)
+
     def test_material_and_document_serialized_responses(self) -> None:
         user = self._create_user("asset_shape_user")
 
@@ -917,6 +2035,62 @@ class BackendRegressionTests(unittest.TestCase):
             self.assertTrue((imports_dir / "guide.epub").exists())
             self.assertTrue((imports_dir / "scan.pdf").exists())
 
+    def test_uploads_stream_to_disk_with_incremental_hash_and_size_limit(self) -> None:
+        class ChunkSource:
+            def __init__(self, total: int):
+                self.remaining = total
+
+            def read(self, size: int = -1) -> bytes:
+                step = min(self.remaining, size if size > 0 else self.remaining)
+                self.remaining -= step
+                return b"\x5a" * step
+
+        target_dir = TEMP_DIR / "stream-upload"
+        total = 24 * 1024 * 1024
+        tracemalloc.start()
+        try:
+            stored = store_stream(
+                ChunkSource(total),
+                target_dir,
+                max_size=total,
+                too_large_message="too large",
+                destination=lambda: target_dir / "big.bin",
+            )
+            _current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertLess(peak, 4 * 1024 * 1024)
+        self.assertEqual(stored.size, total)
+        self.assertEqual(stored.sha256, hashlib.sha256(b"\x5a" * total).hexdigest())
+        self.assertEqual(os.path.getsize(stored.path), total)
+
+        with self.assertRaises(FileValidationError):
+            store_stream(
+                ChunkSource(total + 1),
+                target_dir,
+                max_size=total,
+                too_large_message="too large",
+                destination=lambda: target_dir / "never.bin",
+            )
+        self.assertEqual(sorted(path.name for path in target_dir.iterdir()), ["big.bin"])
+
+        user = self._create_user("stream_book_uploader")
+        books_dir = TEMP_DIR / "books-stream"
+        content = b"%PDF-1.4 " + b"x" * 4096
+        with patch.object(book_import_service_module.settings, "books_dir", str(books_dir)), patch.object(
+            book_import_service_module, "MAX_BOOK_UPLOAD_SIZE", 2048
+        ):
+            response = self.client.post(
+                "/api/materials/books/upload",
+                headers=self._auth_headers(user.id),
+                files=[("files", ("big.pdf", content, "application/pdf")), ("files", ("ok.pdf", b"%PDF-1.4 ok", "application/pdf"))],
+            )
+        self.assertEqual(response.status_code, 200, response.text)
+        payload = response.json()
+        self.assertEqual(payload["errors"][0]["source_name"], "big.pdf")
+        self.assertEqual(payload["items"][0]["source_hash"], hashlib.sha256(b"%PDF-1.4 ok").hexdigest())
+        self.assertEqual(sorted(path.name for path in (books_dir / "imports").iterdir()), ["ok.pdf"])
+
     def test_account_resource_sync_service_rebuilds_materials_and_memory(self) -> None:
         db = self._db()
         try:
@@ -1038,7 +2212,7 @@ class BackendRegressionTests(unittest.TestCase):
             db.close()
 
     def test_book_import_task_persistence_and_interrupted_recovery(self) -> None:
-        tracker = BookImportTaskTracker(ttl_seconds=3600)
+        tracker = BookImportTaskTracker(ttl_seconds=3600, state_backend=LocalStateBackend())
         reserved, active_id = tracker.reserve_slot("task-1", account_id=1)
         self.assertTrue(reserved)
         self.assertIsNone(active_id)
@@ -1089,6 +2263,283 @@ class BackendRegressionTests(unittest.TestCase):
         finally:
             db.close()
 
+    def test_book_import_task_progress_is_coalesced_before_persisting(self) -> None:
+        tracker = BookImportTaskTracker(ttl_seconds=3600, flush_interval_seconds=3600, flush_max_updates=5)
+        tracker.create_task("task-coalesce", total_files=1, account_id=1)
+        tracker.update("task-coalesce", status="running", total_chunks_add=12)
+
+        with patch.object(tracker, "_persist_task", wraps=tracker._persist_task) as persist_mock:
+            for _ in range(12):
+                tracker.update("task-coalesce", completed_chunks_add=1)
+            self.assertEqual(persist_mock.call_count, 2)
+            self.assertEqual(tracker.get("task-coalesce")["completed_chunks"], 12)
+            self.assertEqual(BookImportTaskTracker(ttl_seconds=3600).get("task-coalesce")["completed_chunks"], 10)
+
+            tracker.finish("task-coalesce", status="completed", message="done")
+            self.assertEqual(persist_mock.call_count, 3)
+
+        persisted = BookImportTaskTracker(ttl_seconds=3600).get("task-coalesce")
+        self.assertEqual(persisted["status"], "completed")
+        self.assertEqual(persisted["completed_chunks"], 12)
+
+    def test_shared_state_backend_guards_book_import_slot_across_workers(self) -> None:
+        backend = DatabaseStateBackend()
+        self.assertEqual(backend.incr("rate:test", ttl_seconds=60), 1)
+        self.assertEqual(backend.incr("rate:test", 2, ttl_seconds=60), 3)
+        self.assertTrue(backend.acquire_lease("lease:test", "owner-a", 60))
+        self.assertTrue(backend.acquire_lease("lease:test", "owner-a", 60))
+        self.assertFalse(backend.acquire_lease("lease:test", "owner-b", 60))
+        self.assertFalse(backend.release_lease("lease:test", "owner-b"))
+        self.assertTrue(backend.release_lease("lease:test", "owner-a"))
+        self.assertIsNone(backend.lease_owner("lease:test"))
+        backend.set_value("value:test", {"progress": 5})
+        self.assertEqual(backend.get_value("value:test"), {"progress": 5})
+        cursor = backend.latest_cursor("channel:test")
+        backend.publish("channel:test", {"n": 1})
+        backend.publish("channel:test", {"n": 2})
+        messages, cursor = backend.read_messages("channel:test", cursor)
+        self.assertEqual([message["n"] for message in messages], [1, 2])
+        self.assertEqual(backend.read_messages("channel:test", cursor)[0], [])
+
+        # Another worker process holds the slot and is still running its task.
+        other_worker = BookImportTaskTracker(ttl_seconds=3600, state_backend=backend)
+        other_worker.create_task("task-remote", total_files=1, account_id=1)
+        other_worker.update("task-remote", status="running")
+        self.assertTrue(backend.acquire_lease("book-import:account:1", "other-instance:task-remote", 60))
+
+        tracker = BookImportTaskTracker(ttl_seconds=3600, state_backend=backend)
+        self.assertEqual(tracker.reserve_slot("task-local", account_id=1), (False, "task-remote"))
+        with patch("app.services.state_backend.get_state_backend", return_value=backend):
+            _mark_interrupted_book_tasks()
+        self.assertEqual(tracker.get("task-remote")["status"], "running")
+
+        # Once its lease lapses the orphaned task is interrupted and the slot is handed over.
+        backend.release_lease("book-import:account:1", "other-instance:task-remote")
+        self.assertEqual(tracker.reserve_slot("task-local", account_id=1), (True, None))
+        self.assertEqual(backend.lease_owner("book-import:account:1"), f"{INSTANCE_ID}:task-local")
+        self.assertEqual(tracker.get("task-remote")["status"], "interrupted")
+        tracker.create_task("task-local", total_files=0, account_id=1)
+        tracker.finish("task-local", status="completed", message="done")
+        self.assertIsNone(backend.lease_owner("book-import:account:1"))
+        self.assertIsNone(backend.lease_owner("book-import:runner:0"))
+
+        # A worker that lost the slot must not start importing.
+        self.assertTrue(backend.acquire_lease("book-import:account:1", "other-instance:task-remote-2", 60))
+        self.assertIsNone(tracker.restart("task-local", total_files=0))
+        self.assertEqual(tracker.get("task-local")["status"], "completed")
+
+    def test_book_import_slot_is_released_when_claim_or_restart_fails(self) -> None:
+        backend = LocalStateBackend()
+        tracker = BookImportTaskTracker(ttl_seconds=3600, state_backend=backend, lease_seconds=1, max_concurrent=1)
+        leases_of = lambda task_id: [name for name, owner in tracker._held_leases.items() if owner.endswith(f":{task_id}")]  # noqa: E731
+
+        # A reserved task that disappeared before it was claimed gives its slot back.
+        self.assertEqual(tracker.reserve_slot("task-gone", account_id=2), (True, None))
+        self.assertIsNone(tracker.claim_task("task-gone"))
+        self.assertEqual(leases_of("task-gone"), [])
+        self.assertIsNone(backend.lease_owner("book-import:account:2"))
+        self.assertIsNone(backend.lease_owner("book-import:runner:0"))
+
+        # The runner lease went to another worker between reserve and claim.
+        tracker.create_task("task-a", total_files=1, account_id=1)
+        self.assertEqual(tracker.reserve_slot("task-a", account_id=1), (True, None))
+        backend.release_lease("book-import:runner:0", f"{INSTANCE_ID}:task-a")
+        self.assertTrue(backend.acquire_lease("book-import:runner:0", "other-instance:task-x", 60))
+        self.assertIsNone(tracker.claim_task("task-a"))
+        self.assertEqual(leases_of("task-a"), [])
+        self.assertIsNone(backend.lease_owner("book-import:account:1"))
+        self.assertEqual(tracker.get("task-a")["status"], "queued")
+        backend.release_lease("book-import:runner:0", "other-instance:task-x")
+
+        # The account lease went elsewhere between claim and restart: the task goes back to the queue.
+        self.assertEqual(tracker.reserve_slot("task-a", account_id=1), (True, None))
+        self.assertEqual(tracker.claim_task("task-a")["status"], "pending")
+        backend.release_lease("book-import:account:1", f"{INSTANCE_ID}:task-a")
+        self.assertTrue(backend.acquire_lease("book-import:account:1", "other-instance:task-y", 60))
+        self.assertIsNone(tracker.restart("task-a", total_files=1))
+        self.assertEqual(tracker.get("task-a")["status"], "interrupted")
+        self.assertEqual(leases_of("task-a"), [])
+        self.assertIsNone(backend.lease_owner("book-import:runner:0"))
+        backend.release_lease("book-import:account:1", "other-instance:task-y")
+
+        # A lease lost while running is dropped by the keeper instead of being taken back once it frees up.
+        self.assertEqual(tracker.reserve_slot("task-b", account_id=3), (True, None))
+        backend.release_lease("book-import:account:3", f"{INSTANCE_ID}:task-b")
+        self.assertTrue(backend.acquire_lease("book-import:account:3", "other-instance:task-z", 60))
+        deadline = time.monotonic() + 5
+        while "book-import:account:3" in leases_of("task-b") and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertNotIn("book-import:account:3", leases_of("task-b"))
+        backend.release_lease("book-import:account:3", "other-instance:task-z")
+        time.sleep(0.8)
+        self.assertIsNone(backend.lease_owner("book-import:account:3"))
+        tracker.release_slot("task-b", 3)
+
+    def test_book_imports_queue_per_account_and_take_turns_under_a_global_cap(self) -> None:
+        tracker = BookImportTaskTracker(ttl_seconds=3600, state_backend=LocalStateBackend(), max_concurrent=2)
+        for task_id, account_id in [("a1", 1), ("a2", 1), ("a3", 1), ("b1", 2), ("c1", 3)]:
+            tracker.create_task(task_id, total_files=1, account_id=account_id)
+        # Accounts take turns, so account 1's backlog does not push b1 and c1 behind it.
+        self.assertEqual([task_id for task_id, _ in tracker.queue_order()], ["a1", "b1", "c1", "a2", "a3"])
+        self.assertEqual(tracker.get("a2")["queue_position"], 4)
+        self.assertEqual(tracker.cancel("a3")["status"], "cancelled")
+
+        started: list[str] = []
+        running = {task_id: threading.Event() for task_id in ("a1", "a2", "b1", "c1")}
+        release = {task_id: threading.Event() for task_id in running}
+
+        def run_task(_self, task_id: str, _account_id: int) -> None:
+            self.assertIsNotNone(tracker.claim_task(task_id))
+            started.append(task_id)
+            running[task_id].set()
+            release[task_id].wait(10)
+            tracker.finish(task_id, status="completed", message="done")
+
+        dispatcher = BookImportDispatcher(max_workers=2, retry_seconds=3600)
+        try:
+            with patch.object(book_import_task_service_module, "book_import_task_tracker", tracker), patch.object(
+                BookImportDispatcher, "_run_task", run_task
+            ):
+                self.assertEqual(dispatcher.schedule(), 2)
+                self.assertTrue(running["a1"].wait(5) and running["b1"].wait(5))
+                # Account 1 is busy, so the idle account 3 is next even though a2 was queued first.
+                self.assertEqual((tracker.get("c1")["queue_position"], tracker.get("a2")["queue_position"]), (1, 2))
+                self.assertIsNone(tracker.get("a1")["queue_position"])
+
+                release["b1"].set()
+                self.assertTrue(running["c1"].wait(5))
+                self.assertFalse(running["a2"].is_set())
+                release["a1"].set()
+                self.assertTrue(running["a2"].wait(5))
+
+                # A running task is only asked to stop; the import itself ends it.
+                self.assertEqual(tracker.cancel("a2")["stage"], "正在取消")
+                self.assertTrue(tracker.is_cancel_requested("a2"))
+                self.assertFalse(tracker.is_cancel_requested("c1"))
+                release["a2"].set()
+                release["c1"].set()
+                dispatcher.shutdown(wait=True)
+        finally:
+            for event_ in release.values():
+                event_.set()
+            dispatcher.shutdown(wait=True)
+
+        self.assertEqual(started, ["a1", "b1", "c1", "a2"])
+        self.assertEqual(tracker.queue_order(), [])
+        self.assertEqual(tracker.get("a3")["status"], "cancelled")
+
+    def test_rate_limiter_charges_route_costs_per_user_with_bounded_keys(self) -> None:
+        local = LocalStateBackend(max_rate_keys=2)
+        limiter = RateLimiter(rate_per_minute=60, burst=10, state_backend=local)
+        token = create_access_token(7)
+        check = lambda method, path, auth=None, ip="10.0.0.1": limiter.check(  # noqa: E731
+            method=method, path=path, authorization=auth, client_ip=ip
+        )
+
+        self.assertEqual(check("POST", "/api/chat/send-stream", f"Bearer {token}").remaining, 5)
+        self.assertEqual(check("POST", "/api/chat/send-stream", f"Bearer {token}").remaining, 0)
+        limited = check("POST", "/api/chat/send-stream", f"Bearer {token}")
+        self.assertFalse(limited.allowed)
+        self.assertEqual(limited.key, "user:7")
+        self.assertGreater(limited.retry_after, 4)
+        # The same NAT address is still free for other users, and cheap routes cost one token.
+        self.assertEqual(check("GET", "/api/chat/sessions").remaining, 9)
+        self.assertEqual(check("GET", "/api/chat/sessions", ip="10.0.0.2").key, "ip:10.0.0.2")
+        self.assertEqual(list(local._rate_tats), ["ip:10.0.0.1", "ip:10.0.0.2"])
+
+        metrics = {item["route_group"]: item for item in limiter.metrics()["routes"]}
+        self.assertEqual((metrics["llm"]["allowed"], metrics["llm"]["limited"]), (2, 1))
+        self.assertEqual(metrics["default"]["allowed"], 2)
+
+        shared = RateLimiter(rate_per_minute=60, burst=3, state_backend=DatabaseStateBackend())
+        decisions = [shared.check(method="GET", path="/api/materials", authorization=None, client_ip="1.2.3.4") for _ in range(4)]
+        self.assertEqual([decision.allowed for decision in decisions], [True, True, True, False])
+        # Without RATE_LIMIT_SHARED the limiter never touches the shared (database) backend.
+        self.assertIsInstance(RateLimiter()._state(), LocalStateBackend)
+
+        response = self.client.get("/api/health/rate-limit")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("routes", response.json())
+
+    def test_local_state_backend_refuses_multiple_server_workers(self) -> None:
+        self.assertEqual(configured_worker_count(["uvicorn", "app.main:app"], {}), 1)
+        self.assertEqual(configured_worker_count(["uvicorn", "app.main:app", "--workers", "4"], {}), 4)
+        self.assertEqual(configured_worker_count(["uvicorn", "app.main:app", "--workers=2"], {}), 2)
+        self.assertEqual(configured_worker_count(["gunicorn", "-w", "3", "app.main:app"], {}), 3)
+        self.assertEqual(configured_worker_count(["uvicorn", "app.main:app"], {"WEB_CONCURRENCY": "2"}), 2)
+
+        with patch.object(sys, "argv", ["uvicorn", "app.main:app", "--workers", "2"]), patch.dict(os.environ):
+            os.environ.pop("WEB_CONCURRENCY", None)
+            with patch("app.services.state_backend.get_state_backend", return_value=LocalStateBackend()):
+                with self.assertRaisesRegex(RuntimeError, "STATE_BACKEND"):
+                    check_worker_support()
+            with patch("app.services.state_backend.get_state_backend", return_value=DatabaseStateBackend()):
+                check_worker_support()
+        with patch.object(sys, "argv", ["uvicorn", "app.main:app"]), patch.dict(os.environ, {"WEB_CONCURRENCY": "1"}):
+            with patch("app.services.state_backend.get_state_backend", return_value=LocalStateBackend()):
+                check_worker_support()
+
+    def test_progress_stream_pushes_snapshot_then_deltas(self) -> None:
+        tracker = UploadProgressTracker(broker=ProgressBroker(queue_size=2))
+        tracker.update("upload-stream", account_id=1, status="parsing", stage="解析中", parse_progress=10)
+        service = ProgressStreamService(
+            tracker,
+            serialize_task=serialize_upload_task,
+            terminal_statuses=UPLOAD_TERMINAL_STATUSES,
+            keepalive_seconds=5,
+        )
+
+        async def collect() -> tuple[list[str], int]:
+            stream = service.stream("upload-stream", account_id=1)
+            events = [await stream.__anext__()]
+            subscription = next(iter(tracker._broker._subscribers["upload-stream"]))
+            for progress in (20, 30, 40, 50):
+                tracker.update("upload-stream", parse_progress=progress)
+            await asyncio.sleep(0)
+            tracker.complete("upload-stream")
+            async for event in stream:
+                events.append(event)
+            return events, subscription.dropped
+
+        events, dropped = asyncio.run(collect())
+        snapshot = json.loads(events[0][len("data: "):])
+        self.assertEqual(snapshot["event"], "snapshot")
+        self.assertEqual(snapshot["task"]["parse_progress"], 10)
+        self.assertNotIn("account_id", snapshot["task"])
+
+        deltas = [json.loads(event[len("data: "):]) for event in events[1:-1]]
+        self.assertEqual(events[-1], "data: [DONE]\n\n")
+        self.assertGreaterEqual(dropped, 1)
+        self.assertEqual(deltas[-1]["event"], "delta")
+        self.assertEqual(deltas[-1]["changes"]["status"], "completed")
+        self.assertEqual(deltas[-1]["changes"]["parse_progress"], 100)
+        self.assertNotIn("stage", deltas[0]["changes"])
+        self.assertEqual(tracker._broker.subscriber_count("upload-stream"), 0)
+
+        user = self._create_user("progress_stream_user")
+        task_id = f"upload-{uuid.uuid4().hex}"
+        upload_progress_tracker.update(task_id, account_id=user.account_id, status="parsing", parse_progress=30)
+        upload_progress_tracker.complete(task_id)
+        response = self.client.get(f"/api/materials/upload-tasks/{task_id}/stream", headers=self._auth_headers(user.id))
+        self.assertEqual(response.status_code, 200, response.text)
+        self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+        self.assertIn('"event": "snapshot"', response.text)
+        self.assertTrue(response.text.endswith("data: [DONE]\n\n"))
+
+        # A task id that never shows up ends the stream instead of keeping it open forever.
+        pending = ProgressStreamService(
+            tracker,
+            serialize_task=serialize_upload_task,
+            terminal_statuses=UPLOAD_TERMINAL_STATUSES,
+            pending_seconds=0.2,
+        )
+
+        async def collect_missing() -> list[str]:
+            return [event async for event in pending.stream("upload-missing", account_id=1)]
+
+        self.assertEqual(asyncio.run(collect_missing())[-1], "data: [DONE]\n\n")
+        self.assertEqual(tracker._broker.subscriber_count("upload-missing"), 0)
+
 
 if __name__ == "__main__":
     unittest.main()
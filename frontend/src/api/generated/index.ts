@@ -105,24 +105,51 @@ export interface MaterialResponse extends Omit<Schema['MaterialResponse'], 'keyw
   keywords: string[]
 }
 
-export interface MaterialUploadResponse extends Omit<Schema['MaterialUploadResponse'], 'keywords'> {
+export interface MaterialListItemResponse extends Omit<Schema['MaterialListItemResponse'], 'keywords'> {
   keywords: string[]
 }
 
 export interface MaterialListResponse extends Omit<Schema['MaterialListResponse'], 'items'> {
-  items: MaterialResponse[]
+  items: MaterialListItemResponse[]
 }
 
 export type UploadTaskResponse = Schema['UploadTaskResponse']
+export type MaterialUploadBatchFileResponse = Schema['MaterialUploadBatchFileResponse']
+export interface MaterialUploadBatchResponse extends Omit<Schema['MaterialUploadBatchResponse'], 'files'> {
+  files: MaterialUploadBatchFileResponse[]
+}
 
 export type BookImportStartResponse = Schema['BookImportStartResponse']
 export type BookImportFileResultResponse = Schema['BookImportFileResultResponse']
 
-export interface BookImportTaskResponse extends Omit<Schema['BookImportTaskResponse'], 'file_results' | 'selected_files'> {
-  file_results: BookImportFileResultResponse[]
+export interface BookImportFileResultListResponse extends Omit<Schema['BookImportFileResultListResponse'], 'items'> {
+  items: BookImportFileResultResponse[]
+}
+
+export interface BookImportTaskResponse extends Omit<Schema['BookImportTaskResponse'], 'selected_files'> {
   selected_files: string[]
 }
 
+export interface TaskProgressDeltaSseEventResponse extends Omit<Schema['TaskProgressDeltaSseEventResponse'], 'changes'> {
+  changes: Record<string, unknown>
+}
+
+export interface UploadTaskSnapshotSseEventResponse extends Omit<Schema['UploadTaskSnapshotSseEventResponse'], 'task'> {
+  task: UploadTaskResponse
+}
+
+export interface BookImportTaskSnapshotSseEventResponse extends Omit<Schema['BookImportTaskSnapshotSseEventResponse'], 'task'> {
+  task: BookImportTaskResponse
+}
+
+export type UploadTaskStreamEventResponse
+  = | UploadTaskSnapshotSseEventResponse
+    | TaskProgressDeltaSseEventResponse
+
+export type BookImportTaskStreamEventResponse
+  = | BookImportTaskSnapshotSseEventResponse
+    | TaskProgressDeltaSseEventResponse
+
 export type BookScanItemResponse = Schema['BookScanItemResponse']
 
 export interface BookScanResponse extends Omit<Schema['BookScanResponse'], 'items'> {
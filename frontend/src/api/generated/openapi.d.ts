@@ -325,7 +325,13 @@ export interface paths {
         put?: never;
         /**
          * Upload Material
-         * @description Upload a material file and extract title/doc_type/summary/keywords.
+         * @description Store a material file and queue its extraction of title/doc_type/summary/keywords.
+
+Responds ``202`` with the upload task as soon as the file is on disk; progress
+and the outcome are reported on ``/upload-tasks/{task_id}``. A file whose
+content the user already uploaded completes with the message ``素材已存在``;
+``allow_duplicate`` creates a separate entry that reuses the earlier
+extraction and analysis instead.
          */
         post: operations["upload_material_api_materials_upload_post"];
         delete?: never;
@@ -334,6 +340,46 @@ export interface paths {
         patch?: never;
         trace?: never;
     };
+    "/api/materials/upload-batch": {
+        parameters: {
+            query?: never;
+            header?: never;
+            path?: never;
+            cookie?: never;
+        };
+        get?: never;
+        put?: never;
+        /**
+         * Upload Material Batch
+         * @description Store many material files and queue them as one batch with a single progress task.
+
+Files are extracted in parallel worker processes and analysed with bounded LLM
+concurrency; ``/upload-batches/{task_id}`` reports the status of every file.
+         */
+        post: operations["upload_material_batch_api_materials_upload_batch_post"];
+        delete?: never;
+        options?: never;
+        head?: never;
+        patch?: never;
+        trace?: never;
+    };
+    "/api/materials/upload-batches/{task_id}": {
+        parameters: {
+            query?: never;
+            header?: never;
+            path?: never;
+            cookie?: never;
+        };
+        /** Get Upload Batch */
+        get: operations["get_upload_batch_api_materials_upload_batches__task_id__get"];
+        put?: never;
+        post?: never;
+        delete?: never;
+        options?: never;
+        head?: never;
+        patch?: never;
+        trace?: never;
+    };
     "/api/materials/upload-tasks/{task_id}": {
         parameters: {
             query?: never;
@@ -351,6 +397,23 @@ export interface paths {
         patch?: never;
         trace?: never;
     };
+    "/api/materials/upload-tasks/{task_id}/stream": {
+        parameters: {
+            query?: never;
+            header?: never;
+            path?: never;
+            cookie?: never;
+        };
+        /** Stream Upload Task */
+        get: operations["stream_upload_task_api_materials_upload_tasks__task_id__stream_get"];
+        put?: never;
+        post?: never;
+        delete?: never;
+        options?: never;
+        head?: never;
+        patch?: never;
+        trace?: never;
+    };
     "/api/materials": {
         parameters: {
             query?: never;
@@ -471,6 +534,57 @@ export interface paths {
         patch?: never;
         trace?: never;
     };
+    "/api/materials/books/tasks/{task_id}/cancel": {
+        parameters: {
+            query?: never;
+            header?: never;
+            path?: never;
+            cookie?: never;
+        };
+        get?: never;
+        put?: never;
+        /** Cancel Book Import Task */
+        post: operations["cancel_book_import_task_api_materials_books_tasks__task_id__cancel_post"];
+        delete?: never;
+        options?: never;
+        head?: never;
+        patch?: never;
+        trace?: never;
+    };
+    "/api/materials/books/tasks/{task_id}/stream": {
+        parameters: {
+            query?: never;
+            header?: never;
+            path?: never;
+            cookie?: never;
+        };
+        /** Stream Book Import Task */
+        get: operations["stream_book_import_task_api_materials_books_tasks__task_id__stream_get"];
+        put?: never;
+        post?: never;
+        delete?: never;
+        options?: never;
+        head?: never;
+        patch?: never;
+        trace?: never;
+    };
+    "/api/materials/books/tasks/{task_id}/files": {
+        parameters: {
+            query?: never;
+            header?: never;
+            path?: never;
+            cookie?: never;
+        };
+        /** List Book Import Task Files */
+        get: operations["list_book_import_task_files_api_materials_books_tasks__task_id__files_get"];
+        put?: never;
+        post?: never;
+        delete?: never;
+        options?: never;
+        head?: never;
+        patch?: never;
+        trace?: never;
+    };
     "/api/materials/books/sources": {
         parameters: {
             query?: never;
@@ -781,6 +895,23 @@ export interface paths {
         patch?: never;
         trace?: never;
     };
+    "/api/health/rate-limit": {
+        parameters: {
+            query?: never;
+            header?: never;
+            path?: never;
+            cookie?: never;
+        };
+        /** Rate Limit Metrics */
+        get: operations["rate_limit_metrics_api_health_rate_limit_get"];
+        put?: never;
+        post?: never;
+        delete?: never;
+        options?: never;
+        head?: never;
+        patch?: never;
+        trace?: never;
+    };
 }
 export type webhooks = Record<string, never>;
 export interface components {
@@ -938,6 +1069,30 @@ export interface components {
             file: string;
             /** Task Id */
             task_id?: string | null;
+            /**
+             * Allow Duplicate
+             * @default false
+             */
+            allow_duplicate: boolean;
+        };
+        /** Body_upload_material_batch_api_materials_upload_batch_post */
+        Body_upload_material_batch_api_materials_upload_batch_post: {
+            /** Files */
+            files: string[];
+            /** Task Id */
+            task_id?: string | null;
+            /**
+             * Allow Duplicate
+             * @default false
+             */
+            allow_duplicate: boolean;
+        };
+        /** BookImportFileResultListResponse */
+        BookImportFileResultListResponse: {
+            /** Items */
+            items?: components["schemas"]["BookImportFileResultResponse"][];
+            /** Total */
+            total: number;
         };
         /** BookImportFileResultResponse */
         BookImportFileResultResponse: {
@@ -1020,10 +1175,10 @@ export interface components {
             ocr_used_files: number;
             /** Ocr Pages */
             ocr_pages: number;
-            /** File Results */
-            file_results?: components["schemas"]["BookImportFileResultResponse"][];
             /** Selected Files */
             selected_files?: string[];
+            /** Queue Position */
+            queue_position?: number | null;
         };
         /** BookScanItemResponse */
         BookScanItemResponse: {
@@ -1301,10 +1456,33 @@ export interface components {
             /** Password */
             password: string;
         };
+        /** MaterialListItemResponse */
+        MaterialListItemResponse: {
+            /** Id */
+            id: number;
+            /** Title */
+            title: string;
+            /** Doc Type */
+            doc_type?: string | null;
+            /** Summary */
+            summary: string;
+            /** Keywords */
+            keywords?: string[];
+            /** Char Count */
+            char_count: number;
+            /** Content Text */
+            content_text?: string | null;
+            /** Original Filename */
+            original_filename?: string | null;
+            /** Created At */
+            created_at?: string | null;
+            /** Snippet */
+            snippet?: string | null;
+        };
         /** MaterialListResponse */
         MaterialListResponse: {
             /** Items */
-            items?: components["schemas"]["MaterialResponse"][];
+            items?: components["schemas"]["MaterialListItemResponse"][];
             /** Total */
             total: number;
         };
@@ -1360,28 +1538,43 @@ export interface components {
             /** Total */
             total: number;
         };
-        /** MaterialUploadResponse */
-        MaterialUploadResponse: {
-            /** Warnings */
-            warnings?: string[] | null;
-            /** Id */
-            id: number;
-            /** Title */
-            title: string;
-            /** Doc Type */
-            doc_type?: string | null;
-            /** Summary */
-            summary: string;
-            /** Keywords */
-            keywords?: string[];
-            /** Char Count */
-            char_count: number;
-            /** Content Text */
-            content_text?: string | null;
-            /** Original Filename */
-            original_filename?: string | null;
-            /** Created At */
-            created_at?: string | null;
+        /** MaterialUploadBatchFileResponse */
+        MaterialUploadBatchFileResponse: {
+            /** Task Id */
+            task_id: string;
+            /** Filename */
+            filename: string;
+            /** Status */
+            status: string;
+            /** Material Id */
+            material_id?: number | null;
+            /**
+             * Duplicate
+             * @default false
+             */
+            duplicate: boolean;
+            /**
+             * Message
+             * @default
+             */
+            message: string;
+        };
+        /** MaterialUploadBatchResponse */
+        MaterialUploadBatchResponse: {
+            /** Task Id */
+            task_id: string;
+            /** Status */
+            status: string;
+            /** Stage */
+            stage: string;
+            /** Message */
+            message: string;
+            /** Parse Progress */
+            parse_progress: number;
+            /** Updated At */
+            updated_at: number;
+            /** Files */
+            files?: components["schemas"]["MaterialUploadBatchFileResponse"][];
         };
         /** MessageResponse */
         MessageResponse: {
@@ -1455,6 +1648,26 @@ export interface components {
             message: string;
             user: components["schemas"]["AuthUserResponse"];
         };
+        /** RateLimitMetricsResponse */
+        RateLimitMetricsResponse: {
+            /** Rate Per Minute */
+            rate_per_minute: number;
+            /** Burst */
+            burst: number;
+            /** Routes */
+            routes?: components["schemas"]["RateLimitRouteMetricsResponse"][];
+        };
+        /** RateLimitRouteMetricsResponse */
+        RateLimitRouteMetricsResponse: {
+            /** Route Group */
+            route_group: string;
+            /** Cost */
+            cost: number;
+            /** Allowed */
+            allowed: number;
+            /** Limited */
+            limited: number;
+        };
         /** RebindUserRequest */
         RebindUserRequest: {
             /**
@@ -1787,6 +2000,40 @@ export interface components {
             message: components["schemas"]["ChatMessageResponse"];
         };
         ChatStreamEventResponse: components["schemas"]["ChatWorkflowSseEventResponse"] | components["schemas"]["ChatChunkSseEventResponse"] | components["schemas"]["ChatErrorSseEventResponse"] | components["schemas"]["ChatFinalSseEventResponse"];
+        /** TaskProgressDeltaSseEventResponse */
+        TaskProgressDeltaSseEventResponse: {
+            /**
+             * @description discriminator enum property added by openapi-typescript
+             * @enum {string}
+             */
+            event: "delta";
+            /** Task Id */
+            task_id: string;
+            /** Changes */
+            changes?: {
+                [key: string]: unknown;
+            };
+        };
+        /** UploadTaskSnapshotSseEventResponse */
+        UploadTaskSnapshotSseEventResponse: {
+            /**
+             * @description discriminator enum property added by openapi-typescript
+             * @enum {string}
+             */
+            event: "snapshot";
+            task: components["schemas"]["UploadTaskResponse"];
+        };
+        UploadTaskStreamEventResponse: components["schemas"]["UploadTaskSnapshotSseEventResponse"] | components["schemas"]["TaskProgressDeltaSseEventResponse"];
+        /** BookImportTaskSnapshotSseEventResponse */
+        BookImportTaskSnapshotSseEventResponse: {
+            /**
+             * @description discriminator enum property added by openapi-typescript
+             * @enum {string}
+             */
+            event: "snapshot";
+            task: components["schemas"]["BookImportTaskResponse"];
+        };
+        BookImportTaskStreamEventResponse: components["schemas"]["BookImportTaskSnapshotSseEventResponse"] | components["schemas"]["TaskProgressDeltaSseEventResponse"];
     };
     responses: never;
     parameters: never;
@@ -2482,6 +2729,70 @@ export interface operations {
                 "multipart/form-data": components["schemas"]["Body_upload_material_api_materials_upload_post"];
             };
         };
+        responses: {
+            /** @description Successful Response */
+            202: {
+                headers: {
+                    [name: string]: unknown;
+                };
+                content: {
+                    "application/json": components["schemas"]["UploadTaskResponse"];
+                };
+            };
+            /** @description Validation Error */
+            422: {
+                headers: {
+                    [name: string]: unknown;
+                };
+                content: {
+                    "application/json": components["schemas"]["HTTPValidationError"];
+                };
+            };
+        };
+    };
+    upload_material_batch_api_materials_upload_batch_post: {
+        parameters: {
+            query?: never;
+            header?: never;
+            path?: never;
+            cookie?: never;
+        };
+        requestBody: {
+            content: {
+                "multipart/form-data": components["schemas"]["Body_upload_material_batch_api_materials_upload_batch_post"];
+            };
+        };
+        responses: {
+            /** @description Successful Response */
+            202: {
+                headers: {
+                    [name: string]: unknown;
+                };
+                content: {
+                    "application/json": components["schemas"]["MaterialUploadBatchResponse"];
+                };
+            };
+            /** @description Validation Error */
+            422: {
+                headers: {
+                    [name: string]: unknown;
+                };
+                content: {
+                    "application/json": components["schemas"]["HTTPValidationError"];
+                };
+            };
+        };
+    };
+    get_upload_batch_api_materials_upload_batches__task_id__get: {
+        parameters: {
+            query?: never;
+            header?: never;
+            path: {
+                task_id: string;
+            };
+            cookie?: never;
+        };
+        requestBody?: never;
         responses: {
             /** @description Successful Response */
             200: {
@@ -2489,7 +2800,7 @@ export interface operations {
                     [name: string]: unknown;
                 };
                 content: {
-                    "application/json": components["schemas"]["MaterialUploadResponse"];
+                    "application/json": components["schemas"]["MaterialUploadBatchResponse"];
                 };
             };
             /** @description Validation Error */
@@ -2534,6 +2845,37 @@ export interface operations {
             };
         };
     };
+    stream_upload_task_api_materials_upload_tasks__task_id__stream_get: {
+        parameters: {
+            query?: never;
+            header?: never;
+            path: {
+                task_id: string;
+            };
+            cookie?: never;
+        };
+        requestBody?: never;
+        responses: {
+            /** @description SSE stream of an upload task snapshot followed by progress deltas. */
+            200: {
+                headers: {
+                    [name: string]: unknown;
+                };
+                content: {
+                    "text/event-stream": string;
+                };
+            };
+            /** @description Validation Error */
+            422: {
+                headers: {
+                    [name: string]: unknown;
+                };
+                content: {
+                    "application/json": components["schemas"]["HTTPValidationError"];
+                };
+            };
+        };
+    };
     list_materials_api_materials_get: {
         parameters: {
             query?: {
@@ -2780,6 +3122,102 @@ export interface operations {
             };
         };
     };
+    cancel_book_import_task_api_materials_books_tasks__task_id__cancel_post: {
+        parameters: {
+            query?: never;
+            header?: never;
+            path: {
+                task_id: string;
+            };
+            cookie?: never;
+        };
+        requestBody?: never;
+        responses: {
+            /** @description Successful Response */
+            200: {
+                headers: {
+                    [name: string]: unknown;
+                };
+                content: {
+                    "application/json": components["schemas"]["BookImportTaskResponse"];
+                };
+            };
+            /** @description Validation Error */
+            422: {
+                headers: {
+                    [name: string]: unknown;
+                };
+                content: {
+                    "application/json": components["schemas"]["HTTPValidationError"];
+                };
+            };
+        };
+    };
+    stream_book_import_task_api_materials_books_tasks__task_id__stream_get: {
+        parameters: {
+            query?: never;
+            header?: never;
+            path: {
+                task_id: string;
+            };
+            cookie?: never;
+        };
+        requestBody?: never;
+        responses: {
+            /** @description SSE stream of a book import task snapshot followed by progress deltas. */
+            200: {
+                headers: {
+                    [name: string]: unknown;
+                };
+                content: {
+                    "text/event-stream": string;
+                };
+            };
+            /** @description Validation Error */
+            422: {
+                headers: {
+                    [name: string]: unknown;
+                };
+                content: {
+                    "application/json": components["schemas"]["HTTPValidationError"];
+                };
+            };
+        };
+    };
+    list_book_import_task_files_api_materials_books_tasks__task_id__files_get: {
+        parameters: {
+            query?: {
+                skip?: number;
+                limit?: number;
+            };
+            header?: never;
+            path: {
+                task_id: string;
+            };
+            cookie?: never;
+        };
+        requestBody?: never;
+        responses: {
+            /** @description Successful Response */
+            200: {
+                headers: {
+                    [name: string]: unknown;
+                };
+                content: {
+                    "application/json": components["schemas"]["BookImportFileResultListResponse"];
+                };
+            };
+            /** @description Validation Error */
+            422: {
+                headers: {
+                    [name: string]: unknown;
+                };
+                content: {
+                    "application/json": components["schemas"]["HTTPValidationError"];
+                };
+            };
+        };
+    };
     list_book_sources_api_materials_books_sources_get: {
         parameters: {
             query?: {
@@ -3459,4 +3897,24 @@ export interface operations {
             };
         };
     };
+    rate_limit_metrics_api_health_rate_limit_get: {
+        parameters: {
+            query?: never;
+            header?: never;
+            path?: never;
+            cookie?: never;
+        };
+        requestBody?: never;
+        responses: {
+            /** @description Successful Response */
+            200: {
+                headers: {
+                    [name: string]: unknown;
+                };
+                content: {
+                    "application/json": components["schemas"]["RateLimitMetricsResponse"];
+                };
+            };
+        };
+    };
 }
@@ -1,4 +1,5 @@
 import type {
+  BookImportFileResultListResponse,
   BookImportStartResponse,
   BookImportTaskResponse,
   BookScanResponse,
@@ -19,6 +20,12 @@ export default {
   getTask: (taskId: string) =>
     api.get<BookImportTaskResponse>(`/api/materials/books/tasks/${taskId}`),
 
+  cancelTask: (taskId: string) =>
+    api.post<BookImportTaskResponse>(`/api/materials/books/tasks/${taskId}/cancel`),
+
+  listTaskFiles: (taskId: string, params: { skip?: number, limit?: number }) =>
+    api.get<BookImportFileResultListResponse>(`/api/materials/books/tasks/${taskId}/files`, { params }),
+
   listSources: (params: { skip?: number, limit?: number }) =>
     api.get<BookSourceListResponse>('/api/materials/books/sources', { params }),
 }
@@ -1,5 +1,6 @@
 import type {
   MaterialListResponse,
+  MaterialUploadBatchResponse,
   MessageResponse,
   UploadTaskResponse,
 } from '../generated'
@@ -15,6 +16,12 @@ export default {
   getUploadTask: (taskId: string) =>
     api.get<UploadTaskResponse>(`/api/materials/upload-tasks/${taskId}`),
 
+  uploadBatch: (data: FormData) =>
+    api.post<MaterialUploadBatchResponse>('/api/materials/upload-batch', data),
+
+  getUploadBatch: (taskId: string) =>
+    api.get<MaterialUploadBatchResponse>(`/api/materials/upload-batches/${taskId}`),
+
   delete: (id: number) => api.delete<MessageResponse>(`/api/materials/${id}`),
 
   batchDelete: (ids: number[]) => api.post<MessageResponse>('/api/materials/batch-delete', { ids }),
@@ -0,0 +1,111 @@
+import type {
+  BookImportTaskResponse,
+  BookImportTaskStreamEventResponse,
+  UploadTaskResponse,
+  UploadTaskStreamEventResponse,
+} from '../generated'
+import { resolveApiUrl } from '@/api'
+
+type TaskStreamEvent = UploadTaskStreamEventResponse | BookImportTaskStreamEventResponse
+
+interface StreamTaskProgressOptions<T> {
+  signal?: AbortSignal
+  token?: string
+  onSnapshot?: (task: T) => void
+  onDelta?: (changes: Partial<T>) => void
+  onDone?: () => void
+}
+
+function isRecord(value: unknown): value is Record<string, unknown> {
+  return typeof value === 'object' && value !== null
+}
+
+function parseTaskStreamEvent(payloadText: string): TaskStreamEvent {
+  const parsed: unknown = JSON.parse(payloadText)
+  if (!isRecord(parsed) || typeof parsed.event !== 'string') {
+    throw new Error('无效进度事件')
+  }
+  if (parsed.event === 'snapshot' && isRecord(parsed.task)) {
+    return parsed as unknown as TaskStreamEvent
+  }
+  if (parsed.event === 'delta' && typeof parsed.task_id === 'string' && isRecord(parsed.changes)) {
+    return { event: 'delta', task_id: parsed.task_id, changes: parsed.changes }
+  }
+  throw new Error('无效进度事件')
+}
+
+async function streamTaskProgress<T>(path: string, options: StreamTaskProgressOptions<T>) {
+  const response = await fetch(resolveApiUrl(path), {
+    method: 'GET',
+    signal: options.signal,
+    headers: {
+      Accept: 'text/event-stream',
+      ...(options.token ? { Authorization: `Bearer ${options.token}` } : {}),
+    },
+  })
+
+  if (!response.ok) {
+    throw new Error(`HTTP ${response.status}`)
+  }
+
+  const reader = response.body?.getReader()
+  if (!reader) {
+    throw new Error('读取响应流失败')
+  }
+
+  const decoder = new TextDecoder()
+  let buffer = ''
+  let doneEventSeen = false
+
+  const processLine = (line: string) => {
+    // Lines starting with ":" are keepalive comments.
+    if (!line.startsWith('data:')) {
+      return
+    }
+
+    const payloadText = line.replace(/^data:\s?/, '').trim()
+    if (!payloadText) {
+      return
+    }
+    if (payloadText === '[DONE]') {
+      if (!doneEventSeen) {
+        doneEventSeen = true
+        options.onDone?.()
+      }
+      return
+    }
+
+    const event = parseTaskStreamEvent(payloadText)
+    if (event.event === 'snapshot') {
+      options.onSnapshot?.(event.task as T)
+      return
+    }
+    options.onDelta?.(event.changes as Partial<T>)
+  }
+
+  while (true) {
+    const { done, value } = await reader.read()
+    if (done) {
+      break
+    }
+    buffer += decoder.decode(value, { stream: true })
+    const lines = buffer.split('\n')
+    buffer = lines.pop() || ''
+    for (const line of lines) {
+      processLine(line.trim())
+    }
+  }
+
+  const trailing = buffer.trim()
+  if (trailing) {
+    processLine(trailing)
+  }
+}
+
+export function streamUploadTask(taskId: string, options: StreamTaskProgressOptions<UploadTaskResponse> = {}) {
+  return streamTaskProgress(`/api/materials/upload-tasks/${taskId}/stream`, options)
+}
+
+export function streamBookImportTask(taskId: string, options: StreamTaskProgressOptions<BookImportTaskResponse> = {}) {
+  return streamTaskProgress(`/api/materials/books/tasks/${taskId}/stream`, options)
+}
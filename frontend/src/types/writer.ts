@@ -12,11 +12,12 @@ import type {
   ChatSessionResponse as ApiChatSessionResponse,
   ChatWorkflowSseEventResponse as ApiChatWorkflowSseEventResponse,
   GeneratedDocumentHistoryItemResponse as ApiGeneratedDocumentHistoryItemResponse,
-  MaterialResponse as ApiMaterialResponse,
+  MaterialListItemResponse as ApiMaterialListItemResponse,
   PermissionInfoResponse as ApiPermissionInfoResponse,
   PreferencesResponse as ApiPreferencesResponse,
   RoleInfoResponse as ApiRoleInfoResponse,
   SessionDraftResponse as ApiSessionDraftResponse,
+  UploadTaskResponse as ApiUploadTaskResponse,
   UserRoleSummaryResponse as ApiUserRoleSummaryResponse,
 } from '@/api/generated'
 
@@ -49,7 +50,9 @@ export interface ChatWorkflowStep {
   detail?: string
 }
 
-export interface Material extends ApiMaterialResponse {}
+export interface Material extends ApiMaterialListItemResponse {}
+
+export interface UploadTask extends ApiUploadTaskResponse {}
 
 export interface BookScanItem extends ApiBookScanItemResponse {}
 
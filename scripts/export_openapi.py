@@ -28,6 +28,13 @@ from app.schemas.chat import (  # noqa: E402
     ChatStreamEventResponse,
     ChatWorkflowSseEventResponse,
 )
+from app.schemas.materials import (  # noqa: E402
+    BookImportTaskSnapshotSseEventResponse,
+    BookImportTaskStreamEventResponse,
+    TaskProgressDeltaSseEventResponse,
+    UploadTaskSnapshotSseEventResponse,
+    UploadTaskStreamEventResponse,
+)
 
 
 def _merge_schema_components(openapi_schema: dict[str, Any], name: str, schema_fragment: dict[str, Any]) -> None:
@@ -64,6 +71,31 @@ def _inject_manual_components(openapi_schema: dict[str, Any]) -> None:
         'ChatStreamEventResponse',
         TypeAdapter(ChatStreamEventResponse).json_schema(ref_template='#/components/schemas/{model}'),
     )
+    _merge_schema_components(
+        openapi_schema,
+        'TaskProgressDeltaSseEventResponse',
+        TaskProgressDeltaSseEventResponse.model_json_schema(ref_template='#/components/schemas/{model}'),
+    )
+    _merge_schema_components(
+        openapi_schema,
+        'UploadTaskSnapshotSseEventResponse',
+        UploadTaskSnapshotSseEventResponse.model_json_schema(ref_template='#/components/schemas/{model}'),
+    )
+    _merge_schema_components(
+        openapi_schema,
+        'UploadTaskStreamEventResponse',
+        TypeAdapter(UploadTaskStreamEventResponse).json_schema(ref_template='#/components/schemas/{model}'),
+    )
+    _merge_schema_components(
+        openapi_schema,
+        'BookImportTaskSnapshotSseEventResponse',
+        BookImportTaskSnapshotSseEventResponse.model_json_schema(ref_template='#/components/schemas/{model}'),
+    )
+    _merge_schema_components(
+        openapi_schema,
+        'BookImportTaskStreamEventResponse',
+        TypeAdapter(BookImportTaskStreamEventResponse).json_schema(ref_template='#/components/schemas/{model}'),
+    )
 
 
 def main() -> int: